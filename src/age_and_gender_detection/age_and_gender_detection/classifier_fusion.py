@@ -0,0 +1,124 @@
+"""
+Fuse the age and gender GoogLeNet classifiers into one batched ONNX graph.
+
+Both classifiers take the same 224x224 mean-subtracted BGR face crop, and the
+published exports declare a fixed batch of 1, so every face used to cost two
+ONNX runs. The fused graph has one ``input`` with a symbolic batch dimension
+that feeds both networks side by side and returns ``age`` and ``gender``
+scores, so a single run classifies every face in a batch.
+
+Reshape targets that hard-code the batch (a leading ``1``) are rewritten to
+``0`` (copy the input dimension), which is the same for batch 1. The detector
+checks the fused graph against the original sessions before using it. Uses
+the ``onnx`` package (a plugin dependency); the detector falls back to the two
+separate sessions if fusion fails.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FUSED_INPUT = "input"
+FUSED_OUTPUTS = ("age", "gender")
+_BATCH_DIM = "batch"
+
+
+def _graph_inputs(graph) -> list:
+    """Real inputs (old exports also list every initializer as an input)."""
+    initializers = {i.name for i in graph.initializer}
+    return [i for i in graph.input if i.name not in initializers]
+
+
+def _free_batch(model) -> None:
+    """Make the batch dimension symbolic and let hard-coded Reshapes follow it."""
+    from onnx import numpy_helper
+
+    graph = model.graph
+    for value in (*_graph_inputs(graph), *graph.output):
+        dims = value.type.tensor_type.shape.dim
+        if dims:
+            dims[0].ClearField("dim_value")
+            dims[0].dim_param = _BATCH_DIM
+    # Intermediate shapes were inferred for batch 1; let ORT infer them again.
+    del graph.value_info[:]
+
+    shapes = {
+        n.input[1]
+        for n in graph.node
+        if n.op_type == "Reshape"
+        # With allowzero=1 a 0 is a literal zero, not "copy".
+        and not any(a.name == "allowzero" and a.i for a in n.attribute)
+    }
+    for i, init in enumerate(graph.initializer):
+        if init.name not in shapes:
+            continue
+        shape = numpy_helper.to_array(init).copy()
+        if shape.ndim == 1 and len(shape) > 1 and shape[0] == 1:
+            shape[0] = 0
+            graph.initializer[i].CopyFrom(numpy_helper.from_array(shape, init.name))
+
+
+def fuse_classifiers(age_path: Path, gender_path: Path, out_path: Path) -> None:
+    """Write the fused age + gender model to ``out_path``."""
+    import onnx
+    from onnx import compose, helper
+
+    age = onnx.load(str(age_path))
+    gender = onnx.load(str(gender_path))
+    opsets = [{o.domain: o.version for o in m.opset_import} for m in (age, gender)]
+    if opsets[0] != opsets[1]:
+        raise ValueError(f"classifier opsets differ: {opsets}")
+
+    parts = []
+    for name, model in (("age", age), ("gender", gender)):
+        _free_batch(model)
+        model = compose.add_prefix(model, f"{name}/")
+        inputs = _graph_inputs(model.graph)
+        if len(inputs) != 1:
+            raise ValueError(f"{name} classifier has {len(inputs)} inputs")
+        parts.append((name, model, inputs[0], model.graph.output[0]))
+
+    elem_type = parts[0][2].type.tensor_type.elem_type
+    nodes, initializers = [], []
+    outputs = []
+    for name, model, graph_in, graph_out in parts:
+        nodes.append(helper.make_node("Identity", [FUSED_INPUT], [graph_in.name]))
+        nodes.extend(model.graph.node)
+        nodes.append(helper.make_node("Identity", [graph_out.name], [name]))
+        initializers.extend(model.graph.initializer)
+        output = onnx.ValueInfoProto()
+        output.CopyFrom(graph_out)
+        output.name = name
+        outputs.append(output)
+    graph = helper.make_graph(
+        nodes,
+        "age_gender_fused",
+        [
+            helper.make_tensor_value_info(
+                FUSED_INPUT, elem_type, [_BATCH_DIM, 3, 224, 224]
+            )
+        ],
+        outputs,
+        initializer=initializers,
+    )
+    fused = helper.make_model(graph, opset_imports=list(age.opset_import))
+    fused.ir_version = max(age.ir_version, gender.ir_version)
+
+    # Write beside the target and rename, so a crash never leaves a part
+    # that looks newer than the sources.
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    onnx.save(fused, str(tmp))
+    os.replace(tmp, out_path)
+    logger.info("Fused %s and %s into %s", age_path.name, gender_path.name, out_path)
+
+
+def ensure_fused(age_path: Path, gender_path: Path, out_path: Path) -> None:
+    """(Re)write the fused model when missing or older than either classifier."""
+    src_mtime = max(p.stat().st_mtime_ns for p in (age_path, gender_path))
+    if out_path.exists() and out_path.stat().st_mtime_ns >= src_mtime:
+        return
+    fuse_classifiers(age_path, gender_path, out_path)
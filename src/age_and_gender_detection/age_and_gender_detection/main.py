@@ -2,6 +2,7 @@ import logging
 import os
 import sys
 import threading
+import time
 from pathlib import Path
 from typing import TypedDict
 
@@ -19,6 +20,7 @@ from rb.api.models import (
 )
 from rb.lib.job_progress import report_file_progress
 from rb.lib.ml_service import MLService
+from rb.lib.stdout import emit_result
 
 from age_and_gender_detection.model import AgeGenderDetector, get_images_from_dir
 
@@ -29,10 +31,11 @@ IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".gif"}
 
 
 class AgeGenderImageDirectory(FileFilterDirectory):
-    """Directory must exist, be non-empty, and contain at least one allowed image extension."""
+    """Directory must exist, be non-empty, and contain at least one allowed image (any depth)."""
 
     path: DirectoryPath
     file_extensions: list[str] = list(IMAGE_EXTENSIONS)
+    recursive: bool = True
 
 
 logging.basicConfig(
@@ -84,63 +87,107 @@ if getattr(sys, "frozen", False):
     # sys._MEIPASS points directly to the _internal folder
     models_dir = Path(sys._MEIPASS) / "src" / "age_and_gender_detection" / "models"
 
-model = AgeGenderDetector(
-    face_detector_path=models_dir / "version-RFB-640.onnx",
-    age_classifier_path=models_dir / "age_googlenet.onnx",
-    gender_classifier_path=models_dir / "gender_googlenet.onnx",
-)
+_MODEL: AgeGenderDetector | None = None
+_MODEL_LOCK = threading.Lock()
+
+
+def get_model() -> AgeGenderDetector:
+    """
+    Process-wide detector, built on first use rather than at import.
+
+    Importing this module (every API / CLI start imports all plugins) no longer
+    loads the three ONNX sessions. Concurrent first calls build it once; a
+    failed load is retried on the next call.
+    """
+    global _MODEL
+    if _MODEL is not None:
+        return _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            start = time.perf_counter()
+            _MODEL = AgeGenderDetector(
+                face_detector_path=models_dir / "version-RFB-640.onnx",
+                age_classifier_path=models_dir / "age_googlenet.onnx",
+                gender_classifier_path=models_dir / "gender_googlenet.onnx",
+            )
+            logger.info(
+                "Loaded age/gender models in %.2fs", time.perf_counter() - start
+            )
+        return _MODEL
+
+
+def _preload() -> None:
+    try:
+        get_model()
+    except Exception as e:
+        logger.warning("Age/gender preload failed (%s); will load on first use", e)
+
+
+def preload_in_background() -> threading.Thread:
+    """Start loading the models on a daemon thread; requests wait for it via the lock."""
+    thread = threading.Thread(target=_preload, name="age-gender-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+# Opt-in warm start for hosts that always run age/gender.
+if os.getenv("RESCUEBOX_AGE_GENDER_PRELOAD", "0") == "1":
+    preload_in_background()
 
 _PREDICT_LOCK = threading.Lock()
 
 
+def _face_responses(image_path: str, predictions: list) -> list[FileResponse]:
+    image_basename = Path(image_path).name
+    responses = []
+    for i, pred in enumerate(predictions):
+        face_num = i + 1
+        metadata = {
+            "Image Path": image_path,
+            "Gender": pred["gender"],
+            "Age": pred["age"],
+            "Bounding Box": str(pred["box"]),
+            # "Face Number": face_num,
+        }
+        responses.append(
+            FileResponse(
+                file_type="img",
+                path=image_path,
+                title=f"Face {face_num} in {image_basename}",
+                metadata=metadata,
+            )
+        )
+    return responses
+
+
 def predict(inputs: Inputs) -> ResponseBody:
     input_path = inputs["image_directory"].path
     logger.info(f"Input path: {input_path}")
 
+    model = get_model()
     with _PREDICT_LOCK:
         image_files = get_images_from_dir(input_path, model.image_file_extensions)
         total = len(image_files)
         processed = 0
         last_reported = 0
         predictions_by_image: dict[str, list] = {}
-        for image_file in image_files:
-            try:
-                pred = model.predict_age_and_gender(str(image_file))
-                predictions_by_image[str(image_file)] = pred
-            finally:
-                processed += 1
-                last_reported = report_file_progress(
-                    None, processed, total, last_reported
-                )
+        # Images run on a worker pool; with ``streaming=true`` each face is sent
+        # as its image finishes (emit_result prints nothing otherwise).
+        for image_path, predictions in model.predict_age_and_gender_stream(image_files):
+            predictions_by_image[image_path] = predictions
+            for response in _face_responses(image_path, predictions):
+                emit_result(response)
+            processed += 1
+            last_reported = report_file_progress(None, processed, total, last_reported)
         if total > 0:
             report_file_progress(None, total, total, last_reported)
     logger.info(f"Response: {predictions_by_image}")
 
     file_responses: list[FileResponse] = []
-    for image_path, predictions in predictions_by_image.items():
-        if not predictions:
-            continue
-
-        for i, pred in enumerate(predictions):
-            face_num = i + 1
-            image_basename = Path(image_path).name
-
-            metadata = {
-                "Image Path": image_path,
-                "Gender": pred["gender"],
-                "Age": pred["age"],
-                "Bounding Box": str(pred["box"]),
-                # "Face Number": face_num,
-            }
-
-            file_responses.append(
-                FileResponse(
-                    file_type="img",
-                    path=image_path,
-                    title=f"Face {face_num} in {image_basename}",
-                    metadata=metadata,
-                )
-            )
+    for image_file in image_files:
+        file_responses.extend(
+            _face_responses(str(image_file), predictions_by_image[str(image_file)])
+        )
 
     if not file_responses:
         return ResponseBody(root=TextResponse(value="No faces detected in any images."))
@@ -3,6 +3,9 @@
 import argparse
 import logging
 import os
+import threading
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from pprint import pprint
 
@@ -10,48 +13,67 @@ import cv2
 import numpy as np
 import onnxruntime as ort
 
-from age_and_gender_detection.box_utils import predict
+from rb.lib.derived_models import derived_model_path
+from rb.lib.face_detection import (
+    is_gpu_inference_failure,
+    ort_providers,
+    session_batch_limit,
+    shared_face_detector,
+)
+from rb.lib.file_scan import scan_files
+from rb.lib.image_cache import load_rgb
+
+from age_and_gender_detection.classifier_fusion import FUSED_INPUT, FUSED_OUTPUTS
 
 # Suppress "Initializer appears in graph inputs" warnings (harmless, model still works)
 ort.set_default_logger_severity(3)
 
 logger = logging.getLogger(__name__)
 
+_CLASSIFIER_SIZE = 224
+_CLASSIFIER_MEAN = np.array([104, 117, 123], dtype=np.float32)
+_DEFAULT_FACE_BATCH = 32
+# Images whose faces are detected and classified together.
+IMAGE_BATCH = 8
+_DEFAULT_MAX_IN_FLIGHT = 32
+# Each ONNX run already uses this many intra-op threads.
+_INTRA_OP_THREADS = 4
+
 
-def _env_force_cpu() -> bool:
-    return os.environ.get("RESCUEBOX_ORT_CPU", "").strip().lower() in (
-        "1",
-        "true",
-        "yes",
+def face_batch_size() -> int:
+    """Faces per classifier run; ``RESCUEBOX_AGE_GENDER_BATCH_SIZE`` overrides."""
+    return max(
+        1, int(os.getenv("RESCUEBOX_AGE_GENDER_BATCH_SIZE", str(_DEFAULT_FACE_BATCH)))
     )
 
 
-def _is_gpu_inference_failure(exc: BaseException) -> bool:
-    """True when ORT failed on GPU path (e.g. cuDNN FE); safe to retry on CPU."""
-    text = f"{type(exc).__name__}: {exc}".lower()
-    if "cudnn" in text:
-        return True
-    if "cuda" in text and ("conv node" in text or "execution" in text):
-        return True
-    return False
-
-
-def _select_runtime_providers() -> list:
-    if _env_force_cpu():
-        return ["CPUExecutionProvider"]
-    available = ort.get_available_providers()
-    providers = ["CPUExecutionProvider"]
-    if "CUDAExecutionProvider" in available:
-        providers.insert(
-            0,
-            (
-                "CUDAExecutionProvider",
-                {"device_id": 0, "cudnn_conv_algo_search": "DEFAULT"},
-            ),
-        )
-    if "CoreMLExecutionProvider" in available:
-        providers.insert(0, "CoreMLExecutionProvider")
-    return providers
+def default_age_gender_workers() -> int:
+    """Images processed concurrently; ``RESCUEBOX_AGE_GENDER_WORKERS`` overrides."""
+    env = os.getenv("RESCUEBOX_AGE_GENDER_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(2, min(8, (os.cpu_count() or 1) // 2))
+
+
+def max_images_in_flight() -> int:
+    """Upper bound on decoded images held at once (``RESCUEBOX_AGE_GENDER_MAX_IN_FLIGHT``)."""
+    return max(
+        1,
+        int(
+            os.getenv("RESCUEBOX_AGE_GENDER_MAX_IN_FLIGHT", str(_DEFAULT_MAX_IN_FLIGHT))
+        ),
+    )
+
+
+def classifier_input(crops) -> np.ndarray:
+    """``(N, 3, 224, 224)`` float32 mean-subtracted BGR tensor for the face crops."""
+    batch = np.empty(
+        (len(crops), _CLASSIFIER_SIZE, _CLASSIFIER_SIZE, 3), dtype=np.float32
+    )
+    for i, crop in enumerate(crops):
+        batch[i] = cv2.resize(crop, (_CLASSIFIER_SIZE, _CLASSIFIER_SIZE))
+    batch -= _CLASSIFIER_MEAN
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
 
 
 # scale current rectangle to box
@@ -83,9 +105,7 @@ def cropImage(image, box):
 
 
 def get_images_from_dir(image_dir, image_file_extensions):
-    image_dir = Path(image_dir)
-    image_files = [f for f in image_dir.iterdir() if f.suffix in image_file_extensions]
-    return image_files
+    return [Path(p) for p in scan_files(image_dir, extensions=image_file_extensions)]
 
 
 class AgeGenderDetector:
@@ -106,8 +126,8 @@ class AgeGenderDetector:
             "(60-100)",
         ]
         self._session_options = ort.SessionOptions()
-        self._session_options.inter_op_num_threads = 4
-        self._session_options.intra_op_num_threads = 4
+        self._session_options.inter_op_num_threads = _INTRA_OP_THREADS
+        self._session_options.intra_op_num_threads = _INTRA_OP_THREADS
 
         self.genderList = ["Male", "Female"]
         self.image_file_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]
@@ -117,14 +137,14 @@ class AgeGenderDetector:
         self.gender_classifier_path = gender_classifier_path
 
         self._cpu_only = False
-        self.runtime_providers = _select_runtime_providers()
+        self._reload_lock = threading.Lock()
+        self.runtime_providers = ort_providers()
         self._load_sessions()
 
     def _load_sessions(self) -> None:
-        self.face_detector = ort.InferenceSession(
-            self.face_detector_path,
-            sess_options=self._session_options,
-            providers=self.runtime_providers,
+        # Shared with other face-aware plugins (one session, per-file box cache).
+        self.face_detector = shared_face_detector(
+            self.face_detector_path, cpu_only=self._cpu_only
         )
         self.age_classifier = ort.InferenceSession(
             self.age_classifier_path,
@@ -136,113 +156,207 @@ class AgeGenderDetector:
             sess_options=self._session_options,
             providers=self.runtime_providers,
         )
+        self.fused_classifier = self._load_fused_classifier()
 
-    def _try_reload_cpu_after_gpu_failure(self, exc: BaseException) -> bool:
-        if self._cpu_only or not _is_gpu_inference_failure(exc):
-            return False
-        logger.warning(
-            "ONNX Runtime GPU inference failed (%s); switching to CPU. "
-            "Set RESCUEBOX_ORT_CPU=1 to skip GPU from the start.",
-            exc,
-        )
-        self._cpu_only = True
-        self.runtime_providers = ["CPUExecutionProvider"]
-        self._load_sessions()
-        return True
+    def _load_fused_classifier(self):
+        """Age + gender in one batched session, or None to run them separately.
 
-    def _run_face_detector(self, feeds: dict):
+        The fused graph is written to the derived-model folder on first use
+        (``rb.lib.derived_models``). ``RESCUEBOX_AGE_GENDER_FUSE=0`` disables it.
+        """
+        if os.getenv("RESCUEBOX_AGE_GENDER_FUSE", "1") == "0":
+            return None
+        age_path = Path(self.age_classifier_path)
         try:
-            return self.face_detector.run(None, feeds)
-        except Exception as e:
-            if not self._try_reload_cpu_after_gpu_failure(e):
-                raise
-            return self.face_detector.run(None, feeds)
+            from age_and_gender_detection.classifier_fusion import ensure_fused
 
-    def _run_age(self, feeds: dict):
-        try:
-            return self.age_classifier.run(None, feeds)
-        except Exception as e:
-            if not self._try_reload_cpu_after_gpu_failure(e):
-                raise
-            return self.age_classifier.run(None, feeds)
+            fused_path = derived_model_path(
+                "age_and_gender_detection", age_path, "age_gender_fused"
+            )
+            ensure_fused(age_path, Path(self.gender_classifier_path), fused_path)
+            session = ort.InferenceSession(
+                str(fused_path),
+                sess_options=self._session_options,
+                providers=self.runtime_providers,
+            )
+            self._check_fused(session)
+        except Exception as exc:
+            logger.warning(
+                "Fused age/gender classifier unavailable (%s); running them "
+                "separately (one run per face with fixed-batch exports)",
+                exc,
+            )
+            return None
+        logger.info("Age and gender classifiers fused; one run per face batch")
+        return session
+
+    def _check_fused(self, session) -> None:
+        """Raise unless ``session`` matches the separate classifiers on two faces."""
+        rng = np.random.default_rng(0)
+        x = rng.uniform(-128, 128, (2, 3, _CLASSIFIER_SIZE, _CLASSIFIER_SIZE))
+        x = x.astype(np.float32)
+        fused = session.run(list(FUSED_OUTPUTS), {FUSED_INPUT: x})
+        for scores, attr in zip(fused, ("age_classifier", "gender_classifier")):
+            expected = self._scores(attr, x)
+            if not np.allclose(
+                scores.reshape(len(x), -1), expected, rtol=1e-3, atol=1e-5
+            ):
+                raise ValueError(f"fused {attr} output differs from the original")
 
-    def _run_gender(self, feeds: dict):
+    def _try_reload_cpu_after_gpu_failure(self, exc: BaseException) -> bool:
+        if not is_gpu_inference_failure(exc):
+            return False
+        with self._reload_lock:
+            if self._cpu_only:
+                # Another worker already switched; retry on the CPU sessions.
+                return True
+            logger.warning(
+                "ONNX Runtime GPU inference failed (%s); switching to CPU. "
+                "Set RESCUEBOX_ORT_CPU=1 to skip GPU from the start.",
+                exc,
+            )
+            self._cpu_only = True
+            self.runtime_providers = ort_providers(cpu_only=True)
+            self._load_sessions()
+        return True
+
+    def _run(self, attr: str, feeds: dict, output_names=None):
         try:
-            return self.gender_classifier.run(None, feeds)
+            return getattr(self, attr).run(output_names, feeds)
         except Exception as e:
             if not self._try_reload_cpu_after_gpu_failure(e):
                 raise
-            return self.gender_classifier.run(None, feeds)
+            return getattr(self, attr).run(output_names, feeds)
+
+    def _scores(self, attr: str, batch: np.ndarray) -> np.ndarray:
+        """``(N, classes)`` scores of one classifier, in runs its input allows."""
+        session = getattr(self, attr)
+        input_name = session.get_inputs()[0].name
+        step = session_batch_limit(session) or len(batch)
+        scores = [
+            self._run(attr, {input_name: batch[i : i + step]})[0]
+            for i in range(0, len(batch), step)
+        ]
+        return np.concatenate(scores).reshape(len(batch), -1)
 
     def faceDetector(self, orig_image, threshold=0.7):
-        image = cv2.cvtColor(orig_image, cv2.COLOR_BGR2RGB)
-        image = cv2.resize(image, (640, 480))
-        image_mean = np.array([127, 127, 127])
-        image = (image - image_mean) / 128
-        image = np.transpose(image, [2, 0, 1])
-        image = np.expand_dims(image, axis=0)
-        image = image.astype(np.float32)
-
-        input_name = self.face_detector.get_inputs()[0].name
-        confidences, boxes = self._run_face_detector({input_name: image})
-        boxes, labels, probs = predict(
-            orig_image.shape[1], orig_image.shape[0], confidences, boxes, threshold
-        )
-        return boxes, labels, probs
+        detector = self.face_detector
+        if threshold != detector.threshold:
+            detector = shared_face_detector(
+                self.face_detector_path, threshold=threshold, cpu_only=self._cpu_only
+            )
+        faces = detector.detect_images([cv2.cvtColor(orig_image, cv2.COLOR_BGR2RGB)])[0]
+        return faces.boxes, np.ones(len(faces), dtype=int), faces.scores
 
     def genderClassifier(self, orig_image):
-        image = orig_image.copy()
-        image = cv2.resize(image, (224, 224))
-        image_mean = np.array([104, 117, 123])
-        image = image - image_mean
-        image = np.transpose(image, [2, 0, 1])
-        image = np.expand_dims(image, axis=0)
-        image = image.astype(np.float32)
-
-        input_name = self.gender_classifier.get_inputs()[0].name
-        genders = self._run_gender({input_name: image})
-        gender = self.genderList[genders[0].argmax()]
-        return gender
+        genders = self._scores("gender_classifier", classifier_input([orig_image]))
+        return self.genderList[genders[0].argmax()]
 
     def ageClassifier(self, orig_image):
-        image = orig_image.copy()
-        image = cv2.resize(image, (224, 224))
-        image_mean = np.array([104, 117, 123])
-        image = image - image_mean
-        image = np.transpose(image, [2, 0, 1])
-        image = np.expand_dims(image, axis=0)
-        image = image.astype(np.float32)
-
-        input_name = self.age_classifier.get_inputs()[0].name
-        ages = self._run_age({input_name: image})
-        age = self.ageList[ages[0].argmax()]
-        return age
+        ages = self._scores("age_classifier", classifier_input([orig_image]))
+        return self.ageList[ages[0].argmax()]
+
+    def classify_faces(self, crops) -> list[tuple[str, str]]:
+        """``(gender, age)`` for each BGR face crop, classified as stacked batches."""
+        if not crops:
+            return []
+        faces = classifier_input(crops)
+        ages, genders = [], []
+        step = face_batch_size()
+        for start in range(0, len(faces), step):
+            batch = faces[start : start + step]
+            if self.fused_classifier is not None:
+                age, gender = self._run(
+                    "fused_classifier", {FUSED_INPUT: batch}, list(FUSED_OUTPUTS)
+                )
+            else:
+                age = self._scores("age_classifier", batch)
+                gender = self._scores("gender_classifier", batch)
+            ages.append(age.reshape(len(batch), -1))
+            genders.append(gender.reshape(len(batch), -1))
+        age_ids = np.concatenate(ages).argmax(axis=1)
+        gender_ids = np.concatenate(genders).argmax(axis=1)
+        return [
+            (self.genderList[g], self.ageList[a]) for g, a in zip(gender_ids, age_ids)
+        ]
 
-    def predict_age_and_gender(self, image_path):
-        orig_image = cv2.imread(image_path)
-        boxes, labels, probs = self.faceDetector(orig_image)
-        preds = []
-        for i in range(boxes.shape[0]):
-            box = scale(boxes[i, :], orig_image.shape[1], orig_image.shape[0])
-            cropped = cropImage(orig_image, box)
-            gender = self.genderClassifier(cropped)
-            age = self.ageClassifier(cropped)
-            preds.append(
-                {
-                    "box": [int(e) for e in box],
-                    "gender": gender,
-                    "age": age,
-                }
-            )
+    def predict_age_and_gender_batch(
+        self, image_paths, *, detect_workers: int | None = None
+    ) -> dict[str, list]:
+        """Predictions for several images: detection per file, one classifier pass."""
+        paths = [str(p) for p in image_paths]
+        # Boxes come from (or go to) the shared cache.
+        detected = self.face_detector.detect_paths(paths, max_workers=detect_workers)
+        preds: dict[str, list] = {path: [] for path in paths}
+        crops = []
+        for path in paths:
+            faces = detected.get(path)
+            if faces is None or not len(faces):
+                continue
+            # Upright like cv2.imread.
+            rgb = load_rgb(path, upright=True)
+            for face_box in faces.boxes:
+                box = scale(face_box, rgb.shape[1], rgb.shape[0])
+                crop = np.ascontiguousarray(cropImage(rgb, box))
+                crops.append(cv2.cvtColor(crop, cv2.COLOR_RGB2BGR))
+                preds[path].append({"box": [int(e) for e in box]})
+        labels = iter(self.classify_faces(crops))
+        for image_preds in preds.values():
+            for pred in image_preds:
+                pred["gender"], pred["age"] = next(labels)
         return preds
 
-    def predict_age_and_gender_on_dir(self, image_dir):
+    def predict_age_and_gender(self, image_path):
+        image_path = str(image_path)
+        return self.predict_age_and_gender_batch([image_path])[image_path]
+
+    def predict_age_and_gender_stream(
+        self,
+        image_paths,
+        *,
+        max_workers: int | None = None,
+        max_in_flight: int | None = None,
+    ) -> Iterator[tuple[str, list]]:
+        """
+        Yield ``(image_path, predictions)`` as each image finishes.
+
+        Small groups of images run on a thread pool that shares this detector's
+        sessions (ONNX Runtime releases the GIL). At most ``max_in_flight``
+        images are submitted but not yet yielded, which bounds decoded images
+        held at once. Results arrive in completion order.
+        """
+        paths = [str(p) for p in image_paths]
+        workers = max_workers or default_age_gender_workers()
+        in_flight = max_in_flight or max_images_in_flight()
+        group = max(1, min(IMAGE_BATCH, in_flight // workers))
+        groups = iter([paths[i : i + group] for i in range(0, len(paths), group)])
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="age-gender")
+        pending: dict = {}
+        try:
+            while True:
+                while sum(pending.values()) + group <= max(in_flight, group):
+                    chunk = next(groups, None)
+                    if chunk is None:
+                        break
+                    future = pool.submit(
+                        self.predict_age_and_gender_batch, chunk, detect_workers=1
+                    )
+                    pending[future] = len(chunk)
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    yield from future.result().items()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def predict_age_and_gender_on_dir(self, image_dir, *, max_workers=None):
         image_files = get_images_from_dir(image_dir, self.image_file_extensions)
-        preds = {}
-        for image_file in image_files:
-            pred = self.predict_age_and_gender(image_file)
-            preds[str(image_file)] = pred
-        return preds
+        preds = dict(
+            self.predict_age_and_gender_stream(image_files, max_workers=max_workers)
+        )
+        return {str(p): preds[str(p)] for p in image_files}
 
 
 if __name__ == "__main__":
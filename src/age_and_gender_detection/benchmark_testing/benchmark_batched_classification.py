@@ -0,0 +1,106 @@
+"""
+Throughput of age/gender classification on group photos: per face vs. batched.
+
+Faces are detected once up front (boxes come from the shared cache), so the
+numbers cover classification only. The per-face baseline is the original loop
+(two ONNX runs per face, one crop at a time). The batched runs stack every face
+crop of the image set into one tensor and classify it with the two separate
+sessions, then with the fused age + gender graph (needs ``onnx``). Runs on
+whatever providers onnxruntime has. Needs the classifier ONNX models in
+``models/``.
+
+Example::
+
+    python benchmark_testing/benchmark_batched_classification.py \
+        --image_dir /path/to/group_photos --batch_sizes 8,32,64
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from age_and_gender_detection.model import (
+    AgeGenderDetector,
+    cropImage,
+    get_images_from_dir,
+    scale,
+)
+from rb.lib.image_cache import load_rgb
+
+MODELS_DIR = Path(__file__).resolve().parents[1] / "models"
+
+
+def _face_crops(detector: AgeGenderDetector, image_dir: str) -> list[np.ndarray]:
+    paths = [
+        str(p) for p in get_images_from_dir(image_dir, detector.image_file_extensions)
+    ]
+    crops = []
+    for path, faces in detector.face_detector.detect_paths(paths).items():
+        rgb = load_rgb(path, upright=True)
+        for face_box in faces.boxes:
+            box = scale(face_box, rgb.shape[1], rgb.shape[0])
+            crop = np.ascontiguousarray(cropImage(rgb, box))
+            crops.append(cv2.cvtColor(crop, cv2.COLOR_RGB2BGR))
+    return crops
+
+
+def _per_face(detector: AgeGenderDetector, crops) -> list[tuple[str, str]]:
+    return [(detector.genderClassifier(c), detector.ageClassifier(c)) for c in crops]
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image_dir", required=True, type=str)
+    parser.add_argument("--batch_sizes", default="8,32,64", type=str)
+    parser.add_argument("--models_dir", default=str(MODELS_DIR), type=str)
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir)
+    detector = AgeGenderDetector(
+        face_detector_path=models_dir / "version-RFB-640.onnx",
+        age_classifier_path=models_dir / "age_googlenet.onnx",
+        gender_classifier_path=models_dir / "gender_googlenet.onnx",
+    )
+    fused = detector.fused_classifier
+    crops = _face_crops(detector, args.image_dir)
+    if not crops:
+        raise SystemExit(f"no faces found under {args.image_dir}")
+
+    _per_face(detector, crops[:2])  # warm-up
+    baseline, base_secs = _timed(_per_face, detector, crops)
+    report = {
+        "faces": len(crops),
+        "providers": detector.age_classifier.get_providers(),
+        "per_face": {"faces_per_sec": round(len(crops) / base_secs, 2)},
+    }
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",") if b.strip()):
+        os.environ["RESCUEBOX_AGE_GENDER_BATCH_SIZE"] = str(batch_size)
+        for mode, session in (("separate", None), ("fused", fused)):
+            if mode == "fused" and session is None:
+                continue
+            detector.fused_classifier = session
+            labels, secs = _timed(detector.classify_faces, crops)
+            agree = sum(a == b for a, b in zip(labels, baseline)) / len(crops)
+            report[f"{mode}_{batch_size}"] = {
+                "faces_per_sec": round(len(crops) / secs, 2),
+                "speedup": round(base_secs / secs, 2),
+                "label_agreement": round(agree, 4),
+            }
+    detector.fused_classifier = fused
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Shared fixtures: the bundled face detector with small stand-in classifiers."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from age_and_gender_detection.model import AgeGenderDetector
+
+MODELS_DIR = Path(__file__).resolve().parents[1] / "models"
+FACE_DETECTOR = MODELS_DIR / "version-RFB-640.onnx"
+
+
+def _classifier(path: Path, classes: int, seed: int) -> Path:
+    """Fixed-batch CNN shaped like the zoo exports (Reshape hard-codes batch 1)."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    weights = {
+        "conv_w": rng.normal(0, 0.01, (16, 3, 8, 8)).astype(np.float32),
+        "shape": np.array([1, -1], dtype=np.int64),
+        "fc_w": rng.normal(0, 1, (16, classes)).astype(np.float32),
+        "fc_b": rng.normal(0, 0.1, (classes,)).astype(np.float32),
+    }
+    nodes = [
+        helper.make_node("Conv", ["input", "conv_w"], ["c"], strides=[8, 8]),
+        helper.make_node("GlobalAveragePool", ["c"], ["p"]),
+        helper.make_node("Reshape", ["p", "shape"], ["f"]),
+        helper.make_node("Gemm", ["f", "fc_w", "fc_b"], ["logits"]),
+        helper.make_node("Softmax", ["logits"], ["prob"], axis=1),
+    ]
+    initializers = [numpy_helper.from_array(v, k) for k, v in weights.items()]
+    # Old exports also list every initializer as a graph input.
+    inputs = [
+        helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, 3, 224, 224])
+    ] + [
+        helper.make_tensor_value_info(i.name, i.data_type, list(i.dims))
+        for i in initializers
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "classifier",
+        inputs,
+        [helper.make_tensor_value_info("prob", TensorProto.FLOAT, [1, classes])],
+        initializer=initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return path
+
+
+@pytest.fixture
+def detector(tmp_path, monkeypatch):
+    """``detector(fuse=True)`` builds an ``AgeGenderDetector`` on stand-in classifiers."""
+    if not FACE_DETECTOR.exists():
+        pytest.skip("RFB-640 face detector not available")
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_FACE_CACHE_DB", str(tmp_path / "faces.db"))
+    monkeypatch.setenv("RESCUEBOX_DERIVED_MODEL_DIR", str(tmp_path / "derived"))
+
+    def _build(fuse: bool = True) -> AgeGenderDetector:
+        monkeypatch.setenv("RESCUEBOX_AGE_GENDER_FUSE", "1" if fuse else "0")
+        return AgeGenderDetector(
+            face_detector_path=FACE_DETECTOR,
+            age_classifier_path=_classifier(tmp_path / "age.onnx", 8, 1),
+            gender_classifier_path=_classifier(tmp_path / "gender.onnx", 2, 2),
+        )
+
+    return _build
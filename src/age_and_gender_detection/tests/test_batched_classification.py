@@ -0,0 +1,79 @@
+"""Batched / fused age and gender classification (synthetic GoogLeNet stand-ins)."""
+
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+from age_and_gender_detection.model import AgeGenderDetector, classifier_input
+
+TEST_IMAGES_DIR = Path(__file__).resolve().parents[1] / "test_images"
+
+EXPECTED_BOXES = {
+    "gela.jpg": [[2287, 715, 3514, 1943]],
+    "guy.jpg": [[812, 1409, 1620, 2218]],
+    "baby.jpg": [[345, 217, 592, 464]],
+    "kid1.jpg": [[229, 58, 551, 381]],
+}
+
+
+def _crops(n: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(3)
+    return [
+        rng.integers(0, 256, (60 + 7 * i, 50 + 5 * i, 3), dtype=np.uint8)
+        for i in range(n)
+    ]
+
+
+def test_classifier_input_matches_per_face_preprocessing():
+    crops = _crops(3)
+    batch = classifier_input(crops)
+    assert batch.shape == (3, 3, 224, 224) and batch.dtype == np.float32
+    for crop, row in zip(crops, batch):
+        image = cv2.resize(crop.copy(), (224, 224)) - np.array([104, 117, 123])
+        assert np.array_equal(row, np.transpose(image, [2, 0, 1]).astype(np.float32))
+
+
+def test_fused_batch_matches_per_face(detector):
+    model = detector(fuse=True)
+    assert model.fused_classifier is not None
+    assert model.fused_classifier.get_inputs()[0].shape[0] == "batch"
+    # Written to the derived-model folder, not beside the bundled models.
+    age_dir = Path(model.age_classifier_path).parent
+    assert not list(age_dir.glob("*fused*"))
+    derived = Path(os.environ["RESCUEBOX_DERIVED_MODEL_DIR"])
+    assert len(list((derived / "age_and_gender_detection").glob("*fused*"))) == 1
+    crops = _crops(37)
+    expected = [(model.genderClassifier(c), model.ageClassifier(c)) for c in crops]
+    assert model.classify_faces(crops) == expected
+
+
+def test_separate_sessions_when_fusion_disabled(detector):
+    fused = detector(fuse=True).classify_faces(_crops(5))
+    model = detector(fuse=False)
+    assert model.fused_classifier is None
+    assert model.classify_faces(_crops(5)) == fused
+    assert model.classify_faces([]) == []
+
+
+def test_fused_model_rejected_when_outputs_differ(detector, monkeypatch):
+    model = detector(fuse=True)
+
+    def _wrong(*args, **kwargs):
+        raise ValueError("fused age_classifier output differs from the original")
+
+    monkeypatch.setattr(AgeGenderDetector, "_check_fused", _wrong)
+    assert model._load_fused_classifier() is None
+
+
+def test_batch_over_images_keeps_boxes(detector):
+    model = detector(fuse=True)
+    paths = [TEST_IMAGES_DIR / name for name in EXPECTED_BOXES]
+    preds = model.predict_age_and_gender_batch(paths)
+    assert list(preds) == [str(p) for p in paths]
+    for path in paths:
+        assert [p["box"] for p in preds[str(path)]] == EXPECTED_BOXES[path.name]
+        for pred in preds[str(path)]:
+            assert pred["gender"] in model.genderList
+            assert pred["age"] in model.ageList
+        assert preds[str(path)] == model.predict_age_and_gender(path)
@@ -0,0 +1,72 @@
+"""The ONNX sessions load on first use, once, not when the plugin is imported."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from age_and_gender_detection import main as age_gender_main
+
+
+def test_import_does_not_load_models():
+    code = (
+        "import age_and_gender_detection.main as m, sys;"
+        "sys.exit(0 if m._MODEL is None else 1)"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    env.pop("RESCUEBOX_AGE_GENDER_PRELOAD", None)
+    assert subprocess.run([sys.executable, "-c", code], env=env).returncode == 0
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    built: list[int] = []
+
+    class _Detector:
+        image_file_extensions = [".jpg"]
+
+        def __init__(self, **kwargs):
+            time.sleep(0.05)  # widen the race between first callers
+            built.append(1)
+
+    monkeypatch.setattr(age_gender_main, "AgeGenderDetector", _Detector)
+    monkeypatch.setattr(age_gender_main, "_MODEL", None)
+    return built
+
+
+def test_concurrent_first_use_builds_once(fake_detector):
+    got = []
+    threads = [
+        threading.Thread(target=lambda: got.append(age_gender_main.get_model()))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(fake_detector) == 1
+    assert len({id(m) for m in got}) == 1
+
+
+def test_background_preload(fake_detector):
+    age_gender_main.preload_in_background().join(timeout=5)
+    assert len(fake_detector) == 1
+    age_gender_main.get_model()
+    assert len(fake_detector) == 1
+
+
+def test_failed_load_is_retried(monkeypatch):
+    calls: list[int] = []
+
+    def _missing(**kwargs):
+        calls.append(1)
+        raise FileNotFoundError("age_googlenet.onnx")
+
+    monkeypatch.setattr(age_gender_main, "AgeGenderDetector", _missing)
+    monkeypatch.setattr(age_gender_main, "_MODEL", None)
+    age_gender_main.preload_in_background().join(timeout=5)
+    with pytest.raises(FileNotFoundError):
+        age_gender_main.get_model()
+    assert len(calls) == 2
@@ -0,0 +1,57 @@
+"""Worker-pool directory processing with results streamed per image."""
+
+import shutil
+import threading
+from pathlib import Path
+
+import pytest
+
+TEST_IMAGES_DIR = Path(__file__).resolve().parents[1] / "test_images"
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for copy in range(3):
+        for src in sorted(TEST_IMAGES_DIR.glob("*.jpg")):
+            shutil.copy(src, folder / f"{copy}_{src.name}")
+    return folder
+
+
+def test_stream_matches_sequential(detector, image_dir):
+    model = detector()
+    paths = sorted(str(p) for p in image_dir.iterdir())
+    expected = {p: model.predict_age_and_gender(p) for p in paths}
+    streamed = list(model.predict_age_and_gender_stream(paths, max_workers=4))
+    assert sorted(p for p, _ in streamed) == paths
+    assert dict(streamed) == expected
+    assert list(model.predict_age_and_gender_on_dir(image_dir)) == paths
+
+
+def test_in_flight_images_are_bounded(detector, image_dir, monkeypatch):
+    model = detector()
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+    real_batch = model.predict_age_and_gender_batch
+
+    def _tracked(paths, **kwargs):
+        with lock:
+            active["now"] += len(paths)
+            active["peak"] = max(active["peak"], active["now"])
+        try:
+            return real_batch(paths, **kwargs)
+        finally:
+            with lock:
+                active["now"] -= len(paths)
+
+    monkeypatch.setattr(model, "predict_age_and_gender_batch", _tracked)
+    paths = sorted(str(p) for p in image_dir.iterdir())
+    seen = [
+        p
+        for p, _ in model.predict_age_and_gender_stream(
+            paths, max_workers=4, max_in_flight=3
+        )
+    ]
+    assert sorted(seen) == paths
+    assert 1 <= active["peak"] <= 3
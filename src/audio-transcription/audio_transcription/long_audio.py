@@ -0,0 +1,48 @@
+"""
+Split long recordings into segments that can be transcribed independently.
+
+Segments end in the middle of a silence found by Silero VAD, once they have
+reached the target length, so no word is cut in two. Each segment is decoded
+on its own (in parallel) and its timestamps shifted back by the segment start.
+Without VAD the audio is cut into fixed windows.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLE_RATE = 16_000
+
+
+def speech_regions(audio: np.ndarray, max_speech_secs: float) -> list[dict]:
+    """Speech ``{"start", "end"}`` sample ranges; none is longer than ``max_speech_secs``."""
+    return get_speech_timestamps(
+        audio, VadOptions(max_speech_duration_s=max_speech_secs)
+    )
+
+
+def plan_segments(
+    total: int, speech: list[dict] | None, target_secs: float
+) -> list[tuple[int, int]]:
+    """
+    ``(start, end)`` sample ranges covering ``total`` samples.
+
+    With ``speech`` (sorted VAD regions) a segment is closed at the middle of
+    the first silence after it reaches ``target_secs``; audio with no speech
+    gives no segments. With ``speech=None`` the ranges are fixed windows.
+    """
+    target = max(1, int(target_secs * SAMPLE_RATE))
+    if speech is None:
+        return [(s, min(s + target, total)) for s in range(0, total, target)]
+    if not speech:
+        return []
+    spans: list[tuple[int, int]] = []
+    start = 0
+    for prev, nxt in zip(speech, speech[1:]):
+        cut = (prev["end"] + nxt["start"]) // 2
+        if cut - start >= target:
+            spans.append((start, cut))
+            start = cut
+    spans.append((start, total))
+    return spans
@@ -5,7 +5,7 @@ import hashlib
 import logging
 import os
 from pathlib import Path
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 import typer
 from pydantic import DirectoryPath
@@ -15,11 +15,18 @@ from rb.api.models import (
     FileFilterDirectory,
     InputSchema,
     InputType,
+    IntRangeDescriptor,
+    ParameterSchema,
+    RangedIntParameterDescriptor,
     ResponseBody,
     TaskSchema,
+    TextInput,
     TextResponse,
 )
+from rb.lib.job_progress import report_file_progress
 from rb.lib.ml_service import MLService
+from rb.lib.stdout import emit_result
+from rb.lib.transcript_store import search_transcripts
 
 from audio_transcription.model import (
     AudioTranscriptionModel,
@@ -69,6 +76,14 @@ class AudioInput(TypedDict):
     input_dir: AudioDirectory
 
 
+class SearchInputs(TypedDict):
+    query: TextInput
+
+
+class SearchParameters(TypedDict):
+    max_results: NotRequired[int]
+
+
 def _resolve_transcripts_dir(dirpath: Path) -> Path:
     """
     Prefer ``<input_dir>/transcripts``. If the input lives on a read-only mount (e.g. UFDR
@@ -110,7 +125,24 @@ def transcribe(inputs: AudioInput) -> ResponseBody:
     transcripts_dir = _resolve_transcripts_dir(dirpath)
 
     # Write one .txt per audio file under transcripts_dir so downstream text_summarization can read them.
-    results = model.transcribe_files_in_directory(str(dirpath), str(transcripts_dir))
+    paths = [str(p) for p in model.get_audio_files(str(dirpath))]
+    total = len(paths)
+    last_reported = 0
+    done: dict[str, dict] = {}
+    # Files finish out of order on the worker pool; each transcript is written,
+    # emitted (streamed with ``streaming=true``) and counted as it completes.
+    for r in model.transcribe_stream(paths, str(transcripts_dir)):
+        done[r["file_path"]] = r
+        emit_result(
+            BatchTextResponse(
+                texts=[TextResponse(value=r["result"], title=r["file_path"])],
+                transcripts_dir=str(transcripts_dir),
+            )
+        )
+        last_reported = report_file_progress(None, len(done), total, last_reported)
+    if total > 0:
+        report_file_progress(None, total, total, last_reported)
+    results = [done[p] for p in paths]
     result_texts = [
         TextResponse(value=r["result"], title=r["file_path"]) for r in results
     ]
@@ -123,6 +155,53 @@ def transcribe(inputs: AudioInput) -> ResponseBody:
     return ResponseBody(root=response)
 
 
+def search_task_schema() -> TaskSchema:
+    query_schema = InputSchema(
+        key="query",
+        label="Word or phrase to find in transcripts",
+        input_type=InputType.TEXT,
+    )
+    max_results_desc = RangedIntParameterDescriptor(
+        range=IntRangeDescriptor(min=1, max=500),
+        default=50,
+    )
+    return TaskSchema(
+        inputs=[query_schema],
+        parameters=[
+            ParameterSchema(
+                key="max_results",
+                label="Max results",
+                subtitle="Number of matching segments to return",
+                value=max_results_desc,
+            )
+        ],
+    )
+
+
+def _timestamp(secs: float) -> str:
+    secs = int(secs)
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+
+def search(inputs: SearchInputs, parameters: SearchParameters) -> ResponseBody:
+    """Find a phrase in every stored transcript (file + time offset)."""
+    hits = search_transcripts(
+        inputs["query"].text,
+        model=model.model_size,
+        limit=parameters.get("max_results", 50),
+    )
+    texts = [
+        TextResponse(
+            value=hit["text"].strip(),
+            title=f"{hit['audio_path']} @ {_timestamp(hit['offset'])}",
+            subtitle=f"{hit['start']:.1f}s - {hit['end']:.1f}s",
+        )
+        for hit in hits
+    ]
+    logger.info("Transcript search %r: %d hit(s)", inputs["query"].text, len(hits))
+    return ResponseBody(root=BatchTextResponse(texts=texts))
+
+
 def cli_parser(path: str):
     """
     Parses CLI input path into a Pydantic object.
@@ -135,6 +214,14 @@ def cli_parser(path: str):
         raise typer.Abort()
 
 
+def search_inputs_cli_parse(query: str) -> SearchInputs:
+    return SearchInputs(query=TextInput(text=query))
+
+
+def search_parameters_cli_parse(value: str) -> SearchParameters:
+    return SearchParameters(max_results=int(value) if value.strip() else 50)
+
+
 ml_service.add_ml_service(
     rule="/transcribe",
     ml_function=transcribe,
@@ -144,6 +231,20 @@ ml_service.add_ml_service(
     order=0,
 )
 
+ml_service.add_ml_service(
+    rule="/search",
+    ml_function=search,
+    inputs_cli_parser=typer.Argument(
+        parser=search_inputs_cli_parse, help="Word or phrase to find"
+    ),
+    parameters_cli_parser=typer.Argument(
+        parser=search_parameters_cli_parse, help="max_results (e.g. 50)"
+    ),
+    task_schema_func=search_task_schema,
+    short_title="Find phrase in transcripts",
+    order=1,
+)
+
 app = ml_service.app
 if __name__ == "__main__":
     app()
@@ -2,14 +2,133 @@ import logging
 import os
 import re
 import sys
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-from faster_whisper import WhisperModel, download_model
+from faster_whisper import (
+    BatchedInferencePipeline,
+    WhisperModel,
+    decode_audio,
+    download_model,
+)
+from rb.lib.file_fingerprint import cached_sha256_many
+from rb.lib.transcript_store import (
+    clear_checkpoints,
+    load_checkpoints,
+    lookup_transcripts,
+    record_transcript_file,
+    save_checkpoint,
+    store_transcript,
+)
+
+from audio_transcription.long_audio import SAMPLE_RATE, plan_segments, speech_regions
 
 logger = logging.getLogger(__name__)
 
 
 DEFAULT_MODEL_SIZE = "base"
+_DEFAULT_BATCH_SIZE = 8
+_DEFAULT_BATCHED_MIN_SECS = 120
+_DEFAULT_LONG_AUDIO_SECS = 900
+_DEFAULT_SEGMENT_SECS = 300
+
+
+def whisper_workers() -> int:
+    """Files transcribed concurrently (``RESCUEBOX_WHISPER_WORKERS``)."""
+    env = os.getenv("RESCUEBOX_WHISPER_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(1, min(4, (os.cpu_count() or 1) // 4))
+
+
+def whisper_cpu_threads(workers: int) -> int:
+    """CTranslate2 threads per worker (``RESCUEBOX_WHISPER_CPU_THREADS``); cores split evenly."""
+    env = os.getenv("RESCUEBOX_WHISPER_CPU_THREADS")
+    if env:
+        return max(1, int(env))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def whisper_vad_filter() -> bool:
+    """Skip silence with Silero VAD; ``RESCUEBOX_WHISPER_VAD=0`` disables."""
+    return os.getenv("RESCUEBOX_WHISPER_VAD", "1") != "0"
+
+
+def whisper_batched_min_seconds() -> float | None:
+    """
+    Recordings at least this long use ``BatchedInferencePipeline``.
+
+    ``RESCUEBOX_WHISPER_BATCHED_MIN_SECS`` (default 120); a negative value
+    disables the batched pipeline.
+    """
+    secs = float(
+        os.getenv("RESCUEBOX_WHISPER_BATCHED_MIN_SECS", str(_DEFAULT_BATCHED_MIN_SECS))
+    )
+    return None if secs < 0 else secs
+
+
+def whisper_long_audio_seconds() -> float | None:
+    """
+    Recordings at least this long are split into segments and checkpointed.
+
+    ``RESCUEBOX_WHISPER_LONG_AUDIO_SECS`` (default 900); a negative value
+    disables long-audio mode.
+    """
+    secs = float(
+        os.getenv("RESCUEBOX_WHISPER_LONG_AUDIO_SECS", str(_DEFAULT_LONG_AUDIO_SECS))
+    )
+    return None if secs < 0 else secs
+
+
+def whisper_segment_seconds() -> float:
+    """Target length of a long-audio segment (``RESCUEBOX_WHISPER_SEGMENT_SECS``)."""
+    return max(
+        1.0,
+        float(os.getenv("RESCUEBOX_WHISPER_SEGMENT_SECS", str(_DEFAULT_SEGMENT_SECS))),
+    )
+
+
+def whisper_word_timestamps() -> bool:
+    """Keep per-word timings (``RESCUEBOX_WHISPER_WORD_TIMESTAMPS=1``); slower, off by default."""
+    return os.getenv("RESCUEBOX_WHISPER_WORD_TIMESTAMPS", "0") == "1"
+
+
+def segment_rows(segments, offset: float = 0.0) -> list[dict]:
+    """
+    ``{"start", "end", "text"}`` dicts (seconds) for faster-whisper segments.
+
+    Word timings, when present, are kept as columnar ``"words"``.
+    """
+    rows = []
+    for s in segments:
+        row = {
+            "start": round(offset + s.start, 3),
+            "end": round(offset + s.end, 3),
+            "text": s.text,
+        }
+        words = getattr(s, "words", None)
+        if words:
+            row["words"] = {
+                "start": [round(offset + w.start, 3) for w in words],
+                "end": [round(offset + w.end, 3) for w in words],
+                "word": [w.word for w in words],
+            }
+        rows.append(row)
+    return rows
+
+
+def transcript_cache_enabled() -> bool:
+    """Reuse stored transcripts of unchanged audio; ``RESCUEBOX_TRANSCRIPT_CACHE=0`` disables."""
+    return os.getenv("RESCUEBOX_TRANSCRIPT_CACHE", "1") != "0"
+
+
+def whisper_batch_size() -> int:
+    """Speech chunks decoded together by the batched pipeline."""
+    return max(
+        1, int(os.getenv("RESCUEBOX_WHISPER_BATCH_SIZE", str(_DEFAULT_BATCH_SIZE)))
+    )
 
 
 def _flat_model_dir(cache: Path, model_size: str) -> Path:
@@ -115,24 +234,57 @@ class AudioTranscriptionModel:
         *,
         cache_dir: Path | None = None,
         local_files_only: bool = False,
+        workers: int | None = None,
+        cpu_threads: int | None = None,
+        use_cache: bool | None = None,
     ):
         self._model_size = model_size or os.environ.get(
             "RESCUEBOX_WHISPER_MODEL", DEFAULT_MODEL_SIZE
         )
         self._cache_dir = cache_dir
         self._local_files_only = local_files_only
+        self._workers = workers or whisper_workers()
+        self._cpu_threads = cpu_threads or whisper_cpu_threads(self._workers)
+        self._use_cache = transcript_cache_enabled() if use_cache is None else use_cache
         self._model: WhisperModel | None = None
+        self._batched: BatchedInferencePipeline | None = None
+        self._load_lock = threading.Lock()
         self.audio_extensions = {".mp3", ".wav", ".flac", ".aac", ".ogg", ".m4a"}
 
+    @property
+    def model_size(self) -> str:
+        return self._model_size
+
     def _ensure_model_loaded(self) -> WhisperModel:
-        if self._model is None:
-            model_path = ensure_whisper_model_downloaded(
-                self._model_size,
-                cache_dir=self._cache_dir,
-                local_files_only=self._local_files_only,
-            )
-            self._model = WhisperModel(model_path, device="cpu", compute_type="int8")
-        return self._model
+        with self._load_lock:
+            if self._model is None:
+                model_path = ensure_whisper_model_downloaded(
+                    self._model_size,
+                    cache_dir=self._cache_dir,
+                    local_files_only=self._local_files_only,
+                )
+                # num_workers lets that many threads transcribe at once on one model.
+                self._model = WhisperModel(
+                    model_path,
+                    device="cpu",
+                    compute_type="int8",
+                    cpu_threads=self._cpu_threads,
+                    num_workers=self._workers,
+                )
+                logger.info(
+                    "Whisper %s loaded: %d worker(s) x %d CPU thread(s)",
+                    self._model_size,
+                    self._workers,
+                    self._cpu_threads,
+                )
+            return self._model
+
+    def _batched_pipeline(self) -> BatchedInferencePipeline:
+        whisper = self._ensure_model_loaded()
+        with self._load_lock:
+            if self._batched is None:
+                self._batched = BatchedInferencePipeline(model=whisper)
+            return self._batched
 
     def get_audio_files(self, directory: str) -> list[Path]:
         audio_files = []
@@ -149,22 +301,206 @@ class AudioTranscriptionModel:
         if audio_path is None:
             raise ValueError("audio_path cannot be None")
 
-    def transcribe(self, audio_path: str, out_dir: str = None) -> str:
-        self._validate_audio_path(audio_path)
+    def _transcribe_segment(self, audio, start: int, end: int) -> list[dict]:
+        """Timed segments for ``audio[start:end]``, in seconds from the recording start."""
+        whisper = self._ensure_model_loaded()
+        segments, _info = whisper.transcribe(
+            audio[start:end],
+            vad_filter=whisper_vad_filter(),
+            word_timestamps=whisper_word_timestamps(),
+        )
+        return segment_rows(segments, start / SAMPLE_RATE)
+
+    def _transcribe_long(self, audio, digest: str | None = None) -> list[dict]:
+        """
+        Timed segments for a long recording, decoded in parallel pieces.
+
+        The audio is split at silences (see ``long_audio``) and the pieces run on
+        ``workers`` threads. With a ``digest`` every finished piece is
+        checkpointed, and pieces already checkpointed for this audio, model and
+        options are not decoded again.
+        """
+        vad = whisper_vad_filter()
+        speech = speech_regions(audio, whisper_segment_seconds()) if vad else None
+        spans = plan_segments(len(audio), speech, whisper_segment_seconds())
+        checkpoint = digest is not None and self._use_cache
+        options = self.transcription_options()
+        done = load_checkpoints(digest, self._model_size, options) if checkpoint else {}
+        todo = [span for span in spans if span not in done]
+        logger.info(
+            "Long audio (%.0f s): %d segment(s), %d from checkpoints",
+            len(audio) / SAMPLE_RATE,
+            len(spans),
+            len(spans) - len(todo),
+        )
+
+        def _run(span: tuple[int, int]) -> list[dict]:
+            rows = self._transcribe_segment(audio, *span)
+            if checkpoint:
+                save_checkpoint(digest, self._model_size, options, *span, rows)
+            return rows
+
+        if todo:
+            with ThreadPoolExecutor(
+                max_workers=min(self._workers, len(todo)),
+                thread_name_prefix="whisper-segment",
+            ) as pool:
+                futures = [pool.submit(_run, span) for span in todo]
+            # Leaving the pool waited for every piece, so all that could
+            # finish are checkpointed before an error is raised.
+            for span, future in zip(todo, futures):
+                done[span] = future.result()
+        return [row for span in spans for row in done[span]]
+
+    def _transcribe_audio(self, audio, digest: str | None = None) -> list[dict]:
+        """
+        Timed segments for 16 kHz mono ``audio``.
+
+        Long recordings are split and checkpointed (``_transcribe_long``);
+        medium ones use the batched pipeline.
+        """
+        long_secs = whisper_long_audio_seconds()
+        if long_secs is not None and len(audio) >= long_secs * SAMPLE_RATE:
+            return self._transcribe_long(audio, digest)
         whisper = self._ensure_model_loaded()
-        segments, _info = whisper.transcribe(str(audio_path))
-        res = "".join(segment.text for segment in segments)
+        vad = whisper_vad_filter()
+        words = whisper_word_timestamps()
+        min_secs = whisper_batched_min_seconds()
+        # The batched pipeline splits on VAD speech chunks, so it needs VAD on.
+        if vad and min_secs is not None and len(audio) >= min_secs * SAMPLE_RATE:
+            segments, _info = self._batched_pipeline().transcribe(
+                audio,
+                batch_size=whisper_batch_size(),
+                vad_filter=True,
+                word_timestamps=words,
+            )
+        else:
+            segments, _info = whisper.transcribe(
+                audio, vad_filter=vad, word_timestamps=words
+            )
+        return segment_rows(segments)
+
+    def transcribe_segments(
+        self, audio_path: str, digest: str | None = None
+    ) -> list[dict]:
+        """Timed ``{"start", "end", "text"[, "words"]}`` segments for one file."""
+        self._validate_audio_path(audio_path)
+        audio = decode_audio(str(audio_path), sampling_rate=SAMPLE_RATE)
+        return self._transcribe_audio(audio, digest)
+
+    def transcribe(
+        self, audio_path: str, out_dir: str = None, digest: str | None = None
+    ) -> str:
+        res = "".join(
+            row["text"] for row in self.transcribe_segments(audio_path, digest)
+        )
         if out_dir:
             self._write_res_to_dir(
                 [{"file_path": str(audio_path), "result": res}], out_dir
             )
         return res
 
-    def transcribe_batch(self, audio_paths: list[str]) -> list[dict]:
-        return [
-            {"file_path": str(audio_path), "result": self.transcribe(audio_path)}
-            for audio_path in audio_paths
-        ]
+    def transcription_options(self) -> dict:
+        """Settings that change the transcript text (part of the cache key)."""
+        vad = whisper_vad_filter()
+        long_secs = whisper_long_audio_seconds()
+        return {
+            "vad": vad,
+            "batched_min_secs": whisper_batched_min_seconds() if vad else None,
+            "long_audio_secs": long_secs,
+            "segment_secs": (
+                whisper_segment_seconds() if long_secs is not None else None
+            ),
+            "word_timestamps": whisper_word_timestamps(),
+        }
+
+    def _save_transcript(
+        self, audio_path: str, text: str, out_dir: str, digest: str | None
+    ) -> None:
+        self._write_res_to_dir([{"file_path": audio_path, "result": text}], out_dir)
+        if digest is not None and self._use_cache:
+            txt_path = Path(out_dir) / f"{Path(audio_path).stem}.txt"
+            record_transcript_file(
+                str(txt_path), digest, self._model_size, self.transcription_options()
+            )
+
+    def _transcribe_and_store(
+        self, audio_path: str, digest: str | None, out_dir: str | None
+    ) -> str:
+        segments = self.transcribe_segments(audio_path, digest)
+        text = "".join(row["text"] for row in segments)
+        if digest is not None and self._use_cache:
+            options = self.transcription_options()
+            store_transcript(
+                digest,
+                self._model_size,
+                options,
+                text,
+                segments=segments,
+                audio_path=audio_path,
+            )
+            clear_checkpoints(digest, self._model_size, options)
+        if out_dir:
+            self._save_transcript(audio_path, text, out_dir, digest)
+        return text
+
+    def transcribe_stream(
+        self, audio_paths: list[str], out_dir: str | None = None
+    ) -> Iterator[dict]:
+        """
+        Yield ``{"file_path", "result"}`` for each file as it finishes.
+
+        Audio already transcribed with the same model and options (matched by
+        content hash, see ``rb.lib.transcript_store``) is returned first without
+        running Whisper. The rest run on a pool of ``workers`` threads sharing one
+        model; each thread decodes its own file, so at most ``workers``
+        recordings are in memory. With ``out_dir``, each transcript is written
+        there as soon as it is done. New results arrive in completion order.
+        """
+        paths = [str(p) for p in audio_paths]
+        if not paths:
+            return
+        digests: dict[str, str] = {}
+        cached: dict[str, str] = {}
+        if self._use_cache:
+            digests = cached_sha256_many(paths)
+            stored = lookup_transcripts(
+                digests.values(), self._model_size, self.transcription_options()
+            )
+            cached = {p: stored[d] for p, d in digests.items() if d in stored}
+            logger.info(
+                "Transcripts: %d cached, %d to transcribe",
+                len(cached),
+                len(paths) - len(cached),
+            )
+        for p in paths:
+            if p in cached:
+                if out_dir:
+                    self._save_transcript(p, cached[p], out_dir, digests[p])
+                yield {"file_path": p, "result": cached[p]}
+
+        cold = [p for p in paths if p not in cached]
+        if not cold:
+            return
+        self._ensure_model_loaded()
+        pool = ThreadPoolExecutor(
+            max_workers=min(self._workers, len(cold)), thread_name_prefix="whisper"
+        )
+        try:
+            futures = {
+                pool.submit(self._transcribe_and_store, p, digests.get(p), out_dir): p
+                for p in cold
+            }
+            for future in as_completed(futures):
+                yield {"file_path": futures[future], "result": future.result()}
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def transcribe_batch(
+        self, audio_paths: list[str], out_dir: str | None = None
+    ) -> list[dict]:
+        done = {r["file_path"]: r for r in self.transcribe_stream(audio_paths, out_dir)}
+        return [done[str(p)] for p in audio_paths]
 
     def _write_res_to_dir(self, res: list[dict], out_dir: str) -> None:
         out_dir = Path(out_dir)
@@ -178,7 +514,4 @@ class AudioTranscriptionModel:
         self, input_dir: str, out_dir: str = None
     ) -> list[dict]:
         paths = self.get_audio_files(input_dir)
-        res = self.transcribe_batch([str(p) for p in paths])
-        if out_dir:
-            self._write_res_to_dir(res, out_dir)
-        return res
+        return self.transcribe_batch([str(p) for p in paths], out_dir)
@@ -1,7 +1,12 @@
 import json
 from pathlib import Path
 
-from audio_transcription.main import APP_NAME, ml_service, task_schema
+from audio_transcription.main import (
+    APP_NAME,
+    ml_service,
+    search_task_schema,
+    task_schema,
+)
 from audio_transcription.main import app as cli_app
 from rb.api.models import ResponseBody
 from rb.lib.common_tests import RBAppTest
@@ -18,6 +23,7 @@ class TestAudioTranscription(RBAppTest):
     def get_all_ml_services(self):
         return [
             (0, "transcribe", "Transcribe audio files", task_schema()),
+            (1, "search", "Find phrase in transcripts", search_task_schema()),
         ]
 
     def test_negative_test(self):
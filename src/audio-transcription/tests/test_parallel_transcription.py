@@ -0,0 +1,223 @@
+"""Worker-pool transcription, VAD and the batched pipeline (stand-in Whisper)."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+from audio_transcription import model as model_module  # noqa: E402
+from audio_transcription.long_audio import plan_segments  # noqa: E402
+from audio_transcription.model import SAMPLE_RATE, AudioTranscriptionModel  # noqa: E402
+from rb.lib.transcript_store import (  # noqa: E402
+    load_checkpoints,
+    load_segments,
+    search_transcripts,
+)
+
+
+class _FakeWhisper:
+    """Records how it was built and every transcribe call; tracks overlap."""
+
+    def __init__(self, path, **kwargs):
+        self.kwargs = kwargs
+        self.calls: list[tuple[str, dict]] = []
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.fail_on: int | None = None
+
+    def transcribe(self, audio, **kwargs):
+        return self._run("sequential", audio, kwargs)
+
+    def _run(self, kind, audio, kwargs):
+        with self.lock:
+            self.calls.append((kind, kwargs))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if self.fail_on is not None and len(self.calls) == self.fail_on:
+            self.fail_on = None
+            raise RuntimeError("worker crashed")
+        secs = len(audio) // SAMPLE_RATE
+        return iter([SimpleNamespace(text=f" {secs}s", start=0.0, end=secs)]), None
+
+
+class _FakeBatched:
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, **kwargs):
+        return self.model._run("batched", audio, kwargs)
+
+
+@pytest.fixture
+def whisper(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_TRANSCRIPT_DB", str(tmp_path / "transcripts.db"))
+    monkeypatch.setattr(model_module, "WhisperModel", _FakeWhisper)
+    monkeypatch.setattr(model_module, "BatchedInferencePipeline", _FakeBatched)
+    monkeypatch.setattr(
+        model_module, "ensure_whisper_model_downloaded", lambda *a, **k: "model"
+    )
+    # File name "<seconds>.wav" decodes to that many seconds of silence.
+    monkeypatch.setattr(
+        model_module,
+        "decode_audio",
+        lambda path, sampling_rate: np.zeros(
+            int(float(path.rsplit("/", 1)[-1][:-4]) * sampling_rate), np.float32
+        ),
+    )
+    return tmp_path
+
+
+def _files(folder, seconds):
+    paths = []
+    for s in seconds:
+        path = folder / f"{s}.wav"
+        path.write_bytes(str(s).encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_pool_sized_to_host(whisper):
+    model = AudioTranscriptionModel(workers=3, cpu_threads=2)
+    whisper_model = model._ensure_model_loaded()
+    assert whisper_model.kwargs["num_workers"] == 3
+    assert whisper_model.kwargs["cpu_threads"] == 2
+    assert whisper_model.kwargs["compute_type"] == "int8"
+
+
+def test_stream_runs_files_concurrently(whisper):
+    model = AudioTranscriptionModel(workers=3, cpu_threads=1)
+    paths = _files(whisper, [1, 2, 3, 4, 5, 6])
+    streamed = list(model.transcribe_stream(paths, str(whisper / "out")))
+    assert sorted(r["file_path"] for r in streamed) == sorted(paths)
+    assert model._model.peak == 3
+    assert (whisper / "out" / "4.txt").read_text() == " 4s"
+    batch = model.transcribe_batch(paths)
+    assert [r["file_path"] for r in batch] == paths
+
+
+def test_vad_and_batched_pipeline_for_long_files(whisper, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_WHISPER_BATCHED_MIN_SECS", "60")
+    model = AudioTranscriptionModel(workers=1, cpu_threads=1)
+    model.transcribe_batch(_files(whisper, [30, 90]))
+    kinds = {kind: kwargs for kind, kwargs in model._model.calls}
+    assert kinds["sequential"]["vad_filter"] is True
+    assert kinds["batched"]["vad_filter"] is True
+    assert kinds["batched"]["batch_size"] == 8
+
+
+def test_vad_off_disables_batched_pipeline(whisper, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_WHISPER_VAD", "0")
+    monkeypatch.setenv("RESCUEBOX_WHISPER_BATCHED_MIN_SECS", "60")
+    model = AudioTranscriptionModel(workers=1, cpu_threads=1)
+    model.transcribe_batch(_files(whisper, [90]))
+    assert model._model.calls == [
+        ("sequential", {"vad_filter": False, "word_timestamps": False})
+    ]
+
+
+def test_repeat_run_uses_stored_transcripts(whisper):
+    paths = _files(whisper, [1, 2])
+    out = whisper / "out"
+    first = AudioTranscriptionModel(workers=2, cpu_threads=1).transcribe_batch(
+        paths, str(out)
+    )
+
+    model = AudioTranscriptionModel(workers=2, cpu_threads=1)
+    assert model.transcribe_batch(paths, str(out)) == first
+    assert model._model is None  # Whisper never loaded
+
+    # A new file, and a copy of a known one under another name.
+    copy = whisper / "copy.wav"
+    copy.write_bytes(b"2")
+    new = _files(whisper, [3])
+    again = model.transcribe_batch([*paths, str(copy), *new])
+    assert [r["result"] for r in again] == [" 1s", " 2s", " 2s", " 3s"]
+    assert len(model._model.calls) == 1
+
+
+def test_cache_disabled(whisper, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_TRANSCRIPT_CACHE", "0")
+    paths = _files(whisper, [1])
+    AudioTranscriptionModel(workers=1, cpu_threads=1).transcribe_batch(paths)
+    model = AudioTranscriptionModel(workers=1, cpu_threads=1)
+    model.transcribe_batch(paths)
+    assert len(model._model.calls) == 1
+
+
+def test_plan_segments_cuts_in_silence():
+    sr = SAMPLE_RATE
+    speech = [{"start": i * 100 * sr, "end": (i * 100 + 90) * sr} for i in range(12)]
+    spans = plan_segments(1200 * sr, speech, 300)
+    assert spans == [
+        (0, 395 * sr),
+        (395 * sr, 695 * sr),
+        (695 * sr, 995 * sr),
+        (995 * sr, 1200 * sr),
+    ]
+    assert plan_segments(1200 * sr, [], 300) == []
+    assert plan_segments(700 * sr, None, 300)[-1] == (600 * sr, 700 * sr)
+
+
+@pytest.fixture
+def long_audio(whisper, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_WHISPER_LONG_AUDIO_SECS", "600")
+    monkeypatch.setenv("RESCUEBOX_WHISPER_SEGMENT_SECS", "300")
+    sr = SAMPLE_RATE
+    monkeypatch.setattr(
+        model_module,
+        "speech_regions",
+        lambda audio, max_secs: [
+            {"start": s, "end": s + 90 * sr} for s in range(0, len(audio), 100 * sr)
+        ],
+    )
+    return whisper
+
+
+def test_long_audio_segments_are_stitched(long_audio):
+    model = AudioTranscriptionModel(workers=2, cpu_threads=1)
+    audio = np.zeros(1200 * SAMPLE_RATE, np.float32)
+    rows = model._transcribe_long(audio)
+    assert [r["start"] for r in rows] == [0, 395, 695, 995]
+    assert [r["end"] for r in rows] == [395, 695, 995, 1200]
+    assert "".join(r["text"] for r in rows) == " 395s 300s 300s 205s"
+    assert {kind for kind, _ in model._model.calls} == {"sequential"}
+
+
+def test_interrupted_long_audio_resumes(long_audio):
+    path = _files(long_audio, [1200])[0]
+    model = AudioTranscriptionModel(workers=1, cpu_threads=1)
+    model._ensure_model_loaded().fail_on = 2
+    with pytest.raises(RuntimeError):
+        model.transcribe_batch([path])
+    assert len(model._model.calls) == 4
+
+    model = AudioTranscriptionModel(workers=1, cpu_threads=1)
+    [result] = model.transcribe_batch([path])
+    assert result["result"] == " 395s 300s 300s 205s"
+    assert len(model._model.calls) == 1  # only the failed segment
+    digest = model_module.cached_sha256_many([path])[path]
+    options = model.transcription_options()
+    assert load_checkpoints(digest, model._model_size, options) == {}
+
+
+def test_segments_are_indexed_for_search(long_audio):
+    paths = _files(long_audio, [5, 1200])
+    model = AudioTranscriptionModel(workers=2, cpu_threads=1)
+    model.transcribe_batch(paths)
+    digest = model_module.cached_sha256_many([paths[1]])[paths[1]]
+    segments = load_segments(digest, model.model_size, model.transcription_options())
+    assert [s["start"] for s in segments] == [0, 395, 695, 995]
+    hits = search_transcripts("300s", model=model.model_size)
+    assert [(h["audio_path"], h["offset"]) for h in hits] == [
+        (paths[1], 395),
+        (paths[1], 695),
+    ]
+    assert search_transcripts("5s")[0]["audio_path"] == paths[0]
@@ -29,6 +29,7 @@ from case_uco.uco.observable import (
 )
 from case_uco.uco.tool import AnalyticTool, Tool
 from case_uco.uco.types import Hash
+from rb.lib.file_fingerprint import cached_sha256
 
 KB_PREFIX = "http://rescuebox.org/kb/"
 RB_NS = "http://rescuebox.org/ns/"  # @context prefix for rb: properties on export nodes
@@ -297,11 +298,7 @@ def _local_file_forensics(path: str) -> dict[str, Any]:
     if mime_guess:
         out["mime_type"] = mime_guess
     try:
-        h = hashlib.sha256()
-        with open(path, "rb") as fp:
-            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
-                h.update(chunk)
-        out["sha256_hex"] = h.hexdigest()
+        out["sha256_hex"] = cached_sha256(path)
     except OSError:
         pass
     return out
@@ -0,0 +1,98 @@
+"""
+Throughput of deepfake detection: one image at a time vs. pipelined batches.
+
+The sequential baseline is the original loop (decode, detect, crop, BNext with
+batch size 1). The batched runs use ``run_models`` with a prefetch pool and
+batched face-detector / BNext calls. Runs on whatever providers onnxruntime has;
+use a CPU-only onnxruntime build (or ``CUDA_VISIBLE_DEVICES=``) for CPU numbers.
+Needs the ONNX models in ``deepfake_detection/onnx_models``.
+
+Example::
+
+    python benchmark_testing/benchmark_batched_inference.py \
+        --image_dir ../../src-tauri/demo/deepfake-detection/inputs --batch_sizes 1,8,16,32
+"""
+
+import argparse
+import json
+import time
+
+from deepfake_detection.main import (
+    _load_face_detector_session,
+    default_prefetch_workers,
+    run_models,
+)
+from deepfake_detection.process.bnext_M import BNext_M_ModelONNX
+from deepfake_detection.sim_data import defaultDataset
+from rb.lib.image_cache import decode_cache
+
+
+def _sequential(model, dataset, facecrop) -> list[dict]:
+    rows = []
+    for i in range(len(dataset)):
+        sample = dataset[i]
+        if sample is None:
+            continue
+        tensor = model.preprocess(sample["image"], facecrop=facecrop)
+        rows.append(model.postprocess(model.predict(tensor)))
+    return rows
+
+
+def _head(dataset, n):
+    """First ``n`` images of ``dataset`` (for warm-up)."""
+    subset = defaultDataset.__new__(defaultDataset)
+    subset.__dict__.update(dataset.__dict__)
+    subset.images = dataset.images[:n]
+    return subset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image_dir", required=True, type=str)
+    parser.add_argument("--batch_sizes", default="1,8,16,32", type=str)
+    parser.add_argument("--workers", default=default_prefetch_workers(), type=int)
+    parser.add_argument("--no_facecrop", action="store_true")
+    args = parser.parse_args()
+
+    dataset = defaultDataset(dataset_path=args.image_dir)
+    model = BNext_M_ModelONNX()
+    facecrop = None if args.no_facecrop else _load_face_detector_session()
+    # Keep decode work in every run; the shared cache would otherwise serve
+    # later runs from memory.
+    decode_cache().max_bytes = 0
+
+    _sequential(model, _head(dataset, 2), facecrop)  # warm-up
+    start = time.perf_counter()
+    baseline = _sequential(model, dataset, facecrop)
+    base_secs = time.perf_counter() - start
+    report = {
+        "images": len(dataset),
+        "providers": model.session.get_providers(),
+        "sequential": {"images_per_sec": round(len(baseline) / base_secs, 2)},
+    }
+
+    for batch_size in (int(b) for b in args.batch_sizes.split(",") if b.strip()):
+        start = time.perf_counter()
+        results = run_models(
+            [model],
+            dataset,
+            facecrop=facecrop,
+            batch_size=batch_size,
+            max_workers=args.workers,
+        )
+        secs = time.perf_counter() - start
+        rows = results[0][1:]
+        agree = sum(
+            a["prediction"] == b["prediction"] for a, b in zip(rows, baseline)
+        ) / max(1, len(rows))
+        report[f"batched_{batch_size}"] = {
+            "images_per_sec": round(len(rows) / secs, 2),
+            "speedup": round(base_secs / secs, 2),
+            "label_agreement": round(agree, 4),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
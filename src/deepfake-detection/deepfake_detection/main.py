@@ -3,12 +3,18 @@ import csv
 import logging
 import os
 import threading
+import time
 import warnings
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import repeat
 from pathlib import Path
 from typing import Any, TypedDict
 
-import onnxruntime as ort
+import numpy as np
 import typer
 from pydantic import DirectoryPath
 from rb.api.models import (
@@ -26,9 +32,16 @@ from rb.api.models import (
     TaskSchema,
     TextResponse,
 )
+from rb.lib.face_detection import (
+    FaceBoxes,
+    FaceDetector,
+    detector_input,
+    shared_face_detector,
+)
 from rb.lib.ml_service import MLService
 
 from deepfake_detection.process.bnext_M import BNext_M_ModelONNX
+from deepfake_detection.process.facedetector import face_center
 from deepfake_detection.sim_data import defaultDataset
 
 logging.basicConfig(
@@ -41,46 +54,37 @@ logger = logging.getLogger(__name__)
 warnings.filterwarnings("ignore")
 APP_NAME = "deepfake_detection"
 
-# Extensions scanned by ``defaultDataset`` in ``sim_data`` (top-level files only).
+# Extensions accepted by ``DeepfakeImageDirectory`` (``defaultDataset`` scans recursively).
 DEEPFAKE_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
 
 
 class DeepfakeImageDirectory(FileFilterDirectory):
-    """Directory must exist, be non-empty, and contain at least one allowed image extension."""
+    """Directory must exist, be non-empty, and contain at least one allowed image (any depth)."""
 
     path: DirectoryPath
     file_extensions: list[str] = list(DEEPFAKE_IMAGE_EXTENSIONS)
+    recursive: bool = True
 
 
 print("start")
 
 
-def _load_face_detector_session():
+_FACE_DETECTOR_PATH = (
+    Path(__file__).resolve().parent / "onnx_models" / "face_detector.onnx"
+)
+
+
+def _load_face_detector_session() -> FaceDetector:
     """
-    RetinaFace ONNX session used to align crops on the detected face before BNext inference.
+    Ultra-Light RFB-640 face detector used to align crops on the detected face before
+    BNext inference (the process-wide detector from ``rb.lib.face_detection``).
 
     Face-aligned inputs typically match the model's training distribution better than raw
-    full frames. This session is always passed into ``run_models(..., facecrop=...)`` when
+    full frames. The detector is always passed into ``run_models(..., facecrop=...)`` when
     the ONNX file loads. The task parameter ``facecrop`` only selects whether result rows
     show the saved crop vs the full image; it does not turn this preprocessing off.
     """
-    model_dir = Path(__file__).resolve().parent / "onnx_models"
-    available = ort.get_available_providers()
-    providers = ["CPUExecutionProvider"]
-    if "CUDAExecutionProvider" in available:
-        providers.insert(
-            0,
-            (
-                "CUDAExecutionProvider",
-                {"device_id": 0, "cudnn_conv_algo_search": "DEFAULT"},
-            ),
-        )
-    if "CoreMLExecutionProvider" in available:
-        providers.insert(0, "CoreMLExecutionProvider")
-    return ort.InferenceSession(
-        str(model_dir / "face_detector.onnx"),
-        providers=providers,
-    )
+    return shared_face_detector(_FACE_DETECTOR_PATH)
 
 
 # Configure UI Elements in RescueBox Desktop
@@ -136,35 +140,220 @@ def _preview_face_crop_in_results(facecrop: str) -> bool:
     return facecrop.strip().lower() in ("true", "1", "yes")
 
 
-def run_models(models, dataset, facecrop=None):
+# Images per face-detector / BNext run. Larger batches keep the CPU or GPU busier
+# at the cost of memory: roughly 3.7 MB of detector input per image plus the
+# decoded images of the batches being prefetched.
+_DEFAULT_BATCH_SIZE = 16
+# Batches decoded ahead of the one being inferred.
+_PREFETCH_BATCHES = 2
+# Concurrent ONNX runs (face detector or BNext) across all requests. Decoding and
+# cropping happen outside a slot, so a queued request keeps preparing batches.
+_INFERENCE_SLOTS = threading.BoundedSemaphore(
+    max(1, int(os.getenv("RESCUEBOX_DEEPFAKE_INFERENCE_SLOTS", "1")))
+)
+
+
+def deepfake_batch_size() -> int:
+    """Batch size from ``RESCUEBOX_DEEPFAKE_BATCH_SIZE`` (default 16)."""
+    return max(1, int(os.getenv("RESCUEBOX_DEEPFAKE_BATCH_SIZE", _DEFAULT_BATCH_SIZE)))
+
+
+def default_prefetch_workers() -> int:
+    """Threads for decode / detector preprocessing / face crops."""
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+@contextmanager
+def _inference_slot(timings: dict[str, float] | None):
+    """Hold an inference slot; adds slot wait / hold time to ``timings``."""
+    requested = time.perf_counter()
+    with _INFERENCE_SLOTS:
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            if timings is not None:
+                timings["queue_secs"] = (
+                    timings.get("queue_secs", 0.0) + acquired - requested
+                )
+                timings["inference_secs"] = (
+                    timings.get("inference_secs", 0.0) + time.perf_counter() - acquired
+                )
+
+
+def _load_sample(dataset, index: int, detect: bool) -> dict | None:
+    """Decode one image and, when ``detect``, build its face-detector input (prefetch pool)."""
+    sample = dataset[index]
+    if sample is None:
+        return None
+    sample["detector_input"] = None
+    if detect:
+        try:
+            sample["detector_input"] = detector_input(np.asarray(sample["image"]))
+        except Exception as e:
+            logger.debug("Detector input failed for %s: %s", sample["image_path"], e)
+    return sample
+
+
+def _detect_faces(
+    samples: list[dict],
+    cached: dict[str, FaceBoxes],
+    facecrop: FaceDetector | None,
+    timings: dict | None = None,
+) -> list[tuple]:
+    """
+    ``(center, already_headshot)`` per sample; no face when detection fails.
+
+    Boxes already in the shared face cache (``cached``) are reused; the rest are
+    detected in one batched run and stored for other face-aware plugins.
+    """
+    detections: list[tuple] = [(None, False)] * len(samples)
+    if facecrop is None:
+        return detections
+    todo = [
+        i
+        for i, s in enumerate(samples)
+        if s["image_path"] not in cached and s["detector_input"] is not None
+    ]
+    fresh: dict[str, FaceBoxes] = {}
+    if todo:
+        try:
+            with _inference_slot(timings):
+                found = facecrop.detect_inputs(
+                    [samples[i]["detector_input"] for i in todo],
+                    [samples[i]["image"].size for i in todo],
+                )
+            fresh = {samples[i]["image_path"]: f for i, f in zip(todo, found)}
+            facecrop.store(fresh)
+        except Exception as e:
+            logger.warning(
+                "Face detection failed for a batch (%s); using full images.", e
+            )
+    for i, sample in enumerate(samples):
+        faces = cached.get(sample["image_path"])
+        if faces is None:
+            faces = fresh.get(sample["image_path"])
+        if faces is not None:
+            detections[i] = face_center(faces)
+    return detections
+
+
+def _model_input(
+    model, sample: dict, detection: tuple, preview_dir: str | None
+) -> tuple[np.ndarray, Any]:
+    """Face crop + transforms for one sample: ``(1x3xHxW tensor, preview path)``."""
+    image, preview = model.face_crop(
+        sample["image"], *detection, preview_dir=preview_dir
+    )
+    return model.apply_transforms(image), preview
+
+
+def _predict_batch(
+    model, tensors: list[np.ndarray], batch_size: int, timings: dict | None = None
+) -> list[dict]:
+    """Run ``model`` over stacked inputs in chunks it accepts."""
+    step = getattr(model, "max_batch", None) or batch_size
+    rows: list[dict] = []
+    for start in range(0, len(tensors), step):
+        batch = np.concatenate(tensors[start : start + step])
+        with _inference_slot(timings):
+            output = model.predict(batch)
+        rows.extend(model.postprocess_batch(output))
+    return rows
+
+
+def run_models(
+    models,
+    dataset,
+    facecrop=None,
+    *,
+    batch_size: int | None = None,
+    max_workers: int | None = None,
+    crop_preview_dir: str | None = None,
+    on_batch: Callable[[str, list[dict]], None] | None = None,
+    timings: dict[str, float] | None = None,
+):
+    """
+    Run each model over ``dataset`` in bounded, pipelined batches.
+
+    A thread pool decodes and prepares detector inputs up to ``_PREFETCH_BATCHES``
+    batches ahead. ``facecrop`` is the shared ``FaceDetector``: boxes already in its
+    per-file cache are reused, the rest are detected once per batch. The model also
+    runs once per batch, so memory stays bounded by the batch size and not by the
+    dataset size.
+    ``on_batch(model_name, rows)`` is called as each batch completes so callers can
+    stream results; the full per-model result lists are still returned.
+
+    Every ONNX run holds one of the process-wide inference slots
+    (``RESCUEBOX_DEEPFAKE_INFERENCE_SLOTS``, default 1). When ``timings`` is given,
+    ``inference_secs`` and ``queue_secs`` (time spent waiting for a slot) are added to it.
+    """
     print("run_models called")
+    batch_size = batch_size or deepfake_batch_size()
+    workers = max_workers or default_prefetch_workers()
+    batches = [
+        range(start, min(start + batch_size, len(dataset)))
+        for start in range(0, len(dataset), batch_size)
+    ]
     results = []
-    for model in models:
-        model_results = []
-        model_results.append({"model_name": model.__class__.__name__})
-        # print("Name:", model.__class__.__name__)
-        for i in range(
-            len(dataset)
-        ):  # This is done one image at a time to avoid memory issues
-            sample = dataset[i]
-            image = sample["image"]
-            image_path = sample["image_path"]
-
-            # Preprocess, predict, postprocess (with optional face crop)
-            preprocessed_image = model.preprocess(image, facecrop=facecrop)
-            prediction = model.predict(preprocessed_image)
-            processed_prediction = model.postprocess(prediction)
-
-            # Add image name to prediction
-            processed_prediction["image_path"] = image_path
-            crop_pv = getattr(model, "last_crop_preview_path", None)
-            if crop_pv:
-                processed_prediction["crop_preview_path"] = crop_pv
-
-            # Append the result to the list
-            model_results.append(processed_prediction)
-
-        results.append(model_results)
+    # Separate pools so face crops never queue behind prefetched decodes.
+    with (
+        ThreadPoolExecutor(max_workers=workers) as load_pool,
+        ThreadPoolExecutor(max_workers=workers) as crop_pool,
+    ):
+        for model in models:
+            model_name = model.__class__.__name__
+            model_results = [{"model_name": model_name}]
+            pending: deque[tuple[list[Future], dict[str, FaceBoxes]]] = deque()
+            next_batch = 0
+
+            def _submit(k: int) -> None:
+                paths = [dataset.images[i] for i in batches[k]]
+                cached = facecrop.lookup(paths) if facecrop is not None else {}
+                futures = [
+                    load_pool.submit(
+                        _load_sample,
+                        dataset,
+                        i,
+                        facecrop is not None and dataset.images[i] not in cached,
+                    )
+                    for i in batches[k]
+                ]
+                pending.append((futures, cached))
+
+            while next_batch < len(batches) and len(pending) < _PREFETCH_BATCHES:
+                _submit(next_batch)
+                next_batch += 1
+            while pending:
+                futures, cached = pending.popleft()
+                samples = [f.result() for f in futures]
+                if next_batch < len(batches):
+                    _submit(next_batch)
+                    next_batch += 1
+                samples = [s for s in samples if s is not None]
+                if not samples:
+                    continue
+                detections = _detect_faces(samples, cached, facecrop, timings)
+                prepared = list(
+                    crop_pool.map(
+                        _model_input,
+                        repeat(model),
+                        samples,
+                        detections,
+                        repeat(crop_preview_dir),
+                    )
+                )
+                rows = _predict_batch(
+                    model, [t for t, _ in prepared], batch_size, timings
+                )
+                for sample, (_, preview), row in zip(samples, prepared, rows):
+                    row["image_path"] = sample["image_path"]
+                    if preview:
+                        row["crop_preview_path"] = preview
+                model_results.extend(rows)
+                if on_batch is not None:
+                    on_batch(model_name, rows)
+            results.append(model_results)
     return results
 
 
@@ -205,7 +394,36 @@ def param_parser(facecrop: str = "false") -> Parameters:
     return {"facecrop": facecrop}
 
 
-_PREDICT_LOCK = threading.Lock()
+_MODEL_CLASSES = {
+    "BNext_M_ModelONNX": BNext_M_ModelONNX,
+}
+_RESIDENT_MODELS: dict[str, Any] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _get_model(name: str):
+    """Process-wide instance of model ``name``, built on first use."""
+    with _SESSIONS_LOCK:
+        model = _RESIDENT_MODELS.get(name)
+        if model is None:
+            model = _RESIDENT_MODELS[name] = _MODEL_CLASSES[name]()
+        return model
+
+
+def _get_face_detector() -> FaceDetector | None:
+    """
+    Process-wide shared face detector (``rb.lib.face_detection``), loaded on first use.
+
+    ``None`` when the ONNX file cannot be loaded; the next request tries again.
+    """
+    try:
+        return _load_face_detector_session()
+    except Exception as e:
+        logger.warning(
+            "Face detector unavailable (%s); preprocessing falls back to full images only.",
+            e,
+        )
+        return None
 
 
 # @server.route(
@@ -214,126 +432,143 @@ _PREDICT_LOCK = threading.Lock()
 #     short_title="DeepFake Detection",
 #     order=0,
 # )
-def give_prediction(inputs: Inputs, parameters: Parameters) -> ResponseBody:
-    print("give_prediction called")
-    with _PREDICT_LOCK:
-        input_path = inputs["input_dir"].path
-        out = Path(inputs["output_dir"].path)
-        selected_models = ["BNext_M_ModelONNX"]
-
-        logger.info(f"Input path: {input_path}")
-        logger.info(f"Output path: {out}")
-        logger.info(f"Parameters: {parameters}")
-        preview_crop = _preview_face_crop_in_results(
-            parameters.get("facecrop", "false")
-        )
-        logger.info(
-            "Result preview: %s",
-            "face crop image" if preview_crop else "full image",
-        )
-        logger.info(f"Selected models: {selected_models}")
+def _create_predictions_csv(directory: Path):
+    """Open a new ``predictions_<time>[_n].csv`` in ``directory`` (exclusive create).
 
-        # Filter models
-        model_map = {
-            "BNext_M_ModelONNX": BNext_M_ModelONNX,
-        }
-        active_models = [model_map[m]() for m in selected_models if m in model_map]
-        logger.info(f"Active models: {[m.__class__.__name__ for m in active_models]}")
-        crop_preview_root = out.parent if out.suffix else out
-        crop_preview_root.mkdir(parents=True, exist_ok=True)
-        for m in active_models:
-            m.crop_preview_dir = str(crop_preview_root.resolve())
-
-        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    Concurrent requests can share an output folder and start within the same
+    second; each gets its own file instead of overwriting another's.
+    """
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    for n in range(1000):
+        suffix = f"_{n}" if n else ""
+        path = directory / f"predictions_{now}{suffix}.csv"
+        try:
+            return path, open(path, "x", newline="", encoding="utf-8")
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Too many prediction files for {now} in {directory}")
 
-        out = crop_preview_root / f"predictions_{now}.csv"
 
-        # Face-aligned crops improve scores; always load when ONNX is available (``facecrop`` only affects result UI).
-        facecropper: ort.InferenceSession | None = None
-        try:
-            facecropper = _load_face_detector_session()
-            logger.info(
-                "Face detector loaded; preprocess uses face alignment when a face is found (headshot uses full frame)."
-            )
-        except Exception as e:
-            logger.warning(
-                "Face detector unavailable (%s); preprocessing falls back to full images only.",
-                e,
-            )
-        dataset = defaultDataset(dataset_path=input_path, resolution=224)
-        res_list = run_models(active_models, dataset, facecrop=facecropper)
-        logger.debug(f"Results list: {res_list}")
-
-        # Persist aggregate results beside crop previews (CLI and tests expect predictions_*.csv here).
-        csv_fields = ["model_name", "image_path", "prediction", "confidence"]
-        with open(out, "w", newline="", encoding="utf-8") as csv_f:
-            writer = csv.DictWriter(csv_f, fieldnames=csv_fields, extrasaction="ignore")
-            writer.writeheader()
-            for model_results in res_list:
-                mn = model_results[0]["model_name"]
-                for row in model_results[1:]:
-                    writer.writerow(
-                        {
-                            "model_name": mn,
-                            "image_path": row.get("image_path", ""),
-                            "prediction": row.get("prediction", ""),
-                            "confidence": row.get("confidence", ""),
-                        }
-                    )
-        logger.info("Wrote predictions CSV to %s", out)
-
-        # Prepare model data structure
-        model_data = []
-        for model_results in res_list:
-            model_name = model_results[0]["model_name"]
-            predictions = model_results[1:]
-            model_data.append({"name": model_name, "predictions": predictions})
-
-        file_responses: list[FileResponse] = []
-        if model_data and model_data[0]["predictions"]:
-            num_images = len(model_data[0]["predictions"])
-            for i in range(num_images):
-                row_metadata: dict[str, Any] = {}
-                # Use the full image_path instead of just the basename
-                full_image_path = model_data[0]["predictions"][i]["image_path"]
-                os.path.basename(full_image_path)
-
-                crop_preview_path = model_data[0]["predictions"][i].get(
-                    "crop_preview_path"
+def give_prediction(inputs: Inputs, parameters: Parameters) -> ResponseBody:
+    print("give_prediction called")
+    input_path = inputs["input_dir"].path
+    out = Path(inputs["output_dir"].path)
+    selected_models = ["BNext_M_ModelONNX"]
+
+    logger.info(f"Input path: {input_path}")
+    logger.info(f"Output path: {out}")
+    logger.info(f"Parameters: {parameters}")
+    preview_crop = _preview_face_crop_in_results(parameters.get("facecrop", "false"))
+    logger.info(
+        "Result preview: %s",
+        "face crop image" if preview_crop else "full image",
+    )
+    logger.info(f"Selected models: {selected_models}")
+
+    # Sessions stay resident across requests; only the first request pays for loading.
+    load_start = time.perf_counter()
+    active_models = [_get_model(m) for m in selected_models if m in _MODEL_CLASSES]
+    # Face-aligned crops improve scores; always used when ONNX is available (``facecrop`` only affects result UI).
+    facecropper = _get_face_detector()
+    load_secs = time.perf_counter() - load_start
+    logger.info(f"Active models: {[m.__class__.__name__ for m in active_models]}")
+    crop_preview_root = out.parent if out.suffix else out
+    crop_preview_root.mkdir(parents=True, exist_ok=True)
+
+    dataset = defaultDataset(dataset_path=input_path, resolution=224)
+
+    # Persist results beside crop previews (CLI and tests expect predictions_*.csv
+    # here). Rows are written as each batch completes, so a long run leaves a
+    # usable partial CSV behind.
+    csv_fields = ["model_name", "image_path", "prediction", "confidence"]
+    out, csv_f = _create_predictions_csv(crop_preview_root)
+    with csv_f:
+        writer = csv.DictWriter(csv_f, fieldnames=csv_fields, extrasaction="ignore")
+        writer.writeheader()
+
+        def _write_rows(model_name: str, rows: list[dict]) -> None:
+            for row in rows:
+                writer.writerow(
+                    {
+                        "model_name": model_name,
+                        "image_path": row.get("image_path", ""),
+                        "prediction": row.get("prediction", ""),
+                        "confidence": row.get("confidence", ""),
+                    }
                 )
-                if preview_crop and crop_preview_path:
-                    display_path = crop_preview_path
-                    title = "Face crop"
-                    row_metadata["Image path"] = full_image_path
-
-                elif preview_crop:
-                    display_path = full_image_path
-                    title = "Full image"
-                else:
-                    display_path = full_image_path
-                    title = "Full image"
-
-                for m_idx, m in enumerate(model_data):
-                    pred = m["predictions"][i]["prediction"]
-                    conf = m["predictions"][i]["confidence"]
-                    model_name = m["name"]
-                    row_metadata["Prediction"] = pred
-                    row_metadata["Confidence"] = f"{conf * 100:.0f}%"
-
-                file_responses.append(
-                    FileResponse(
-                        file_type="img",
-                        path=display_path,
-                        title=title,
-                        metadata=row_metadata,
-                    )
+            csv_f.flush()
+
+        timings: dict[str, float] = {}
+        run_start = time.perf_counter()
+        res_list = run_models(
+            active_models,
+            dataset,
+            facecrop=facecropper,
+            crop_preview_dir=str(crop_preview_root.resolve()),
+            on_batch=_write_rows,
+            timings=timings,
+        )
+    logger.debug(f"Results list: {res_list}")
+    logger.info(
+        "Timing: model load %.2fs, inference %.2fs, waiting for an inference "
+        "slot %.2fs, total run %.2fs",
+        load_secs,
+        timings.get("inference_secs", 0.0),
+        timings.get("queue_secs", 0.0),
+        time.perf_counter() - run_start,
+    )
+    logger.info("Wrote predictions CSV to %s", out)
+
+    # Prepare model data structure
+    model_data = []
+    for model_results in res_list:
+        model_name = model_results[0]["model_name"]
+        predictions = model_results[1:]
+        model_data.append({"name": model_name, "predictions": predictions})
+
+    file_responses: list[FileResponse] = []
+    if model_data and model_data[0]["predictions"]:
+        num_images = len(model_data[0]["predictions"])
+        for i in range(num_images):
+            row_metadata: dict[str, Any] = {}
+            # Use the full image_path instead of just the basename
+            full_image_path = model_data[0]["predictions"][i]["image_path"]
+            os.path.basename(full_image_path)
+
+            crop_preview_path = model_data[0]["predictions"][i].get("crop_preview_path")
+            if preview_crop and crop_preview_path:
+                display_path = crop_preview_path
+                title = "Face crop"
+                row_metadata["Image path"] = full_image_path
+
+            elif preview_crop:
+                display_path = full_image_path
+                title = "Full image"
+            else:
+                display_path = full_image_path
+                title = "Full image"
+
+            for m_idx, m in enumerate(model_data):
+                pred = m["predictions"][i]["prediction"]
+                conf = m["predictions"][i]["confidence"]
+                model_name = m["name"]
+                row_metadata["Prediction"] = pred
+                row_metadata["Confidence"] = f"{conf * 100:.0f}%"
+
+            file_responses.append(
+                FileResponse(
+                    file_type="img",
+                    path=display_path,
+                    title=title,
+                    metadata=row_metadata,
                 )
-        if not file_responses:
-            return ResponseBody(
-                root=TextResponse(value="No predictions generated or no images found.")
             )
+    if not file_responses:
+        return ResponseBody(
+            root=TextResponse(value="No predictions generated or no images found.")
+        )
 
-        return ResponseBody(root=BatchFileResponse(files=file_responses))
+    return ResponseBody(root=BatchFileResponse(files=file_responses))
 
 
 # ----------------------------
@@ -354,7 +589,8 @@ server.add_app_metadata(
     info=app_info,
     plugin_name=APP_NAME,
     gpu=True,
-    make_threadsafe=True,
+    # Requests may overlap; ONNX runs are bounded by ``_INFERENCE_SLOTS``.
+    make_threadsafe=False,
 )
 
 
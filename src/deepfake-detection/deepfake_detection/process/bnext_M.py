@@ -5,6 +5,7 @@ from pathlib import Path
 import numpy as np
 import onnxruntime as ort
 from PIL import Image
+from rb.lib.face_detection import session_batch_limit
 
 from deepfake_detection.process.facedetector import faceDetector
 from deepfake_detection.process.utils import (
@@ -66,6 +67,8 @@ class BNext_M_ModelONNX:
             logger.error(f"Error getting available providers: {e}")
 
         self.resolution = resolution
+        # Exported with a dynamic batch axis; ``None`` means any batch size.
+        self.max_batch = session_batch_limit(self.session)
         self.valid_extensions = (".jpg", ".jpeg", ".png")
 
     def apply_transforms(self, image: Image.Image) -> np.ndarray:
@@ -84,12 +87,43 @@ class BNext_M_ModelONNX:
         out = out.transpose(2, 0, 1)
         return out[None, ...]  # add batch dim
 
+    def face_crop(self, image, center, already_headshot, preview_dir=None):
+        """
+        Crop ``image`` around a detected face center (see ``faceDetector``).
+
+        Returns ``(image, crop_preview_path)``; the preview JPEG is only written to
+        ``preview_dir`` (default: ``crop_preview_dir``) when one is set. Headshots and
+        images without a face are unchanged.
+        """
+        if already_headshot or center is None:
+            return image, None
+        resolution_ratio = getattr(self, "resolution_ratio", 1.5)
+        cx, cy = center
+        w_img, h_img = image.size
+        half = int(self.resolution * resolution_ratio / 2)
+        left = max(0, cx - half)
+        top = max(0, cy - half)
+        right = min(w_img, cx + half)
+        bottom = min(h_img, cy + half)
+        if right <= left or bottom <= top:
+            return image, None
+        image = image.crop((left, top, right, bottom))
+        preview_path = None
+        pdir = preview_dir or getattr(self, "crop_preview_dir", None)
+        if pdir:
+            try:
+                out = Path(pdir) / f"face_preview_{uuid.uuid4().hex[:12]}.jpg"
+                image.save(out, format="JPEG", quality=92)
+                preview_path = str(out.resolve())
+            except Exception as ex:
+                logger.debug("Face crop preview save skipped: %s", ex)
+        return image, preview_path
+
     def preprocess(self, image, facecrop=None):
         """Set ``last_crop_preview_path`` when a face crop JPEG is saved (for result previews)."""
         self.last_crop_preview_path = None
         # Optional face cropping
         if facecrop:
-            self.resolution_ratio = getattr(self, "resolution_ratio", 1.5)
             try:
                 np_image = np.array(image.convert("RGB"))
                 boxes, labels, scores, center, already_headshot = faceDetector(
@@ -97,28 +131,9 @@ class BNext_M_ModelONNX:
                 )
             except Exception:
                 center, already_headshot = None, False
-            if already_headshot:
-                return self.apply_transforms(image)
-            if center is not None:
-                cx, cy = center
-                w_img, h_img = image.size
-                half = int(self.resolution * self.resolution_ratio / 2)
-                left = max(0, cx - half)
-                top = max(0, cy - half)
-                right = min(w_img, cx + half)
-                bottom = min(h_img, cy + half)
-                if right > left and bottom > top:
-                    image = image.crop((left, top, right, bottom))
-                    pdir = getattr(self, "crop_preview_dir", None)
-                    if pdir:
-                        try:
-                            out = (
-                                Path(pdir) / f"face_preview_{uuid.uuid4().hex[:12]}.jpg"
-                            )
-                            image.save(out, format="JPEG", quality=92)
-                            self.last_crop_preview_path = str(out.resolve())
-                        except Exception as ex:
-                            logger.debug("Face crop preview save skipped: %s", ex)
+            image, self.last_crop_preview_path = self.face_crop(
+                image, center, already_headshot
+            )
         return self.apply_transforms(image)
 
     def decode_prediction(self, confidence):
@@ -147,6 +162,10 @@ class BNext_M_ModelONNX:
         prob = 1.0 / (1.0 + np.exp(-logit))
         return self.decode_prediction(prob)
 
+    def postprocess_batch(self, output):
+        """``postprocess`` for each row of a batched ``predict`` output."""
+        return [self.postprocess(row[None, ...]) for row in output]
+
     def predict(self, input):
         output = self.session.run(None, {"input": input})
         return output[0]
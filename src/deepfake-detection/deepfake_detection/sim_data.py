@@ -1,9 +1,12 @@
-from os import listdir
 from os.path import isdir
 from pathlib import Path
 
 import numpy as np
-from PIL import Image
+from rb.lib.file_scan import scan_files
+from rb.lib.image_cache import load_image
+
+# Image types picked up anywhere under ``dataset_path``.
+DATASET_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
 
 class defaultDataset:
@@ -11,20 +14,14 @@ class defaultDataset:
         assert isdir(dataset_path), f"Dataset path {dataset_path} does not exist."
         self.dataset_path = Path(dataset_path)
         self.resolution = resolution
-        self.images = []
-        for image_filename in listdir(dataset_path):
-            if (
-                image_filename.lower().endswith(".jpg")
-                or image_filename.lower().endswith(".png")
-                or image_filename.lower().endswith(".jpeg")
-            ):
-                self.images.append(str(self.dataset_path / image_filename))
+        self.images = scan_files(dataset_path, extensions=DATASET_IMAGE_EXTENSIONS)
 
     def __len__(self):
         return len(self.images)
 
     def read_image(self, path):
-        image = Image.open(path).convert("RGB")
+        # Upright (EXIF applied) so shared face boxes line up with the pixels.
+        image = load_image(path, upright=True)
         original_res = image.size
         # Return the original image without any processing
         return image, original_res
@@ -0,0 +1,222 @@
+"""Batched, slot-bounded ``run_models`` and process-resident deepfake sessions."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from deepfake_detection import main as deepfake_main
+from deepfake_detection.main import run_models
+from deepfake_detection.process.bnext_M import BNext_M_ModelONNX
+
+from deepfake_detection.sim_data import defaultDataset
+from PIL import Image
+from rb.lib.face_detection import FaceDetector, session_batch_limit
+
+
+class _FakeSession:
+    """Records batch sizes; ``outputs(x)`` maps a stacked input to ORT outputs."""
+
+    def __init__(self, shape, outputs):
+        self._inputs = [SimpleNamespace(name="input", shape=shape)]
+        self._outputs = outputs
+        self.batches: list[int] = []
+
+    def get_inputs(self):
+        return self._inputs
+
+    def run(self, _names, feed):
+        x = next(iter(feed.values()))
+        self.batches.append(len(x))
+        return self._outputs(x)
+
+
+def _detector_outputs(x):
+    # One face per image, placed from the image content so crops differ.
+    m = x.mean(axis=(1, 2, 3))
+    confs = np.stack([1 - (0.8 + 0.1 * np.tanh(m)), 0.8 + 0.1 * np.tanh(m)], axis=1)
+    left = 0.3 + 0.2 * np.tanh(m)
+    boxes = np.stack([left, left, left + 0.2, left + 0.25], axis=1)
+    return [confs[:, None, :].astype(np.float32), boxes[:, None, :]]
+
+
+def _bnext_outputs(x):
+    return [(x.mean(axis=(1, 2, 3)) * 20 - 10)[:, None].astype(np.float32)]
+
+
+def _model(max_batch_dim="batch_size"):
+    model = BNext_M_ModelONNX.__new__(BNext_M_ModelONNX)
+    model.session = _FakeSession([max_batch_dim, 3, 224, 224], _bnext_outputs)
+    model.resolution = 224
+    model.max_batch = session_batch_limit(model.session)
+    return model
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    for i, size in enumerate([(640, 480), (300, 500), (800, 600), (256, 256)] * 2):
+        pixels = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        pixels[:, : size[0] // 2] //= 1 + i  # vary brightness -> vary detections
+        Image.fromarray(pixels).save(tmp_path / f"img_{i}.jpg")
+    return defaultDataset(dataset_path=str(tmp_path))
+
+
+def _sequential(model, dataset, facecrop):
+    rows = []
+    for i in range(len(dataset)):
+        sample = dataset[i]
+        tensor = model.preprocess(sample["image"], facecrop=facecrop)
+        row = model.postprocess(model.predict(tensor))
+        row["image_path"] = sample["image_path"]
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("with_detector", [True, False])
+def test_batched_matches_sequential(dataset, with_detector):
+    detector = (
+        FaceDetector(
+            _FakeSession(["batch", 3, 480, 640], _detector_outputs),
+            "fake",
+            use_cache=False,
+        )
+        if with_detector
+        else None
+    )
+    expected = _sequential(_model(), dataset, detector)
+
+    model = _model()
+    streamed: list[dict] = []
+    results = run_models(
+        [model],
+        dataset,
+        facecrop=detector,
+        batch_size=3,
+        max_workers=2,
+        on_batch=lambda name, rows: streamed.extend(rows),
+    )
+    got = results[0][1:]
+    assert results[0][0] == {"model_name": "BNext_M_ModelONNX"}
+    assert streamed == got
+    assert [r["image_path"] for r in got] == [r["image_path"] for r in expected]
+    for a, b in zip(got, expected):
+        assert a["prediction"] == b["prediction"]
+        assert a["confidence"] == pytest.approx(b["confidence"], abs=1e-6)
+    assert model.session.batches == [3, 3, 2]
+    if detector is not None:
+        assert detector.session.batches[-3:] == [3, 3, 2]
+
+
+def test_fixed_batch_model_runs_one_at_a_time(dataset):
+    model = _model(max_batch_dim=1)
+    results = run_models([model], dataset, batch_size=4, max_workers=2)
+    assert len(results[0]) == len(dataset) + 1
+    assert model.session.batches == [1] * len(dataset)
+
+
+class _SlowSession(_FakeSession):
+    """Tracks how many ``run`` calls overlap across threads."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def run(self, names, feed):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        try:
+            return super().run(names, feed)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_concurrent_requests_share_inference_slot(dataset, monkeypatch):
+    monkeypatch.setattr(
+        deepfake_main, "_INFERENCE_SLOTS", threading.BoundedSemaphore(1)
+    )
+    model = _model()
+    model.session = _SlowSession(["batch_size", 3, 224, 224], _bnext_outputs)
+    timings = [{}, {}]
+    threads = [
+        threading.Thread(
+            target=run_models,
+            args=([model], dataset),
+            kwargs={"batch_size": 2, "max_workers": 2, "timings": t},
+        )
+        for t in timings
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert model.session.peak == 1
+    assert len(model.session.batches) == 2 * 4
+    for t in timings:
+        assert t["inference_secs"] > 0 and t["queue_secs"] >= 0
+
+
+def test_shared_face_boxes_are_reused(dataset, tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    session = _FakeSession(["batch", 3, 480, 640], _detector_outputs)
+    detector = FaceDetector(session, "fake", db_path=tmp_path / "faces.db")
+    first = run_models([_model()], dataset, facecrop=detector, batch_size=3)
+    runs = len(session.batches)
+    # A second face-aware pass over the folder reads boxes from the cache.
+    again = run_models([_model()], dataset, facecrop=detector, batch_size=3)
+    assert len(session.batches) == runs
+    assert [r["confidence"] for r in again[0][1:]] == [
+        r["confidence"] for r in first[0][1:]
+    ]
+    assert set(detector.lookup(dataset.images)) == set(dataset.images)
+
+
+def test_models_stay_resident(monkeypatch):
+    built: list[str] = []
+
+    class _Model:
+        def __init__(self):
+            built.append("model")
+
+    monkeypatch.setattr(deepfake_main, "_MODEL_CLASSES", {"Fake": _Model})
+    monkeypatch.setattr(deepfake_main, "_RESIDENT_MODELS", {})
+    for _ in range(3):
+        assert deepfake_main._get_model("Fake") is deepfake_main._get_model("Fake")
+    assert built == ["model"]
+
+
+def test_missing_detector_is_retried(monkeypatch):
+    calls: list[int] = []
+
+    def _missing(path, **kwargs):
+        calls.append(1)
+        raise FileNotFoundError(str(path))
+
+    monkeypatch.setattr(deepfake_main, "shared_face_detector", _missing)
+    assert deepfake_main._get_face_detector() is None
+    assert deepfake_main._get_face_detector() is None
+    assert len(calls) == 2
+
+
+def test_predictions_csv_names_do_not_collide(tmp_path, monkeypatch):
+    class _FrozenClock:
+        @staticmethod
+        def now():
+            from datetime import datetime
+
+            return datetime(2026, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr(deepfake_main, "datetime", _FrozenClock)
+    created = [deepfake_main._create_predictions_csv(tmp_path) for _ in range(3)]
+    for _, f in created:
+        f.close()
+    assert [p.name for p, _ in created] == [
+        "predictions_2026-01-02_03-04-05.csv",
+        "predictions_2026-01-02_03-04-05_1.csv",
+        "predictions_2026-01-02_03-04-05_2.csv",
+    ]
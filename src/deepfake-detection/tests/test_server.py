@@ -17,6 +17,18 @@ from rb.api.models import AppMetadata, BatchFileResponse, ResponseBody
 from rb.lib.common_tests import RBAppTest
 
 
+def _streamed(results):
+    """``run_models`` stand-in that streams ``results`` through ``on_batch``."""
+
+    def _run(models, dataset, facecrop=None, on_batch=None, **kwargs):
+        for model_results in results:
+            if on_batch is not None:
+                on_batch(model_results[0]["model_name"], model_results[1:])
+        return results
+
+    return _run
+
+
 class TestDeepFakeServer(RBAppTest):
     def setup_method(self):
         # Skip heavy model tests when ONNX artifacts are not available in the workspace.
@@ -48,16 +60,18 @@ class TestDeepFakeServer(RBAppTest):
         # Prepare a dummy image and mock predictions
         dummy_image = tmp_path / "img1.jpg"
         dummy_image.write_text("dummy")
-        run_models_mock.return_value = [
+        run_models_mock.side_effect = _streamed(
             [
-                {"model_name": "TestModel"},
-                {
-                    "image_path": str(dummy_image),
-                    "prediction": "fake",
-                    "confidence": 1.0,
-                },
+                [
+                    {"model_name": "TestModel"},
+                    {
+                        "image_path": str(dummy_image),
+                        "prediction": "fake",
+                        "confidence": 1.0,
+                    },
+                ]
             ]
-        ]
+        )
         # Set up input/output directories
         input_dir = tmp_path / "input"
         input_dir.mkdir()
@@ -92,16 +106,18 @@ class TestDeepFakeServer(RBAppTest):
         # Prepare a dummy image and mock predictions
         dummy_image = tmp_path / "img1.jpg"
         dummy_image.write_text("dummy")
-        run_models_mock.return_value = [
+        run_models_mock.side_effect = _streamed(
             [
-                {"model_name": "TestModel"},
-                {
-                    "image_path": str(dummy_image),
-                    "prediction": "fake",
-                    "confidence": 1.0,
-                },
+                [
+                    {"model_name": "TestModel"},
+                    {
+                        "image_path": str(dummy_image),
+                        "prediction": "fake",
+                        "confidence": 1.0,
+                    },
+                ]
             ]
-        ]
+        )
         # Set up input/output directories
         input_dir = tmp_path / "input"
         input_dir.mkdir()
@@ -3,7 +3,7 @@ import os
 
 import cv2
 import numpy as np
-import onnxruntime as ort
+from rb.lib.face_detection import get_session
 
 from face_detection_recognition.utils.retinaface_utils import (
     detect_with_retinaface,
@@ -131,30 +131,8 @@ def detect_faces_and_get_embeddings(
                     models_dir, "yolov8-face-detection.onnx"
                 )
 
-        # YOLO models processing
-        session_options = ort.SessionOptions()
-        session_options.inter_op_num_threads = 4
-        session_options.intra_op_num_threads = 4
-        providers = []
-        available_providers = ort.get_available_providers()
-
-        if "CUDAExecutionProvider" in available_providers:
-            pvdr = "CUDAExecutionProvider"
-            providers = [
-                (
-                    "CUDAExecutionProvider",
-                    {"device_id": 0, "cudnn_conv_algo_search": "DEFAULT"},
-                ),
-            ]
-        if "CoreMLExecutionProvider" in available_providers:
-            pvdr = "CoreMLExecutionProvider"
-            providers.insert(0, pvdr)
-
-        providers.append("CPUExecutionProvider")
-
-        detector_session = ort.InferenceSession(
-            detector_onnx_path, sess_options=session_options, providers=providers
-        )
+        # YOLO models processing (session shared process-wide via rb-lib)
+        detector_session = get_session(detector_onnx_path)
 
         model_inputs = detector_session.get_inputs()
         input_name = model_inputs[0].name
@@ -3,7 +3,7 @@ import os
 
 import cv2
 import numpy as np
-import onnxruntime as ort
+from rb.lib.face_detection import get_session
 from face_detection_recognition.hash import sha256_image
 from face_detection_recognition.utils.get_batch_embeddings import get_embedding
 
@@ -165,15 +165,9 @@ def detect_with_retinaface(
 
     img_input = prepare_retinaface_input(img_rgb)
 
-    # Load model
-    session_options = ort.SessionOptions()
-    session_options.inter_op_num_threads = 4
-    session_options.intra_op_num_threads = 4
-    providers = ["CPUExecutionProvider"]
+    # Load model (cached per process; RetinaFace stays on CPU)
     try:
-        session = ort.InferenceSession(
-            model_path, sess_options=session_options, providers=providers
-        )
+        session = get_session(model_path, cpu_only=True)
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         return [], [], []
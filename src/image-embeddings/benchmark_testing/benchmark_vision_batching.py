@@ -0,0 +1,92 @@
+"""
+Images/sec for the CLIP vision encoder: per-image loop (previous ``search_images`` path)
+vs. ``_embed_images_batched`` (thread-pool decode + dynamic ONNX batches).
+
+No database access; only the ONNX sessions and bundled processor are used.
+
+Example::
+
+    python benchmark_testing/benchmark_vision_batching.py --image_dir ./photos --limit 500
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from image_embeddings.main import (
+    _EXPECTED_IMAGE_EMBED_DIM,
+    CLIP_IMAGE_EXTENSIONS,
+    _dummy_text_inputs,
+    _embed_images_batched,
+    _get_clip_processor,
+    _get_onnx_sessions,
+    _pick_session_for_inputs,
+)
+from PIL import Image
+from rb.lib.file_scan import scan_files
+
+
+def _sequential(processor, sessions, dummy_text, paths) -> dict[str, np.ndarray]:
+    """One decode + one ``run()`` per image, as before batching."""
+    out: dict[str, np.ndarray] = {}
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        inputs = dict(processor(images=image, return_tensors="np", do_rescale=True))
+        feed = {**inputs, **dummy_text}
+        session, required = _pick_session_for_inputs(sessions, feed, "vision")
+        vec = session.run(
+            ["image_embeds"], {k: v for k, v in feed.items() if k in required}
+        )[0]
+        out[path] = (vec / np.linalg.norm(vec, axis=-1, keepdims=True)).squeeze()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image_dir", required=True, type=str)
+    parser.add_argument("--limit", default=0, type=int, help="Max images (0 = all)")
+    parser.add_argument("--batch_size", default=32, type=int)
+    args = parser.parse_args()
+
+    paths = scan_files(args.image_dir, extensions=CLIP_IMAGE_EXTENSIONS)
+    if args.limit:
+        paths = paths[: args.limit]
+
+    processor = _get_clip_processor()
+    sessions = _get_onnx_sessions()
+    dummy_text = _dummy_text_inputs(processor)
+    _sequential(processor, sessions, dummy_text, paths[:2])  # warm-up
+
+    start = time.perf_counter()
+    before = _sequential(processor, sessions, dummy_text, paths)
+    seq_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = _embed_images_batched(
+        processor,
+        sessions,
+        dummy_text,
+        paths,
+        _EXPECTED_IMAGE_EMBED_DIM,
+        batch_size=args.batch_size,
+    )
+    batch_secs = time.perf_counter() - start
+
+    cos = [float(np.dot(before[p], after[p])) for p in after if p in before]
+    print(
+        json.dumps(
+            {
+                "images": len(paths),
+                "sequential_images_per_sec": round(len(before) / seq_secs, 2),
+                "batched_images_per_sec": round(len(after) / batch_secs, 2),
+                "speedup": round(seq_secs / batch_secs, 2),
+                "min_cosine_sequential_vs_batched": round(min(cos), 6) if cos else None,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-import hashlib
 import logging
 import os
 import threading
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import cache
+from itertools import islice
 from pathlib import Path
 from typing import Any, TypedDict, cast
 
@@ -32,6 +35,9 @@ from rb.api.models import (
     TaskSchema,
     TextInput,
 )
+from rb.lib.file_fingerprint import cached_sha256_many
+from rb.lib.file_scan import iter_files
+from rb.lib.image_cache import load_image
 from rb.lib.job_progress import report_file_progress
 from rb.lib.ml_service import MLService
 from sqlalchemy import bindparam, text
@@ -51,15 +57,31 @@ logging.getLogger("filelock").setLevel(logging.WARNING)
 
 _INSTANCE_LOCK = threading.Lock()
 
-# Raster types accepted for CLIP embedding (top-level files under ``input_dir``).
+# Images per vision ``run()`` when the ONNX export has a dynamic batch axis.
+_VISION_BATCH_SIZE = 32
+# Decode + CLIP preprocessing threads (PIL decode releases the GIL).
+_PREPROCESS_WORKERS = max(1, min(8, os.cpu_count() or 1))
+# Scanned paths handled per step; new content in a step is embedded before
+# the scan goes on, so the vision session starts without waiting for the tree.
+_SCAN_CHUNK = 512
+
+# Text-query embeddings kept per process (query string -> normalised vector).
+_TEXT_QUERY_CACHE_SIZE = 256
+_TEXT_QUERY_CACHE: OrderedDict[str, np.ndarray] = OrderedDict()
+_TEXT_QUERY_CACHE_LOCK = threading.Lock()
+# Several text queries in one request are separated by this character.
+QUERY_SEPARATOR = ";"
+
+# Raster types accepted for CLIP embedding (files anywhere under ``input_dir``).
 CLIP_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff"}
 
 
 class ClipImageDirectory(FileFilterDirectory):
-    """Directory must exist, be non-empty, and contain at least one allowed image extension."""
+    """Directory must exist, be non-empty, and contain at least one allowed image (any depth)."""
 
     path: DirectoryPath
     file_extensions: list[str] = list(CLIP_IMAGE_EXTENSIONS)
+    recursive: bool = True
 
 
 class Inputs(TypedDict):
@@ -81,7 +103,7 @@ def task_schema() -> TaskSchema:
     )
     query_schema = InputSchema(
         key="query",
-        label="Enter Text query to find the most similar images",
+        label="Enter Text query to find the most similar images (separate several with ;)",
         input_type=InputType.TEXT,
     )
 
@@ -162,15 +184,6 @@ def _paths_already_embedded(session: Session, paths: list[str]) -> set[str]:
     return set(rows)
 
 
-def _sha256_file(path: str) -> str:
-    """SHA-256 hex digest of raw file bytes (chunked read for large images)."""
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-
 @cache
 def _get_clip_processor() -> Any:
     """Load bundled CLIP tokenizer + image preprocessor (same dir as ONNX exports)."""
@@ -271,27 +284,398 @@ def _dummy_text_inputs(processor) -> dict:
     }
 
 
-def _dummy_pixel_values(processor) -> np.ndarray:
-    from PIL import Image
-
+def _clip_input_size(processor) -> int:
+    """Input side the vision preprocessor resizes to (224 for CLIP ViT-B/32)."""
     size = getattr(_clip_image_processor(processor), "size", 224)
     if isinstance(size, dict):
         size = max(size.values() or [224])
-    dummy = Image.new("RGB", (int(size), int(size)), color=(0, 0, 0))
+    return int(size)
+
+
+def _dummy_pixel_values(processor) -> np.ndarray:
+    from PIL import Image
+
+    size = _clip_input_size(processor)
+    dummy = Image.new("RGB", (size, size), color=(0, 0, 0))
     inputs = dict(processor(images=dummy, return_tensors="np", do_rescale=True))
     return inputs["pixel_values"]
 
 
+@cache
+def _get_dummy_inputs() -> tuple[dict, np.ndarray]:
+    """(dummy text inputs, dummy pixel_values) for the bundled processor, built once."""
+    processor = _get_clip_processor()
+    return _dummy_text_inputs(processor), _dummy_pixel_values(processor)
+
+
+def _split_queries(query_text: str) -> list[str]:
+    """``QUERY_SEPARATOR``-separated queries, stripped and de-duplicated in order."""
+    queries = [q.strip() for q in query_text.split(QUERY_SEPARATOR)]
+    return list(dict.fromkeys(q for q in queries if q))
+
+
+def _encode_text_queries(
+    processor: Any,
+    sessions: tuple[ort.InferenceSession, ort.InferenceSession],
+    dummy_pixels: np.ndarray,
+    queries: list[str],
+) -> np.ndarray:
+    """Normalised CLIP text embeddings, one row per query.
+
+    Queries seen recently are served from a process-level LRU; the rest are
+    tokenized together and encoded in one text-session ``run()`` (one per query
+    if the export has a fixed batch of 1).
+    """
+    with _TEXT_QUERY_CACHE_LOCK:
+        cached = {q: _TEXT_QUERY_CACHE[q] for q in queries if q in _TEXT_QUERY_CACHE}
+        for q in cached:
+            _TEXT_QUERY_CACHE.move_to_end(q)
+    missing = [q for q in queries if q not in cached]
+
+    if missing:
+        probe = {"input_ids": None, "pixel_values": dummy_pixels}
+        text_session, required = _pick_session_for_inputs(sessions, probe, "text")
+        if "input_ids" not in required:
+            raise ValueError(
+                f"Text ONNX session missing input_ids input: {sorted(required)}"
+            )
+        step = len(missing) if _supports_dynamic_batch(text_session, "input_ids") else 1
+        for i in range(0, len(missing), step):
+            chunk = missing[i : i + step]
+            text_inputs = dict(processor(text=chunk, return_tensors="np", padding=True))
+            text_inputs["pixel_values"] = dummy_pixels
+            features = text_session.run(
+                ["text_embeds"],
+                {k: v for k, v in text_inputs.items() if k in required},
+            )[0]
+            features = features / np.linalg.norm(features, axis=-1, keepdims=True)
+            cached.update(zip(chunk, features))
+
+        with _TEXT_QUERY_CACHE_LOCK:
+            for q in missing:
+                _TEXT_QUERY_CACHE[q] = cached[q]
+            while len(_TEXT_QUERY_CACHE) > _TEXT_QUERY_CACHE_SIZE:
+                _TEXT_QUERY_CACHE.popitem(last=False)
+
+    return np.stack([cached[q] for q in queries])
+
+
+def _rank_paths_for_queries(
+    session: Session, query_vecs: np.ndarray, paths: list[str], top_k: int
+) -> list[list[Any]]:
+    """Top-k stored rows among ``paths`` for each query vector, in one SQL round trip.
+
+    Returns one list of ``(id, path, similarity)`` rows per query, best first.
+    """
+    if not paths or len(query_vecs) == 0:
+        return [[] for _ in range(len(query_vecs))]
+    literals = [
+        "[" + ",".join(str(x) for x in vec.tolist()) + "]" for vec in query_vecs
+    ]
+    # pgvector: LATERAL top-k per query, restricted to rows embedded for this run.
+    stmt = text(
+        """
+            SELECT q.ord, hit.id, hit.path, hit.similarity
+            FROM unnest(CAST(:qvecs AS text[])) WITH ORDINALITY AS q(qvec, ord)
+            CROSS JOIN LATERAL (
+                SELECT id, path,
+                       1 - (embedding <=> CAST(q.qvec AS vector)) AS similarity
+                FROM image_embeddings
+                WHERE path IN :paths
+                ORDER BY embedding <=> CAST(q.qvec AS vector)
+                LIMIT :top_k
+            ) AS hit
+            ORDER BY q.ord, hit.similarity DESC
+            """
+    ).bindparams(bindparam("paths", expanding=True))
+    rows = session.execute(
+        stmt, {"qvecs": literals, "paths": paths, "top_k": top_k}
+    ).fetchall()
+    ranked: list[list[Any]] = [[] for _ in range(len(query_vecs))]
+    for row in rows:
+        ranked[int(row.ord) - 1].append(row)
+    return ranked
+
+
+def _rows_by_content_hash(
+    session: Session, hashes: set[str]
+) -> dict[str, ImageEmbedding]:
+    """First stored row per content hash, fetched in one ``IN`` query."""
+    if not hashes:
+        return {}
+    rows = (
+        session.execute(
+            select(ImageEmbedding).where(
+                cast(Any, ImageEmbedding.__table__.c.content_sha256).in_(sorted(hashes))
+            )
+        )
+        .scalars()
+        .all()
+    )
+    out: dict[str, ImageEmbedding] = {}
+    for row in rows:
+        out.setdefault(row.content_sha256, row)
+    return out
+
+
+def _supports_dynamic_batch(
+    session: ort.InferenceSession, input_name: str = "pixel_values"
+) -> bool:
+    """True if ``input_name`` accepts a variable batch dimension."""
+    for inp in session.get_inputs():
+        if inp.name == input_name:
+            batch_dim = inp.shape[0]
+            return not isinstance(batch_dim, int) or batch_dim != 1
+    return False
+
+
+def _preprocess_image(processor: Any, path: str) -> np.ndarray | None:
+    """Decode + CLIP-preprocess one file (runs on the worker pool)."""
+    try:
+        image = load_image(path, min_side=_clip_input_size(processor))
+        inputs = dict(processor(images=image, return_tensors="np", do_rescale=True))
+        return inputs["pixel_values"]
+    except Exception as e:
+        logger.warning("Could not process %s: %s", path, e)
+        return None
+
+
+def _run_vision_batch(
+    session: ort.InferenceSession,
+    extra: dict,
+    paths: list[str],
+    arrays: list[np.ndarray],
+) -> tuple[list[str], np.ndarray | None]:
+    """Run one stacked batch; if it fails, retry image by image and drop failures."""
+    try:
+        pixel_values = np.concatenate(arrays).astype(np.float32, copy=False)
+        return (
+            paths,
+            session.run(["image_embeds"], {"pixel_values": pixel_values, **extra})[0],
+        )
+    except Exception as e:
+        if len(paths) == 1:
+            logger.warning("Could not process %s: %s", paths[0], e)
+            return [], None
+        logger.warning(
+            "Vision batch of %d failed (%s); retrying one image at a time",
+            len(paths),
+            e,
+        )
+    kept: list[str] = []
+    features: list[np.ndarray] = []
+    for p, arr in zip(paths, arrays):
+        ok, feats = _run_vision_batch(session, extra, [p], [arr])
+        if feats is not None:
+            kept.extend(ok)
+            features.append(feats)
+    return kept, np.concatenate(features) if features else None
+
+
+def _embed_images_batched(
+    processor: Any,
+    sessions: tuple[ort.InferenceSession, ort.InferenceSession],
+    dummy_text: dict,
+    paths: list[str],
+    expected_dim: int,
+    batch_size: int = _VISION_BATCH_SIZE,
+    on_batch: Callable[[list[str]], None] | None = None,
+) -> dict[str, np.ndarray]:
+    """Normalised CLIP image embeddings for ``paths``.
+
+    Decoding and preprocessing run on a thread pool a few batches ahead of the
+    ONNX session, which is fed one stacked batch per ``run()`` when the export
+    has a dynamic batch axis (one image per call otherwise). A batch that fails
+    is retried one image at a time; images that still fail are skipped.
+    """
+    if not paths:
+        return {}
+    vision_inputs = {"pixel_values": None, **dummy_text}
+    vision_session, required = _pick_session_for_inputs(
+        sessions, vision_inputs, "vision"
+    )
+    if "pixel_values" not in required:
+        raise ValueError(
+            f"Vision ONNX session missing pixel_values input: {sorted(required)}"
+        )
+    extra = {k: v for k, v in dummy_text.items() if k in required}
+    effective = batch_size if _supports_dynamic_batch(vision_session) else 1
+    batches = [paths[i : i + effective] for i in range(0, len(paths), effective)]
+    # Keep enough decode work queued to occupy every worker while the session runs.
+    lookahead = max(2, -(-_PREPROCESS_WORKERS // effective) + 1)
+
+    results: dict[str, np.ndarray] = {}
+    with ThreadPoolExecutor(max_workers=_PREPROCESS_WORKERS) as pool:
+        pending: deque[list[Future]] = deque()
+        next_batch = 0
+        for batch in batches:
+            while next_batch < len(batches) and len(pending) < lookahead:
+                pending.append(
+                    [
+                        pool.submit(_preprocess_image, processor, p)
+                        for p in batches[next_batch]
+                    ]
+                )
+                next_batch += 1
+            futures = pending.popleft()
+            ok_paths: list[str] = []
+            arrays: list[np.ndarray] = []
+            for p, fut in zip(batch, futures):
+                arr = fut.result()
+                if arr is not None:
+                    ok_paths.append(p)
+                    arrays.append(arr)
+            features = None
+            if arrays:
+                ok_paths, features = _run_vision_batch(
+                    vision_session, extra, ok_paths, arrays
+                )
+            if features is not None:
+                if features.shape[-1] != expected_dim:
+                    raise ValueError(
+                        f"CLIP ONNX vision output dim={features.shape[-1]}; "
+                        f"image_embeddings.embedding is vector({expected_dim})."
+                    )
+                features = features / np.linalg.norm(features, axis=-1, keepdims=True)
+                results.update(zip(ok_paths, features))
+            if on_batch is not None:
+                on_batch(batch)
+    return results
+
+
+def _chunked(items: Iterable[str], size: int):
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _ingest_image_paths(
+    session: Session,
+    paths: Iterable[str],
+    embed: Callable[[list[str], Callable[[list[str]], None]], dict[str, np.ndarray]],
+) -> list[str]:
+    """
+    Store embeddings for scanned ``paths``; returns the paths to search.
+
+    Paths are taken ``_SCAN_CHUNK`` at a time as the scan yields them. In each
+    chunk, paths with a stored row are reused and the rest are hashed
+    (stat-keyed cache, so unchanged files are not re-read). Content that is
+    not stored yet is embedded at once with ``embed(paths, on_batch)``, one
+    vision pass per unique hash. Misses whose content is already stored are
+    relocated or cloned after the scan, because that choice depends on every
+    path under the directory.
+    """
+    storage = ImageEmbeddingStorage(session)
+    file_paths: list[str] = []
+    paths_for_search: list[str] = []
+    stored_misses: list[tuple[str, ImageEmbedding]] = []
+    rows_by_hash: dict[str, ImageEmbedding] = {}
+    need_embed: dict[str, list[str]] = {}
+    embeddings: dict[str, np.ndarray] = {}
+    relocated_count = cloned_count = reused_count = 0
+    processed_paths = last_reported = 0
+
+    def _on_batch(paths_done: list[str]) -> None:
+        nonlocal processed_paths, last_reported
+        processed_paths += len(paths_done)
+        # The total grows while the scan runs; progress only ever moves forward.
+        last_reported = report_file_progress(
+            None, processed_paths, len(file_paths), last_reported
+        )
+
+    for chunk in _chunked(paths, _SCAN_CHUNK):
+        already = _paths_already_embedded(session, chunk)
+        misses = [p for p in chunk if p not in already]
+        path_to_hash = cached_sha256_many(misses)
+        misses = [p for p in misses if p in path_to_hash]
+        file_paths.extend(p for p in chunk if p in already or p in path_to_hash)
+        reused = [p for p in chunk if p in already]
+        paths_for_search.extend(reused)
+        reused_count += len(reused)
+        processed_paths += len(reused)
+
+        unseen = {path_to_hash[p] for p in misses} - rows_by_hash.keys()
+        rows_by_hash.update(_rows_by_content_hash(session, unseen - need_embed.keys()))
+        reps: list[str] = []
+        for path in misses:
+            h = path_to_hash[path]
+            row = rows_by_hash.get(h)
+            if row is not None:
+                stored_misses.append((path, row))
+                continue
+            if h not in need_embed:
+                reps.append(path)
+            else:
+                processed_paths += 1
+            need_embed.setdefault(h, []).append(path)
+        if reps:
+            embeddings.update(embed(reps, _on_batch))
+
+    # Misses whose content is stored: reuse, relocate, or clone.
+    file_paths_set = set(file_paths)
+    for path, row in sorted(stored_misses, key=lambda pr: pr[0]):
+        row_path_str = str(row.path)
+        if row_path_str == path or os.path.normpath(row_path_str) == os.path.normpath(
+            path
+        ):
+            pass
+        elif row_path_str not in file_paths_set:
+            logger.info(
+                "Reused image embedding by content hash (path updated): %s -> %s",
+                row_path_str,
+                path,
+            )
+            row.path = path
+            session.add(row)
+            relocated_count += 1
+        else:
+            emb = list(row.embedding) if row.embedding is not None else []
+            session.add(
+                ImageEmbedding(
+                    path=path, embedding=emb, content_sha256=row.content_sha256
+                )
+            )
+            cloned_count += 1
+        paths_for_search.append(path)
+        reused_count += 1
+
+    # One bulk insert for every new row (duplicates share the vector).
+    new_rows: list[tuple[str, list[float], str]] = []
+    for h, group in need_embed.items():
+        vec = embeddings.get(group[0])
+        if vec is None:
+            continue
+        emb = vec.tolist()
+        for path in group:
+            new_rows.append((path, emb, h))
+            paths_for_search.append(path)
+    storage.save_embeddings_bulk(new_rows)
+
+    if file_paths:
+        report_file_progress(None, len(file_paths), len(file_paths), last_reported)
+    if new_rows or relocated_count or cloned_count:
+        storage.commit()
+    logger.info(
+        "Image embeddings: %d new, %d reused (%d relocated, %d cloned)",
+        len(new_rows),
+        reused_count,
+        relocated_count,
+        cloned_count,
+    )
+    return paths_for_search
+
+
 def search_images(inputs: Inputs, parameters: Parameters) -> ResponseBody:
     """
     Embed images under ``input_dir`` that are not already stored, then rank
     those images (including reused embeddings) by CLIP text–image similarity to ``query``.
+    Several queries separated by ``QUERY_SEPARATOR`` are encoded in one batch and
+    ranked together; each hit carries the query it belongs to.
     """
-    from PIL import Image
-
     with _INSTANCE_LOCK:
         input_dir = str(inputs["input_dir"].path)
         query_text = inputs["query"].text
+        queries = _split_queries(query_text) or [query_text]
 
         model_name = parameters.get("model_name", DEFAULT_CLIP_MODEL)
         top_k = int(parameters.get("top_k", 15))
@@ -307,198 +691,43 @@ def search_images(inputs: Inputs, parameters: Parameters) -> ResponseBody:
             getattr(_img_proc, "do_normalize", None),
             getattr(_img_proc, "resample", None),
         )
-        dummy_text = _dummy_text_inputs(processor)
-        dummy_pixels = _dummy_pixel_values(processor)
-
-        file_paths: list[str] = []
-        for name in sorted(os.listdir(input_dir)):
-            path = os.path.join(input_dir, name)
-            if (
-                os.path.isfile(path)
-                and os.path.splitext(path)[1].lower() in CLIP_IMAGE_EXTENSIONS
-            ):
-                file_paths.append(path)
-
-        path_to_hash: dict[str, str] = {}
-        hashed_paths: list[str] = []
-        for path in file_paths:
-            try:
-                path_to_hash[path] = _sha256_file(path)
-                hashed_paths.append(path)
-            except OSError as exc:
-                logger.warning("Skip hashing %s: %s", path, exc)
-        file_paths = hashed_paths
-
-        paths_for_search: list[str] = []
-        newly_embedded_count = 0
-        relocated_count = 0
-        cloned_count = 0
-        reused_count = 0
-        search_results: list[dict] = []
-
-        with Session(engine) as session:
-            storage = ImageEmbeddingStorage(session)
-            already = _paths_already_embedded(session, file_paths)
-            file_paths_set = set(file_paths)
-            total_paths = len(file_paths)
-            processed_paths = 0
-            last_reported = 0
-
-            for path in file_paths:
-                try:
-                    if path in already:
-                        paths_for_search.append(path)
-                        reused_count += 1
-                        continue
-                    h = path_to_hash[path]
-                    row = (
-                        session.execute(
-                            select(ImageEmbedding).where(
-                                ImageEmbedding.content_sha256 == h
-                            )
-                        )
-                        .scalars()
-                        .first()
-                    )
-                    if row is None:
-                        try:
-                            image = Image.open(path).convert("RGB")
-                            inputs_processed = dict(
-                                processor(
-                                    images=image, return_tensors="np", do_rescale=True
-                                )
-                            )
-                            vision_inputs = {**inputs_processed, **dummy_text}
-                            onnx_session, required = _pick_session_for_inputs(
-                                (text_session, vision_session),
-                                vision_inputs,
-                                "vision",
-                            )
-                            if "pixel_values" not in required:
-                                raise ValueError(
-                                    f"Vision ONNX session missing pixel_values input: {sorted(required)}"
-                                )
-                            outputs = onnx_session.run(
-                                ["image_embeds"],
-                                {
-                                    k: v
-                                    for k, v in vision_inputs.items()
-                                    if k in required
-                                },
-                            )
-                            image_features = outputs[0]
-                            if image_features.shape[-1] != expected_dim:
-                                raise ValueError(
-                                    f"CLIP ONNX vision output dim={image_features.shape[-1]}; "
-                                    f"image_embeddings.embedding is vector({expected_dim})."
-                                )
-                            image_features = image_features / np.linalg.norm(
-                                image_features, axis=-1, keepdims=True
-                            )
-                            embedding = image_features.squeeze()
-                            embedding_list = embedding.tolist()
-                            storage.save_embedding(
-                                path, embedding_list, content_sha256=h
-                            )
-                            paths_for_search.append(path)
-                            newly_embedded_count += 1
-                            already.add(path)
-                            session.flush()
-                        except Exception as e:
-                            logger.warning("Could not process %s: %s", path, e)
-                            continue
-                    if row is not None:
-                        row_path_str = str(row.path)
-                        if row_path_str == path or os.path.normpath(
-                            row_path_str
-                        ) == os.path.normpath(path):
-                            paths_for_search.append(path)
-                            reused_count += 1
-                            already.add(path)
-                            session.flush()
-                            continue
-                        if row_path_str not in file_paths_set:
-                            row.path = path
-                            session.add(row)
-                            relocated_count += 1
-                            logger.info(
-                                "Reused image embedding by content hash (path updated): %s -> %s",
-                                row.path,
-                                path,
-                            )
-                        else:
-                            emb = (
-                                list(row.embedding) if row.embedding is not None else []
-                            )
-                            session.add(
-                                ImageEmbedding(
-                                    path=path, embedding=emb, content_sha256=h
-                                )
-                            )
-                            cloned_count += 1
-                        paths_for_search.append(path)
-                        reused_count += 1
-                        already.add(path)
-                        session.flush()
-                        continue
-                finally:
-                    processed_paths += 1
-                    last_reported = report_file_progress(
-                        None, processed_paths, total_paths, last_reported
-                    )
+        dummy_text, dummy_pixels = _get_dummy_inputs()
 
-            if total_paths > 0:
-                report_file_progress(None, total_paths, total_paths, last_reported)
+        def _embed(
+            paths: list[str], on_batch: Callable[[list[str]], None]
+        ) -> dict[str, np.ndarray]:
+            return _embed_images_batched(
+                processor,
+                (text_session, vision_session),
+                dummy_text,
+                paths,
+                expected_dim,
+                on_batch=on_batch,
+            )
 
-            if newly_embedded_count or relocated_count or cloned_count:
-                storage.commit()
+        search_results: list[dict] = []
 
-            text_inputs = dict(
-                processor(text=[query_text], return_tensors="np", padding=True)
-            )
-            text_inputs["pixel_values"] = dummy_pixels
-            onnx_session, required = _pick_session_for_inputs(
-                (text_session, vision_session),
-                text_inputs,
-                "text",
+        with Session(engine) as session:
+            # Snapshot scan: directories unchanged since the last run are not re-listed.
+            paths_for_search = _ingest_image_paths(
+                session,
+                iter_files(input_dir, extensions=CLIP_IMAGE_EXTENSIONS, snapshot=True),
+                _embed,
             )
-            if "input_ids" not in required:
-                raise ValueError(
-                    f"Text ONNX session missing input_ids input: {sorted(required)}"
-                )
-            text_outputs = onnx_session.run(
-                ["text_embeds"],
-                {k: v for k, v in text_inputs.items() if k in required},
+
+            query_vecs = _encode_text_queries(
+                processor, (text_session, vision_session), dummy_pixels, queries
             )
-            text_features = text_outputs[0]
-            text_features = text_features / np.linalg.norm(
-                text_features, axis=-1, keepdims=True
+            ranked = _rank_paths_for_queries(
+                session, query_vecs, paths_for_search, top_k
             )
-            query_vec = text_features.squeeze()
-
-            embedded_paths = paths_for_search
-            if embedded_paths:
-                # pgvector: rank only rows whose path was embedded in this run (uses index on embedding).
-                qvec_literal = "[" + ",".join(str(x) for x in query_vec.tolist()) + "]"
-                stmt = text(
-                    """
-                        SELECT id, path, 1 - (embedding <=> CAST(:qvec AS vector)) AS similarity
-                        FROM image_embeddings
-                        WHERE path IN :paths
-                        ORDER BY embedding <=> CAST(:qvec AS vector)
-                        LIMIT :top_k
-                        """
-                ).bindparams(bindparam("paths", expanding=True))
-                rows = session.execute(
-                    stmt,
-                    {"qvec": qvec_literal, "paths": embedded_paths, "top_k": top_k},
-                ).fetchall()
-                search_results = []
+            for query, rows in zip(queries, ranked):
                 for row in rows:
                     sim = float(row.similarity)
                     search_results.append(
                         {
                             # "id": row.id,
+                            "query": query,
                             "path": row.path,
                             "similarity": round(sim, 4),
                             "is_match": sim >= min_similarity,
@@ -507,7 +736,10 @@ def search_images(inputs: Inputs, parameters: Parameters) -> ResponseBody:
 
         # One FileResponse per ranked hit so job UI uses the same batch table as age-gender (click row → open image).
         file_responses: list[FileResponse] = []
-        for rank, row in enumerate(search_results, start=1):
+        ranks: dict[str, int] = {}
+        for row in search_results:
+            query = row["query"]
+            rank = ranks[query] = ranks.get(query, 0) + 1
             sim = row["similarity"]
             is_match = row["is_match"]
             path = str(row["path"])
@@ -516,9 +748,9 @@ def search_images(inputs: Inputs, parameters: Parameters) -> ResponseBody:
                     file_type=FileType.IMG,
                     path=path,
                     title=f"#{rank} · similarity {sim}",
-                    subtitle=query_text,
+                    subtitle=query,
                     metadata={
-                        "Query": query_text,
+                        "Query": query,
                         "Similarity": str(sim),
                         "Match": "Yes" if is_match else "No",
                         # "Model": model_name,
@@ -1,11 +1,16 @@
 """Tests for image embeddings embed+search (single endpoint)."""
 
+from types import SimpleNamespace
+
+import numpy as np
 import pytest
+from image_embeddings import main as image_embeddings_main
 from image_embeddings.main import (
     DEFAULT_CLIP_MODEL,
     ClipImageDirectory,
     Inputs,
     Parameters,
+    _embed_images_batched,
     task_schema,
 )
 from rb.api.models import TextInput
@@ -44,3 +49,34 @@ def test_parameters_structure():
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class _VisionSession:
+    """Dynamic-batch vision encoder that rejects any batch with a bad image."""
+
+    def __init__(self):
+        self.batches: list[int] = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="pixel_values", shape=["batch", 3, 2, 2])]
+
+    def run(self, _names, feed):
+        pixels = feed["pixel_values"]
+        self.batches.append(len(pixels))
+        if (pixels < 0).any():
+            raise RuntimeError("corrupt tensor")
+        return [pixels.reshape(len(pixels), -1)[:, :3] + 1.0]
+
+
+def test_failed_batch_is_retried_image_by_image(monkeypatch):
+    def _preprocess(_processor, path):
+        value = -1.0 if path == "bad.jpg" else float(len(path))
+        return np.full((1, 3, 2, 2), value, dtype=np.float32)
+
+    monkeypatch.setattr(image_embeddings_main, "_preprocess_image", _preprocess)
+    session = _VisionSession()
+    paths = ["a.jpg", "bad.jpg", "ccc.jpg", "dd.jpg"]
+    out = _embed_images_batched(None, (session, session), {}, paths, 3, batch_size=4)
+    assert sorted(out) == ["a.jpg", "ccc.jpg", "dd.jpg"]
+    assert np.allclose(np.linalg.norm(out["a.jpg"]), 1.0)
+    assert session.batches == [4, 1, 1, 1, 1]
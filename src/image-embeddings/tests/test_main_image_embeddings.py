@@ -1,15 +1,27 @@
 """Tests for image embeddings plugin"""
 
+from types import SimpleNamespace
+
+import numpy as np
 import pytest
+from image_embeddings import main as image_embeddings_main
 from image_embeddings.main import (
     DEFAULT_CLIP_MODEL,
     ClipImageDirectory,
     Inputs,
     Parameters,
+    _embed_images_batched,
+    _encode_text_queries,
+    _ingest_image_paths,
+    _split_queries,
     search_images,
     task_schema,
 )
+from PIL import Image
+from rb.api.database import ImageEmbedding
 from rb.api.models import TextInput
+from rb.lib.file_scan import iter_files
+from sqlmodel import Session, SQLModel, create_engine, select
 
 
 def test_task_schema():
@@ -56,5 +68,181 @@ def test_parameters_structure():
     assert params["min_similarity"] == 0.25
 
 
+class _FakeProcessor:
+    """Maps an image to pixel_values filled with its red channel value."""
+
+    def __call__(self, images, return_tensors, do_rescale):
+        red = float(images.getpixel((0, 0))[0])
+        return {"pixel_values": np.full((1, 3, 4, 4), red, dtype=np.float32)}
+
+
+class _FakeVisionSession:
+    def __init__(self, batch_dim):
+        self.batch_dim = batch_dim
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="pixel_values", shape=[self.batch_dim, 3, 4, 4])]
+
+    def run(self, names, feed):
+        pixels = feed["pixel_values"]
+        self.batch_sizes.append(pixels.shape[0])
+        out = np.zeros((pixels.shape[0], 512), dtype=np.float32)
+        out[:, 0] = pixels[:, 0, 0, 0] + 1.0
+        out[:, 1] = 1.0
+        return [out]
+
+
+def _write_images(tmp_path, reds):
+    paths = []
+    for i, red in enumerate(reds):
+        p = tmp_path / f"img_{i}.png"
+        Image.new("RGB", (8, 8), color=(red, 0, 0)).save(p)
+        paths.append(str(p))
+    return paths
+
+
+def test_embed_images_batched_dynamic_batches_and_order(tmp_path):
+    paths = _write_images(tmp_path, [10, 20, 30, 40, 50])
+    session = _FakeVisionSession("batch")
+    done = []
+    out = _embed_images_batched(
+        _FakeProcessor(),
+        (session, session),
+        {},
+        paths,
+        512,
+        batch_size=2,
+        on_batch=done.extend,
+    )
+    assert session.batch_sizes == [2, 2, 1]
+    assert done == paths
+    for path, red in zip(paths, [10, 20, 30, 40, 50]):
+        vec = out[path]
+        assert np.isclose(np.linalg.norm(vec), 1.0)
+        assert np.isclose(vec[0] / vec[1], red + 1.0)
+
+
+def test_embed_images_batched_fixed_batch_and_bad_file(tmp_path):
+    paths = _write_images(tmp_path, [1, 2])
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(b"not an image")
+    session = _FakeVisionSession(1)
+    out = _embed_images_batched(
+        _FakeProcessor(), (session, session), {}, [paths[0], str(bad), paths[1]], 512
+    )
+    assert session.batch_sizes == [1, 1]
+    assert set(out) == set(paths)
+
+
+def test_embed_images_batched_dim_mismatch(tmp_path):
+    paths = _write_images(tmp_path, [1])
+    session = _FakeVisionSession("batch")
+    with pytest.raises(ValueError, match="vector\\(768\\)"):
+        _embed_images_batched(_FakeProcessor(), (session, session), {}, paths, 768)
+
+
+class _FakeTokenizer:
+    """Maps each query to one token id equal to its length."""
+
+    def __call__(self, text, return_tensors, padding):
+        ids = np.array([[len(t)] for t in text], dtype=np.int64)
+        return {"input_ids": ids, "attention_mask": np.ones_like(ids)}
+
+
+class _FakeTextSession:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [
+            SimpleNamespace(name="input_ids", shape=["batch", "seq"]),
+            SimpleNamespace(name="attention_mask", shape=["batch", "seq"]),
+        ]
+
+    def run(self, names, feed):
+        ids = feed["input_ids"]
+        self.batch_sizes.append(ids.shape[0])
+        out = np.zeros((ids.shape[0], 512), dtype=np.float32)
+        out[:, 0] = ids[:, 0]
+        out[:, 1] = 1.0
+        return [out]
+
+
+def test_split_queries():
+    assert _split_queries(" red car ; dog;;red car ") == ["red car", "dog"]
+    assert _split_queries("  ") == []
+
+
+def test_encode_text_queries_batches_and_caches():
+    session = _FakeTextSession()
+    dummy = np.zeros((1, 3, 4, 4), dtype=np.float32)
+    first = _encode_text_queries(
+        _FakeTokenizer(), (session, session), dummy, ["a", "bbb"]
+    )
+    assert session.batch_sizes == [2]
+    assert first.shape == (2, 512)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    assert np.isclose(first[1, 0] / first[1, 1], 3.0)
+
+    again = _encode_text_queries(
+        _FakeTokenizer(), (session, session), dummy, ["bbb", "cc", "a"]
+    )
+    assert session.batch_sizes == [2, 1]
+    assert np.allclose(again[0], first[1])
+    assert np.allclose(again[2], first[0])
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+@pytest.fixture
+def db_session(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_SCAN_SNAPSHOT_DB", str(tmp_path / "scan.db"))
+    monkeypatch.setattr(image_embeddings_main, "_SCAN_CHUNK", 2)
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[ImageEmbedding.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+def test_ingest_embeds_while_the_scan_streams(tmp_path, db_session):
+    root = tmp_path / "images"
+    for i, sub in enumerate(["a", "a", "b", "b/c", "b/c"]):
+        (root / sub).mkdir(parents=True, exist_ok=True)
+        (root / sub / f"{i}.png").write_bytes(b"png %d" % i)
+    (root / "b" / "copy.png").write_bytes(b"png 0")  # same content as a/0.png
+    scanned = []
+    embed_calls = []
+
+    def _scan():
+        for p in iter_files(root, extensions=[".png"], snapshot=True):
+            scanned.append(p)
+            yield p
+
+    def _embed(paths, on_batch):
+        embed_calls.append((list(paths), len(scanned)))
+        on_batch(paths)
+        vec = np.zeros(512, dtype=np.float32)
+        vec[0] = 1.0
+        return {p: vec for p in paths}
+
+    found = _ingest_image_paths(db_session, _scan(), _embed)
+    assert sorted(found) == sorted(scanned) and len(found) == 6
+    # Embedding started before the scan had yielded every path.
+    assert embed_calls[0][1] < 6
+    assert sum(len(paths) for paths, _ in embed_calls) == 5
+    assert (tmp_path / "scan.db").exists()
+
+    # A moved file is relocated by content hash; nothing is embedded again.
+    (root / "a" / "1.png").rename(root / "moved.png")
+    embed_calls.clear()
+    scanned.clear()
+    found = _ingest_image_paths(db_session, _scan(), _embed)
+    assert sum(len(paths) for paths, _ in embed_calls) == 0
+    stored = set(db_session.exec(select(ImageEmbedding.path)))
+    assert str(root / "moved.png") in stored
+    assert str(root / "a" / "1.png") not in stored
+    assert sorted(found) == sorted(scanned)
@@ -0,0 +1,111 @@
+"""
+Series clustering throughput: LSH-banded ``cluster_images`` on synthetic
+SigLIP-sized embeddings and PDQ hashes with planted near-duplicate groups.
+
+No database or images needed. Reports wall time per signal and how many planted
+groups came back as exactly one cluster.
+
+Example::
+
+    python benchmark_testing/benchmark_clustering.py --images 500000 --mode pdq
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from image_similarity.clustering import (
+    DEFAULT_COSINE_THRESHOLD,
+    cluster_images,
+    simhash_shape,
+)
+from image_similarity.pdq_index import DEFAULT_MATCH_RADIUS
+
+
+def _planted(args, rng):
+    groups = args.images // (args.group_size * 10)  # ~10% of images are in a series
+    planted = groups * args.group_size
+    emb = pdq = None
+    if args.mode in ("semantic", "combined"):
+        emb = rng.standard_normal((args.images, args.dim), dtype=np.float32)
+        centers = rng.standard_normal((groups, args.dim), dtype=np.float32)
+        emb[:planted] = (
+            np.repeat(centers, args.group_size, axis=0) + 0.2 * emb[:planted]
+        )
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    if args.mode in ("pdq", "combined"):
+        pdq = rng.integers(0, np.iinfo(np.uint64).max, (args.images, 4), np.uint64)
+        base = np.repeat(pdq[: planted : args.group_size], args.group_size, axis=0)
+        bits = rng.integers(0, 256, (planted, 20))
+        flips = np.zeros((planted, 4), dtype=np.uint64)
+        for col in range(bits.shape[1]):
+            word, bit = bits[:, col] // 64, (bits[:, col] % 64).astype(np.uint64)
+            flips[np.arange(planted), word] |= np.uint64(1) << bit
+        # Members sit <= 20 bits from their group's first hash.
+        flips[:: args.group_size] = 0
+        pdq[:planted] = base ^ flips
+    return emb, pdq, groups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", default=100_000, type=int)
+    parser.add_argument("--dim", default=1152, type=int)
+    parser.add_argument("--group_size", default=5, type=int)
+    parser.add_argument(
+        "--mode", default="combined", choices=["combined", "semantic", "pdq"]
+    )
+    parser.add_argument("--cosine_threshold", default=DEFAULT_COSINE_THRESHOLD)
+    parser.add_argument("--pdq_max_distance", default=DEFAULT_MATCH_RADIUS, type=int)
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    emb, pdq, groups = _planted(args, rng)
+
+    stage_secs: dict[str, float] = {}
+    clock = {"t": time.perf_counter()}
+
+    def _progress(stage: str, done: int, total: int) -> None:
+        if done == total:
+            now = time.perf_counter()
+            stage_secs[stage] = round(now - clock["t"], 2)
+            clock["t"] = now
+
+    start = time.perf_counter()
+    result = cluster_images(
+        emb,
+        pdq,
+        cosine_threshold=float(args.cosine_threshold),
+        pdq_max_distance=args.pdq_max_distance,
+        progress=_progress,
+    )
+    total_secs = time.perf_counter() - start
+
+    labels = result.labels[: groups * args.group_size].reshape(groups, -1)
+    intact = (labels == labels[:, :1]).all(axis=1) & (
+        result.sizes[labels[:, 0]] == args.group_size
+    )
+    bands, rows = simhash_shape(args.images, float(args.cosine_threshold))
+    print(
+        json.dumps(
+            {
+                "images": args.images,
+                "mode": args.mode,
+                "simhash_bands": bands,
+                "simhash_rows": rows,
+                "stage_secs": stage_secs,
+                "total_secs": round(total_secs, 2),
+                "clusters": result.cluster_count,
+                "planted_groups": groups,
+                "planted_groups_recovered": round(float(intact.mean()), 4),
+                "all_pairs_comparisons": args.images * (args.images - 1) // 2,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+PDQ lookup latency: per-row Python Hamming loop vs. ``PdqIndex`` (packed 256-bit
+hashes, NumPy popcount, multi-index radius search).
+
+Uses synthetic hashes with planted near-duplicates; no database or images needed.
+
+Example::
+
+    python benchmark_testing/benchmark_pdq_index.py --hashes 1000000 --queries 200
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from image_similarity.pdq_index import (
+    DEFAULT_MATCH_RADIUS,
+    PdqIndex,
+    unpack_pdq_hex,
+)
+from image_similarity.scorers import hamming_distance
+
+
+def _near_copy(packed: np.ndarray, rng: np.random.Generator, bits: int) -> np.ndarray:
+    out = packed.copy()
+    for bit in rng.choice(256, bits, replace=False):
+        out[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hashes", default=1_000_000, type=int)
+    parser.add_argument("--queries", default=200, type=int)
+    parser.add_argument("--radius", default=DEFAULT_MATCH_RADIUS, type=int)
+    parser.add_argument("--k", default=10, type=int)
+    parser.add_argument(
+        "--loop_sample",
+        default=100_000,
+        type=int,
+        help="Hashes scored by the Python loop baseline (extrapolated to --hashes)",
+    )
+    parser.add_argument("--seed", default=0, type=int)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    packed = rng.integers(0, np.iinfo(np.uint64).max, (args.hashes, 4), np.uint64)
+    targets = rng.choice(args.hashes, args.queries, replace=False)
+    queries = [
+        _near_copy(packed[t], rng, int(rng.integers(0, args.radius + 1)))
+        for t in targets
+    ]
+    paths = [f"/evidence/{i:08d}.jpg" for i in range(args.hashes)]
+
+    start = time.perf_counter()
+    index = PdqIndex(paths, packed)
+    index.radius(queries[0], args.radius)  # builds the substring buckets
+    build_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = sum(
+        paths[t] in {p for p, _ in index.radius(q, args.radius)}
+        for t, q in zip(targets, queries)
+    )
+    radius_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    start = time.perf_counter()
+    for q in queries:
+        index.knn(q, args.k)
+    knn_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+    sample = unpack_pdq_hex(packed[: args.loop_sample])
+    q_hex = unpack_pdq_hex(queries[0][None, :])[0]
+    start = time.perf_counter()
+    sorted((hamming_distance(q_hex, h), i) for i, h in enumerate(sample))[: args.k]
+    loop_ms = (time.perf_counter() - start) * 1000 * args.hashes / len(sample)
+
+    print(
+        json.dumps(
+            {
+                "hashes": args.hashes,
+                "queries": args.queries,
+                "radius": args.radius,
+                "index_build_secs": round(build_secs, 3),
+                "radius_ms_per_query": round(radius_ms, 3),
+                "radius_recall_planted": round(found / args.queries, 4),
+                "knn_exhaustive_ms_per_query": round(knn_ms, 3),
+                "python_loop_ms_per_query_est": round(loop_ms, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
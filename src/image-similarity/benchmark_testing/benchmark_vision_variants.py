@@ -0,0 +1,107 @@
+"""
+Accuracy and images/sec for the SigLIP2 vision encoder variants (fp32 / int8 / fp16).
+
+Each variant embeds the same images. Accuracy is measured against fp32: the
+per-image cosine between the two embeddings, and how many of each image's
+fp32 top-k neighbours the variant also returns. No database access.
+
+Example::
+
+    python benchmark_testing/benchmark_vision_variants.py \
+        --image_dir ../../src-tauri/demo/image-similarity/inputs --limit 200
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from image_similarity.main import (
+    _DEFAULT_MODEL,
+    _VISION_ONNX_PATHS,
+    ALLOWED_IMAGE_EXTS,
+    _embed_pil_images,
+    _load_onnx_vision_model,
+)
+from PIL import Image
+from rb.lib.file_scan import scan_files
+
+
+def _neighbour_recall(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean overlap of each row's top-k neighbours (self excluded)."""
+    k = min(k, len(reference) - 1)
+    if k <= 0:
+        return 1.0
+    ref_sims, cand_sims = reference @ reference.T, candidate @ candidate.T
+    np.fill_diagonal(ref_sims, -np.inf)
+    np.fill_diagonal(cand_sims, -np.inf)
+    ref_top = np.argpartition(-ref_sims, k, axis=1)[:, :k]
+    cand_top = np.argpartition(-cand_sims, k, axis=1)[:, :k]
+    hits = sum(
+        len(set(a) & set(b)) for a, b in zip(ref_top.tolist(), cand_top.tolist())
+    )
+    return hits / (k * len(reference))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image_dir", required=True, type=str)
+    parser.add_argument("--limit", default=0, type=int, help="Max images (0 = all)")
+    parser.add_argument("--batch_size", default=32, type=int)
+    parser.add_argument("--k", default=5, type=int, help="Neighbours for recall@k")
+    parser.add_argument(
+        "--variants",
+        default=",".join(_VISION_ONNX_PATHS),
+        help="Comma-separated model_name keys",
+    )
+    args = parser.parse_args()
+
+    paths = scan_files(args.image_dir, extensions=ALLOWED_IMAGE_EXTS)
+    if args.limit:
+        paths = paths[: args.limit]
+    images = [Image.open(p).convert("RGB") for p in paths]
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    if _DEFAULT_MODEL not in variants:
+        variants.insert(0, _DEFAULT_MODEL)  # reference for accuracy
+
+    embeddings: dict[str, np.ndarray] = {}
+    report: dict[str, dict] = {}
+    for variant in variants:
+        try:
+            session, processor = _load_onnx_vision_model(variant)
+        except (FileNotFoundError, ValueError) as exc:
+            report[variant] = {"skipped": str(exc)}
+            continue
+        _embed_pil_images(session, processor, images[:2], args.batch_size)  # warm-up
+        start = time.perf_counter()
+        embeddings[variant] = _embed_pil_images(
+            session, processor, images, args.batch_size
+        )
+        secs = time.perf_counter() - start
+        report[variant] = {
+            "providers": session.get_providers(),
+            "images_per_sec": round(len(images) / secs, 2),
+        }
+
+    reference = embeddings.get(_DEFAULT_MODEL)
+    if reference is not None:
+        for variant, emb in embeddings.items():
+            if variant == _DEFAULT_MODEL:
+                continue
+            cos = np.einsum("ij,ij->i", reference, emb)
+            report[variant].update(
+                {
+                    "cosine_to_fp32_mean": round(float(cos.mean()), 5),
+                    "cosine_to_fp32_min": round(float(cos.min()), 5),
+                    f"neighbour_recall@{args.k}": round(
+                        _neighbour_recall(reference, emb, args.k), 4
+                    ),
+                }
+            )
+
+    print(json.dumps({"images": len(images), "variants": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
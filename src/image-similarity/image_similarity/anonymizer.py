@@ -13,12 +13,17 @@ Anonymization approach inspired by:
 from __future__ import annotations
 
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Sequence
 
+import cv2
 import numpy as np
 import onnxruntime as ort
-from PIL import Image, ImageFilter
+from PIL import Image
+from rb.lib.derived_models import derived_model_path
 from transformers import CLIPSegProcessor, CLIPTokenizerFast, ViTImageProcessor
 
 logger = logging.getLogger(__name__)
@@ -36,6 +41,8 @@ _CLIPSEG_PREPROCESSOR_CONFIG_PATH = _MODELS_DIR / "clipseg_preprocessor_config.j
 
 _cached_session: Optional[ort.InferenceSession] = None
 _cached_processor: Optional[CLIPSegProcessor] = None
+# (text, image) sessions; False once splitting has failed for this process.
+_cached_split: Optional[tuple[ort.InferenceSession, ort.InferenceSession]] | bool = None
 
 
 def _sigmoid(x: np.ndarray) -> np.ndarray:
@@ -43,14 +50,19 @@ def _sigmoid(x: np.ndarray) -> np.ndarray:
     return 1.0 / (1.0 + np.exp(-x))
 
 
-def _load_clipseg() -> tuple[ort.InferenceSession, CLIPSegProcessor]:
-    """Load CLIPSeg ONNX session and processor, caching for reuse."""
-    global _cached_session, _cached_processor
-    if _cached_session is not None and _cached_processor is not None:
-        return _cached_session, _cached_processor
+def _clipseg_providers() -> list[str]:
+    available = ort.get_available_providers()
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    return [p for p in providers if p in available]
+
+
+def _load_clipseg_processor() -> CLIPSegProcessor:
+    """Tokenizer + image processor for CLIPSeg, cached for reuse."""
+    global _cached_processor
+    if _cached_processor is not None:
+        return _cached_processor
 
     required_files = [
-        (_CLIPSEG_ONNX_PATH, "ONNX model"),
         (_CLIPSEG_TOKENIZER_PATH, "tokenizer"),
         (_CLIPSEG_TOKENIZER_CONFIG_PATH, "tokenizer config"),
         (_CLIPSEG_PREPROCESSOR_CONFIG_PATH, "preprocessor config"),
@@ -59,16 +71,6 @@ def _load_clipseg() -> tuple[ort.InferenceSession, CLIPSegProcessor]:
         if not path.exists():
             raise FileNotFoundError(f"CLIPSeg {desc} not found at {path}")
 
-    available = ort.get_available_providers()
-    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
-    providers = [p for p in providers if p in available]
-    logger.info(
-        "Loading CLIPSeg ONNX model from %s (providers=%s)",
-        _CLIPSEG_ONNX_PATH.name,
-        providers,
-    )
-
-    _cached_session = ort.InferenceSession(str(_CLIPSEG_ONNX_PATH), providers=providers)
     tokenizer = CLIPTokenizerFast(
         vocab_file=None,
         tokenizer_file=str(_CLIPSEG_TOKENIZER_PATH),
@@ -79,73 +81,224 @@ def _load_clipseg() -> tuple[ort.InferenceSession, CLIPSegProcessor]:
     _cached_processor = CLIPSegProcessor(
         image_processor=image_processor, tokenizer=tokenizer
     )
+    return _cached_processor
 
-    return _cached_session, _cached_processor
 
+def _load_clipseg() -> tuple[ort.InferenceSession, CLIPSegProcessor]:
+    """Load the full CLIPSeg ONNX session and processor, caching for reuse."""
+    global _cached_session
+    if _cached_session is not None:
+        return _cached_session, _load_clipseg_processor()
+
+    if not _CLIPSEG_ONNX_PATH.exists():
+        raise FileNotFoundError(f"CLIPSeg ONNX model not found at {_CLIPSEG_ONNX_PATH}")
+    processor = _load_clipseg_processor()
+    providers = _clipseg_providers()
+    logger.info(
+        "Loading CLIPSeg ONNX model from %s (providers=%s)",
+        _CLIPSEG_ONNX_PATH.name,
+        providers,
+    )
+    _cached_session = ort.InferenceSession(str(_CLIPSEG_ONNX_PATH), providers=providers)
+    return _cached_session, processor
 
-def _create_mask(
-    image: Image.Image,
-    labels: Sequence[str],
+
+def _load_clipseg_split() -> (
+    Optional[tuple[ort.InferenceSession, ort.InferenceSession]]
+):
+    """Text / image CLIPSeg sessions, or None to use the full graph.
+
+    The split is written to the derived-model folder on first use
+    (``rb.lib.derived_models``). ``RESCUEBOX_CLIPSEG_SPLIT=0`` disables it.
+    """
+    global _cached_split
+    if _cached_split is False:
+        return None
+    if _cached_split is not None:
+        return _cached_split
+    if (
+        os.getenv("RESCUEBOX_CLIPSEG_SPLIT", "1") == "0"
+        or not _CLIPSEG_ONNX_PATH.exists()
+    ):
+        return None
+    try:
+        from image_similarity.clipseg_split import ensure_split
+
+        text_path = derived_model_path("image_similarity", _CLIPSEG_ONNX_PATH, "text")
+        image_path = derived_model_path("image_similarity", _CLIPSEG_ONNX_PATH, "image")
+        ensure_split(_CLIPSEG_ONNX_PATH, text_path, image_path)
+        providers = _clipseg_providers()
+        _cached_split = (
+            ort.InferenceSession(str(text_path), providers=providers),
+            ort.InferenceSession(str(image_path), providers=providers),
+        )
+        logger.info("CLIPSeg prompt encoder split off; prompts are encoded once")
+    except Exception as exc:
+        logger.warning("CLIPSeg split unavailable (%s); using the full graph", exc)
+        _cached_split = False
+        return None
+    return _cached_split
+
+
+def _clipseg_max_pairs() -> int:
+    """(image, prompt) pairs per CLIPSeg run; ``RESCUEBOX_CLIPSEG_MAX_PAIRS`` overrides."""
+    return max(1, int(os.getenv("RESCUEBOX_CLIPSEG_MAX_PAIRS", "40")))
+
+
+def default_anonymize_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+@lru_cache(maxsize=8)
+def _tokenize_labels(labels: tuple[str, ...]) -> dict[str, np.ndarray]:
+    """Tokenized prompts for a label set (identical for every image)."""
+    processor = _load_clipseg_processor()
+    return dict(processor.tokenizer(list(labels), padding=True, return_tensors="np"))
+
+
+@lru_cache(maxsize=8)
+def _prompt_features(labels: tuple[str, ...]) -> dict[str, np.ndarray]:
+    """Text-part outputs for a label set, computed once and reused for every image."""
+    split = _load_clipseg_split()
+    assert split is not None
+    text_session = split[0]
+    names = {i.name for i in text_session.get_inputs()}
+    feed = {k: v for k, v in _tokenize_labels(labels).items() if k in names}
+    outputs = text_session.run(None, feed)
+    return {o.name: v for o, v in zip(text_session.get_outputs(), outputs)}
+
+
+def _preprocess_images(
+    processor: CLIPSegProcessor, images: Sequence[Image.Image]
+) -> np.ndarray:
+    return processor.image_processor(images=list(images), return_tensors="np")[
+        "pixel_values"
+    ].astype(np.float32)
+
+
+def _run_pairs(
+    session: ort.InferenceSession,
+    pixel_values: np.ndarray,
+    text: dict[str, np.ndarray],
+    n_labels: int,
+    per_run: int,
+) -> np.ndarray:
+    """Logits for every (image, prompt) pair, ``per_run`` images per ONNX run."""
+    input_names = {i.name for i in session.get_inputs()}
+    chunks = []
+    for start in range(0, len(pixel_values), per_run):
+        pixels = pixel_values[start : start + per_run]
+        n = len(pixels)
+        feed = {
+            "pixel_values": np.repeat(pixels, n_labels, axis=0),
+            **{k: np.tile(v, (n,) + (1,) * (v.ndim - 1)) for k, v in text.items()},
+        }
+        logits = session.run(None, {k: v for k, v in feed.items() if k in input_names})[
+            0
+        ]
+        chunks.append(logits.reshape(n, n_labels, *logits.shape[-2:]))
+    return np.concatenate(chunks)
+
+
+def _clipseg_logits(
+    images: Sequence[Image.Image], labels: tuple[str, ...]
+) -> np.ndarray:
+    """``(len(images), len(labels), H, W)`` CLIPSeg logits.
+
+    Each image is preprocessed once and broadcast across the label prompts;
+    pairs from several images share one ONNX run. With the split model the
+    prompts are encoded once per label set and only the image part runs here.
+    """
+    n_labels = len(labels)
+    per_run = max(1, _clipseg_max_pairs() // n_labels)
+    split = _load_clipseg_split()
+    if split is None:
+        session, processor = _load_clipseg()
+        pixel_values = _preprocess_images(processor, images)
+        return _run_pairs(
+            session, pixel_values, _tokenize_labels(labels), n_labels, per_run
+        )
+
+    features = _prompt_features(labels)
+    # Float per-prompt tensors can be tiled across images; anything else
+    # (e.g. a shape vector) only matches a run with exactly one image.
+    if not all(
+        v.dtype.kind == "f" and v.ndim > 0 and v.shape[0] == n_labels
+        for v in features.values()
+    ):
+        per_run = 1
+    pixel_values = _preprocess_images(_load_clipseg_processor(), images)
+    return _run_pairs(split[1], pixel_values, features, n_labels, per_run)
+
+
+def _mask_from_logits(
+    logits: np.ndarray,
+    size: tuple[int, int],
     threshold: float = DEFAULT_THRESHOLD,
     dilate: int = DEFAULT_DILATE,
     blur: int = DEFAULT_BLUR,
-) -> Image.Image:
-    """Segment *labels* in *image* via CLIPSeg ONNX and return a grayscale mask.
+) -> np.ndarray:
+    """Full-resolution ``uint8`` mask (255 = black out) from ``(labels, H, W)`` logits.
 
-    All labels are processed in a single forward pass. White pixels in the
-    returned mask mark detected regions.
+    Every label's probability map is upsampled in one multi-channel resize,
+    thresholded, and OR-ed; dilation and feathering run once on the union.
     """
-    session, processor = _load_clipseg()
-
-    h, w = image.size[1], image.size[0]
-    combined = np.zeros((h, w), dtype=np.uint8)
+    w, h = size
+    probs = (_sigmoid(logits) * 255).astype(np.uint8)
+    upsampled = cv2.resize(
+        np.ascontiguousarray(probs.transpose(1, 2, 0)),
+        (w, h),
+        interpolation=cv2.INTER_LINEAR,
+    ).reshape(h, w, -1)
+    mask = (upsampled > int(threshold * 255)).any(axis=2).astype(np.uint8) * 255
+    if dilate > 0:
+        # ``dilate`` passes of a 3x3 max filter == one (2*dilate+1) square kernel.
+        kernel = np.ones((2 * dilate + 1, 2 * dilate + 1), dtype=np.uint8)
+        mask = cv2.dilate(mask, kernel)
+    if blur > 0:
+        mask = cv2.GaussianBlur(mask, (0, 0), sigmaX=blur)
+    return mask
 
-    inputs = processor(
-        text=list(labels),
-        images=[image] * len(labels),
-        padding=True,
-        return_tensors="np",
-    )
 
-    ort_inputs = {
-        k: v for k, v in inputs.items() if k in [i.name for i in session.get_inputs()]
-    }
-    outputs = session.run(None, ort_inputs)
-
-    logits = outputs[0]  # (num_labels, H, W)
-    for i, label in enumerate(labels):
-        mask_logits = logits[i]
-        mask_prob = _sigmoid(mask_logits)
-        mask_uint8 = (mask_prob * 255).astype(np.uint8)
-        mask_resized = np.array(
-            Image.fromarray(mask_uint8).resize((w, h), Image.Resampling.BILINEAR)
-        )
-        binary = (mask_resized > int(threshold * 255)).astype(np.uint8) * 255
-        combined = np.maximum(combined, binary)
-        detected = np.any(binary > 0)
-        logger.info(
-            "CLIPSeg '%s': %s", label, "detected" if detected else "not detected"
-        )
+def _apply_blackout(image: Image.Image, mask: np.ndarray) -> Image.Image:
+    """Fade masked regions to black (``mask`` 255 = fully black)."""
+    if mask.shape[:2] != (image.size[1], image.size[0]):
+        mask = cv2.resize(mask, image.size, interpolation=cv2.INTER_LANCZOS4)
+    pixels = np.asarray(image.convert("RGB"), dtype=np.uint16)
+    keep = (255 - mask.astype(np.uint16))[..., None]
+    return Image.fromarray(((pixels * keep + 127) // 255).astype(np.uint8), "RGB")
 
-    mask = Image.fromarray(combined, mode="L")
 
-    if dilate > 0:
-        for _ in range(dilate):
-            mask = mask.filter(ImageFilter.MaxFilter(3))
-    if blur > 0:
-        mask = mask.filter(ImageFilter.GaussianBlur(radius=blur))
+def anonymize_images(
+    images: Sequence[Image.Image],
+    target_labels: Sequence[str] = DEFAULT_TARGET_LABELS,
+    threshold: float = DEFAULT_THRESHOLD,
+    dilate: int = DEFAULT_DILATE,
+    blur: int = DEFAULT_BLUR,
+    max_workers: int | None = None,
+) -> list[Image.Image]:
+    """Anonymize a batch of images (one CLIPSeg pass for the whole batch).
 
-    return mask
+    Mask upsampling, morphology and compositing run on a thread pool (OpenCV
+    releases the GIL). Returns new images in input order; inputs are unchanged.
+    """
+    if not images:
+        return []
+    labels = tuple(target_labels)
+    logits = _clipseg_logits(images, labels)
 
+    def _one(i: int) -> Image.Image:
+        mask = _mask_from_logits(logits[i], images[i].size, threshold, dilate, blur)
+        if logger.isEnabledFor(logging.DEBUG):
+            hits = [lab for lab, lg in zip(labels, logits[i]) if (lg > 0).any()]
+            logger.debug("CLIPSeg detected %s", hits or "nothing")
+        return _apply_blackout(images[i], mask)
 
-def _apply_blackout(image: Image.Image, mask: Image.Image) -> Image.Image:
-    """Replace masked regions with black pixels."""
-    if mask.size != image.size:
-        mask = mask.resize(image.size, Image.Resampling.LANCZOS)
-    if mask.mode != "L":
-        mask = mask.convert("L")
-    black = Image.new("RGB", image.size, (0, 0, 0))
-    return Image.composite(black, image, mask)
+    if len(images) == 1:
+        return [_one(0)]
+    workers = min(len(images), max_workers or default_anonymize_workers())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_one, range(len(images))))
 
 
 def anonymize_image(
@@ -160,5 +313,4 @@ def anonymize_image(
     Returns a new PIL Image with sensitive regions replaced by black pixels.
     The original image is never modified.
     """
-    mask = _create_mask(image, target_labels, threshold, dilate, blur)
-    return _apply_blackout(image, mask)
+    return anonymize_images([image], target_labels, threshold, dilate, blur)[0]
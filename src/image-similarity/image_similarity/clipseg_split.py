@@ -0,0 +1,98 @@
+"""
+Split the single-file CLIPSeg ONNX export into a text part and an image part.
+
+The published export (``Xenova/clipseg-rd64-refined``) takes ``input_ids``,
+``attention_mask`` and ``pixel_values`` together, so every (image, prompt)
+pair re-encodes the prompt. The split is found from the graph itself. The
+*text frontier* is every tensor computed only from the text inputs and
+consumed by a node that also depends on ``pixel_values``; for CLIPSeg that
+is the projected prompt embedding the decoder is conditioned on.
+
+* text part: ``input_ids``, ``attention_mask`` -> text frontier
+* image part: ``pixel_values`` + text frontier -> ``logits``
+
+Running the text part once per label set and feeding its outputs to the
+image part gives the same logits as the full graph. Uses the ``onnx``
+package (a plugin dependency); the anonymizer falls back to the full graph
+if the split fails.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TEXT_INPUTS = ("input_ids", "attention_mask")
+
+
+def text_frontier(model) -> list[str]:
+    """Text-only tensors consumed by nodes that also see the image input."""
+    graph = model.graph
+    text = {i.name for i in graph.input if i.name in TEXT_INPUTS}
+    if not text:
+        raise ValueError("model has no text inputs to split off")
+    deps: dict[str, frozenset[str]] = {i.name: frozenset([i.name]) for i in graph.input}
+    for init in graph.initializer:
+        deps[init.name] = frozenset()
+
+    frontier: list[str] = []
+    seen: set[str] = set()
+    for node in graph.node:
+        inputs = [x for x in node.input if x]
+        node_deps = frozenset().union(*(deps.get(x, frozenset()) for x in inputs))
+        if node_deps - text:
+            for x in inputs:
+                d = deps.get(x, frozenset())
+                if d and d <= text and x not in seen:
+                    seen.add(x)
+                    frontier.append(x)
+        for out in node.output:
+            deps[out] = node_deps
+    if not frontier:
+        raise ValueError("text and image branches never meet; nothing to split")
+    return frontier
+
+
+def split_model(src: Path, text_path: Path, image_path: Path) -> list[str]:
+    """Write the text and image parts of ``src``; returns the frontier tensor names."""
+    import onnx
+    from onnx.utils import extract_model
+
+    model = onnx.load(str(src), load_external_data=False)
+    frontier = text_frontier(model)
+    text_inputs = [i.name for i in model.graph.input if i.name in TEXT_INPUTS]
+    image_inputs = [i.name for i in model.graph.input if i.name not in TEXT_INPUTS]
+    outputs = [model.graph.output[0].name]
+    del model
+
+    # Write beside the targets and rename, so a crash never leaves a part
+    # that looks newer than the source.
+    parts = [
+        (text_path, text_inputs, frontier),
+        (image_path, image_inputs + frontier, outputs),
+    ]
+    for path, ins, outs in parts:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        extract_model(str(src), str(tmp), ins, outs)
+        os.replace(tmp, path)
+    logger.info(
+        "Split %s into text/image parts at %d tensor(s): %s",
+        src.name,
+        len(frontier),
+        frontier,
+    )
+    return frontier
+
+
+def ensure_split(src: Path, text_path: Path, image_path: Path) -> None:
+    """(Re)write the split parts when missing or older than ``src``."""
+    src_mtime = src.stat().st_mtime_ns
+    if all(
+        p.exists() and p.stat().st_mtime_ns >= src_mtime
+        for p in (text_path, image_path)
+    ):
+        return
+    split_model(src, text_path, image_path)
@@ -0,0 +1,422 @@
+"""
+Series / near-duplicate clustering over stored SigLIP embeddings and PDQ hashes.
+
+Candidate pairs come from locality-sensitive hashing instead of an all-pairs scan:
+
+* **Semantic**: random-hyperplane (SimHash) signatures of the unit embeddings,
+  split into bands; images sharing a band bucket are verified with a cosine
+  matrix product over that bucket only.
+* **Perceptual**: the 16 x 16-bit PDQ substrings from ``pdq_index`` act as LSH
+  bands. Two hashes within distance ``r`` agree within ``r // 16`` bits on at
+  least one substring, so each substring is also probed with those bit flips
+  (as ``PdqIndex.radius`` does); candidates are verified with a vectorised
+  Hamming distance. Recall is exact up to ``MAX_PROBED_RADIUS`` (47).
+
+Verified edges are merged into connected components (single linkage), so the
+work grows with the bucket sizes rather than with N^2. Buckets larger than
+``_MAX_BUCKET`` (e.g. thousands of blank frames) are linked greedily to leader
+images so a single flood cannot make a pass quadratic.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+from image_similarity.pdq_index import (
+    _SUBSTRINGS,
+    DEFAULT_MATCH_RADIUS,
+    MAX_PROBED_RADIUS,
+    _flip_masks,
+    pdq_substrings,
+    popcount,
+)
+
+DEFAULT_COSINE_THRESHOLD = 0.9
+# SimHash shape is derived from N: enough bits per band for ~_TARGET_BUCKET images
+# per bucket, enough bands for _TARGET_RECALL on a pair at the cosine threshold.
+_TARGET_BUCKET = 4
+_TARGET_RECALL = 0.95
+_MIN_ROWS, _MAX_ROWS = 8, 20
+_MIN_BANDS, _MAX_BANDS = 4, 64
+_LSH_SEED = 0x5EED
+# Buckets up to this size are verified together in padded batches; larger ones
+# one at a time, and above _MAX_BUCKET greedily against leaders.
+_MAX_BATCHED = 64
+_MAX_BUCKET = 1024
+# Rows (bucket slots) per batched verification call, bounds peak memory.
+_BATCH_ROWS = 16384
+# Candidate pairs per verification call in the PDQ bit-flip probe pass.
+_PROBE_PAIRS = 1 << 20
+_SIGNATURE_BLOCK = 8192
+
+ProgressFn = Callable[[int, int], None]
+# (a, b) member index arrays -> (len(a), len(b)) bool adjacency.
+PairFn = Callable[[np.ndarray, np.ndarray], np.ndarray]
+# (B, s) member index matrix -> (B, s, s) bool adjacency (padding handled by caller).
+BlockFn = Callable[[np.ndarray], np.ndarray]
+
+
+@dataclass
+class ClusterResult:
+    """Per-image cluster assignment (clusters numbered by size, largest first)."""
+
+    labels: np.ndarray
+    sizes: np.ndarray
+    representatives: np.ndarray
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self.sizes)
+
+
+def connected_components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Component id (smallest member index) per node for the undirected edges ``u``-``v``."""
+    labels = np.arange(n, dtype=np.int64)
+    if len(u) == 0:
+        return labels
+    u = np.asarray(u, dtype=np.int64)
+    v = np.asarray(v, dtype=np.int64)
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        nxt = labels.copy()
+        np.minimum.at(nxt, u, low)
+        np.minimum.at(nxt, v, low)
+        # Pointer jumping: follow labels to their roots.
+        while True:
+            jumped = nxt[nxt]
+            if np.array_equal(jumped, nxt):
+                break
+            nxt = jumped
+        if np.array_equal(nxt, labels):
+            return labels
+        labels = nxt
+
+
+def _batched_components(adj: np.ndarray) -> np.ndarray:
+    """Component labels (min slot) for a stack of dense ``(B, s, s)`` adjacencies."""
+    batch, size, _ = adj.shape
+    labels = np.broadcast_to(np.arange(size), (batch, size)).copy()
+    while True:
+        nxt = np.minimum(np.where(adj, labels[:, None, :], size).min(axis=2), labels)
+        nxt = np.take_along_axis(nxt, nxt, axis=1)
+        if np.array_equal(nxt, labels):
+            return labels
+        labels = nxt
+
+
+def _large_bucket_edges(
+    members: np.ndarray, pair_adj: PairFn
+) -> tuple[np.ndarray, np.ndarray]:
+    """Edges linking every member of one big bucket to a component root."""
+    if len(members) <= _MAX_BUCKET:
+        labels = _batched_components(pair_adj(members, members)[None])[0]
+        linked = labels != np.arange(len(members))
+        return members[linked], members[labels[linked]]
+
+    # Oversized bucket: attach each chunk to existing leaders, promote the rest.
+    us, vs = [], []
+    leaders = members[:0]
+    for start in range(0, len(members), _MAX_BUCKET):
+        chunk = members[start : start + _MAX_BUCKET]
+        if len(leaders):
+            adj = pair_adj(chunk, leaders)
+            hit = adj.any(axis=1)
+            us.append(chunk[hit])
+            vs.append(leaders[adj[hit].argmax(axis=1)])
+            chunk = chunk[~hit]
+        if len(chunk):
+            labels = _batched_components(pair_adj(chunk, chunk)[None])[0]
+            linked = labels != np.arange(len(chunk))
+            us.append(chunk[linked])
+            vs.append(chunk[labels[linked]])
+            leaders = np.concatenate([leaders, chunk[~linked]])
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def _small_bucket_edges(
+    order: np.ndarray,
+    starts: np.ndarray,
+    sizes: np.ndarray,
+    slots: int,
+    block_adj: BlockFn,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Verify same-size-class buckets together, padded to ``slots`` members."""
+    us, vs = [], []
+    per_call = max(1, _BATCH_ROWS // slots)
+    offsets = np.arange(slots)
+    for i in range(0, len(starts), per_call):
+        s0, sz = starts[i : i + per_call], sizes[i : i + per_call]
+        present = offsets[None, :] < sz[:, None]
+        idx = order[np.minimum(s0[:, None] + offsets[None, :], len(order) - 1)]
+        adj = block_adj(idx) & present[:, :, None] & present[:, None, :]
+        labels = _batched_components(adj)
+        linked = present & (labels != offsets[None, :])
+        us.append(idx[linked])
+        vs.append(np.take_along_axis(idx, labels, axis=1)[linked])
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def _banded_edges(
+    band_keys: np.ndarray,
+    pair_adj: PairFn,
+    block_adj: BlockFn,
+    progress: ProgressFn | None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Verify candidates that share a key in any band (``band_keys``: ``(N, bands)``)."""
+    n, bands = band_keys.shape
+    us, vs = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for b in range(bands):
+        order = np.argsort(band_keys[:, b], kind="stable")
+        keys = band_keys[order, b]
+        bounds = np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1, [n]])
+        starts, sizes = bounds[:-1], np.diff(bounds)
+        lower = 1
+        slots = 2
+        while lower < _MAX_BATCHED:
+            sel = (sizes > lower) & (sizes <= slots)
+            if sel.any():
+                u, v = _small_bucket_edges(
+                    order, starts[sel], sizes[sel], slots, block_adj
+                )
+                us.append(u)
+                vs.append(v)
+            lower, slots = slots, slots * 2
+        for i in np.flatnonzero(sizes > _MAX_BATCHED):
+            u, v = _large_bucket_edges(
+                order[starts[i] : starts[i] + sizes[i]], pair_adj
+            )
+            us.append(u)
+            vs.append(v)
+        if progress is not None:
+            progress(b + 1, bands)
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def simhash_shape(n: int, threshold: float) -> tuple[int, int]:
+    """``(bands, rows)`` for SimHash banding over ``n`` images at ``threshold``."""
+    rows = int(
+        np.clip(np.ceil(np.log2(max(n, 2) / _TARGET_BUCKET)), _MIN_ROWS, _MAX_ROWS)
+    )
+    agree = 1.0 - float(np.arccos(np.clip(threshold, -1.0, 1.0))) / np.pi
+    band_hit = agree**rows
+    if band_hit >= 1.0:
+        return _MIN_BANDS, rows
+    bands = int(np.ceil(np.log(1.0 - _TARGET_RECALL) / np.log(1.0 - band_hit)))
+    return int(np.clip(bands, _MIN_BANDS, _MAX_BANDS)), rows
+
+
+def _simhash_band_keys(embeddings: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """``(N, bands)`` bucket keys from random-hyperplane signs."""
+    rng = np.random.default_rng(_LSH_SEED)
+    planes = rng.standard_normal((embeddings.shape[1], bands * rows)).astype(np.float32)
+    weights = (1 << np.arange(rows, dtype=np.int64))[None, None, :]
+    keys = np.empty((len(embeddings), bands), dtype=np.int64)
+    for start in range(0, len(embeddings), _SIGNATURE_BLOCK):
+        block = embeddings[start : start + _SIGNATURE_BLOCK].astype(np.float32)
+        bits = (block @ planes > 0).reshape(len(block), bands, rows)
+        keys[start : start + len(block)] = (bits * weights).sum(axis=2)
+    return keys
+
+
+def semantic_edges(
+    embeddings: np.ndarray,
+    threshold: float = DEFAULT_COSINE_THRESHOLD,
+    progress: ProgressFn | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs of L2-normalised embeddings with cosine >= ``threshold`` (LSH candidates)."""
+    if len(embeddings) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    # Candidate verification gathers rows repeatedly; upcast once, not per bucket.
+    vectors = np.asarray(embeddings, dtype=np.float32)
+
+    def pair_adj(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return vectors[a] @ vectors[b].T >= threshold
+
+    def block_adj(idx: np.ndarray) -> np.ndarray:
+        x = vectors[idx]
+        return np.matmul(x, x.transpose(0, 2, 1)) >= threshold
+
+    bands, rows = simhash_shape(len(embeddings), threshold)
+    keys = _simhash_band_keys(vectors, bands, rows)
+    return _banded_edges(keys, pair_adj, block_adj, progress)
+
+
+def _probe_edges(
+    keys: np.ndarray,
+    packed: np.ndarray,
+    max_distance: int,
+    masks: np.ndarray,
+    progress: ProgressFn | None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Verified pairs whose substrings differ by one of ``masks`` in some band.
+
+    Buckets larger than ``_MAX_BUCKET`` are not probed into; their members are
+    linked through leaders by the exact-match pass.
+    """
+    n, bands = keys.shape
+    us, vs = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for b in range(bands):
+        col = keys[:, b]
+        order = np.argsort(col, kind="stable")
+        sorted_keys = col[order]
+        has_hash = col >= 0
+        for mask in masks[masks != 0].astype(np.int64):
+            target = col ^ mask
+            lo = np.searchsorted(sorted_keys, target, side="left")
+            counts = np.searchsorted(sorted_keys, target, side="right") - lo
+            counts[~has_hash | (counts > _MAX_BUCKET)] = 0
+            rows = np.flatnonzero(counts)
+            if not len(rows):
+                continue
+            # Split rows so each verification call sees about _PROBE_PAIRS pairs.
+            total = np.cumsum(counts[rows])
+            cuts = np.searchsorted(
+                total, np.arange(_PROBE_PAIRS, total[-1], _PROBE_PAIRS), side="right"
+            )
+            for part in np.split(rows, cuts):
+                if not len(part):
+                    continue
+                c = counts[part]
+                first = np.repeat(np.cumsum(c) - c, c)
+                src = np.repeat(part, c)
+                dst = order[np.repeat(lo[part], c) + np.arange(len(src)) - first]
+                # Each pair is reached from both ends; verify it once.
+                keep = src < dst
+                src, dst = src[keep], dst[keep]
+                dist = popcount(packed[src] ^ packed[dst]).sum(axis=1, dtype=np.uint16)
+                close = dist <= max_distance
+                us.append(src[close])
+                vs.append(dst[close])
+        if progress is not None:
+            progress(b + 1, bands)
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def pdq_edges(
+    packed: np.ndarray,
+    valid: np.ndarray,
+    max_distance: int = DEFAULT_MATCH_RADIUS,
+    progress: ProgressFn | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs of PDQ hashes within ``max_distance`` bits (16-bit substring bands).
+
+    Substrings are matched exactly, then (for ``max_distance >= 16``) probed
+    with up to ``max_distance // 16`` flipped bits, so every pair within
+    ``max_distance`` is found. ``valid`` masks rows that actually have a hash;
+    the others are never linked.
+    """
+    if not 0 <= max_distance <= MAX_PROBED_RADIUS:
+        raise ValueError(
+            f"PDQ distance must be between 0 and {MAX_PROBED_RADIUS}, got {max_distance}"
+        )
+    keys = pdq_substrings(packed).astype(np.int64)
+    # Rows without a hash get unique negative keys so they never share a bucket.
+    missing = np.flatnonzero(~valid)
+    keys[missing] = -(missing[:, None] + 1)
+
+    def pair_adj(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        dist = popcount(packed[a][:, None, :] ^ packed[b][None, :, :]).sum(
+            axis=2, dtype=np.uint16
+        )
+        return dist <= max_distance
+
+    def block_adj(idx: np.ndarray) -> np.ndarray:
+        x = packed[idx]
+        dist = popcount(x[:, :, None, :] ^ x[:, None, :, :]).sum(
+            axis=3, dtype=np.uint16
+        )
+        return dist <= max_distance
+
+    probe_radius = max_distance // _SUBSTRINGS
+    if probe_radius == 0:
+        return _banded_edges(keys, pair_adj, block_adj, progress)
+
+    # Two passes over the bands: exact buckets, then bit-flip probes.
+    def exact_progress(done: int, total: int) -> None:
+        if progress is not None:
+            progress(done, 2 * total)
+
+    def probe_progress(done: int, total: int) -> None:
+        if progress is not None:
+            progress(total + done, 2 * total)
+
+    u, v = _banded_edges(keys, pair_adj, block_adj, exact_progress)
+    pu, pv = _probe_edges(
+        keys, packed, max_distance, _flip_masks(probe_radius), probe_progress
+    )
+    return np.concatenate([u, pu]), np.concatenate([v, pv])
+
+
+def summarize_clusters(
+    n: int, labels: np.ndarray, embeddings: np.ndarray | None = None
+) -> ClusterResult:
+    """Renumber components by size (largest = 0) and pick one representative each.
+
+    With embeddings, the representative is the member closest to the cluster
+    centroid; otherwise it is the member with the lowest index.
+    """
+    roots, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(roots), dtype=np.int64)
+    by_size = np.lexsort((roots, -sizes))
+    rank[by_size] = np.arange(len(roots))
+    cluster = rank[inverse]
+    sizes = sizes[by_size]
+
+    if embeddings is None:
+        score = -np.arange(n, dtype=np.float64)
+    else:
+        centroids = np.zeros((len(sizes), embeddings.shape[1]), dtype=np.float32)
+        np.add.at(centroids, cluster, embeddings.astype(np.float32))
+        score = np.einsum(
+            "ij,ij->i", embeddings.astype(np.float32), centroids[cluster]
+        ).astype(np.float64)
+    order = np.lexsort((-score, cluster))
+    first = np.concatenate([[True], cluster[order][1:] != cluster[order][:-1]])
+    representatives = np.empty(len(sizes), dtype=np.int64)
+    representatives[cluster[order][first]] = order[first]
+    return ClusterResult(labels=cluster, sizes=sizes, representatives=representatives)
+
+
+def cluster_images(
+    embeddings: np.ndarray | None,
+    packed_pdq: np.ndarray | None,
+    pdq_valid: np.ndarray | None = None,
+    *,
+    cosine_threshold: float = DEFAULT_COSINE_THRESHOLD,
+    pdq_max_distance: int = DEFAULT_MATCH_RADIUS,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> ClusterResult:
+    """Cluster N images from either or both signals (edges from both are merged).
+
+    ``progress(stage, done, total)`` is called per LSH band with stage
+    ``"semantic"`` or ``"pdq"``.
+    """
+    if embeddings is None and packed_pdq is None:
+        raise ValueError("cluster_images needs embeddings and/or PDQ hashes")
+    n = len(embeddings) if embeddings is not None else len(packed_pdq)
+    us, vs = [], []
+    if embeddings is not None:
+        u, v = semantic_edges(
+            embeddings,
+            cosine_threshold,
+            None if progress is None else (lambda d, t: progress("semantic", d, t)),
+        )
+        us.append(u)
+        vs.append(v)
+    if packed_pdq is not None:
+        valid = pdq_valid if pdq_valid is not None else np.ones(n, dtype=bool)
+        u, v = pdq_edges(
+            packed_pdq,
+            valid,
+            pdq_max_distance,
+            None if progress is None else (lambda d, t: progress("pdq", d, t)),
+        )
+        us.append(u)
+        vs.append(v)
+    labels = connected_components(n, np.concatenate(us), np.concatenate(vs))
+    return summarize_clusters(n, labels, embeddings)
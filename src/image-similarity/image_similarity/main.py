@@ -1,7 +1,10 @@
 from typing import TypedDict
-import hashlib
+import csv
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 import numpy as np
@@ -10,6 +13,10 @@ import pdqhash
 import typer
 from PIL import Image
 from transformers import AutoImageProcessor
+from rb.lib.derived_models import derived_model_path
+from rb.lib.file_fingerprint import cached_sha256_many
+from rb.lib.file_scan import scan_files
+from rb.lib.image_cache import load_image
 from rb.lib.job_progress import report_phased_file_progress
 from rb.lib.ml_service import MLService
 from rb.api.models import (
@@ -40,8 +47,29 @@ from rb.api.embedding_storage import (
     ImageSimilarityEmbeddingStorage,
     ImageSimilarityPrivateEmbeddingStorage,
 )
-from image_similarity.scorers import ClipScorer, CombinedScorer, ImageScorer, PdqScorer
-from image_similarity.anonymizer import anonymize_image, DEFAULT_TARGET_LABELS
+from image_similarity.clustering import (
+    DEFAULT_COSINE_THRESHOLD,
+    ClusterResult,
+    cluster_images,
+)
+from image_similarity.pdq_index import (
+    DEFAULT_MATCH_RADIUS,
+    MAX_PROBED_RADIUS,
+    PDQ_HEX_LEN,
+    pack_pdq_hex,
+)
+from image_similarity.scorers import (
+    ClipScorer,
+    FusedClipPdqScorer,
+    ImageScorer,
+    PdqScorer,
+)
+from image_similarity.anonymizer import (
+    DEFAULT_TARGET_LABELS,
+    anonymize_image,
+    anonymize_images,
+    default_anonymize_workers,
+)
 from image_similarity import sql_filters
 from sqlmodel import Session, select
 
@@ -54,21 +82,42 @@ ALLOWED_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp"}
 _DEFAULT_MODEL = "google/siglip2-so400m-patch14-384"
 _MODELS_DIR = Path(__file__).resolve().parent / "onnx_models"
 _DEFAULT_ONNX_PATH = _MODELS_DIR / "siglip2-so400m-patch14-384.onnx"
+# SigLIP2 input side; images are decoded through the shared rb-lib cache at
+# this tier instead of at full resolution.
+_VISION_INPUT_SIDE = 384
 # Number of images fed to the ONNX session per GPU kernel launch.
 # Larger values increase GPU utilisation; reduce if VRAM is limited.
 _EMBED_BATCH_SIZE = 32
-
-_ORT_SESSION: ort.InferenceSession | None = None
+# Width of the SigLIP2-SO400M pooled embedding (``Vector(1152)`` column).
+_EMBED_DIM = 1152
+
+# Selectable vision encoders (``model_name`` enum keys). Each variant stores its
+# vectors under its own model_name, so quantised and full-precision embeddings
+# are never compared with each other.
+_INT8_MODEL = f"{_DEFAULT_MODEL}:int8"
+_FP16_MODEL = f"{_DEFAULT_MODEL}:fp16"
+_VISION_ONNX_PATHS: dict[str, Path] = {
+    _DEFAULT_MODEL: _DEFAULT_ONNX_PATH,
+    _INT8_MODEL: _MODELS_DIR / "siglip2-so400m-patch14-384.int8.onnx",
+    _FP16_MODEL: _MODELS_DIR / "siglip2-so400m-patch14-384.fp16.onnx",
+}
+
+# Serialises the one-time int8 quantisation between concurrent first requests.
+_QUANTIZE_LOCK = threading.Lock()
+
+_ORT_SESSIONS: dict[str, ort.InferenceSession] = {}
 _PROCESSOR: AutoImageProcessor | None = None
 
 
-def _get_onnx_vision_model() -> tuple[ort.InferenceSession, AutoImageProcessor]:
-    """Load the ONNX model once and cache it for the lifetime of the process."""
-    global _ORT_SESSION, _PROCESSOR
-    if _ORT_SESSION is None or _PROCESSOR is None:
-        _ORT_SESSION, _PROCESSOR = _load_onnx_vision_model()
-        logger.info("ONNX vision model loaded and cached.")
-    return _ORT_SESSION, _PROCESSOR
+def _get_onnx_vision_model(
+    model_name: str = _DEFAULT_MODEL,
+) -> tuple[ort.InferenceSession, AutoImageProcessor]:
+    """Load the ONNX model once per variant and cache it for the lifetime of the process."""
+    global _PROCESSOR
+    if model_name not in _ORT_SESSIONS or _PROCESSOR is None:
+        _ORT_SESSIONS[model_name], _PROCESSOR = _load_onnx_vision_model(model_name)
+        logger.info("ONNX vision model %s loaded and cached.", model_name)
+    return _ORT_SESSIONS[model_name], _PROCESSOR
 
 
 class Inputs(TypedDict):
@@ -85,6 +134,19 @@ class Parameters(TypedDict):
     scoring_mode: str
 
 
+class ClusterInputs(TypedDict):
+    input_dir: DirectoryInput
+    output_dir: DirectoryInput
+
+
+class ClusterParameters(TypedDict):
+    user_email: str
+    model_name: str
+    cosine_threshold: float
+    pdq_max_distance: int
+    cluster_mode: str
+
+
 # ---------------------------------------------------------------------------
 #  ONNX Runtime helpers  (same pattern as deepfake-detection / face-match)
 # ---------------------------------------------------------------------------
@@ -102,21 +164,86 @@ def _get_ort_providers() -> list[str]:
     return providers
 
 
-def _load_onnx_vision_model() -> tuple[ort.InferenceSession, AutoImageProcessor]:
-    """Load the bundled vision ONNX model and its image processor."""
-    if not _DEFAULT_ONNX_PATH.exists():
+def _quantize_int8(src: Path, dst: Path) -> None:
+    """Write a dynamic int8 (weight-quantised MatMul/Gemm) copy of ``src``."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info("Quantizing %s to dynamic int8 (one-time)", src.name)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+    quantize_dynamic(
+        str(src),
+        str(tmp),
+        op_types_to_quantize=["MatMul", "Gemm"],
+        weight_type=QuantType.QInt8,
+    )
+    os.replace(tmp, dst)
+
+
+def _load_onnx_vision_model(
+    model_name: str = _DEFAULT_MODEL,
+) -> tuple[ort.InferenceSession, AutoImageProcessor]:
+    """Load the vision ONNX model for ``model_name`` and its image processor.
+
+    The int8 variant is quantised from the fp32 export on first use when it
+    has not been downloaded; the quantised copy goes to the user's derived-model
+    folder (``rb.lib.derived_models``), not the package. The fp16 variant needs
+    the CUDA provider.
+    """
+    if model_name not in _VISION_ONNX_PATHS:
+        raise ValueError(
+            f"Unknown model_name {model_name!r}; expected one of {list(_VISION_ONNX_PATHS)}"
+        )
+    providers = _get_ort_providers()
+    if model_name == _FP16_MODEL and "CUDAExecutionProvider" not in providers:
+        raise ValueError(
+            f"{model_name} needs the CUDA execution provider; use {_INT8_MODEL} on CPU."
+        )
+    onnx_path = _VISION_ONNX_PATHS[model_name]
+    if (
+        not onnx_path.exists()
+        and model_name == _INT8_MODEL
+        and _DEFAULT_ONNX_PATH.exists()
+    ):
+        try:
+            with _QUANTIZE_LOCK:
+                onnx_path = derived_model_path(
+                    "image_similarity", _DEFAULT_ONNX_PATH, "int8"
+                )
+                if not onnx_path.exists():
+                    _quantize_int8(_DEFAULT_ONNX_PATH, onnx_path)
+        except (ImportError, OSError) as exc:
+            logger.warning("Cannot quantize locally (%s)", exc)
+    if not onnx_path.exists():
         raise FileNotFoundError(
-            f"ONNX model not found at {_DEFAULT_ONNX_PATH}. "
-            f"Download the vision ONNX export of {_DEFAULT_MODEL} into the onnx_models/ directory."
+            f"ONNX model not found at {onnx_path}. "
+            f"Download the vision ONNX export of {model_name} into the onnx_models/ directory."
         )
     session = ort.InferenceSession(
-        str(_DEFAULT_ONNX_PATH),
-        providers=_get_ort_providers(),
+        str(onnx_path),
+        providers=providers,
     )
     processor = AutoImageProcessor.from_pretrained(_MODELS_DIR)
     return session, processor
 
 
+def _vision_model_enum() -> EnumParameterDescriptor:
+    """``model_name`` choices; fp16 is offered only when CUDA is available."""
+    enum_vals = [
+        EnumVal(key=_DEFAULT_MODEL, label="SigLIP2-SO400M"),
+        EnumVal(key=_INT8_MODEL, label="SigLIP2-SO400M int8 (faster on CPU)"),
+    ]
+    if "CUDAExecutionProvider" in ort.get_available_providers():
+        enum_vals.append(EnumVal(key=_FP16_MODEL, label="SigLIP2-SO400M fp16 (GPU)"))
+    return EnumParameterDescriptor(enum_vals=enum_vals, default=_DEFAULT_MODEL)
+
+
+def _input_dtype(ort_session: ort.InferenceSession) -> type:
+    """NumPy dtype the session expects for ``pixel_values``."""
+    if ort_session.get_inputs()[0].type == "tensor(float16)":
+        return np.float16
+    return np.float32
+
+
 def _supports_dynamic_batch(ort_session: ort.InferenceSession) -> bool:
     """Return True if the ONNX model accepts a variable batch dimension."""
     inp = ort_session.get_inputs()[0]
@@ -156,18 +283,15 @@ def _embed_images_batch(
         valid_paths: list[str] = []
         for p in batch_paths:
             try:
-                images.append(Image.open(p).convert("RGB"))
+                images.append(load_image(p, min_side=_VISION_INPUT_SIDE))
                 valid_paths.append(p)
             except Exception as exc:
                 logger.warning("Could not open %s: %s", p, exc)
         if not images:
             continue
-        pixel_values = processor(images=images, return_tensors="np")[
-            "pixel_values"
-        ].astype(np.float32)
-        outputs = ort_session.run(["pooler_output"], {"pixel_values": pixel_values})
-        embeds = outputs[0]
-        embeds = embeds / np.linalg.norm(embeds, axis=-1, keepdims=True)
+        embeds = _embed_pil_images(
+            ort_session, processor, images, batch_size=len(images)
+        )
         for path, vec in zip(valid_paths, embeds):
             results[path] = vec
         processed += len(valid_paths)
@@ -191,19 +315,33 @@ def _embed_images_batch(
     return results, last_reported
 
 
+def _embed_pil_images(
+    ort_session: ort.InferenceSession,
+    processor: AutoImageProcessor,
+    images: list[Image.Image],
+    batch_size: int = _EMBED_BATCH_SIZE,
+) -> np.ndarray:
+    """``(len(images), D)`` normalised embeddings for in-memory PIL Images."""
+    step = batch_size if _supports_dynamic_batch(ort_session) else 1
+    dtype = _input_dtype(ort_session)
+    chunks = []
+    for i in range(0, len(images), step):
+        pixel_values = processor(images=images[i : i + step], return_tensors="np")[
+            "pixel_values"
+        ].astype(dtype)
+        outputs = ort_session.run(["pooler_output"], {"pixel_values": pixel_values})
+        chunks.append(outputs[0].astype(np.float32))
+    embeds = np.concatenate(chunks)
+    return embeds / np.linalg.norm(embeds, axis=-1, keepdims=True)
+
+
 def _embed_pil_image(
     ort_session: ort.InferenceSession,
     processor: AutoImageProcessor,
     image: Image.Image,
 ) -> np.ndarray:
     """Compute a normalised embedding from an in-memory PIL Image via ONNX Runtime."""
-    pixel_values = processor(images=image, return_tensors="np")["pixel_values"].astype(
-        np.float32
-    )
-    outputs = ort_session.run(["pooler_output"], {"pixel_values": pixel_values})
-    embeds = outputs[0]
-    embeds = embeds / np.linalg.norm(embeds, axis=-1, keepdims=True)
-    return embeds.squeeze()
+    return _embed_pil_images(ort_session, processor, [image])[0]
 
 
 _PDQ_HEX_LEN = 64  # 256 bits = 64 hex chars
@@ -241,12 +379,7 @@ def _compute_pdq_hash(source: Image.Image | str) -> str:
 
 
 def task_schema() -> TaskSchema:
-    model_enum = EnumParameterDescriptor(
-        enum_vals=[
-            EnumVal(key="google/siglip2-so400m-patch14-384", label="SigLIP2-SO400M"),
-        ],
-        default="google/siglip2-so400m-patch14-384",
-    )
+    model_enum = _vision_model_enum()
     top_k_desc = RangedIntParameterDescriptor(
         range=IntRangeDescriptor(min=1, max=20),
         default=5,
@@ -327,6 +460,76 @@ def task_schema() -> TaskSchema:
     )
 
 
+def cluster_task_schema() -> TaskSchema:
+    model_enum = _vision_model_enum()
+    cosine_desc = RangedFloatParameterDescriptor(
+        range=FloatRangeDescriptor(min=0.5, max=1.0),
+        default=DEFAULT_COSINE_THRESHOLD,
+    )
+    pdq_desc = RangedIntParameterDescriptor(
+        range=IntRangeDescriptor(min=0, max=MAX_PROBED_RADIUS),
+        default=DEFAULT_MATCH_RADIUS,
+    )
+    cluster_mode_enum = EnumParameterDescriptor(
+        enum_vals=[
+            EnumVal(key="combined", label="Combined (CLIP or PDQ match)"),
+            EnumVal(key="semantic", label="Semantic only (CLIP)"),
+            EnumVal(key="pdq", label="Perceptual only (PDQ)"),
+        ],
+        default="combined",
+    )
+
+    return TaskSchema(
+        inputs=[
+            InputSchema(
+                key="input_dir",
+                label="Directory of image files to group into series",
+                input_type=InputType.DIRECTORY,
+            ),
+            InputSchema(
+                key="output_dir",
+                label="Directory for the cluster assignment CSV",
+                input_type=InputType.DIRECTORY,
+            ),
+        ],
+        parameters=[
+            ParameterSchema(
+                key="user_email",
+                label="Your email",
+                subtitle="Required — identifies embedding ownership for cross-agency sharing",
+                value=TextParameterDescriptor(default=""),
+            ),
+            ParameterSchema(
+                key="model_name",
+                label="CLIP model",
+                subtitle="Model whose stored embeddings are clustered",
+                value=model_enum,
+            ),
+            ParameterSchema(
+                key="cosine_threshold",
+                label="Semantic threshold",
+                subtitle="Two images are linked when their CLIP cosine similarity is >= this",
+                value=cosine_desc,
+            ),
+            ParameterSchema(
+                key="pdq_max_distance",
+                label="PDQ distance",
+                subtitle=(
+                    "Two images are linked when their PDQ hashes differ in <= this "
+                    f"many bits (0-{MAX_PROBED_RADIUS})"
+                ),
+                value=pdq_desc,
+            ),
+            ParameterSchema(
+                key="cluster_mode",
+                label="Clustering mode",
+                subtitle="Combined links images that match on either signal",
+                value=cluster_mode_enum,
+            ),
+        ],
+    )
+
+
 server = MLService(APP_NAME)
 script_dir = os.path.dirname(os.path.abspath(__file__))
 info_file_path = os.path.join(script_dir, "app-info.md")
@@ -357,19 +560,6 @@ def _paths_already_embedded(
     return set(rows)
 
 
-_SHA256_HEX_LEN = 64  # SHA-256 = 32 bytes = 64 hex chars
-
-
-def _sha256_file(path: str) -> str:
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    digest = h.hexdigest()
-    assert len(digest) == _SHA256_HEX_LEN
-    return digest
-
-
 def _discover_new_paths(
     session: Session,
     file_paths: list[str],
@@ -494,7 +684,19 @@ def _persist_new_path(
         return
 
     if row.path not in file_paths_set:
-        row.path = path
+        # Insert a copy under the new path rather than renaming the row: the
+        # in-memory PDQ search index only picks up new rows (see scorers).
+        session.add(
+            ImageSimilarityEmbedding(
+                path=path,
+                embedding=list(row.embedding) if row.embedding is not None else [],
+                content_sha256=row.content_sha256,
+                model_name=row.model_name,
+                pdq_hash=row.pdq_hash,
+                user_email=row.user_email,
+            )
+        )
+        session.delete(row)
         counters["relocated"] += 1
         logger.info(
             "Reused embedding by content hash (path updated): %s -> %s", row.path, path
@@ -574,28 +776,14 @@ def _embed_and_store_images(
 
 
 def _collect_image_paths(input_dir: str) -> list[str]:
-    """Return sorted list of valid image file paths from a directory."""
-    paths: list[str] = []
-    for name in sorted(os.listdir(input_dir)):
-        if os.path.splitext(name)[1].lower() not in ALLOWED_IMAGE_EXTS:
-            continue
-        full = os.path.join(input_dir, name)
-        if os.path.isfile(full):
-            paths.append(full)
-    return paths
+    """Return sorted list of valid image file paths anywhere under a directory."""
+    return scan_files(input_dir, extensions=ALLOWED_IMAGE_EXTS)
 
 
 def _hash_paths(paths: list[str]) -> tuple[list[str], dict[str, str]]:
-    """SHA-256 hash each path. Returns (valid_paths, path_to_hash)."""
-    path_to_hash: dict[str, str] = {}
-    valid: list[str] = []
-    for p in paths:
-        try:
-            path_to_hash[p] = _sha256_file(p)
-            valid.append(p)
-        except OSError as exc:
-            logger.warning("Skip hashing %s: %s", p, exc)
-    return valid, path_to_hash
+    """SHA-256 hash each path via the stat-keyed cache. Returns (valid_paths, path_to_hash)."""
+    path_to_hash = cached_sha256_many(paths)
+    return [p for p in paths if p in path_to_hash], path_to_hash
 
 
 def _load_query_image(query_image_path: str, anonymize: bool) -> Image.Image:
@@ -648,21 +836,14 @@ def _build_scorer(
     if scoring_mode == "pdq":
         return PdqScorer(session, query_pdq, use_private_table=use_private_table)
 
-    return CombinedScorer(
-        [
-            (
-                "clip",
-                ClipScorer(
-                    session, query_vec, model_name, use_private_table=use_private_table
-                ),
-                0.6,
-            ),
-            (
-                "pdq",
-                PdqScorer(session, query_pdq, use_private_table=use_private_table),
-                0.4,
-            ),
-        ]
+    return FusedClipPdqScorer(
+        session,
+        query_vec,
+        query_pdq,
+        model_name,
+        use_private_table=use_private_table,
+        clip_weight=0.6,
+        pdq_weight=0.4,
     )
 
 
@@ -716,6 +897,14 @@ def _uncached_private_paths(
     return [p for p in file_paths if path_to_hash.get(p) not in cached]
 
 
+def _open_rgb(path: str) -> Image.Image | Exception:
+    """Decode one image for the anonymization pool (errors are returned, not raised)."""
+    try:
+        return Image.open(path).convert("RGB")
+    except Exception as exc:
+        return exc
+
+
 def _group_by_hash(
     paths: list[str], path_to_hash: dict[str, str]
 ) -> dict[str, list[str]]:
@@ -762,23 +951,45 @@ def _create_private_embeddings(
 
     embedded, cloned = 0, 0
     failures: list[tuple[str, str]] = []
-    for h, paths in groups.items():
-        try:
-            img = Image.open(paths[0]).convert("RGB")
-            anonymized = anonymize_image(img)
-            emb = _embed_pil_image(ort_session, processor, anonymized).tolist()
-            pdq_hash = _compute_pdq_hash(anonymized)
-            for path in paths:
-                storage.save_embedding(path, emb, content_sha256=h, pdq_hash=pdq_hash)
-            embedded += 1
-            cloned += len(paths) - 1
+    items = list(groups.items())
+    with ThreadPoolExecutor(max_workers=default_anonymize_workers()) as pool:
+        for start in range(0, len(items), _EMBED_BATCH_SIZE):
+            batch = items[start : start + _EMBED_BATCH_SIZE]
+            decoded = list(pool.map(_open_rgb, [paths[0] for _, paths in batch]))
+            ready = []
+            for (h, paths), img in zip(batch, decoded):
+                if isinstance(img, Exception):
+                    failures.append((paths[0], str(img)))
+                    logger.warning("Private embedding failed for %s: %s", paths[0], img)
+                else:
+                    ready.append((h, paths, img))
+            if not ready:
+                continue
+            try:
+                anonymized = anonymize_images([img for _, _, img in ready])
+                embeds = _embed_pil_images(ort_session, processor, anonymized)
+                pdq_hashes = list(pool.map(_compute_pdq_hash, anonymized))
+            except Exception as exc:
+                failures.extend((paths[0], str(exc)) for _, paths, _ in ready)
+                logger.warning(
+                    "Private embedding failed for %d image(s) from %s: %s",
+                    len(ready),
+                    ready[0][1][0],
+                    exc,
+                )
+                continue
+            for (h, paths, _), emb, pdq_hash in zip(ready, embeds, pdq_hashes):
+                vec = emb.tolist()
+                for path in paths:
+                    storage.save_embedding(
+                        path, vec, content_sha256=h, pdq_hash=pdq_hash
+                    )
+                embedded += 1
+                cloned += len(paths) - 1
             session.flush()
             last_reported = report_phased_file_progress(
-                None, 3, 3, embedded, total, last_reported
+                None, 3, 3, embedded + len(failures), total, last_reported
             )
-        except Exception as exc:
-            failures.append((paths[0], str(exc)))
-            logger.warning("Private embedding failed for %s: %s", paths[0], exc)
 
     if embedded or cloned:
         storage.commit()
@@ -812,7 +1023,7 @@ def search_series(inputs: Inputs, parameters: Parameters) -> ResponseBody:
     if not user_email:
         raise ValueError("user_email is required for embedding ownership attribution.")
 
-    ort_session, processor = _get_onnx_vision_model()
+    ort_session, processor = _get_onnx_vision_model(model_name)
     logger.info(
         "Scoring: providers=%s model=%s mode=%s email=%s",
         ort_session.get_providers(),
@@ -905,6 +1116,174 @@ def search_series(inputs: Inputs, parameters: Parameters) -> ResponseBody:
     return ResponseBody(root=BatchFileResponse(files=file_responses))
 
 
+# Rows per SELECT when loading stored vectors for clustering.
+_CLUSTER_LOAD_CHUNK = 5000
+
+
+def _load_cluster_signals(
+    session: Session,
+    paths: list[str],
+    model_name: str,
+    use_embeddings: bool,
+    use_pdq: bool,
+    progress_phases: int,
+) -> tuple[np.ndarray | None, np.ndarray | None, np.ndarray, int]:
+    """Stored embeddings (float16, row per path) and packed PDQ hashes + validity mask."""
+    embeddings = (
+        np.zeros((len(paths), _EMBED_DIM), dtype=np.float16) if use_embeddings else None
+    )
+    hexes = ["0" * PDQ_HEX_LEN] * len(paths)
+    valid = np.zeros(len(paths), dtype=bool)
+    index = {p: i for i, p in enumerate(paths)}
+    last_reported = 0
+    for start in range(0, len(paths), _CLUSTER_LOAD_CHUNK):
+        chunk = paths[start : start + _CLUSTER_LOAD_CHUNK]
+        rows = session.exec(
+            select(
+                ImageSimilarityEmbedding.path,
+                ImageSimilarityEmbedding.embedding,
+                ImageSimilarityEmbedding.pdq_hash,
+            ).where(sql_filters.path_in(chunk), sql_filters.model_name_eq(model_name))
+        ).all()
+        for path, embedding, pdq_hash in rows:
+            i = index[path]
+            if embeddings is not None and embedding is not None:
+                embeddings[i] = np.asarray(embedding, dtype=np.float16)
+            if pdq_hash and len(pdq_hash) == PDQ_HEX_LEN:
+                hexes[i] = pdq_hash
+                valid[i] = True
+        last_reported = report_phased_file_progress(
+            None,
+            1,
+            progress_phases,
+            start + len(chunk),
+            len(paths),
+            last_reported,
+        )
+    packed = pack_pdq_hex(hexes) if use_pdq else None
+    return embeddings, packed, valid, last_reported
+
+
+def _write_cluster_csv(
+    output_dir: str, paths: list[str], result: ClusterResult
+) -> Path:
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    out = out_dir / f"image_clusters_{now}.csv"
+    is_rep = np.zeros(len(paths), dtype=bool)
+    is_rep[result.representatives] = True
+    with open(out, "w", newline="", encoding="utf-8") as csv_f:
+        writer = csv.writer(csv_f)
+        writer.writerow(["path", "cluster_id", "cluster_size", "is_representative"])
+        for i in np.lexsort((np.arange(len(paths)), result.labels)):
+            label = int(result.labels[i])
+            writer.writerow(
+                [paths[i], label, int(result.sizes[label]), bool(is_rep[i])]
+            )
+    return out
+
+
+def cluster_series(
+    inputs: ClusterInputs, parameters: ClusterParameters
+) -> ResponseBody:
+    """Group every image under ``input_dir`` into series / near-duplicate clusters."""
+
+    input_dir = os.path.realpath(str(inputs["input_dir"].path))
+    output_dir = str(inputs["output_dir"].path)
+    model_name = parameters.get("model_name", _DEFAULT_MODEL)
+    cosine_threshold = float(
+        parameters.get("cosine_threshold", DEFAULT_COSINE_THRESHOLD)
+    )
+    pdq_max_distance = int(parameters.get("pdq_max_distance", DEFAULT_MATCH_RADIUS))
+    if not 0 <= pdq_max_distance <= MAX_PROBED_RADIUS:
+        raise ValueError(f"pdq_max_distance must be between 0 and {MAX_PROBED_RADIUS}.")
+    cluster_mode = parameters.get("cluster_mode", "combined")
+    user_email = parameters.get("user_email", "").strip()
+    if not user_email:
+        raise ValueError("user_email is required for embedding ownership attribution.")
+    if cluster_mode not in ("semantic", "pdq", "combined"):
+        raise ValueError(
+            f"cluster_mode must be one of semantic/pdq/combined, got: {cluster_mode!r}"
+        )
+    use_embeddings = cluster_mode in ("semantic", "combined")
+    use_pdq = cluster_mode in ("pdq", "combined")
+
+    ort_session, processor = _get_onnx_vision_model(model_name)
+    file_paths, path_to_hash = _hash_paths(_collect_image_paths(input_dir))
+
+    with Session(engine) as session:
+        storage = ImageSimilarityEmbeddingStorage(
+            session,
+            model_name=model_name,
+            user_email=user_email,
+        )
+        # New images are embedded first; everything already stored is reused.
+        paths, _ = _embed_and_store_images(
+            session,
+            storage,
+            file_paths,
+            path_to_hash,
+            ort_session,
+            processor,
+            model_name,
+        )
+        # Phase 1 loads vectors, then one phase per clustering signal.
+        phases = 1 + int(use_embeddings) + int(use_pdq)
+        embeddings, packed, valid, last_reported = _load_cluster_signals(
+            session, paths, model_name, use_embeddings, use_pdq, phases
+        )
+
+    stage_phase = {"semantic": 2, "pdq": phases}
+
+    def _progress(stage: str, done: int, total: int) -> None:
+        nonlocal last_reported
+        last_reported = report_phased_file_progress(
+            None, stage_phase[stage], phases, done, total, last_reported
+        )
+
+    result = cluster_images(
+        embeddings,
+        packed,
+        valid,
+        cosine_threshold=cosine_threshold,
+        pdq_max_distance=pdq_max_distance,
+        progress=_progress,
+    )
+    csv_path = _write_cluster_csv(output_dir, paths, result)
+    logger.info(
+        "Clustered %d image(s) into %d cluster(s); assignments in %s",
+        len(paths),
+        result.cluster_count,
+        csv_path,
+    )
+
+    file_responses = [
+        FileResponse(
+            file_type=FileType.CSV,
+            path=str(csv_path),
+            title=f"Cluster assignments · {result.cluster_count} clusters",
+        )
+    ]
+    for label, rep in enumerate(result.representatives):
+        if result.sizes[label] < 2:
+            break  # clusters are ordered by size; the rest are singletons
+        file_responses.append(
+            FileResponse(
+                file_type=FileType.IMG,
+                path=paths[int(rep)],
+                title=f"Cluster {label} · {int(result.sizes[label])} images",
+                metadata={
+                    "cluster_id": label,
+                    "cluster_size": int(result.sizes[label]),
+                    "cluster_mode": cluster_mode,
+                    "model_name": model_name,
+                },
+            )
+        )
+    return ResponseBody(root=BatchFileResponse(files=file_responses))
+
+
 def inputs_cli_parse(value: str) -> Inputs:
     if "|||" not in value:
         raise ValueError(
@@ -940,6 +1319,42 @@ def parameters_cli_parse(value: str) -> Parameters:
     )
 
 
+def cluster_inputs_cli_parse(value: str) -> ClusterInputs:
+    if "|||" not in value:
+        raise ValueError(
+            "Expected 'input_dir|||output_dir' (use ||| between the two folders)."
+        )
+    dir_part, out_part = value.split("|||", 1)
+    return ClusterInputs(
+        input_dir=DirectoryInput(path=dir_part.strip()),
+        output_dir=DirectoryInput(path=out_part.strip()),
+    )
+
+
+def cluster_parameters_cli_parse(value: str) -> ClusterParameters:
+    parts = [p.strip() for p in value.split(",")]
+    user_email = parts[0] if len(parts) > 0 and parts[0] else ""
+    model_name = parts[1] if len(parts) > 1 and parts[1] else _DEFAULT_MODEL
+    cosine_threshold = (
+        float(parts[2]) if len(parts) > 2 and parts[2] else DEFAULT_COSINE_THRESHOLD
+    )
+    pdq_max_distance = (
+        int(parts[3]) if len(parts) > 3 and parts[3] else DEFAULT_MATCH_RADIUS
+    )
+    cluster_mode = parts[4] if len(parts) > 4 and parts[4] else "combined"
+    if cluster_mode not in ("semantic", "pdq", "combined"):
+        raise ValueError(
+            f"cluster_mode must be one of semantic/pdq/combined, got: {cluster_mode!r}"
+        )
+    return ClusterParameters(
+        user_email=user_email,
+        model_name=model_name,
+        cosine_threshold=cosine_threshold,
+        pdq_max_distance=pdq_max_distance,
+        cluster_mode=cluster_mode,
+    )
+
+
 server.add_ml_service(
     rule="/search_series",
     ml_function=search_series,
@@ -956,6 +1371,22 @@ server.add_ml_service(
     task_schema_func=task_schema,
 )
 
+server.add_ml_service(
+    rule="/cluster_series",
+    ml_function=cluster_series,
+    inputs_cli_parser=typer.Argument(
+        parser=cluster_inputs_cli_parse,
+        help="Directory of images and output folder as: input_dir|||output_dir",
+    ),
+    parameters_cli_parser=typer.Argument(
+        parser=cluster_parameters_cli_parse,
+        help="user_email,model_name,cosine_threshold,pdq_max_distance,cluster_mode  (cluster_mode: combined|semantic|pdq)",
+    ),
+    short_title="Cluster directory into series",
+    order=1,
+    task_schema_func=cluster_task_schema,
+)
+
 app = server.app
 if __name__ == "__main__":
     app()
@@ -0,0 +1,172 @@
+"""
+In-memory PDQ index: packed 256-bit hashes with vectorised Hamming distance.
+
+Hashes are held as an ``(N, 4)`` ``uint64`` array (big-endian words of the
+64-char hex string). Exhaustive scoring is one XOR + popcount over that array.
+Radius queries (PDQ's match threshold is distance <= 31) use multi-index
+hashing: the 256 bits are split into 16 x 16-bit substrings, and by pigeonhole
+any hash within ``r`` of the query matches it exactly, or within ``r // 16``
+bits, on at least one substring. Only those bucket members are verified.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from functools import cache
+from itertools import combinations
+
+import numpy as np
+
+PDQ_BITS = 256
+PDQ_HEX_LEN = PDQ_BITS // 4
+# Distance at or below which two PDQ hashes are treated as the same image.
+DEFAULT_MATCH_RADIUS = 31
+
+_WORDS = PDQ_BITS // 64
+_SUBSTRINGS = 16
+_SUBSTRING_BITS = PDQ_BITS // _SUBSTRINGS
+# Beyond this per-substring radius the probe count outgrows an exhaustive scan.
+_MAX_PROBE_RADIUS = 2
+# Largest radius multi-index probing answers exactly (r // 16 <= _MAX_PROBE_RADIUS).
+MAX_PROBED_RADIUS = (_MAX_PROBE_RADIUS + 1) * _SUBSTRINGS - 1
+
+if hasattr(np, "bitwise_count"):
+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        """Per-element set-bit count of an unsigned integer array."""
+        return np.bitwise_count(x)
+
+else:  # NumPy < 2.0
+    _POP16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        """Per-element set-bit count of an unsigned integer array."""
+        x = x.astype(np.uint64, copy=False)
+        total = np.zeros(x.shape, dtype=np.uint8)
+        for shift in (0, 16, 32, 48):
+            total += _POP16[
+                ((x >> np.uint64(shift)) & np.uint64(0xFFFF)).astype(np.intp)
+            ]
+        return total
+
+
+def pack_pdq_hex(hexes: Sequence[str]) -> np.ndarray:
+    """``(N, 4)`` ``uint64`` array from 64-char hex PDQ hashes."""
+    if not hexes:
+        return np.zeros((0, _WORDS), dtype=np.uint64)
+    if any(len(h) != PDQ_HEX_LEN for h in hexes):
+        raise ValueError(f"PDQ hashes must be {PDQ_HEX_LEN} hex characters")
+    raw = bytes.fromhex("".join(hexes))
+    return np.frombuffer(raw, dtype=">u8").reshape(-1, _WORDS).astype(np.uint64)
+
+
+def unpack_pdq_hex(packed: np.ndarray) -> list[str]:
+    """Inverse of :func:`pack_pdq_hex`."""
+    raw = np.ascontiguousarray(packed, dtype=">u8").tobytes().hex()
+    return [raw[i : i + PDQ_HEX_LEN] for i in range(0, len(raw), PDQ_HEX_LEN)]
+
+
+def hamming_distances(packed: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Hamming distance from one packed hash ``(4,)`` to every row of ``packed``."""
+    return popcount(packed ^ query).sum(axis=-1, dtype=np.uint16)
+
+
+def pdq_substrings(packed: np.ndarray) -> np.ndarray:
+    """``(N, 16)`` ``uint16`` view of each hash's 16-bit substrings."""
+    shifts = np.array([48, 32, 16, 0], dtype=np.uint64)
+    parts = (packed[..., None] >> shifts) & np.uint64(0xFFFF)
+    return parts.reshape(*packed.shape[:-1], _SUBSTRINGS).astype(np.uint16)
+
+
+@cache
+def _flip_masks(radius: int) -> np.ndarray:
+    """Every 16-bit mask with at most ``radius`` bits set."""
+    masks = [0]
+    for n in range(1, radius + 1):
+        for bits in combinations(range(_SUBSTRING_BITS), n):
+            masks.append(sum(1 << b for b in bits))
+    return np.array(masks, dtype=np.uint16)
+
+
+class PdqIndex:
+    """Immutable PDQ index over ``paths`` (one packed hash per path)."""
+
+    def __init__(self, paths: Sequence[str], packed: np.ndarray) -> None:
+        if len(paths) != len(packed):
+            raise ValueError("paths and packed hashes differ in length")
+        self.paths = list(paths)
+        self.packed = np.ascontiguousarray(packed, dtype=np.uint64).reshape(-1, _WORDS)
+        self._order: np.ndarray | None = None
+        self._starts: np.ndarray | None = None
+
+    @classmethod
+    def from_hex(cls, paths: Sequence[str], hexes: Sequence[str]) -> PdqIndex:
+        return cls(paths, pack_pdq_hex(hexes))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _build_buckets(self) -> None:
+        """Per-substring row order + bucket offsets (built on first radius query)."""
+        subs = pdq_substrings(self.packed)
+        order = np.argsort(subs, axis=0, kind="stable").T.astype(np.int32)
+        keys = np.arange((1 << _SUBSTRING_BITS) + 1)
+        starts = np.empty((_SUBSTRINGS, len(keys)), dtype=np.int64)
+        for j in range(_SUBSTRINGS):
+            starts[j] = np.searchsorted(subs[order[j], j], keys)
+        self._order, self._starts = order, starts
+
+    @staticmethod
+    def _as_packed(query: str | np.ndarray) -> np.ndarray:
+        if isinstance(query, str):
+            return pack_pdq_hex([query])[0]
+        return np.asarray(query, dtype=np.uint64).reshape(_WORDS)
+
+    def distances(self, query: str | np.ndarray) -> np.ndarray:
+        """Exhaustive distances from ``query`` to every indexed hash."""
+        return hamming_distances(self.packed, self._as_packed(query))
+
+    def knn(self, query: str | np.ndarray, k: int) -> list[tuple[str, int]]:
+        """``k`` nearest ``(path, distance)`` pairs, closest first (ties by index order)."""
+        if k <= 0 or not len(self):
+            return []
+        dist = self.distances(query)
+        if k < len(dist):
+            idx = np.argpartition(dist, k - 1)[:k]
+        else:
+            idx = np.arange(len(dist))
+        idx = idx[np.lexsort((idx, dist[idx]))]
+        return [(self.paths[i], int(dist[i])) for i in idx]
+
+    def radius(
+        self, query: str | np.ndarray, radius: int = DEFAULT_MATCH_RADIUS
+    ) -> list[tuple[str, int]]:
+        """All ``(path, distance)`` pairs with distance <= ``radius``, closest first."""
+        if not len(self):
+            return []
+        q = self._as_packed(query)
+        probe_radius = radius // _SUBSTRINGS
+        if probe_radius > _MAX_PROBE_RADIUS:
+            cand = np.arange(len(self))
+            dist = hamming_distances(self.packed, q)
+        else:
+            if self._order is None:
+                self._build_buckets()
+            assert self._order is not None and self._starts is not None
+            masks = _flip_masks(probe_radius)
+            q_subs = pdq_substrings(q)
+            chunks = []
+            for j in range(_SUBSTRINGS):
+                probes = (q_subs[j] ^ masks).astype(np.intp)
+                lo, hi = self._starts[j, probes], self._starts[j, probes + 1]
+                for a, b in zip(lo.tolist(), hi.tolist()):
+                    if b > a:
+                        chunks.append(self._order[j, a:b])
+            if not chunks:
+                return []
+            cand = np.unique(np.concatenate(chunks))
+            dist = hamming_distances(self.packed[cand], q)
+        keep = dist <= radius
+        cand, dist = cand[keep], dist[keep]
+        order = np.lexsort((cand, dist))
+        return [(self.paths[cand[i]], int(dist[i])) for i in order]
@@ -3,25 +3,32 @@ Scorer plugin interface and implementations for image-similarity search.
 
 Each scorer produces a list of {"path": str, "score": float [0,1]} dicts ranked
 by score descending.  The CombinedScorer merges multiple scorers via a weighted
-average so that semantic and perceptual signals complement each other.
+average so that semantic and perceptual signals complement each other; the
+FusedClipPdqScorer computes the same CLIP + PDQ blend from a single streamed
+query and stops as soon as the top-K can no longer change.
 """
 
 from __future__ import annotations
 
 import logging
+import threading
+from collections.abc import Iterable, Sequence
 from typing import Protocol, runtime_checkable
 
 import numpy as np
 from rb.api.database import ImageSimilarityEmbedding, ImageSimilarityPrivateEmbedding
-from image_similarity import sql_filters
-from sqlalchemy import bindparam, text
+from image_similarity.pdq_index import (
+    PDQ_BITS,
+    PDQ_HEX_LEN,
+    PdqIndex,
+    hamming_distances,
+    pack_pdq_hex,
+)
+from sqlalchemy import bindparam, func, text
 from sqlmodel import Session, select
 
 logger = logging.getLogger(__name__)
 
-_PDQ_BITS = 256
-
-
 # ---------------------------------------------------------------------------
 # Protocol
 # ---------------------------------------------------------------------------
@@ -96,6 +103,99 @@ def hamming_distance(hex_a: str, hex_b: str) -> int:
     return bin(int(hex_a, 16) ^ int(hex_b, 16)).count("1")
 
 
+class _StoredPdqHashes:
+    """Packed PDQ hashes of one embeddings table, kept across searches.
+
+    Rows are never updated in place (``_persist_new_path`` relocates a moved
+    file by inserting a copy under the new path and deleting the old row), so
+    a search fetches just the rows added since the previous one. When
+    ``max(id)`` and ``count(*)`` no longer add up (rows deleted, database
+    reset) the hashes are loaded again. A path stored more than once keeps its
+    newest hash.
+    """
+
+    def __init__(self, table) -> None:
+        self._cols = table.columns
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._max_id = 0
+        self._count = 0
+        self.index = PdqIndex([], pack_pdq_hex([]))
+        self.rows: dict[str, int] = {}
+
+    def _rows_after(self, session: Session, max_id: int) -> Sequence:
+        cols = self._cols
+        return session.execute(
+            select(cols["id"], cols["path"], cols["pdq_hash"])
+            .where(cols["id"] > self._max_id, cols["id"] <= max_id)
+            .order_by(cols["id"])
+        ).all()
+
+    def refresh(self, session: Session) -> tuple[PdqIndex, dict[str, int]]:
+        """Current ``(index, {path: row})``, topped up from the table."""
+        cols = self._cols
+        max_id, count = session.execute(
+            select(func.max(cols["id"]), func.count(cols["id"]))
+        ).one()
+        max_id, count = max_id or 0, count or 0
+        with self._lock:
+            if (max_id, count) == (self._max_id, self._count):
+                return self.index, self.rows
+            new = self._rows_after(session, max_id)
+            if self._count + len(new) != count:
+                # Rows went missing below the last id seen: load the table again.
+                self._reset()
+                new = self._rows_after(session, max_id)
+            self._append(new)
+            self._max_id = max_id
+            self._count += len(new)
+            return self.index, self.rows
+
+    def _append(self, new: Sequence) -> None:
+        fresh: dict[str, str] = {}
+        for _, path, pdq in new:
+            if pdq and len(pdq) == PDQ_HEX_LEN:
+                fresh[path] = pdq
+        if not fresh:
+            return
+        # Build new objects so searches holding the old snapshot stay consistent.
+        rows = dict(self.rows)
+        added = [p for p in fresh if p not in rows]
+        for p in added:
+            rows[p] = len(rows)
+        packed = np.concatenate(
+            [self.index.packed, pack_pdq_hex([fresh[p] for p in added])]
+        )
+        replaced = [p for p in fresh if p in self.rows]
+        if replaced:
+            packed[[rows[p] for p in replaced]] = pack_pdq_hex(
+                [fresh[p] for p in replaced]
+            )
+        self.index = PdqIndex([*self.index.paths, *added], packed)
+        self.rows = rows
+
+
+# One per (database, table) for the life of the process.
+_STORED_PDQ: dict[tuple[str, bool], _StoredPdqHashes] = {}
+_STORED_PDQ_LOCK = threading.Lock()
+
+
+def _stored_pdq_hashes(session: Session, use_private_table: bool) -> _StoredPdqHashes:
+    bind = session.get_bind()
+    key = (bind.url.render_as_string(hide_password=True), use_private_table)
+    with _STORED_PDQ_LOCK:
+        if key not in _STORED_PDQ:
+            model = (
+                ImageSimilarityPrivateEmbedding
+                if use_private_table
+                else ImageSimilarityEmbedding
+            )
+            _STORED_PDQ[key] = _StoredPdqHashes(model.__table__)
+        return _STORED_PDQ[key]
+
+
 def pdq_similarity_search(
     session: Session,
     query_pdq: str,
@@ -103,41 +203,36 @@ def pdq_similarity_search(
     top_k: int,
     use_private_table: bool = False,
 ) -> list[dict]:
-    """Rank candidates by PDQ Hamming similarity to the query hash."""
-    if not candidate_paths or not query_pdq:
+    """Rank candidates by PDQ Hamming similarity to the query hash.
+
+    The table's hashes stay packed in memory between searches (see
+    :class:`_StoredPdqHashes`). Candidates within the PDQ match radius come
+    from :meth:`PdqIndex.radius`; only when fewer than ``top_k`` of them are
+    that close are the remaining candidates scored exhaustively.
+    """
+    if not candidate_paths or not query_pdq or top_k <= 0:
         return []
 
-    if use_private_table:
-        rows = session.exec(
-            select(
-                ImageSimilarityPrivateEmbedding.path,
-                ImageSimilarityPrivateEmbedding.pdq_hash,
-            ).where(
-                sql_filters.priv_path_in(candidate_paths),
-                ImageSimilarityPrivateEmbedding.pdq_hash != "",
-            )
-        ).all()
-    else:
-        rows = session.exec(
-            select(
-                ImageSimilarityEmbedding.path, ImageSimilarityEmbedding.pdq_hash
-            ).where(
-                sql_filters.path_in(candidate_paths),
-                sql_filters.pdq_hash_nonempty(),
-            )
-        ).all()
+    index, rows = _stored_pdq_hashes(session, use_private_table).refresh(session)
+    wanted = set(candidate_paths)
+    if top_k < len(wanted):
+        hits = [(p, d) for p, d in index.radius(query_pdq) if p in wanted][:top_k]
+        if len(hits) == top_k:
+            return _pdq_results(hits)
 
-    if not rows:
+    idx = np.sort(np.fromiter((rows[p] for p in wanted if p in rows), dtype=np.intp))
+    if not len(idx):
         logger.warning("pdq_similarity_search: no PDQ hashes found for candidates")
         return []
+    paths = [index.paths[i] for i in idx.tolist()]
+    hits = PdqIndex(paths, index.packed[idx]).knn(query_pdq, top_k)
+    return _pdq_results(hits)
 
-    scored = []
-    for path, pdq_hash in rows:
-        dist = hamming_distance(query_pdq, pdq_hash)
-        scored.append({"path": path, "score": round(1.0 - dist / _PDQ_BITS, 4)})
 
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:top_k]
+def _pdq_results(hits: list[tuple[str, int]]) -> list[dict]:
+    return [
+        {"path": path, "score": round(1.0 - dist / PDQ_BITS, 4)} for path, dist in hits
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -249,3 +344,156 @@ class CombinedScorer:
 
         combined.sort(key=lambda x: x["score"], reverse=True)
         return combined[:top_k]
+
+
+# ---------------------------------------------------------------------------
+# Fused CLIP + PDQ scorer
+# ---------------------------------------------------------------------------
+
+# Rows fetched per page of the cosine-ordered stream (at least this many, or
+# a few times top_k).
+_FUSED_MIN_PAGE = 256
+
+
+def fused_rank(
+    pages: Iterable[Sequence[tuple[str, float, str | None]]],
+    query_pdq: str,
+    top_k: int,
+    clip_weight: float,
+    pdq_weight: float,
+) -> list[dict]:
+    """Threshold-algorithm top-K over ``(path, clip_score, pdq_hash)`` pages.
+
+    Pages must arrive in descending ``clip_score`` order (sorted access on the
+    CLIP list); each row carries its PDQ hash, so the PDQ score is a free
+    random access computed vectorised per page. Scores match
+    :class:`CombinedScorer`: a row without a usable hash is scored on CLIP
+    alone. An unseen row scores at most ``w_clip * last_clip + w_pdq * 1``, so
+    the stream stops once the K-th best score reaches that bound.
+    """
+    total = clip_weight + pdq_weight
+    if total <= 0:
+        raise ValueError("Sum of scorer weights must be > 0")
+    wc, wp = clip_weight / total, pdq_weight / total
+    q = (
+        pack_pdq_hex([query_pdq])[0]
+        if query_pdq and len(query_pdq) == PDQ_HEX_LEN
+        else None
+    )
+
+    best: list[dict] = []
+    seen = 0
+    for page in pages:
+        if not page:
+            break
+        paths = [r[0] for r in page]
+        clip = np.round(np.array([float(r[1]) for r in page]), 4)
+        has_pdq = np.array(
+            [q is not None and bool(r[2]) and len(r[2]) == PDQ_HEX_LEN for r in page]
+        )
+        pdq = np.zeros(len(page))
+        if has_pdq.any():
+            packed = pack_pdq_hex([r[2] for r, ok in zip(page, has_pdq) if ok])
+            dist = hamming_distances(packed, q)
+            pdq[has_pdq] = np.round(1.0 - dist / PDQ_BITS, 4)
+        combined = np.round(np.where(has_pdq, wc * clip + wp * pdq, clip), 4)
+
+        for i in range(len(page)):
+            entry: dict = {
+                "path": paths[i],
+                "score": float(combined[i]),
+                "score_clip": float(clip[i]),
+            }
+            if has_pdq[i]:
+                entry["score_pdq"] = float(pdq[i])
+            best.append(entry)
+        seen += len(page)
+        # Stable: ties keep cosine order, as in CombinedScorer.
+        best.sort(key=lambda x: x["score"], reverse=True)
+        del best[top_k:]
+
+        bound = wc * float(clip[-1]) + wp if q is not None else float(clip[-1])
+        if len(best) >= top_k and best[-1]["score"] >= bound:
+            logger.debug("fused_rank: stopped after %d rows", seen)
+            break
+    return best
+
+
+class FusedClipPdqScorer:
+    """CLIP + PDQ blend (same scores as ``CombinedScorer`` over Clip/Pdq scorers).
+
+    One query streams candidates in pgvector cosine order together with their
+    PDQ hashes; Hamming similarity is computed in NumPy per page and the
+    stream is abandoned once :func:`fused_rank` proves the top-K is final.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        query_vec: np.ndarray,
+        query_pdq: str,
+        model_name: str = "google/siglip2-so400m-patch14-384",
+        use_private_table: bool = False,
+        clip_weight: float = 0.6,
+        pdq_weight: float = 0.4,
+    ) -> None:
+        self._session = session
+        self._query_vec = query_vec
+        self._query_pdq = query_pdq
+        self._model_name = model_name
+        self._use_private_table = use_private_table
+        self._clip_weight = clip_weight
+        self._pdq_weight = pdq_weight
+
+    def _pages(self, candidate_paths: list[str], page_size: int):
+        table = (
+            "image_similarity_private_embeddings"
+            if self._use_private_table
+            else "image_similarity_embeddings"
+        )
+        qvec_literal = "[" + ",".join(str(float(x)) for x in self._query_vec) + "]"
+        stmt = (
+            text(
+                f"""
+                SELECT path,
+                       1 - (embedding <=> CAST(:qvec AS vector)) AS score,
+                       pdq_hash
+                FROM {table}
+                WHERE path IN :paths
+                  AND model_name = :model_name
+                ORDER BY embedding <=> CAST(:qvec AS vector)
+                """
+            )
+            .bindparams(bindparam("paths", expanding=True))
+            .execution_options(stream_results=True)
+        )
+        result = self._session.execute(
+            stmt,
+            {
+                "qvec": qvec_literal,
+                "paths": candidate_paths,
+                "model_name": self._model_name,
+            },
+        )
+        try:
+            while True:
+                rows = result.fetchmany(page_size)
+                if not rows:
+                    return
+                yield [(r.path, r.score, r.pdq_hash) for r in rows]
+        finally:
+            result.close()
+
+    def score(
+        self, query_path: str, candidate_paths: list[str], top_k: int
+    ) -> list[dict]:
+        if not candidate_paths or top_k <= 0:
+            return []
+        page_size = max(_FUSED_MIN_PAGE, 4 * top_k)
+        return fused_rank(
+            self._pages(candidate_paths, page_size),
+            self._query_pdq,
+            top_k,
+            self._clip_weight,
+            self._pdq_weight,
+        )
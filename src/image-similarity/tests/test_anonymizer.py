@@ -0,0 +1,305 @@
+"""Tests for the batched CLIPSeg anonymizer (fake ONNX session, no model file)."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from image_similarity import anonymizer
+from PIL import Image, ImageFilter
+
+
+def _reference_mask(logits, size, threshold=0.3, dilate=5, blur=5):
+    """The original per-label PIL implementation."""
+    w, h = size
+    combined = np.zeros((h, w), dtype=np.uint8)
+    for label_logits in logits:
+        prob = (anonymizer._sigmoid(label_logits) * 255).astype(np.uint8)
+        resized = np.array(
+            Image.fromarray(prob).resize((w, h), Image.Resampling.BILINEAR)
+        )
+        combined = np.maximum(
+            combined, (resized > int(threshold * 255)).astype(np.uint8) * 255
+        )
+    mask = Image.fromarray(combined, mode="L")
+    for _ in range(dilate):
+        mask = mask.filter(ImageFilter.MaxFilter(3))
+    if blur > 0:
+        mask = mask.filter(ImageFilter.GaussianBlur(radius=blur))
+    return np.array(mask)
+
+
+def _blob_logits(n_labels=3, size=32, seed=0):
+    rng = np.random.default_rng(seed)
+    logits = np.full((n_labels, size, size), -6.0, dtype=np.float32)
+    for i in range(n_labels):
+        y, x = rng.integers(4, size - 8, 2)
+        logits[i, y : y + 5, x : x + 5] = 6.0
+    return logits
+
+
+def test_mask_matches_reference_before_feathering():
+    logits = _blob_logits()
+    got = anonymizer._mask_from_logits(logits, (96, 64), dilate=3, blur=0)
+    ref = _reference_mask(logits, (96, 64), dilate=3, blur=0)
+    assert got.shape == ref.shape == (64, 96)
+    # Bilinear rounding may move a boundary pixel; regions must coincide.
+    assert np.mean(got != ref) < 0.01
+
+
+def test_mask_matches_reference_with_feathering():
+    logits = _blob_logits(seed=1)
+    got = anonymizer._mask_from_logits(logits, (96, 64)).astype(int)
+    ref = _reference_mask(logits, (96, 64)).astype(int)
+    assert np.abs(got - ref).mean() < 4
+
+
+def test_apply_blackout_scales_by_mask():
+    image = Image.new("RGB", (4, 2), (200, 100, 50))
+    mask = np.array([[0, 255, 128, 0], [255, 255, 0, 0]], dtype=np.uint8)
+    out = np.asarray(anonymizer._apply_blackout(image, mask))
+    assert out[0, 0].tolist() == [200, 100, 50]
+    assert out[0, 1].tolist() == [0, 0, 0]
+    assert out[0, 2].tolist() == [100, 50, 25]
+
+
+class _FakeSession:
+    """Logit map per (image, prompt) pair: image brightness + prompt token sum."""
+
+    def __init__(self):
+        self.runs = []
+
+    def get_inputs(self):
+        return [
+            SimpleNamespace(name=n)
+            for n in ("input_ids", "attention_mask", "pixel_values")
+        ]
+
+    def run(self, _outputs, feed):
+        self.runs.append(len(feed["pixel_values"]))
+        ids = feed["input_ids"].sum(axis=1).astype(np.float32)
+        pixels = feed["pixel_values"].mean(axis=(1, 2, 3))
+        value = pixels + ids / 1e6
+        return [np.broadcast_to(value[:, None, None], (len(value), 8, 8)).copy()]
+
+
+class _FakeProcessor:
+    def __init__(self):
+        self.image_calls = 0
+        self.image_processor = self._images
+        self.tokenizer = self._tokens
+
+    def _images(self, images, return_tensors):
+        self.image_calls += 1
+        return {
+            "pixel_values": np.stack(
+                [np.full((3, 4, 4), np.asarray(im).mean() / 255) for im in images]
+            )
+        }
+
+    def _tokens(self, labels, padding, return_tensors):
+        ids = np.array([[len(lab), ord(lab[0])] for lab in labels])
+        return {"input_ids": ids, "attention_mask": np.ones_like(ids)}
+
+
+@pytest.fixture
+def fake_clipseg(monkeypatch):
+    session, processor = _FakeSession(), _FakeProcessor()
+    monkeypatch.setattr(anonymizer, "_load_clipseg", lambda: (session, processor))
+    monkeypatch.setattr(anonymizer, "_load_clipseg_processor", lambda: processor)
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_MAX_PAIRS", "6")
+    anonymizer._tokenize_labels.cache_clear()
+    yield session, processor
+    anonymizer._tokenize_labels.cache_clear()
+
+
+def test_clipseg_logits_pairs_each_image_with_every_label(fake_clipseg):
+    session, processor = fake_clipseg
+    images = [Image.new("RGB", (10, 10), (v, v, v)) for v in (0, 51, 102, 153, 204)]
+    labels = ("face", "text", "logo")
+    logits = anonymizer._clipseg_logits(images, labels)
+
+    assert logits.shape == (5, 3, 8, 8)
+    assert processor.image_calls == 1  # every image preprocessed once
+    assert session.runs == [6, 6, 3]  # 2 images x 3 prompts per run
+    for i, v in enumerate((0, 51, 102, 153, 204)):
+        for j, lab in enumerate(labels):
+            expected = v / 255 + (len(lab) + ord(lab[0])) / 1e6
+            assert logits[i, j, 0, 0] == pytest.approx(expected, abs=1e-6)
+
+
+def test_anonymize_images_keeps_order_and_sizes(fake_clipseg, monkeypatch):
+    images = [Image.new("RGB", (20 + i, 10), (255, 255, 255)) for i in range(4)]
+    bright = np.full((2, 8, 8), 6.0, dtype=np.float32)
+    dark = np.full((2, 8, 8), -6.0, dtype=np.float32)
+    monkeypatch.setattr(
+        anonymizer,
+        "_clipseg_logits",
+        lambda imgs, labels: np.stack([bright, dark, bright, dark]),
+    )
+    out = anonymizer.anonymize_images(images, ("face", "text"), max_workers=2)
+    assert [im.size for im in out] == [im.size for im in images]
+    assert np.asarray(out[0]).max() == 0  # fully masked
+    assert np.asarray(out[1]).min() == 255  # untouched
+
+
+# ---------------------------------------------------------------------------
+#  Precomputed prompt embeddings (split graph) vs. the full graph
+# ---------------------------------------------------------------------------
+
+
+def _toy_clipseg(path, with_shape_frontier):
+    """Tiny graph shaped like CLIPSeg: text + vision branches meet in a decoder."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    d, hw = 6, 8
+    inits = [
+        numpy_helper.from_array(rng.standard_normal((1, d)).astype(np.float32), "Wt"),
+        numpy_helper.from_array(rng.standard_normal((3, d)).astype(np.float32), "Wv"),
+        numpy_helper.from_array(
+            rng.standard_normal((d, hw * hw)).astype(np.float32), "Wo"
+        ),
+        numpy_helper.from_array(np.array([hw, hw], dtype=np.int64), "hw"),
+        numpy_helper.from_array(np.array([-1], dtype=np.int64), "neg1"),
+    ]
+    nodes = [
+        helper.make_node("Cast", ["input_ids"], ["ids_f"], to=TensorProto.FLOAT),
+        helper.make_node("Cast", ["attention_mask"], ["mask_f"], to=TensorProto.FLOAT),
+        helper.make_node("Mul", ["ids_f", "mask_f"], ["masked"]),
+        helper.make_node("ReduceMean", ["masked"], ["pooled"], axes=[1]),
+        helper.make_node("MatMul", ["pooled", "Wt"], ["cond"]),
+        helper.make_node("ReduceMean", ["pixel_values"], ["vis"], axes=[2, 3]),
+        helper.make_node("Reshape", ["vis", "vis_shape"], ["vis2"]),
+        helper.make_node("MatMul", ["vis2", "Wv"], ["vis_emb"]),
+        helper.make_node("Mul", ["cond", "vis_emb"], ["film"]),
+        helper.make_node("MatMul", ["film", "Wo"], ["flat"]),
+        helper.make_node("Concat", ["batch", "hw"], ["out_shape"], axis=0),
+        helper.make_node("Reshape", ["flat", "out_shape"], ["logits"]),
+    ]
+    if with_shape_frontier:
+        # Batch size taken from the text branch, as exported graphs often do.
+        nodes.insert(0, helper.make_node("Shape", ["input_ids"], ["ids_shape"], end=1))
+        nodes.insert(1, helper.make_node("Identity", ["ids_shape"], ["batch"]))
+    else:
+        nodes.insert(
+            0, helper.make_node("Shape", ["pixel_values"], ["pix_shape"], end=1)
+        )
+        nodes.insert(1, helper.make_node("Identity", ["pix_shape"], ["batch"]))
+    nodes.insert(
+        2, helper.make_node("Concat", ["batch", "neg1"], ["vis_shape"], axis=0)
+    )
+    graph = helper.make_graph(
+        nodes,
+        "toy_clipseg",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["b", "s"]),
+            helper.make_tensor_value_info(
+                "attention_mask", TensorProto.INT64, ["b", "s"]
+            ),
+            helper.make_tensor_value_info(
+                "pixel_values", TensorProto.FLOAT, ["b", 3, 4, 4]
+            ),
+        ],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["b", hw, hw])],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+@pytest.fixture
+def toy_models(tmp_path, monkeypatch):
+    processor = _FakeProcessor()
+    monkeypatch.setattr(anonymizer, "_CLIPSEG_ONNX_PATH", tmp_path / "full.onnx")
+    monkeypatch.setenv("RESCUEBOX_DERIVED_MODEL_DIR", str(tmp_path / "derived"))
+    monkeypatch.setattr(anonymizer, "_load_clipseg_processor", lambda: processor)
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_MAX_PAIRS", "6")
+
+    def _reset():
+        anonymizer._cached_session = None
+        anonymizer._cached_split = None
+        anonymizer._tokenize_labels.cache_clear()
+        anonymizer._prompt_features.cache_clear()
+
+    _reset()
+    yield tmp_path, _reset
+    _reset()
+
+
+@pytest.mark.parametrize("with_shape_frontier", [False, True])
+def test_split_graph_matches_full_graph(toy_models, monkeypatch, with_shape_frontier):
+    from image_similarity.clipseg_split import text_frontier
+
+    tmp_path, reset = toy_models
+    _toy_clipseg(tmp_path / "full.onnx", with_shape_frontier)
+    images = [
+        Image.new("RGB", (10, 10), (v, 2 * v % 256, 7)) for v in range(0, 250, 50)
+    ]
+    labels = ("face", "text", "logo")
+
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_SPLIT", "0")
+    full = anonymizer._clipseg_logits(images, labels)
+
+    reset()
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_SPLIT", "1")
+    split = anonymizer._clipseg_logits(images, labels)
+    assert anonymizer._cached_split not in (None, False)
+    assert anonymizer._cached_session is None  # full graph never loaded
+    assert len(list((tmp_path / "derived" / "image_similarity").glob("*.onnx"))) == 2
+
+    np.testing.assert_allclose(split, full, rtol=1e-5, atol=1e-5)
+    import onnx
+
+    frontier = text_frontier(onnx.load(str(tmp_path / "full.onnx")))
+    # The prompt embedding always crosses; shape tensors only when the
+    # decoder takes its batch size from the text branch.
+    assert "cond" in frontier
+    assert (frontier != ["cond"]) == with_shape_frontier
+
+
+def test_prompt_features_encoded_once_per_label_set(toy_models, monkeypatch):
+    tmp_path, _ = toy_models
+    _toy_clipseg(tmp_path / "full.onnx", False)
+    calls = []
+    real = anonymizer._tokenize_labels.__wrapped__
+    monkeypatch.setattr(
+        anonymizer,
+        "_tokenize_labels",
+        anonymizer.lru_cache(maxsize=8)(
+            lambda labels: calls.append(labels) or real(labels)
+        ),
+    )
+    image = [Image.new("RGB", (10, 10), (90, 90, 90))]
+    for _ in range(3):
+        anonymizer._clipseg_logits(image, ("face", "logo"))
+    assert calls == [("face", "logo")]
+
+
+@pytest.mark.skipif(
+    not anonymizer._CLIPSEG_ONNX_PATH.exists(), reason="CLIPSeg ONNX not downloaded"
+)
+def test_split_masks_match_full_model(monkeypatch):
+    """Masks from the precomputed-prompt path equal the full-graph masks."""
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+        for _ in range(3)
+    ]
+    labels = tuple(anonymizer.DEFAULT_TARGET_LABELS)
+
+    def _masks():
+        logits = anonymizer._clipseg_logits(images, labels)
+        return [
+            anonymizer._mask_from_logits(lg, im.size) for lg, im in zip(logits, images)
+        ]
+
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_SPLIT", "0")
+    monkeypatch.setattr(anonymizer, "_cached_split", None)
+    full = _masks()
+    monkeypatch.setenv("RESCUEBOX_CLIPSEG_SPLIT", "1")
+    anonymizer._prompt_features.cache_clear()
+    split = _masks()
+    for a, b in zip(full, split):
+        assert np.abs(a.astype(int) - b.astype(int)).max() <= 1
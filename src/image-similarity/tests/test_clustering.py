@@ -0,0 +1,157 @@
+"""Tests for LSH-banded series clustering (synthetic vectors, no DB)."""
+
+import numpy as np
+import pytest
+from image_similarity.clustering import (
+    cluster_images,
+    connected_components,
+    pdq_edges,
+    semantic_edges,
+    simhash_shape,
+)
+from image_similarity.main import (
+    cluster_inputs_cli_parse,
+    cluster_parameters_cli_parse,
+    cluster_task_schema,
+)
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _planted_embeddings(rng, clusters, per, noise_rows, dim=256, noise=0.2):
+    centers = rng.standard_normal((clusters, dim))
+    members = np.repeat(centers, per, axis=0)
+    members += noise * rng.standard_normal(members.shape)
+    return _unit(np.vstack([members, rng.standard_normal((noise_rows, dim))]))
+
+
+def _planted_pdq(rng, clusters, per, noise_rows, flips=20):
+    n = clusters * per + noise_rows
+    packed = rng.integers(0, np.iinfo(np.uint64).max, (n, 4), np.uint64)
+    for c in range(clusters):
+        base = c * per
+        for j in range(1, per):
+            row = packed[base].copy()
+            for bit in rng.choice(256, flips, replace=False):
+                row[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+            packed[base + j] = row
+    return packed
+
+
+def test_connected_components_merges_chains():
+    labels = connected_components(6, np.array([0, 1, 4]), np.array([1, 2, 5]))
+    assert labels.tolist() == [0, 0, 0, 3, 4, 4]
+
+
+def test_semantic_edges_match_brute_force():
+    rng = np.random.default_rng(0)
+    emb = _planted_embeddings(rng, 30, 4, 200)
+    u, v = semantic_edges(emb, 0.9)
+    sims = emb @ emb.T
+    # Every returned edge is a verified pair ...
+    assert np.all(sims[u, v] >= 0.9)
+    # ... and the components equal brute-force single linkage.
+    bu, bv = np.nonzero(np.triu(sims >= 0.9, k=1))
+    expected = connected_components(len(emb), bu, bv)
+    assert np.array_equal(connected_components(len(emb), u, v), expected)
+
+
+def test_pdq_edges_respect_distance_and_missing_hashes():
+    rng = np.random.default_rng(1)
+    packed = _planted_pdq(rng, 20, 3, 100)
+    valid = np.ones(len(packed), dtype=bool)
+    valid[1] = False
+    u, v = pdq_edges(packed, valid, 31)
+    labels = connected_components(len(packed), u, v)
+    assert labels[1] == 1  # row without a hash stays alone
+    for c in range(1, 20):
+        assert len(set(labels[c * 3 : c * 3 + 3].tolist())) == 1
+    assert len(set(labels[60:].tolist())) == 100
+
+
+@pytest.mark.parametrize("max_distance", [15, 31, 47])
+def test_pdq_edges_find_every_pair_within_distance(max_distance):
+    rng = np.random.default_rng(7)
+    base = rng.integers(0, np.iinfo(np.uint64).max, (60, 4), np.uint64)
+    near = base.copy()
+    for row in near:
+        for bit in rng.choice(256, max_distance, replace=False):
+            row[bit // 64] ^= np.uint64(1) << np.uint64(bit % 64)
+    packed = np.concatenate([base, near])
+    u, v = pdq_edges(packed, np.ones(len(packed), dtype=bool), max_distance)
+    found = {(min(a, b), max(a, b)) for a, b in zip(u.tolist(), v.tolist())}
+    assert all((i, i + 60) in found for i in range(60))
+    assert all(
+        bin(int.from_bytes((packed[a] ^ packed[b]).tobytes(), "big")).count("1")
+        <= max_distance
+        for a, b in found
+    )
+
+
+def test_pdq_edges_reject_unprobed_distance():
+    with pytest.raises(ValueError, match="between 0 and 47"):
+        pdq_edges(np.zeros((2, 4), dtype=np.uint64), np.ones(2, dtype=bool), 48)
+
+
+def test_oversized_bucket_is_linked_through_leaders(monkeypatch):
+    import image_similarity.clustering as clustering
+
+    monkeypatch.setattr(clustering, "_MAX_BUCKET", 8)
+    packed = np.zeros((40, 4), dtype=np.uint64)  # 40 identical blank frames
+    u, v = pdq_edges(packed, np.ones(40, dtype=bool), 0)
+    assert set(connected_components(40, u, v).tolist()) == {0}
+
+
+def test_cluster_images_orders_and_picks_representatives():
+    rng = np.random.default_rng(2)
+    emb = _planted_embeddings(rng, 10, 5, 50)
+    pdq = _planted_pdq(rng, 10, 5, 50)
+    emb[45:50] = _unit(emb[45:50] + 10 * emb[40])  # cluster 9 grows to 10 images
+    stages = []
+    result = cluster_images(
+        emb, pdq, progress=lambda stage, done, total: stages.append(stage)
+    )
+    assert result.sizes[0] == 10
+    assert result.cluster_count == len(result.sizes)
+    assert set(stages) == {"semantic", "pdq"}
+    for label, rep in enumerate(result.representatives):
+        assert result.labels[rep] == label
+    assert result.sizes.sum() == len(emb)
+
+
+def test_cluster_images_requires_a_signal():
+    with pytest.raises(ValueError):
+        cluster_images(None, None)
+
+
+def test_simhash_shape_grows_with_corpus():
+    small_bands, small_rows = simhash_shape(1_000, 0.9)
+    big_bands, big_rows = simhash_shape(500_000, 0.9)
+    assert big_rows > small_rows
+    assert 4 <= small_bands <= 64 and 4 <= big_bands <= 64
+
+
+def test_cluster_task_schema_inputs_and_parameters():
+    schema = cluster_task_schema()
+    assert [i.key for i in schema.inputs] == ["input_dir", "output_dir"]
+    assert {p.key for p in schema.parameters} == {
+        "user_email",
+        "model_name",
+        "cosine_threshold",
+        "pdq_max_distance",
+        "cluster_mode",
+    }
+
+
+def test_cluster_cli_parsers(tmp_path):
+    (tmp_path / "out").mkdir()
+    inputs = cluster_inputs_cli_parse(f"{tmp_path}|||{tmp_path / 'out'}")
+    assert str(inputs["output_dir"].path).endswith("out")
+    params = cluster_parameters_cli_parse("me@example.org,,0.95,20,pdq")
+    assert params["cosine_threshold"] == 0.95
+    assert params["pdq_max_distance"] == 20
+    assert params["cluster_mode"] == "pdq"
+    with pytest.raises(ValueError):
+        cluster_parameters_cli_parse("me@example.org,,,,bogus")
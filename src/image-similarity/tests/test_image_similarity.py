@@ -2,11 +2,17 @@
 
 import inspect
 
+import numpy as np
 import pytest
+from image_similarity import main as image_similarity_main
+from image_similarity import scorers
 from image_similarity.main import (
     Inputs,
     Parameters,
     _compute_pdq_hash,
+    _embed_pil_images,
+    _load_onnx_vision_model,
+    _vision_model_enum,
     inputs_cli_parse,
     parameters_cli_parse,
     search_series,
@@ -14,10 +20,14 @@ from image_similarity.main import (
 )
 from image_similarity.scorers import (
     CombinedScorer,
+    fused_rank,
     hamming_distance,
+    pdq_similarity_search,
 )
 from PIL import Image
+from rb.api.database import ImageSimilarityEmbedding
 from rb.api.models import DirectoryInput, FileInput
+from sqlmodel import Session, SQLModel, create_engine, select
 
 # ---------------------------------------------------------------------------
 #  Task schema
@@ -39,6 +49,96 @@ def test_task_schema_parameters():
     assert keys == ["model_name", "top_k", "min_similarity", "scoring_mode"]
 
 
+def test_vision_model_enum_offers_distinct_quantized_variant():
+    keys = [v.key for v in _vision_model_enum().enum_vals]
+    assert keys[0] == "google/siglip2-so400m-patch14-384"
+    assert "google/siglip2-so400m-patch14-384:int8" in keys
+    assert len(set(keys)) == len(keys)
+
+
+def test_load_vision_model_rejects_unknown_and_unsupported(monkeypatch, tmp_path):
+    with pytest.raises(ValueError, match="Unknown model_name"):
+        _load_onnx_vision_model("not-a-model")
+    monkeypatch.setattr(
+        image_similarity_main, "_get_ort_providers", lambda: ["CPUExecutionProvider"]
+    )
+    with pytest.raises(ValueError, match="CUDA"):
+        _load_onnx_vision_model("google/siglip2-so400m-patch14-384:fp16")
+    paths = dict(image_similarity_main._VISION_ONNX_PATHS)
+    paths["google/siglip2-so400m-patch14-384:int8"] = tmp_path / "int8.onnx"
+    monkeypatch.setattr(image_similarity_main, "_VISION_ONNX_PATHS", paths)
+    monkeypatch.setattr(
+        image_similarity_main, "_DEFAULT_ONNX_PATH", tmp_path / "missing.onnx"
+    )
+    with pytest.raises(FileNotFoundError):
+        _load_onnx_vision_model("google/siglip2-so400m-patch14-384:int8")
+
+
+def test_int8_model_is_quantized_into_the_derived_model_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("RESCUEBOX_DERIVED_MODEL_DIR", str(tmp_path / "derived"))
+    monkeypatch.setattr(
+        image_similarity_main, "_get_ort_providers", lambda: ["CPUExecutionProvider"]
+    )
+    fp32 = tmp_path / "package" / "vision.onnx"
+    fp32.parent.mkdir()
+    fp32.write_bytes(b"fp32")
+    paths = dict(image_similarity_main._VISION_ONNX_PATHS)
+    paths["google/siglip2-so400m-patch14-384:int8"] = fp32.parent / "int8.onnx"
+    monkeypatch.setattr(image_similarity_main, "_VISION_ONNX_PATHS", paths)
+    monkeypatch.setattr(image_similarity_main, "_DEFAULT_ONNX_PATH", fp32)
+    quantized = []
+
+    def _quantize(src, dst):
+        quantized.append(dst)
+        dst.write_bytes(b"int8")
+
+    monkeypatch.setattr(image_similarity_main, "_quantize_int8", _quantize)
+    monkeypatch.setattr(
+        image_similarity_main.ort, "InferenceSession", lambda path, providers: path
+    )
+    monkeypatch.setattr(
+        image_similarity_main.AutoImageProcessor,
+        "from_pretrained",
+        lambda _dir: "processor",
+    )
+    for _ in range(2):
+        session, _ = _load_onnx_vision_model("google/siglip2-so400m-patch14-384:int8")
+    assert len(quantized) == 1
+    assert quantized[0].parent == tmp_path / "derived" / "image_similarity"
+    assert session == str(quantized[0])
+    assert list(fp32.parent.iterdir()) == [fp32]
+
+
+class _Fp16Session:
+    def __init__(self):
+        self.dtypes = []
+
+    def get_inputs(self):
+        class _Input:
+            shape = ["batch", 3, 4, 4]
+            type = "tensor(float16)"
+
+        return [_Input()]
+
+    def run(self, _names, feed):
+        pixels = feed["pixel_values"]
+        self.dtypes.append(pixels.dtype)
+        return [np.ones((len(pixels), 3), dtype=np.float16)]
+
+
+def test_embed_pil_images_feeds_fp16_models_half_precision():
+    session = _Fp16Session()
+
+    def processor(images, return_tensors):
+        return {"pixel_values": np.zeros((len(images), 3, 4, 4), dtype=np.float32)}
+
+    images = [Image.new("RGB", (4, 4)) for _ in range(3)]
+    out = _embed_pil_images(session, processor, images, batch_size=2)
+    assert session.dtypes == [np.float16, np.float16]
+    assert out.dtype == np.float32 and out.shape == (3, 3)
+    np.testing.assert_allclose(np.linalg.norm(out, axis=1), 1.0, rtol=1e-6)
+
+
 # ---------------------------------------------------------------------------
 #  Function signature
 # ---------------------------------------------------------------------------
@@ -285,5 +385,108 @@ def test_combined_scorer_zero_weights_raises():
         CombinedScorer([("clip", clip, 0.0)])
 
 
+# ---------------------------------------------------------------------------
+#  Fused CLIP + PDQ ranking (threshold algorithm, no DB)
+# ---------------------------------------------------------------------------
+
+
+def _fused_rows(n, seed=0):
+    import random
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        pdq = "" if i % 7 == 0 else f"{rng.getrandbits(256):064x}"
+        rows.append((f"/img/{i}.jpg", rng.random(), pdq))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows
+
+
+def _paged(rows, size, consumed):
+    for start in range(0, len(rows), size):
+        consumed.append(start)
+        yield rows[start : start + size]
+
+
+def test_fused_rank_matches_combined_scorer():
+    rows = _fused_rows(300)
+    query = f"{7:064x}"
+    clip = _FakeScorer([{"path": p, "score": round(s, 4)} for p, s, _ in rows])
+    pdq = _FakeScorer(
+        [
+            {"path": p, "score": round(1 - hamming_distance(query, h) / 256, 4)}
+            for p, _, h in rows
+            if h
+        ]
+    )
+    expected = CombinedScorer([("clip", clip, 0.6), ("pdq", pdq, 0.4)]).score(
+        "q.jpg", [r[0] for r in rows], top_k=10
+    )
+    got = fused_rank(_paged(rows, 16, []), query, 10, 0.6, 0.4)
+    assert [(h["path"], h["score"]) for h in got] == [
+        (h["path"], h["score"]) for h in expected
+    ]
+
+
+def test_fused_rank_stops_once_top_k_is_final():
+    query = "0" * 64
+    # Ten exact PDQ matches with high cosine, then a long tail of weak images.
+    strong = [(f"/dup/{i}.jpg", 0.95 - i * 0.001, query) for i in range(10)]
+    weak = [(f"/tail/{i}.jpg", 0.5 - i * 1e-5, "f" * 64) for i in range(5000)]
+    consumed = []
+    got = fused_rank(_paged(strong + weak, 64, consumed), query, 5, 0.6, 0.4)
+    assert [h["path"] for h in got] == [f"/dup/{i}.jpg" for i in range(5)]
+    assert len(consumed) == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+# ---------------------------------------------------------------------------
+#  Relocated files
+# ---------------------------------------------------------------------------
+
+
+def test_relocated_file_is_found_by_pdq_search(monkeypatch):
+    monkeypatch.setattr(scorers, "_STORED_PDQ", {})
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[ImageSimilarityEmbedding.__table__])
+    query = "0" * 64
+    with Session(engine) as session:
+        session.add(
+            ImageSimilarityEmbedding(
+                path="/old/a.jpg",
+                embedding=[0.5] * 1152,
+                content_sha256="a" * 64,
+                pdq_hash=query,
+            )
+        )
+        session.commit()
+        assert pdq_similarity_search(session, query, ["/old/a.jpg"], 1) == [
+            {"path": "/old/a.jpg", "score": 1.0}
+        ]
+
+        row = session.exec(select(ImageSimilarityEmbedding)).one()
+        counters = {"new": 0, "relocated": 0, "cloned": 0}
+        image_similarity_main._persist_new_path(
+            "/new/a.jpg",
+            "a" * 64,
+            row,
+            {},
+            {},
+            {"/new/a.jpg"},
+            session,
+            None,
+            [],
+            set(),
+            counters,
+        )
+        session.commit()
+        assert counters["relocated"] == 1
+        assert [r.path for r in session.exec(select(ImageSimilarityEmbedding))] == [
+            "/new/a.jpg"
+        ]
+        assert pdq_similarity_search(session, query, ["/new/a.jpg"], 1) == [
+            {"path": "/new/a.jpg", "score": 1.0}
+        ]
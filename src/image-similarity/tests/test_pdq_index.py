@@ -0,0 +1,150 @@
+"""Tests for the packed PDQ index and the stored-hash search (SQLite)."""
+
+import numpy as np
+import pytest
+from image_similarity import scorers
+from image_similarity.pdq_index import (
+    PdqIndex,
+    hamming_distances,
+    pack_pdq_hex,
+    unpack_pdq_hex,
+)
+from image_similarity.scorers import hamming_distance, pdq_similarity_search
+from rb.api.database import ImageSimilarityEmbedding
+from sqlalchemy import delete
+from sqlmodel import Session, SQLModel, create_engine
+
+
+def _random_hexes(rng, n):
+    return [bytes(rng.integers(0, 256, 32, dtype=np.uint8)).hex() for _ in range(n)]
+
+
+def _flip_bits(hex_hash, rng, n):
+    value = int(hex_hash, 16)
+    for bit in rng.choice(256, n, replace=False):
+        value ^= 1 << int(bit)
+    return f"{value:064x}"
+
+
+def test_pack_roundtrip_and_distances_match_reference():
+    rng = np.random.default_rng(1)
+    hexes = _random_hexes(rng, 50)
+    packed = pack_pdq_hex(hexes)
+    assert packed.shape == (50, 4)
+    assert unpack_pdq_hex(packed) == hexes
+    dist = hamming_distances(packed, packed[0])
+    assert dist.tolist() == [hamming_distance(hexes[0], h) for h in hexes]
+
+
+def test_pack_rejects_bad_length():
+    with pytest.raises(ValueError):
+        pack_pdq_hex(["abc"])
+
+
+def test_radius_matches_exhaustive_scan():
+    rng = np.random.default_rng(2)
+    base = _random_hexes(rng, 200)
+    query = base[0]
+    near = [_flip_bits(query, rng, n) for n in (0, 5, 16, 31, 32, 40)]
+    hexes = base + near
+    paths = [f"/img/{i}.jpg" for i in range(len(hexes))]
+    index = PdqIndex.from_hex(paths, hexes)
+
+    got = index.radius(query, 31)
+    expected = sorted(
+        (hamming_distance(query, h), p)
+        for p, h in zip(paths, hexes)
+        if hamming_distance(query, h) <= 31
+    )
+    assert got == [(p, d) for d, p in expected]
+    assert [d for _, d in got] == [0, 0, 5, 16, 31]
+    # Radii past the multi-index probe limit fall back to the exhaustive scan.
+    assert len(index.radius(query, 60)) == len(
+        [h for h in hexes if hamming_distance(query, h) <= 60]
+    )
+
+
+def test_knn_orders_by_distance():
+    rng = np.random.default_rng(3)
+    query = _random_hexes(rng, 1)[0]
+    hexes = [_flip_bits(query, rng, n) for n in (9, 3, 20, 1)]
+    index = PdqIndex.from_hex(["a", "b", "c", "d"], hexes)
+    assert index.knn(query, 2) == [("d", 1), ("b", 3)]
+    assert [p for p, _ in index.knn(query, 10)] == ["d", "b", "a", "c"]
+
+
+@pytest.fixture
+def session():
+    scorers._STORED_PDQ.clear()
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[ImageSimilarityEmbedding.__table__])
+    with Session(engine) as s:
+        yield s
+    scorers._STORED_PDQ.clear()
+
+
+def _add(session, rows):
+    for path, pdq in rows:
+        session.add(ImageSimilarityEmbedding(path=path, pdq_hash=pdq))
+    session.commit()
+
+
+def _delete(session, row_id):
+    table = ImageSimilarityEmbedding.__table__
+    session.execute(delete(table).where(table.c.id == row_id))
+    session.commit()
+
+
+def test_pdq_similarity_search_scores_and_truncates(session):
+    query = "0" * 64
+    _add(
+        session,
+        [("/far.jpg", "f" * 64), ("/same.jpg", query), ("/near.jpg", "0" * 63 + "3")],
+    )
+    paths = ["/far.jpg", "/same.jpg", "/near.jpg"]
+    hits = pdq_similarity_search(session, query, paths, top_k=2)
+    assert hits == [
+        {"path": "/same.jpg", "score": 1.0},
+        {"path": "/near.jpg", "score": round(1 - 2 / 256, 4)},
+    ]
+    assert pdq_similarity_search(session, query, ["/far.jpg"], top_k=2) == [
+        {"path": "/far.jpg", "score": 0.0}
+    ]
+
+
+def test_stored_hashes_follow_the_table(session):
+    rng = np.random.default_rng(4)
+    query = _random_hexes(rng, 1)[0]
+    hexes = _random_hexes(rng, 300) + [_flip_bits(query, rng, n) for n in (2, 7, 40)]
+    paths = [f"/img/{i}.jpg" for i in range(len(hexes))]
+    _add(session, [(p, h) for p, h in zip(paths, hexes)] + [("/none.jpg", "")])
+
+    def expected(k):
+        ranked = sorted((hamming_distance(query, h), i) for i, h in enumerate(hexes))
+        return [paths[i] for _, i in ranked[:k]]
+
+    # Two hits within the match radius, the third ranked exhaustively.
+    assert [h["path"] for h in pdq_similarity_search(session, query, paths, 2)] == (
+        expected(2)
+    )
+    assert [h["path"] for h in pdq_similarity_search(session, query, paths, 3)] == (
+        expected(3)
+    )
+    stored = scorers._STORED_PDQ[("sqlite://", False)]
+    index = stored.index
+    assert len(index) == len(paths)
+
+    # New rows are appended; a re-stored path keeps its newest hash.
+    _add(session, [("/img/new.jpg", query), (paths[0], query)])
+    hits = pdq_similarity_search(session, query, [*paths, "/img/new.jpg"], 2)
+    assert {h["path"] for h in hits} == {"/img/new.jpg", paths[0]}
+    assert len(stored.index) == len(paths) + 1
+    assert stored.index is not index
+
+    # Deleted rows are dropped by a reload.
+    _delete(session, 1)
+    hits = pdq_similarity_search(session, query, [*paths, "/img/new.jpg"], 2)
+    assert [h["path"] for h in hits] == ["/img/new.jpg", paths[0]]
+    _delete(session, len(paths) + 3)
+    hits = pdq_similarity_search(session, query, [*paths, "/img/new.jpg"], 2)
+    assert [h["path"] for h in hits] == ["/img/new.jpg", expected(1)[0]]
@@ -30,6 +30,7 @@ from image_summary.model import SUPPORTED_MODELS
 from image_summary.process import (
     SUPPORTED_IMAGE_EXTENSIONS,
     ImageSummaryFilePair,
+    new_summary_cache,
     process_images,
 )
 
@@ -136,7 +137,8 @@ def summarize_images(
         output_dir,
         has_ff,
     )
-    file_pairs = process_images(model, input_dir, output_dir, file_filter)
+    cache = new_summary_cache(model)
+    file_pairs = process_images(model, input_dir, output_dir, file_filter, cache=cache)
 
     # If output patterns were not obtained from a persisted filter, collect them from uploaded files
     if not output_patterns:
@@ -183,6 +185,7 @@ def summarize_images(
         "input_dir": str(Path(input_dir).resolve()),
         "files": list(result_files),
         "file_pairs": file_pairs,
+        "summary_cache": cache.stats(),
     }
     response = TextResponse(value=json.dumps(payload))
     logger.info("ImageSummary API: response ready | files=%d", len(result_files))
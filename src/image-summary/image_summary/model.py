@@ -9,6 +9,7 @@ from typing import Final
 
 import ollama
 import rb.lib.ollama  # noqa: F401
+from rb.lib.llm_scheduler import get_scheduler
 
 SUPPORTED_MODELS: Final[dict[str, dict[str, str]]] = {
     "moondream:latest": {
@@ -39,6 +40,12 @@ IMAGE_PROMPT: Final[str] = (
 
 IMAGE_PROMPT_MOONDREAM: Final[str] = "Briefly describe the image."
 
+BATCH_PROMPT_SUFFIX: Final[str] = (
+    " You are given {count} images, in this order: {names}. Describe each image "
+    "separately and only from its own content. Output only a JSON array with one "
+    'object per image: {{"file": "<file name>", "description": "<description>"}}.'
+)
+
 
 def extract_response_after_think(text: str) -> str:
     """
@@ -71,27 +78,46 @@ def ensure_model_exists(model: str) -> None:
         raise ValueError(e)
 
 
-def describe_image(model: str, image_path: str) -> str:
+def _image_prompt(model: str) -> str:
+    return IMAGE_PROMPT_MOONDREAM if model == "moondream:latest" else IMAGE_PROMPT
+
+
+def describe_image(model: str, image_path: str, tag: str | None = None) -> str:
     """
     Describe a single image using a vision-capable Ollama model.
 
     Mirrors the text-summary flow: build a prompt, call ollama.generate,
     and post-process the response (strip any </redacted_thinking> blocks).
+    An incomplete response raises ``ValueError``, so it is never written or
+    cached as a description.
+
+    Requests go through the shared scheduler (``rb.lib.llm_scheduler``), which
+    bounds how many run against Ollama at once and retries transient failures.
+    """
+    response = get_scheduler().generate(
+        model, _image_prompt(model), images=[image_path], tag=tag
+    )
+    if not response or not response.get("done"):
+        raise ValueError(f"Model '{model}' returned an incomplete response")
+    return extract_response_after_think(response.get("response", "").strip())
 
-    Callers should serialize concurrent jobs (see :mod:`image_summary.process`).
+
+def describe_images_batch(
+    model: str, image_paths: list[str], tag: str | None = None
+) -> dict[str, str]:
+    """
+    Describe several images in one request; ``{path: description}``.
+
+    Images the model left out of its JSON answer are missing from the result.
     """
-    if model == "moondream:latest":
-        prompt = IMAGE_PROMPT_MOONDREAM
-    else:
-        prompt = IMAGE_PROMPT
-    response = ollama.generate(
-        model=model,
-        prompt=prompt,
-        images=[image_path],
+    names = ", ".join(Path(p).name for p in image_paths)
+    prompt = _image_prompt(model) + BATCH_PROMPT_SUFFIX.format(
+        count=len(image_paths), names=names
     )
-    if response and response.get("done"):
-        return extract_response_after_think(response.get("response", "").strip())
-    return str(response)
+    response = get_scheduler().generate(model, prompt, images=image_paths, tag=tag)
+    if not (response and response.get("done")):
+        raise ValueError(f"Incomplete batch response: {response}")
+    return parse_batch_descriptions(response.get("response", ""), image_paths)
 
 
 def parse_batch_descriptions(raw: str, paths: list[str]) -> dict[str, str]:
@@ -130,10 +156,15 @@ def resolve_batch_chunk_size(value: int | None) -> int:
 
 
 def resolve_batch_parallel_workers(value: int | None) -> int:
-    """Concurrent batch workers (capped at 32). Default 1 when unset."""
+    """
+    Concurrent batch workers (capped at 32).
+
+    Defaults to the shared Ollama scheduler's concurrency window, so every
+    slot is kept busy without queueing more work than it can run.
+    """
     if value is not None:
         return min(int(value), 32)
     env = os.getenv("IMAGE_SUMMARY_BATCH_PARALLEL_WORKERS")
     if env is not None and env.strip() != "":
         return int(env)
-    return 1
+    return get_scheduler().max_concurrency
@@ -1,21 +1,39 @@
 import logging
-import threading
+import uuid
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from rb.lib.job_progress import report_file_progress
+from rb.lib.llm_scheduler import get_scheduler
 from rb.lib.plugin_io import ImageSummaryFilePair
-
-from image_summary.model import describe_image, ensure_model_exists
+from rb.lib.summary_cache import SummaryCache, prompt_version
+
+from image_summary.model import (
+    BATCH_PROMPT_SUFFIX,
+    IMAGE_PROMPT,
+    IMAGE_PROMPT_MOONDREAM,
+    describe_image,
+    describe_images_batch,
+    ensure_model_exists,
+    resolve_batch_chunk_size,
+    resolve_batch_parallel_workers,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SUPPORTED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tiff"}
+CACHE_KIND = "image_summary"
 
-# Serialize all image-summary work in this process so only one job talks to Ollama at a time.
-# (Does not coordinate across multiple API worker processes—use a single worker or external lock.)
-_image_summary_lock = threading.Lock()
+
+def new_summary_cache(model: str) -> SummaryCache:
+    """Cache of image descriptions; entries from older prompts are dropped."""
+    return SummaryCache(
+        CACHE_KIND,
+        model,
+        prompt_version(IMAGE_PROMPT, IMAGE_PROMPT_MOONDREAM, BATCH_PROMPT_SUFFIX),
+    )
 
 
 def iter_image_files(directory: Path, file_filter: list[Path]) -> Iterable[Path]:
@@ -46,22 +64,71 @@ def iter_image_files(directory: Path, file_filter: list[Path]) -> Iterable[Path]
             yield path
 
 
+def _write_summary(
+    image_path: Path, summary_text: str, output_path: Path
+) -> ImageSummaryFilePair:
+    out_file = output_path / (image_path.name + ".txt")
+    out_file.write_text(summary_text, encoding="utf-8")
+    return {
+        "input_path": str(image_path.resolve()),
+        "output_path": str(out_file.resolve()),
+    }
+
+
+def _describe_batch(
+    model: str,
+    batch: list[Path],
+    output_path: Path,
+    tag: str,
+    cache: SummaryCache,
+) -> dict[Path, ImageSummaryFilePair]:
+    """Describe ``batch`` (one request when it has several images) and write the .txt files."""
+    descriptions: dict[str, str] = {}
+    if len(batch) > 1:
+        try:
+            descriptions = describe_images_batch(model, [str(p) for p in batch], tag)
+        except Exception as e:
+            logger.warning(
+                "ImageSummary: batch of %d failed (%s); describing one by one",
+                len(batch),
+                e,
+            )
+    pairs: dict[Path, ImageSummaryFilePair] = {}
+    for image_path in batch:
+        logger.info("ImageSummary: processing -> %s", image_path.name)
+        try:
+            summary_text = descriptions.get(str(image_path))
+            if summary_text is None:
+                summary_text = describe_image(model, str(image_path), tag)
+            cache.store(str(image_path), summary_text)
+            pairs[image_path] = _write_summary(image_path, summary_text, output_path)
+            logger.info("ImageSummary: done -> %s", image_path.name)
+        except Exception as e:
+            logger.error("ImageSummary: error processing %s: %s", image_path.name, e)
+    return pairs
+
+
 def process_images(
-    model: str, input_dir: str, output_dir: str, file_filter: list[Path]
+    model: str,
+    input_dir: str,
+    output_dir: str,
+    file_filter: list[Path],
+    *,
+    chunk_size: int | None = None,
+    parallel_workers: int | None = None,
+    cache: SummaryCache | None = None,
 ) -> list[ImageSummaryFilePair]:
     """
-    Process images sequentially, writing one ``.txt`` per image.
-
-    Only one image-summary job runs at a time per process (global lock), so
-    concurrent HTTP clients queue here instead of hammering Ollama in parallel.
+    Describe images on a worker pool, writing one ``.txt`` per image.
+
+    Images are grouped ``resolve_batch_chunk_size`` to a request (default 1;
+    images a batch answer leaves out are described on their own) and
+    ``resolve_batch_parallel_workers`` groups run at once. Requests go through
+    the shared Ollama scheduler, whose concurrency window also bounds
+    concurrent jobs. Images already described with this model and prompt are
+    written from ``cache`` without a request. Pairs are returned in processing
+    (``file_filter``) order.
     """
-    with _image_summary_lock:
-        return _process_images_unlocked(model, input_dir, output_dir, file_filter)
-
-
-def _process_images_unlocked(
-    model: str, input_dir: str, output_dir: str, file_filter: list[Path]
-) -> list[ImageSummaryFilePair]:
     logger.info(
         "ImageSummary: start | model=%s | input_dir=%s | output_dir=%s",
         model,
@@ -78,39 +145,58 @@ def _process_images_unlocked(
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    pairs: list[ImageSummaryFilePair] = []
     images = list(iter_image_files(input_path, file_filter))
     logger.info("ImageSummary: discovered %d image(s) to process", len(images))
     total = len(images)
-    processed = 0
-    last_reported = 0
-
+    if cache is None:
+        cache = new_summary_cache(model)
+    cached = cache.lookup(str(p) for p in images)
+    done: dict[Path, ImageSummaryFilePair] = {}
     for image_path in images:
-        try:
-            logger.info("ImageSummary: processing -> %s", image_path.name)
+        if str(image_path) in cached:
             try:
-                summary_text = describe_image(model, str(image_path))
-                out_file = output_path / (image_path.name + ".txt")
-                out_file.write_text(summary_text, encoding="utf-8")
-                pairs.append(
-                    {
-                        "input_path": str(image_path.resolve()),
-                        "output_path": str(out_file.resolve()),
-                    }
+                done[image_path] = _write_summary(
+                    image_path, cached[str(image_path)], output_path
                 )
-                logger.info("ImageSummary: done -> %s", image_path.name)
-            except Exception as e:
-                logger.error(
-                    "ImageSummary: error processing %s: %s", image_path.name, e
+            except OSError as e:
+                logger.error("ImageSummary: error writing %s: %s", image_path.name, e)
+    processed = len(cached)
+    last_reported = report_file_progress(None, processed, total, 0)
+
+    cold = [p for p in images if str(p) not in cached]
+    chunk = max(1, resolve_batch_chunk_size(chunk_size))
+    workers = max(1, resolve_batch_parallel_workers(parallel_workers))
+    batches = [cold[i : i + chunk] for i in range(0, len(cold), chunk)]
+    tag = f"image_summary:{uuid.uuid4().hex}"
+
+    if batches:
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(batches)),
+            thread_name_prefix="image-summary",
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _describe_batch, model, batch, output_path, tag, cache
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                done.update(future.result())
+                processed += len(futures[future])
+                last_reported = report_file_progress(
+                    None, processed, total, last_reported
                 )
-        finally:
-            processed += 1
-            last_reported = report_file_progress(None, processed, total, last_reported)
 
     if total > 0:
         report_file_progress(None, total, total, last_reported)
 
+    pairs = [done[p] for p in images if p in done]
     if not pairs:
         logger.warning("ImageSummary: no files were processed")
-    logger.info("ImageSummary: complete | processed=%d file(s)", len(pairs))
+    logger.info(
+        "ImageSummary: complete | processed=%d file(s) | cache=%s | ollama=%s",
+        len(pairs),
+        cache.stats(),
+        get_scheduler().summary(tag),
+    )
     return pairs
@@ -0,0 +1,145 @@
+"""Parallel / batched image description through the shared Ollama scheduler."""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from image_summary import model as model_module
+from image_summary import process as process_module
+from image_summary.process import process_images
+
+
+class _FakeScheduler:
+    """
+    Answers like a vision model; a batch answer can leave out ``drop`` files.
+
+    Single-image requests for ``incomplete`` files stop before ``done``.
+    """
+
+    max_concurrency = 3
+
+    def __init__(self, drop=(), incomplete=()):
+        self.drop = set(drop)
+        self.incomplete = set(incomplete)
+        self.calls: list[list[str]] = []
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def generate(self, model, prompt, *, images=None, tag=None):
+        with self.lock:
+            self.calls.append([Path(p).name for p in images])
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if len(images) == 1:
+            if Path(images[0]).name in self.incomplete:
+                return {"done": False, "response": "partial"}
+            text = f"single {Path(images[0]).name}"
+        else:
+            text = json.dumps(
+                [
+                    {"file": Path(p).name, "description": f"batch {Path(p).name}"}
+                    for p in images
+                    if Path(p).name not in self.drop
+                ]
+            )
+        return {"done": True, "response": text}
+
+    def summary(self, tag=None):
+        return {"requests": len(self.calls)}
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CACHE_DB", str(tmp_path / "summaries.db"))
+    monkeypatch.setattr(process_module, "ensure_model_exists", lambda model: None)
+    d = tmp_path / "in"
+    d.mkdir()
+    for i in range(7):
+        (d / f"img_{i}.jpg").write_bytes(b"\xff\xd8\xff" + bytes([i]))
+    return d
+
+
+def _use(monkeypatch, scheduler):
+    monkeypatch.setattr(model_module, "get_scheduler", lambda: scheduler)
+    monkeypatch.setattr(process_module, "get_scheduler", lambda: scheduler)
+
+
+def test_single_image_requests_run_concurrently(images, tmp_path, monkeypatch):
+    scheduler = _FakeScheduler()
+    _use(monkeypatch, scheduler)
+    order = sorted(images.iterdir(), reverse=True)
+    pairs = process_images("gemma3:4b", str(images), str(tmp_path / "out"), order)
+    assert [Path(p["input_path"]).name for p in pairs] == [p.name for p in order]
+    assert scheduler.peak == 3  # defaults to the scheduler window
+    assert len(scheduler.calls) == 7
+    out = Path(pairs[0]["output_path"])
+    assert out.read_text(encoding="utf-8") == "single img_6.jpg"
+
+
+def test_batches_fall_back_for_missing_images(images, tmp_path, monkeypatch):
+    scheduler = _FakeScheduler(drop={"img_1.jpg"})
+    _use(monkeypatch, scheduler)
+    pairs = process_images(
+        "gemma3:4b",
+        str(images),
+        str(tmp_path / "out"),
+        [],
+        chunk_size=3,
+        parallel_workers=2,
+    )
+    texts = {
+        Path(p["input_path"]).name: Path(p["output_path"]).read_text(encoding="utf-8")
+        for p in pairs
+    }
+    assert len(pairs) == 7
+    assert texts["img_0.jpg"] == "batch img_0.jpg"
+    assert texts["img_1.jpg"] == "single img_1.jpg"
+    assert sorted(len(c) for c in scheduler.calls) == [1, 1, 3, 3]
+    assert scheduler.peak <= 2
+
+
+def test_repeat_run_is_served_from_cache(images, tmp_path, monkeypatch):
+    _use(monkeypatch, _FakeScheduler())
+    first = process_images("gemma3:4b", str(images), str(tmp_path / "out"), [])
+
+    scheduler = _FakeScheduler()
+    _use(monkeypatch, scheduler)
+    (images / "new.jpg").write_bytes(b"\xff\xd8\xff new")
+    cache = process_module.new_summary_cache("gemma3:4b")
+    again = process_images(
+        "gemma3:4b", str(images), str(tmp_path / "out2"), [], cache=cache
+    )
+    assert scheduler.calls == [["new.jpg"]]
+    names = {Path(p["input_path"]).name for p in first}
+    assert {Path(p["input_path"]).name for p in again} == names | {"new.jpg"}
+    assert (tmp_path / "out2" / "img_0.jpg.txt").read_text() == "single img_0.jpg"
+    assert cache.stats()["hits"] == 7 and cache.stats()["stored"] == 1
+
+    # A changed prompt drops the old descriptions.
+    monkeypatch.setattr(process_module, "IMAGE_PROMPT", "Describe the image.")
+    cache = process_module.new_summary_cache("gemma3:4b")
+    process_images("gemma3:4b", str(images), str(tmp_path / "out3"), [], cache=cache)
+    assert cache.stats()["hits"] == 0 and cache.stats()["invalidated"] == 8
+
+
+def test_incomplete_response_is_not_cached(images, tmp_path, monkeypatch):
+    _use(monkeypatch, _FakeScheduler(incomplete={"img_2.jpg"}))
+    cache = process_module.new_summary_cache("gemma3:4b")
+    pairs = process_images(
+        "gemma3:4b", str(images), str(tmp_path / "out"), [], cache=cache
+    )
+    assert "img_2.jpg" not in {Path(p["input_path"]).name for p in pairs}
+    assert not (tmp_path / "out" / "img_2.jpg.txt").exists()
+    assert cache.stats()["stored"] == 6
+
+    scheduler = _FakeScheduler()
+    _use(monkeypatch, scheduler)
+    process_images("gemma3:4b", str(images), str(tmp_path / "out2"), [])
+    assert scheduler.calls == [["img_2.jpg"]]
+    assert (tmp_path / "out2" / "img_2.jpg.txt").read_text() == "single img_2.jpg"
@@ -136,6 +136,20 @@ class ImageEmbeddingStorage(DatabaseEmbeddingStorage):
         )
         self.session.add(record)
 
+    def save_embeddings_bulk(self, rows: list[tuple[str, list[float], str]]) -> None:
+        """Insert ``(path, embedding, content_sha256)`` rows in one executemany round trip."""
+        if not rows:
+            return
+        from sqlalchemy import insert
+
+        self.session.execute(
+            insert(ImageEmbedding),
+            [
+                {"path": path, "embedding": embedding, "content_sha256": sha}
+                for path, embedding, sha in rows
+            ],
+        )
+
     def _create_record(self, path: str, embedding: list[float]):
         return ImageEmbedding(path=path, embedding=embedding)
 
@@ -63,13 +63,14 @@ class DirectoryInput(BaseModel):
 
 
 class FileFilterDirectory(DirectoryInput):
-    """Find files with file_extensions in path directory."""
+    """Find files with file_extensions in path directory (or its subtree when ``recursive``)."""
 
     model_config = ConfigDict(
         populate_by_name=True,
     )
     path: str
     file_extensions: list[str]
+    recursive: bool = False
 
     @field_validator("path")
     @classmethod
@@ -88,10 +89,15 @@ class FileFilterDirectory(DirectoryInput):
         files = list(path_obj.glob("*"))
         if not files:
             raise ValueError(f"validate directory: Directory {path_obj} is empty.")
-        number_of_matched_files = [
-            f.name for f in files if f.suffix.lower() in self.file_extensions
-        ]
-        if len(number_of_matched_files) < 1:
+        if self.recursive:
+            from rb.lib.file_scan import iter_files
+
+            matches = iter_files(path_obj, extensions=self.file_extensions)
+            has_match = next(matches, None) is not None
+            matches.close()
+        else:
+            has_match = any(f.suffix.lower() in self.file_extensions for f in files)
+        if not has_match:
             raise ValueError(
                 f"input directory validate failed: No file extensions matching {self.file_extensions} found in directory: {path_obj}"
             )
@@ -0,0 +1,38 @@
+"""
+Writable location for models derived from bundled exports at run time.
+
+Plugins that rewrite a shipped ONNX model on first use (a split or fused
+graph) must not write into their package directory, which is read-only on
+many installs. Derived files go under ``{RESCUEBOX_DERIVED_MODEL_DIR}`` or
+``~/.rescuebox/models`` (``%LOCALAPPDATA%\\RescueBox\\models`` on Windows),
+one folder per plugin. Names carry the source file's size and mtime, so an
+updated source model gets a new derived file instead of a stale one.
+"""
+
+from __future__ import annotations
+
+import os
+import platform
+from pathlib import Path
+
+
+def derived_model_dir(plugin: str) -> Path:
+    """Folder for ``plugin``'s derived models (created on demand)."""
+    env = os.getenv("RESCUEBOX_DERIVED_MODEL_DIR")
+    if env:
+        base = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        local = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        base = local / "RescueBox" / "models"
+    else:
+        base = Path.home() / ".rescuebox" / "models"
+    path = base / plugin
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def derived_model_path(plugin: str, source: Path, part: str) -> Path:
+    """Path for the ``part`` derived from ``source``, e.g. ``model.<stamp>.text.onnx``."""
+    st = source.stat()
+    stamp = f"{st.st_size:x}-{st.st_mtime_ns:x}"
+    return derived_model_dir(plugin) / f"{source.stem}.{stamp}.{part}{source.suffix}"
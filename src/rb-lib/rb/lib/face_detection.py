@@ -0,0 +1,494 @@
+"""
+Face detection shared by the face-aware plugins.
+
+Deepfake detection and age/gender both find faces with the Ultra-Light RFB-640
+detector (``version-RFB-640.onnx``; deepfake ships it as ``face_detector.onnx``).
+``FaceDetector`` runs it once for all of them:
+
+* Sessions: ``get_session(model_path)`` keeps one ONNX Runtime session per model
+  *content* (SHA-256 via ``file_fingerprint``) for the whole process, so copies of
+  the same model in different plugin folders share a session. Face-match loads its
+  RetinaFace / YOLOv8 sessions through it too.
+* Batching: detector inputs are stacked ``batch_size`` at a time when the export
+  has a dynamic batch axis (the published RFB-640 is fixed at 1).
+* Results: boxes are cached per file under ``(st_dev, st_ino, st_size,
+  st_mtime_ns)`` (see ``file_fingerprint.stat_key``), the detector model and the
+  score threshold. A second face-aware plugin over the same folder reads the
+  boxes instead of detecting again.
+
+Images are decoded upright (EXIF orientation applied, as ``cv2.imread`` does)
+through ``image_cache``; boxes are in those pixel coordinates, so consumers must
+read the image with ``load_rgb(path, upright=True)`` / ``load_image(..., upright=True)``.
+
+One SQLite file (WAL, busy_timeout) at ``{RESCUEBOX_FACE_CACHE_DB}`` or
+``~/.rescuebox/data/face_boxes.db`` (``%LOCALAPPDATA%\\RescueBox\\data`` on Windows).
+If the cache cannot be opened, read or written, faces are detected uncached.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import platform
+import sqlite3
+import threading
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from rb.lib.file_fingerprint import StatKey, cached_sha256, stat_key
+from rb.lib.image_cache import load_rgb
+
+logger = logging.getLogger(__name__)
+
+# Detector input (width, height); every image is resized to this.
+DETECTOR_SIZE = (640, 480)
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_BATCH_SIZE = 16
+
+_BUSY_TIMEOUT_MS = 15_000
+_TABLE = "face_boxes"
+# SQLite's default host-parameter limit is 999 on older builds.
+_LOOKUP_CHUNK = 500
+
+
+def face_cache_db_path() -> Path:
+    """SQLite file holding cached detections."""
+    env = os.getenv("RESCUEBOX_FACE_CACHE_DB")
+    if env:
+        path = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        base = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        path = base / "RescueBox" / "data" / "face_boxes.db"
+    else:
+        path = Path.home() / ".rescuebox" / "data" / "face_boxes.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def default_detect_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+
+def force_cpu() -> bool:
+    """``RESCUEBOX_ORT_CPU=1`` skips GPU providers."""
+    return os.environ.get("RESCUEBOX_ORT_CPU", "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+def ort_providers(cpu_only: bool = False) -> list:
+    """CoreML / CUDA when available, CPU last."""
+    if cpu_only or force_cpu():
+        return ["CPUExecutionProvider"]
+    available = ort.get_available_providers()
+    providers: list = ["CPUExecutionProvider"]
+    if "CUDAExecutionProvider" in available:
+        providers.insert(
+            0,
+            (
+                "CUDAExecutionProvider",
+                {"device_id": 0, "cudnn_conv_algo_search": "DEFAULT"},
+            ),
+        )
+    if "CoreMLExecutionProvider" in available:
+        providers.insert(0, "CoreMLExecutionProvider")
+    return providers
+
+
+def is_gpu_inference_failure(exc: BaseException) -> bool:
+    """True when ORT failed on the GPU path (e.g. cuDNN); safe to retry on CPU."""
+    text = f"{type(exc).__name__}: {exc}".lower()
+    if "cudnn" in text:
+        return True
+    return "cuda" in text and ("conv node" in text or "execution" in text)
+
+
+_SESSIONS: dict[tuple[str, bool], ort.InferenceSession] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def model_id(model_path: str | Path) -> str:
+    """Short content id of a model file (same bytes -> same id)."""
+    return cached_sha256(str(model_path))[:16]
+
+
+def get_session(
+    model_path: str | Path, *, cpu_only: bool = False
+) -> ort.InferenceSession:
+    """Process-wide session for ``model_path``, created on first use."""
+    key = (model_id(model_path), cpu_only)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            options = ort.SessionOptions()
+            options.inter_op_num_threads = 4
+            options.intra_op_num_threads = 4
+            session = ort.InferenceSession(
+                str(model_path),
+                sess_options=options,
+                providers=ort_providers(cpu_only),
+            )
+            _SESSIONS[key] = session
+            logger.info("Loaded ONNX session %s (%s)", Path(model_path).name, key[0])
+        return session
+
+
+def session_batch_limit(session) -> int | None:
+    """Fixed batch size of a session's first input (``None`` = dynamic)."""
+    batch_dim = session.get_inputs()[0].shape[0]
+    return batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+
+
+# ---------------------------------------------------------------------------
+# Ultra-Light detector pre/post-processing
+# (box utilities from Ultra-Light-Fast-Generic-Face-Detector-1MB, MIT)
+# ---------------------------------------------------------------------------
+
+
+def area_of(left_top, right_bottom):
+    """Areas of rectangles given corners ``(N, 2)`` / ``(N, 2)``."""
+    hw = np.clip(right_bottom - left_top, 0.0, None)
+    return hw[..., 0] * hw[..., 1]
+
+
+def iou_of(boxes0, boxes1, eps=1e-5):
+    """Intersection-over-union of ``(N, 4)`` boxes with ``(N or 1, 4)`` boxes."""
+    overlap_left_top = np.maximum(boxes0[..., :2], boxes1[..., :2])
+    overlap_right_bottom = np.minimum(boxes0[..., 2:], boxes1[..., 2:])
+    overlap_area = area_of(overlap_left_top, overlap_right_bottom)
+    area0 = area_of(boxes0[..., :2], boxes0[..., 2:])
+    area1 = area_of(boxes1[..., :2], boxes1[..., 2:])
+    return overlap_area / (area0 + area1 - overlap_area + eps)
+
+
+def hard_nms(box_scores, iou_threshold, top_k=-1, candidate_size=200):
+    """Greedy NMS over ``(N, 5)`` ``[x1, y1, x2, y2, score]`` rows; returns kept rows."""
+    scores = box_scores[:, -1]
+    boxes = box_scores[:, :-1]
+    picked = []
+    indexes = np.argsort(scores)[-candidate_size:]
+    while len(indexes) > 0:
+        current = indexes[-1]
+        picked.append(current)
+        if 0 < top_k == len(picked) or len(indexes) == 1:
+            break
+        current_box = boxes[current, :]
+        indexes = indexes[:-1]
+        iou = iou_of(boxes[indexes, :], np.expand_dims(current_box, axis=0))
+        indexes = indexes[iou <= iou_threshold]
+    return box_scores[picked, :]
+
+
+def detector_input(rgb: np.ndarray) -> np.ndarray:
+    """(3, 480, 640) float32 detector input for one H x W x 3 uint8 RGB image."""
+    image = cv2.resize(rgb, DETECTOR_SIZE)
+    image = (image.astype(np.float32) - 127.0) / 128.0
+    return np.transpose(image, (2, 0, 1))
+
+
+@dataclass(frozen=True)
+class FaceBoxes:
+    """Faces found in one image, in original pixel coordinates."""
+
+    width: int
+    height: int
+    boxes: np.ndarray  # (K, 4) int32 x1, y1, x2, y2
+    scores: np.ndarray  # (K,) float32
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def largest(self) -> int | None:
+        """Index of the largest box, or ``None`` without faces."""
+        if not len(self.boxes):
+            return None
+        b = self.boxes.astype(np.int64)
+        return int(((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])).argmax())
+
+
+def decode_faces(
+    width: int,
+    height: int,
+    confidences: np.ndarray,
+    boxes: np.ndarray,
+    threshold: float = DEFAULT_THRESHOLD,
+    iou_threshold: float = 0.5,
+    top_k: int = -1,
+) -> FaceBoxes:
+    """Detector outputs for one image (``(N, 2)`` scores, ``(N, 4)`` boxes) -> faces."""
+    probs = confidences[:, 1]
+    mask = probs > threshold
+    if not mask.any():
+        return FaceBoxes(
+            width, height, np.zeros((0, 4), np.int32), np.zeros(0, np.float32)
+        )
+    stacked = np.concatenate([boxes[mask], probs[mask].reshape(-1, 1)], axis=1)
+    kept = hard_nms(stacked, iou_threshold, top_k)
+    kept[:, [0, 2]] *= width
+    kept[:, [1, 3]] *= height
+    return FaceBoxes(
+        width,
+        height,
+        kept[:, :4].astype(np.int32),
+        kept[:, 4].astype(np.float32),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Per-file result cache
+# ---------------------------------------------------------------------------
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+        "st_dev INTEGER NOT NULL, st_ino INTEGER NOT NULL, "
+        "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "detector TEXT NOT NULL, threshold REAL NOT NULL, "
+        "width INTEGER NOT NULL, height INTEGER NOT NULL, "
+        "boxes BLOB NOT NULL, scores BLOB NOT NULL, path TEXT, updated_at TEXT, "
+        "PRIMARY KEY (st_dev, st_ino, size, mtime_ns, detector, threshold))"
+    )
+    # Lookups filter on inode alone; without this index each chunk scans the table.
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_TABLE}_ino ON {_TABLE} (st_ino)")
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _stat_keys(paths: Iterable[str]) -> dict[str, StatKey | None]:
+    keyed: dict[str, StatKey | None] = {}
+    for p in paths:
+        try:
+            keyed[p] = stat_key(os.stat(p))
+        except OSError:
+            keyed[p] = None
+    return keyed
+
+
+class FaceDetector:
+    """Batched Ultra-Light face detection with a per-file result cache."""
+
+    def __init__(
+        self,
+        session,
+        detector_id: str,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        use_cache: bool = True,
+        db_path: Path | None = None,
+        model_path: str | Path | None = None,
+    ) -> None:
+        self.session = session
+        self.detector_id = detector_id
+        self.threshold = threshold
+        self.batch_size = max(1, batch_size)
+        self.use_cache = use_cache
+        self.db_path = db_path
+        self._model_path = model_path
+        self._input_name = session.get_inputs()[0].name
+
+    # -- cache ------------------------------------------------------------
+
+    def lookup(self, paths: Iterable[str]) -> dict[str, FaceBoxes]:
+        """Cached detections for ``paths`` whose files are unchanged."""
+        if not self.use_cache:
+            return {}
+        keyed = {p: k for p, k in _stat_keys(paths).items() if k is not None}
+        if not keyed:
+            return {}
+        wanted = set(keyed.values())
+        stored: dict[StatKey, FaceBoxes] = {}
+        inodes = sorted({k[1] for k in wanted})
+        try:
+            self._select(inodes, wanted, stored)
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("Face box cache unavailable (%s); detecting all files", exc)
+            return {}
+        return {p: stored[k] for p, k in keyed.items() if k in stored}
+
+    def _select(
+        self,
+        inodes: list[int],
+        wanted: set[StatKey],
+        stored: dict[StatKey, FaceBoxes],
+    ) -> None:
+        conn = _connect(self.db_path or face_cache_db_path())
+        try:
+            for i in range(0, len(inodes), _LOOKUP_CHUNK):
+                chunk = inodes[i : i + _LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    "SELECT st_dev, st_ino, size, mtime_ns, width, height, boxes, "
+                    f"scores FROM {_TABLE} WHERE detector = ? AND threshold = ? "
+                    f"AND st_ino IN ({marks})",
+                    [self.detector_id, self.threshold, *chunk],
+                ).fetchall()
+                for dev, ino, size, mtime_ns, w, h, boxes, scores in rows:
+                    key = (dev, ino, size, mtime_ns)
+                    if key in wanted:
+                        stored[key] = FaceBoxes(
+                            w,
+                            h,
+                            np.frombuffer(boxes, np.int32).reshape(-1, 4),
+                            np.frombuffer(scores, np.float32),
+                        )
+        finally:
+            conn.close()
+
+    def store(self, results: dict[str, FaceBoxes]) -> None:
+        """Cache detections for files (skipped when the file has no stable stat key)."""
+        if not self.use_cache or not results:
+            return
+        stamp = datetime.now(timezone.utc).isoformat()
+        rows: list[tuple] = []
+        for path, key in _stat_keys(results).items():
+            if key is None:
+                continue
+            faces = results[path]
+            rows.append(
+                (
+                    *key,
+                    self.detector_id,
+                    self.threshold,
+                    faces.width,
+                    faces.height,
+                    np.ascontiguousarray(faces.boxes, np.int32).tobytes(),
+                    np.ascontiguousarray(faces.scores, np.float32).tobytes(),
+                    path,
+                    stamp,
+                )
+            )
+        if not rows:
+            return
+        try:
+            conn = _connect(self.db_path or face_cache_db_path())
+            try:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {_TABLE} "
+                    "(st_dev, st_ino, size, mtime_ns, detector, threshold, width, "
+                    "height, boxes, scores, path, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("Face box cache: could not store detections: %s", exc)
+
+    # -- inference --------------------------------------------------------
+
+    def _run(self, batch: np.ndarray):
+        try:
+            return self.session.run(None, {self._input_name: batch})
+        except Exception as exc:
+            if self._model_path is None or not is_gpu_inference_failure(exc):
+                raise
+            logger.warning("Face detector failed on GPU (%s); retrying on CPU.", exc)
+            self.session = get_session(self._model_path, cpu_only=True)
+            return self.session.run(None, {self._input_name: batch})
+
+    def detect_inputs(
+        self, inputs: list[np.ndarray], sizes: list[tuple[int, int]]
+    ) -> list[FaceBoxes]:
+        """Run ``detector_input`` arrays (original ``(width, height)`` per image)."""
+        step = session_batch_limit(self.session) or self.batch_size
+        results: list[FaceBoxes] = []
+        for start in range(0, len(inputs), step):
+            confs, boxes = self._run(np.stack(inputs[start : start + step]))
+            for j in range(len(confs)):
+                w, h = sizes[start + j]
+                results.append(decode_faces(w, h, confs[j], boxes[j], self.threshold))
+        return results
+
+    def detect_images(self, images: list[np.ndarray]) -> list[FaceBoxes]:
+        """Detect faces in H x W x 3 uint8 RGB arrays (not cached)."""
+        inputs = [detector_input(im) for im in images]
+        return self.detect_inputs(inputs, [(im.shape[1], im.shape[0]) for im in images])
+
+    def detect_paths(
+        self, paths: Iterable[str], *, max_workers: int | None = None
+    ) -> dict[str, FaceBoxes]:
+        """
+        ``{path: FaceBoxes}`` for every readable path.
+
+        Cached files are not decoded. The rest are decoded and preprocessed on a
+        thread pool, detected in batches and stored. Unreadable files are logged
+        and left out.
+        """
+        paths = list(dict.fromkeys(str(p) for p in paths))
+        result = self.lookup(paths)
+        cold = [p for p in paths if p not in result]
+        if cold:
+            workers = min(max_workers or default_detect_workers(), len(cold))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for start in range(0, len(cold), self.batch_size):
+                    chunk = cold[start : start + self.batch_size]
+                    prepared = pool.map(_prepare_path, chunk)
+                    ok = [(p, x) for p, x in zip(chunk, prepared) if x is not None]
+                    if not ok:
+                        continue
+                    found = self.detect_inputs(
+                        [x[0] for _, x in ok], [x[1] for _, x in ok]
+                    )
+                    fresh = {p: faces for (p, _), faces in zip(ok, found)}
+                    self.store(fresh)
+                    result.update(fresh)
+        logger.info(
+            "Face detection: %d cached, %d detected (%d requested)",
+            len(paths) - len(cold),
+            len(cold),
+            len(paths),
+        )
+        return result
+
+
+def _prepare_path(path: str) -> tuple[np.ndarray, tuple[int, int]] | None:
+    try:
+        rgb = load_rgb(path, upright=True)
+    except Exception as exc:
+        logger.warning("Skip face detection for %s: %s", path, exc)
+        return None
+    return detector_input(rgb), (rgb.shape[1], rgb.shape[0])
+
+
+_DETECTORS: dict[tuple, FaceDetector] = {}
+_DETECTORS_LOCK = threading.Lock()
+
+
+def shared_face_detector(
+    model_path: str | Path,
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    cpu_only: bool = False,
+) -> FaceDetector:
+    """Process-wide ``FaceDetector`` for the Ultra-Light model at ``model_path``."""
+    key = (model_id(model_path), threshold, cpu_only)
+    with _DETECTORS_LOCK:
+        detector = _DETECTORS.get(key)
+        if detector is None:
+            detector = FaceDetector(
+                get_session(model_path, cpu_only=cpu_only),
+                key[0],
+                threshold=threshold,
+                model_path=model_path,
+            )
+            _DETECTORS[key] = detector
+        return detector
@@ -0,0 +1,206 @@
+"""
+Stat-keyed SHA-256 cache shared by plugins that fingerprint evidence files.
+
+A file's digest is stored under ``(st_dev, st_ino, st_size, st_mtime_ns)``; while
+those four values are unchanged the stored digest is returned without reading the
+file. Cold digests are computed on a thread pool (``hashlib`` releases the GIL on
+large updates, so reads and hashing overlap across files).
+
+One SQLite file (WAL, busy_timeout) at ``{RESCUEBOX_FINGERPRINT_DB}`` or
+``~/.rescuebox/data/fingerprints.db`` (``%LOCALAPPDATA%\\RescueBox\\data`` on Windows).
+If the cache cannot be opened, read or written, files are hashed uncached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import platform
+import sqlite3
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_BUSY_TIMEOUT_MS = 15_000
+_TABLE = "file_sha256"
+_READ_CHUNK = 1024 * 1024
+# SQLite's default host-parameter limit is 999 on older builds.
+_LOOKUP_CHUNK = 500
+
+StatKey = tuple[int, int, int, int]
+
+
+def fingerprint_db_path() -> Path:
+    """SQLite file holding the fingerprint table."""
+    env = os.getenv("RESCUEBOX_FINGERPRINT_DB")
+    if env:
+        path = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        base = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        path = base / "RescueBox" / "data" / "fingerprints.db"
+    else:
+        path = Path.home() / ".rescuebox" / "data" / "fingerprints.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def default_hash_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def sha256_file(path: str) -> str:
+    """SHA-256 hex digest of raw file bytes (chunked read, no cache)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stat_key(st: os.stat_result) -> StatKey | None:
+    """Cache key for a stat result, or ``None`` when the filesystem has no stable inode."""
+    if not st.st_ino:
+        return None
+    return (int(st.st_dev), int(st.st_ino), int(st.st_size), int(st.st_mtime_ns))
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+        "st_dev INTEGER NOT NULL, st_ino INTEGER NOT NULL, "
+        "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "sha256 TEXT NOT NULL, path TEXT, updated_at TEXT, "
+        "PRIMARY KEY (st_dev, st_ino, size, mtime_ns))"
+    )
+    # Lookups filter on inode alone; without this index each chunk scans the table.
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_TABLE}_ino ON {_TABLE} (st_ino)")
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _lookup(conn: sqlite3.Connection, keys: list[StatKey]) -> dict[StatKey, str]:
+    """Stored digests for ``keys`` (chunked, indexed ``IN`` on inode; exact match in Python)."""
+    wanted = set(keys)
+    found: dict[StatKey, str] = {}
+    inodes = sorted({k[1] for k in wanted})
+    for i in range(0, len(inodes), _LOOKUP_CHUNK):
+        chunk = inodes[i : i + _LOOKUP_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT st_dev, st_ino, size, mtime_ns, sha256 FROM {_TABLE} "
+            f"WHERE st_ino IN ({marks})",
+            chunk,
+        ).fetchall()
+        for dev, ino, size, mtime_ns, digest in rows:
+            key = (dev, ino, size, mtime_ns)
+            if key in wanted:
+                found[key] = digest
+    return found
+
+
+def _hash_if_unchanged(path: str, key: StatKey | None) -> tuple[str, StatKey | None]:
+    """Hash ``path``; drop the key if the file changed while it was being read."""
+    digest = sha256_file(path)
+    if key is not None:
+        try:
+            if stat_key(os.stat(path)) != key:
+                key = None
+        except OSError:
+            key = None
+    return digest, key
+
+
+def cached_sha256_many(
+    paths: Iterable[str],
+    *,
+    max_workers: int | None = None,
+    db_path: Path | None = None,
+) -> dict[str, str]:
+    """
+    Return ``{path: sha256_hex}`` for every readable path.
+
+    Unchanged files are served from the cache; the rest are hashed in parallel and
+    stored. Unreadable paths are logged and left out of the result.
+    """
+    keyed: dict[str, StatKey | None] = {}
+    for p in paths:
+        try:
+            keyed[p] = stat_key(os.stat(p))
+        except OSError as exc:
+            logger.warning("Skip hashing %s: %s", p, exc)
+    if not keyed:
+        return {}
+
+    conn: sqlite3.Connection | None = None
+    stored: dict[StatKey, str] = {}
+    try:
+        conn = _connect(db_path or fingerprint_db_path())
+        stored = _lookup(conn, [k for k in keyed.values() if k is not None])
+    except (sqlite3.Error, OSError) as exc:
+        logger.warning("Fingerprint cache unavailable (%s); hashing all files", exc)
+        if conn is not None:
+            conn.close()
+            conn = None
+    try:
+        result: dict[str, str] = {}
+        cold: list[str] = []
+        for p, key in keyed.items():
+            if key is not None and key in stored:
+                result[p] = stored[key]
+            else:
+                cold.append(p)
+
+        if cold:
+            workers = max_workers or default_hash_workers()
+            rows: list[tuple] = []
+            stamp = datetime.now(timezone.utc).isoformat()
+            with ThreadPoolExecutor(max_workers=min(workers, len(cold))) as pool:
+                futures = {
+                    p: pool.submit(_hash_if_unchanged, p, keyed[p]) for p in cold
+                }
+                for p, fut in futures.items():
+                    try:
+                        digest, key = fut.result()
+                    except OSError as exc:
+                        logger.warning("Skip hashing %s: %s", p, exc)
+                        continue
+                    result[p] = digest
+                    if key is not None:
+                        rows.append((*key, digest, p, stamp))
+            if rows and conn is not None:
+                try:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {_TABLE} "
+                        "(st_dev, st_ino, size, mtime_ns, sha256, path, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    conn.commit()
+                except sqlite3.Error as exc:
+                    logger.warning(
+                        "Fingerprint cache: could not store digests: %s", exc
+                    )
+        logger.info(
+            "File fingerprints: %d cached, %d hashed (%d requested)",
+            len(keyed) - len(cold),
+            len(cold),
+            len(keyed),
+        )
+        return result
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def cached_sha256(path: str, *, db_path: Path | None = None) -> str:
+    """Single-file form of :func:`cached_sha256_many`; raises ``OSError`` if unreadable."""
+    digest = cached_sha256_many([path], max_workers=1, db_path=db_path).get(path)
+    if digest is None:
+        raise OSError(f"Cannot hash {path}")
+    return digest
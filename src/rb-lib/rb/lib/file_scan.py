@@ -0,0 +1,251 @@
+"""
+Directory scanner shared by plugins that ingest folders of evidence files.
+
+Built on ``os.scandir``: each directory is listed by a worker thread, so deep
+trees are walked in parallel, and matching paths are yielded as soon as their
+directory has been read. Files can be filtered by extension and/or by magic
+bytes (catches renamed images).
+
+With ``snapshot=True`` each directory's listing is kept in SQLite keyed by its
+``st_mtime_ns``; a rescan only stats unchanged directories instead of listing
+them. Snapshot file: ``{RESCUEBOX_SCAN_SNAPSHOT_DB}`` or
+``~/.rescuebox/data/scan_snapshots.db`` (``%LOCALAPPDATA%\\RescueBox\\data`` on Windows).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import platform
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_BUSY_TIMEOUT_MS = 15_000
+_TABLE = "dir_snapshot"
+# Directories modified this recently are not snapshotted: a change within the
+# same mtime tick would otherwise go unnoticed on the next scan.
+_RACY_WINDOW_NS = 2_000_000_000
+
+_MAGIC_HEADER_LEN = 16
+# (offset, signature) pairs for raster formats the image plugins decode.
+IMAGE_SIGNATURES: dict[str, tuple[tuple[int, bytes], ...]] = {
+    "jpeg": ((0, b"\xff\xd8\xff"),),
+    "png": ((0, b"\x89PNG\r\n\x1a\n"),),
+    "gif": ((0, b"GIF87a"), (0, b"GIF89a")),
+    "bmp": ((0, b"BM"),),
+    "tiff": ((0, b"II*\x00"), (0, b"MM\x00*")),
+    "webp": ((8, b"WEBP"),),
+}
+
+
+def scan_snapshot_db_path() -> Path:
+    """SQLite file holding per-directory listings for ``snapshot=True`` scans."""
+    env = os.getenv("RESCUEBOX_SCAN_SNAPSHOT_DB")
+    if env:
+        path = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        base = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        path = base / "RescueBox" / "data" / "scan_snapshots.db"
+    else:
+        path = Path.home() / ".rescuebox" / "data" / "scan_snapshots.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def default_scan_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def sniff_image_type(path: str) -> str | None:
+    """Image format named in ``IMAGE_SIGNATURES`` whose magic bytes ``path`` starts with."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_MAGIC_HEADER_LEN)
+    except OSError:
+        return None
+    for kind, signatures in IMAGE_SIGNATURES.items():
+        for offset, sig in signatures:
+            if header[offset : offset + len(sig)] == sig:
+                return kind
+    return None
+
+
+def _normalize_extensions(extensions: Iterable[str] | None) -> set[str] | None:
+    if extensions is None:
+        return None
+    return {e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions}
+
+
+@dataclass
+class _Listing:
+    path: str
+    mtime_ns: int = 0
+    files: list[str] = field(default_factory=list)
+    subdirs: list[str] = field(default_factory=list)
+    kept: list[str] = field(default_factory=list)
+    changed: bool = True
+
+
+def _list_dir(
+    path: str,
+    cached: tuple[int, list[str], list[str]] | None,
+    extensions: set[str] | None,
+    check_magic: bool,
+) -> _Listing:
+    """List one directory (worker thread) and apply the file filters."""
+    listing = _Listing(path)
+    try:
+        listing.mtime_ns = os.stat(path).st_mtime_ns
+        if cached is not None and cached[0] == listing.mtime_ns:
+            listing.files, listing.subdirs = cached[1], cached[2]
+            listing.changed = False
+        else:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            listing.subdirs.append(entry.name)
+                        elif entry.is_file():
+                            listing.files.append(entry.name)
+                    except OSError:
+                        continue
+    except OSError as exc:
+        logger.warning("Skip scanning %s: %s", path, exc)
+        listing.changed = False
+        return listing
+
+    for name in listing.files:
+        if (
+            extensions is not None
+            and os.path.splitext(name)[1].lower() not in extensions
+        ):
+            continue
+        full = os.path.join(path, name)
+        if check_magic and sniff_image_type(full) is None:
+            continue
+        listing.kept.append(full)
+    return listing
+
+
+class _SnapshotStore:
+    """Per-directory listings; only touched from the generator's thread."""
+
+    def __init__(self, db_path: Path) -> None:
+        self._conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+        self._conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+            "files TEXT NOT NULL, subdirs TEXT NOT NULL)"
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._updates: list[tuple[str, int, str, str]] = []
+
+    def get(self, path: str) -> tuple[int, list[str], list[str]] | None:
+        row = self._conn.execute(
+            f"SELECT mtime_ns, files, subdirs FROM {_TABLE} WHERE path = ?",
+            (os.path.abspath(path),),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), json.loads(row[2])
+
+    def put(self, listing: _Listing) -> None:
+        if time.time_ns() - listing.mtime_ns < _RACY_WINDOW_NS:
+            return
+        self._updates.append(
+            (
+                os.path.abspath(listing.path),
+                listing.mtime_ns,
+                json.dumps(listing.files),
+                json.dumps(listing.subdirs),
+            )
+        )
+
+    def close(self) -> None:
+        try:
+            if self._updates:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {_TABLE} (path, mtime_ns, files, subdirs) "
+                    "VALUES (?, ?, ?, ?)",
+                    self._updates,
+                )
+                self._conn.commit()
+        finally:
+            self._conn.close()
+
+
+def iter_files(
+    root: str | os.PathLike,
+    *,
+    extensions: Iterable[str] | None = None,
+    recursive: bool = True,
+    check_magic: bool = False,
+    max_workers: int | None = None,
+    snapshot: bool = False,
+) -> Iterator[str]:
+    """
+    Yield paths of regular files under ``root`` as directories are read.
+
+    Args:
+        extensions: Keep only these suffixes (case-insensitive, with or without dot).
+        recursive: Descend into subdirectories (symlinked directories are not followed).
+        check_magic: Keep only files whose header matches ``IMAGE_SIGNATURES``.
+        max_workers: Directory-listing threads (default: up to 8).
+        snapshot: Reuse stored listings for directories whose mtime is unchanged.
+
+    Order is not deterministic; use :func:`scan_files` for a sorted list.
+    """
+    exts = _normalize_extensions(extensions)
+    store = _SnapshotStore(scan_snapshot_db_path()) if snapshot else None
+    pool = ThreadPoolExecutor(max_workers=max_workers or default_scan_workers())
+
+    def _submit(path: str) -> Future:
+        cached = store.get(path) if store is not None else None
+        return pool.submit(_list_dir, path, cached, exts, check_magic)
+
+    try:
+        pending = {_submit(os.fspath(root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                listing = fut.result()
+                if store is not None and listing.changed:
+                    store.put(listing)
+                if recursive:
+                    for name in listing.subdirs:
+                        pending.add(_submit(os.path.join(listing.path, name)))
+                yield from listing.kept
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if store is not None:
+            store.close()
+
+
+def scan_files(
+    root: str | os.PathLike,
+    *,
+    extensions: Iterable[str] | None = None,
+    recursive: bool = True,
+    check_magic: bool = False,
+    max_workers: int | None = None,
+    snapshot: bool = False,
+) -> list[str]:
+    """Sorted list form of :func:`iter_files`."""
+    return sorted(
+        iter_files(
+            root,
+            extensions=extensions,
+            recursive=recursive,
+            check_magic=check_magic,
+            max_workers=max_workers,
+            snapshot=snapshot,
+        )
+    )
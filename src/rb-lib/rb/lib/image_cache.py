@@ -0,0 +1,246 @@
+"""
+In-process image decode cache shared by plugins that read the same evidence images.
+
+Plugins in one RescueBox process often decode the same JPEGs several times
+(embeddings, similarity, deepfake, ...). This cache keeps decoded RGB arrays,
+keyed by the file's stat fingerprint (see ``file_fingerprint.stat_key``) and a
+size tier, so a later request is served without reading the file again.
+
+Callers ask for "RGB with shorter side >= N". ``N`` is rounded up to one of
+``SIZE_TIERS`` (224 / 384 / 640); larger requests get the full image. A tier is
+derived from any larger cached variant of the same file. Otherwise the file is
+decoded once, using JPEG ``draft`` mode (DCT scaling) so a 24 MP photo is never
+decoded at full size just to be shrunk to 384 px.
+
+Bounded by ``{RESCUEBOX_DECODE_CACHE_MB}`` (default 512) with LRU eviction;
+``0`` disables caching. Arrays are returned read-only. Pixels are cached in stored
+order; ``upright=True`` applies the EXIF orientation on the way out.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from rb.lib.file_fingerprint import stat_key
+
+logger = logging.getLogger(__name__)
+
+SIZE_TIERS = (224, 384, 640)
+_FULL = 0  # tier id for the full-resolution decode
+_DEFAULT_CACHE_MB = 512
+
+FileKey = tuple
+
+
+def decode_cache_bytes() -> int:
+    """Cache budget from ``RESCUEBOX_DECODE_CACHE_MB``."""
+    mb = os.getenv("RESCUEBOX_DECODE_CACHE_MB", str(_DEFAULT_CACHE_MB))
+    return max(0, int(float(mb) * 1024 * 1024))
+
+
+def size_tier(min_side: int | None) -> int:
+    """Smallest tier >= ``min_side`` (``0`` = full resolution)."""
+    if not min_side:
+        return _FULL
+    for tier in SIZE_TIERS:
+        if min_side <= tier:
+            return tier
+    return _FULL
+
+
+def file_key(path: str) -> FileKey:
+    """Identity of the file's current contents (changes when it is rewritten)."""
+    st = os.stat(path)
+    key = stat_key(st)
+    if key is None:
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    return key
+
+
+def _shrink(image: Image.Image, tier: int) -> Image.Image:
+    """Resize so the shorter side equals ``tier`` (never upscales)."""
+    w, h = image.size
+    short = min(w, h)
+    if tier == _FULL or short <= tier:
+        return image
+    scale = tier / short
+    size = (max(tier, round(w * scale)), max(tier, round(h * scale)))
+    return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+
+_EXIF_ORIENTATION = 0x0112
+
+
+def orient(array: np.ndarray, orientation: int) -> np.ndarray:
+    """Apply an EXIF orientation (1-8) to stored pixels, like ``ImageOps.exif_transpose``."""
+    if orientation == 2:
+        return array[:, ::-1]
+    if orientation == 3:
+        return array[::-1, ::-1]
+    if orientation == 4:
+        return array[::-1]
+    if orientation == 5:
+        return array.transpose(1, 0, 2)
+    if orientation == 6:
+        return np.rot90(array, -1)
+    if orientation == 7:
+        return array[::-1, ::-1].transpose(1, 0, 2)
+    if orientation == 8:
+        return np.rot90(array, 1)
+    return array
+
+
+def _decode(path: str, tier: int) -> tuple[np.ndarray, int]:
+    """``(stored-orientation RGB at tier, EXIF orientation)``."""
+    with Image.open(path) as im:
+        orientation = int(im.getexif().get(_EXIF_ORIENTATION, 1) or 1)
+        if tier != _FULL:
+            # JPEG only: decode at the smallest DCT scale still >= tier.
+            im.draft("RGB", (tier, tier))
+        image = im.convert("RGB")
+    return np.asarray(_shrink(image, tier)), orientation
+
+
+def decode_rgb(
+    path: str, min_side: int | None = None, *, upright: bool = False
+) -> np.ndarray:
+    """Decode ``path`` to RGB at the tier for ``min_side`` (no caching)."""
+    array, orientation = _decode(path, size_tier(min_side))
+    return orient(array, orientation) if upright else array
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    derived: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class DecodeCache:
+    """Thread-safe LRU of decoded RGB arrays, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int | None = None) -> None:
+        self.max_bytes = decode_cache_bytes() if max_bytes is None else max_bytes
+        # (file key, tier) -> (stored-orientation array, EXIF orientation)
+        self._entries: OrderedDict[tuple[FileKey, int], tuple[np.ndarray, int]] = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _lookup(
+        self, key: FileKey, tier: int
+    ) -> tuple[tuple[np.ndarray, int] | None, bool]:
+        """``(entry, exact)``: the tier itself, or the smallest larger variant."""
+        with self._lock:
+            exact = self._entries.get((key, tier))
+            if exact is not None:
+                self._entries.move_to_end((key, tier))
+                return exact, True
+            if tier == _FULL:
+                return None, False
+            larger = [t for t in (*SIZE_TIERS, _FULL) if t == _FULL or t > tier]
+            for t in larger:
+                source = self._entries.get((key, t))
+                if source is not None:
+                    self._entries.move_to_end((key, t))
+                    return source, False
+        return None, False
+
+    def _store(self, key: FileKey, tier: int, entry: tuple[np.ndarray, int]) -> None:
+        nbytes = entry[0].nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((key, tier), None)
+            if old is not None:
+                self._bytes -= old[0].nbytes
+            self._entries[(key, tier)] = entry
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.stats.evictions += 1
+
+    def get_rgb(
+        self, path: str, min_side: int | None = None, *, upright: bool = False
+    ) -> np.ndarray:
+        """Read-only ``(H, W, 3)`` ``uint8`` RGB with shorter side >= ``min_side``.
+
+        Images smaller than the request are returned at their own size. Pixels are
+        in stored order unless ``upright``, which applies the EXIF orientation (as
+        ``cv2.imread`` does).
+        """
+        tier = size_tier(min_side)
+        key = file_key(path)
+        cached, exact = self._lookup(key, tier)
+        if cached is not None and exact:
+            self.stats.hits += 1
+            array, orientation = cached
+        else:
+            if cached is not None:
+                self.stats.derived += 1
+                source, orientation = cached
+                array = np.asarray(_shrink(Image.fromarray(source), tier))
+            else:
+                self.stats.misses += 1
+                array, orientation = _decode(path, tier)
+            array.flags.writeable = False
+            self._store(key, tier, (array, orientation))
+        return orient(array, orientation) if upright else array
+
+    def get_image(
+        self, path: str, min_side: int | None = None, *, upright: bool = False
+    ) -> Image.Image:
+        """PIL RGB image form of :meth:`get_rgb` (safe to modify; copy-on-write)."""
+        return Image.fromarray(
+            np.ascontiguousarray(self.get_rgb(path, min_side, upright=upright))
+        )
+
+
+_default_cache: DecodeCache | None = None
+_default_lock = threading.Lock()
+
+
+def decode_cache() -> DecodeCache:
+    """Process-wide cache shared by every plugin."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DecodeCache()
+        return _default_cache
+
+
+def load_rgb(
+    path: str, min_side: int | None = None, *, upright: bool = False
+) -> np.ndarray:
+    """:meth:`DecodeCache.get_rgb` on the shared cache."""
+    return decode_cache().get_rgb(path, min_side, upright=upright)
+
+
+def load_image(
+    path: str, min_side: int | None = None, *, upright: bool = False
+) -> Image.Image:
+    """:meth:`DecodeCache.get_image` on the shared cache."""
+    return decode_cache().get_image(path, min_side, upright=upright)
@@ -0,0 +1,225 @@
+"""
+Bounded, retrying scheduler for Ollama requests, shared by the summary plugins.
+
+Image and text summaries used to call Ollama one request at a time behind a
+per-plugin lock. They now submit through one process-wide ``OllamaScheduler``:
+up to ``RESCUEBOX_OLLAMA_CONCURRENCY`` requests (default 2) are in flight
+against the server at once, across every job and plugin, and the rest wait for
+a slot. Set it to match the server's ``OLLAMA_NUM_PARALLEL``.
+
+Overload and connection errors (HTTP 408/429/5xx, refused connections,
+timeouts) are retried up to ``RESCUEBOX_OLLAMA_RETRIES`` times (default 3)
+with jittered exponential backoff from ``RESCUEBOX_OLLAMA_BACKOFF_SECS``
+(default 0.5). The slot is kept while backing off, so a struggling server
+sees less load, not more.
+
+Every request records its queue wait, latency and attempts; ``summary(tag)``
+gives counts and percentiles for one job.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import ollama
+import rb.lib.ollama  # noqa: F401  (sets OLLAMA_HOST)
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CONCURRENCY = 2
+_DEFAULT_RETRIES = 3
+_DEFAULT_BACKOFF_SECS = 0.5
+_MAX_BACKOFF_SECS = 30.0
+_RETRY_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+_METRICS_KEPT = 2000
+
+
+def ollama_concurrency() -> int:
+    """Requests in flight against Ollama (``RESCUEBOX_OLLAMA_CONCURRENCY``)."""
+    return max(
+        1,
+        int(os.getenv("RESCUEBOX_OLLAMA_CONCURRENCY", str(_DEFAULT_CONCURRENCY))),
+    )
+
+
+def ollama_retries() -> int:
+    """Retries after a transient failure (``RESCUEBOX_OLLAMA_RETRIES``)."""
+    return max(0, int(os.getenv("RESCUEBOX_OLLAMA_RETRIES", str(_DEFAULT_RETRIES))))
+
+
+def ollama_backoff_secs() -> float:
+    """First retry delay; doubles per attempt (``RESCUEBOX_OLLAMA_BACKOFF_SECS``)."""
+    return max(
+        0.0,
+        float(os.getenv("RESCUEBOX_OLLAMA_BACKOFF_SECS", str(_DEFAULT_BACKOFF_SECS))),
+    )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Overload / connection failures worth another attempt (not bad requests)."""
+    if isinstance(exc, ollama.ResponseError):
+        return exc.status_code in _RETRY_STATUS
+    return isinstance(exc, (ConnectionError, httpx.TransportError))
+
+
+@dataclass(frozen=True)
+class RequestMetric:
+    model: str
+    tag: str | None
+    images: int
+    queue_secs: float
+    latency_secs: float
+    attempts: int
+    ok: bool
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class OllamaScheduler:
+    """
+    Concurrency window, retries and latency metrics around ``generate``.
+
+    With ``host`` the scheduler uses its own ``ollama.Client``; otherwise the
+    module-level ``ollama.generate`` (``OLLAMA_HOST``).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        *,
+        retries: int | None = None,
+        backoff_secs: float | None = None,
+        host: str | None = None,
+    ):
+        self.max_concurrency = max_concurrency or ollama_concurrency()
+        self._retries = ollama_retries() if retries is None else retries
+        self._backoff = ollama_backoff_secs() if backoff_secs is None else backoff_secs
+        self._client = ollama.Client(host=host) if host else None
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._metrics: deque[RequestMetric] = deque(maxlen=_METRICS_KEPT)
+        self._metrics_lock = threading.Lock()
+
+    def _call(
+        self,
+        model: str,
+        prompt: str,
+        images: Sequence[str] | None,
+        options: Mapping[str, Any] | None,
+    ):
+        generate = self._client.generate if self._client else ollama.generate
+        kwargs: dict[str, Any] = {}
+        if images:
+            kwargs["images"] = list(images)
+        if options:
+            kwargs["options"] = dict(options)
+        return generate(model, prompt, **kwargs)
+
+    def _delay(self, attempt: int) -> float:
+        return min(_MAX_BACKOFF_SECS, self._backoff * 2 ** (attempt - 1)) * (
+            0.5 + random.random() / 2
+        )
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        *,
+        images: Sequence[str] | None = None,
+        options: Mapping[str, Any] | None = None,
+        tag: str | None = None,
+    ) -> Any:
+        """
+        ``generate(model, prompt[, images, options])`` once a slot is free, with retries.
+
+        ``options`` are Ollama model options (e.g. ``num_ctx``). ``tag`` groups
+        the request's metrics (e.g. one job's output folder).
+        """
+        queued = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            attempts = 0
+            ok = False
+            try:
+                while True:
+                    attempts += 1
+                    try:
+                        response = self._call(model, prompt, images, options)
+                        ok = True
+                        return response
+                    except Exception as exc:
+                        if attempts > self._retries or not is_retryable(exc):
+                            raise
+                        delay = self._delay(attempts)
+                        logger.warning(
+                            "Ollama %s attempt %d failed (%s); retrying in %.1fs",
+                            model,
+                            attempts,
+                            exc,
+                            delay,
+                        )
+                        time.sleep(delay)
+            finally:
+                metric = RequestMetric(
+                    model=model,
+                    tag=tag,
+                    images=len(images or ()),
+                    queue_secs=started - queued,
+                    latency_secs=time.perf_counter() - started,
+                    attempts=attempts,
+                    ok=ok,
+                )
+                with self._metrics_lock:
+                    self._metrics.append(metric)
+                logger.debug("Ollama request: %s", metric)
+
+    def metrics(self, tag: str | None = None) -> list[RequestMetric]:
+        """Recent request metrics (all, or those for ``tag``)."""
+        with self._metrics_lock:
+            return [m for m in self._metrics if tag is None or m.tag == tag]
+
+    def summary(self, tag: str | None = None) -> dict[str, float | int]:
+        """Counts and latency percentiles (seconds) for recent requests."""
+        metrics = self.metrics(tag)
+        if not metrics:
+            return {"requests": 0}
+        latencies = [m.latency_secs for m in metrics]
+        return {
+            "requests": len(metrics),
+            "failed": sum(not m.ok for m in metrics),
+            "retries": sum(m.attempts - 1 for m in metrics),
+            "p50_secs": round(_percentile(latencies, 0.5), 3),
+            "p95_secs": round(_percentile(latencies, 0.95), 3),
+            "max_secs": round(max(latencies), 3),
+            "mean_queue_secs": round(
+                sum(m.queue_secs for m in metrics) / len(metrics), 3
+            ),
+        }
+
+
+_SCHEDULER: OllamaScheduler | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> OllamaScheduler:
+    """The process-wide scheduler, so all plugins share one concurrency window."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = OllamaScheduler()
+            logger.info(
+                "Ollama scheduler: %d concurrent request(s)",
+                _SCHEDULER.max_concurrency,
+            )
+        return _SCHEDULER
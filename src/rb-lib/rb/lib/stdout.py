@@ -1,7 +1,13 @@
+import contextvars
 import io
+import logging
+import queue
 import sys
+import threading
 from io import StringIO
 
+logger = logging.getLogger(__name__)
+
 
 class Capturing(list):
     def __enter__(self):
@@ -15,24 +21,89 @@ class Capturing(list):
         sys.stdout = self._stdout
 
 
-def capture_stdout_as_generator(func, *args, **kwargs):
-    import sys
+class _LineQueue(io.TextIOBase):
+    """stdout stand-in that hands each complete line to a queue."""
 
-    old_stdout = sys.stdout
-    sys.stdout = buffer = io.StringIO()
+    def __init__(self, lines: queue.Queue) -> None:
+        super().__init__()
+        self._lines = lines
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            *done, self._partial = (self._partial + text).split("\n")
+            for line in done:
+                self._lines.put(line)
+        return len(text)
+
+    def finish(self) -> None:
+        with self._lock:
+            if self._partial:
+                self._lines.put(self._partial)
+                self._partial = ""
+
+
+_DONE = object()
+# Set inside capture_stdout_as_generator, i.e. for ``streaming=true`` API calls.
+_STREAMING: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "rb_stdout_streaming", default=False
+)
 
-    try:
-        func(*args, **kwargs)  # Run the function
-        sys.stdout.flush()
-        buffer.seek(0)
 
-        while True:
-            line = buffer.readline()
-            if not line:
-                break  # Stop streaming when done
+def capture_stdout_as_generator(func, *args, **kwargs):
+    """
+    Run ``func`` and yield each line it prints, as soon as it is printed.
+
+    ``func`` runs in a worker thread (with the caller's context, so the job id
+    for progress reporting carries over); exceptions are re-raised after the
+    last line.
+    """
+    lines: queue.Queue = queue.Queue()
+    writer = _LineQueue(lines)
+    errors: list[BaseException] = []
+    context = contextvars.copy_context()
+    context.run(_STREAMING.set, True)
 
-            print(f"Debug: Captured output -> {line.strip()}")  # Debugging print
-            yield line.strip()  # Ensure it's yielding non-empty lines
+    def _run() -> None:
+        try:
+            context.run(func, *args, **kwargs)
+        except BaseException as exc:  # re-raised in the consumer
+            errors.append(exc)
+        finally:
+            writer.finish()
+            lines.put(_DONE)
 
+    old_stdout = sys.stdout
+    sys.stdout = writer
+    worker = threading.Thread(target=_run, name="capture-stdout", daemon=True)
+    try:
+        worker.start()
+        while (line := lines.get()) is not _DONE:
+            logger.debug("Captured output -> %s", line.strip())
+            yield line.strip()
+        worker.join()
     finally:
         sys.stdout = old_stdout
+    if errors:
+        raise errors[0]
+
+
+def is_streaming() -> bool:
+    """True while the command runs under :func:`capture_stdout_as_generator`."""
+    return _STREAMING.get()
+
+
+def emit_result(response) -> None:
+    """
+    Print one result (a pydantic response model) as a JSON line when streaming.
+
+    With ``streaming=true`` the API turns each line into a ``ResponseBody``
+    while the command is still running. Otherwise nothing is printed; the
+    caller gets the results from the command's return value.
+    """
+    if _STREAMING.get():
+        print(response.model_dump_json(), flush=True)
@@ -0,0 +1,248 @@
+"""
+Summary cache shared by the text and image summary plugins.
+
+LLM summaries are stored under ``(input SHA-256, kind, model, prompt version)``;
+``kind`` names the plugin and the prompt version is a hash of its prompt
+templates. Re-running a folder serves unchanged files from the cache without
+calling Ollama; input digests come from ``file_fingerprint`` (stat-keyed, so
+unchanged files are not re-read). Parts of files (e.g. document chunks) are
+cached by the digest of their text with ``lookup_digests`` / ``store_digest``.
+
+When a plugin's prompt templates change, the first job with the new version
+deletes that kind's summaries made with any other version, so stale output is
+never served and the table does not grow with dead entries.
+
+One SQLite file (WAL, busy_timeout) at ``{RESCUEBOX_SUMMARY_CACHE_DB}`` or
+``~/.rescuebox/data/summaries.db`` (``%LOCALAPPDATA%\\RescueBox\\data`` on Windows).
+``RESCUEBOX_SUMMARY_CACHE=0`` turns the cache off. Cache errors are logged
+and the job carries on uncached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import platform
+import sqlite3
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+
+from rb.lib.file_fingerprint import cached_sha256_many
+
+logger = logging.getLogger(__name__)
+
+_BUSY_TIMEOUT_MS = 15_000
+_TABLE = "summaries"
+# SQLite's default host-parameter limit is 999 on older builds.
+_LOOKUP_CHUNK = 500
+
+
+def summary_cache_db_path() -> Path:
+    """SQLite file holding the summary table."""
+    env = os.getenv("RESCUEBOX_SUMMARY_CACHE_DB")
+    if env:
+        path = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        base = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        path = base / "RescueBox" / "data" / "summaries.db"
+    else:
+        path = Path.home() / ".rescuebox" / "data" / "summaries.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def summary_cache_enabled() -> bool:
+    """``RESCUEBOX_SUMMARY_CACHE=0`` disables the cache."""
+    return os.getenv("RESCUEBOX_SUMMARY_CACHE", "1") != "0"
+
+
+def prompt_version(*templates: str) -> str:
+    """Short hash of the prompt templates; changes whenever any template does."""
+    h = hashlib.sha256()
+    for template in templates:
+        h.update(template.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+        "sha256 TEXT NOT NULL, kind TEXT NOT NULL, model TEXT NOT NULL, "
+        "prompt TEXT NOT NULL, text TEXT NOT NULL, source_path TEXT, "
+        "updated_at TEXT, PRIMARY KEY (sha256, kind, model, prompt))"
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class SummaryCache:
+    """
+    One job's view of the cache for ``kind`` / ``model`` / ``prompt``.
+
+    ``lookup`` serves unchanged inputs; ``store`` saves new summaries; ``stats``
+    counts hits, misses, stores and invalidated entries for the job response.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        model: str,
+        prompt: str,
+        *,
+        enabled: bool | None = None,
+        db_path: Path | None = None,
+    ):
+        self.kind = kind
+        self.model = model
+        self.prompt = prompt
+        self.enabled = summary_cache_enabled() if enabled is None else enabled
+        self._db_path = db_path
+        self._digests: dict[str, str] = {}
+        self._checked_stale = False
+        self.hits = self.misses = self.stored = self.invalidated = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        return _connect(self._db_path or summary_cache_db_path())
+
+    def invalidate_stale(self) -> int:
+        """Delete this kind's summaries made with another prompt version."""
+        self._checked_stale = True
+        conn = self._conn()
+        try:
+            removed = conn.execute(
+                f"DELETE FROM {_TABLE} WHERE kind = ? AND prompt != ?",
+                (self.kind, self.prompt),
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        if removed:
+            logger.info(
+                "Summary cache: dropped %d %s summaries from older prompts",
+                removed,
+                self.kind,
+            )
+        self.invalidated += removed
+        return removed
+
+    def _select(self, digests: list[str]) -> dict[str, str]:
+        conn = self._conn()
+        try:
+            stored: dict[str, str] = {}
+            for i in range(0, len(digests), _LOOKUP_CHUNK):
+                chunk = digests[i : i + _LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT sha256, text FROM {_TABLE} WHERE kind = ? "
+                    f"AND model = ? AND prompt = ? AND sha256 IN ({marks})",
+                    [self.kind, self.model, self.prompt, *chunk],
+                ).fetchall()
+                stored.update(rows)
+            return stored
+        finally:
+            conn.close()
+
+    def lookup(self, paths: Iterable[str]) -> dict[str, str]:
+        """``{path: summary}`` for inputs already summarized with this model and prompt."""
+        paths = [str(p) for p in paths]
+        if not self.enabled or not paths:
+            self.misses += len(paths)
+            return {}
+        try:
+            self._digests.update(cached_sha256_many(paths))
+            wanted = sorted({self._digests[p] for p in paths if p in self._digests})
+            stored: dict[str, str] = {}
+            if wanted:
+                if not self._checked_stale:
+                    self.invalidate_stale()
+                stored = self._select(wanted)
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("Summary cache unavailable (%s); summarizing all", exc)
+            self.enabled = False
+            self.misses += len(paths)
+            return {}
+        found = {
+            p: stored[self._digests[p]] for p in paths if self._digests.get(p) in stored
+        }
+        self.hits += len(found)
+        self.misses += len(paths) - len(found)
+        logger.info(
+            "Summary cache (%s, %s): %d cached, %d to summarize",
+            self.kind,
+            self.model,
+            len(found),
+            len(paths) - len(found),
+        )
+        return found
+
+    def lookup_digests(self, digests: Iterable[str]) -> dict[str, str]:
+        """``{digest: summary}`` for content hashes already summarized."""
+        wanted = sorted(set(digests))
+        if not self.enabled or not wanted:
+            self.misses += len(wanted)
+            return {}
+        try:
+            if not self._checked_stale:
+                self.invalidate_stale()
+            found = self._select(wanted)
+        except sqlite3.Error as exc:
+            logger.warning("Summary cache unavailable (%s); summarizing all", exc)
+            self.enabled = False
+            self.misses += len(wanted)
+            return {}
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def store(self, path: str, text: str) -> None:
+        """Save the summary of ``path`` (hashed by an earlier ``lookup``)."""
+        digest = self._digests.get(str(path))
+        if digest is not None:
+            self.store_digest(digest, text, source_path=str(path))
+
+    def store_digest(
+        self, digest: str, text: str, *, source_path: str | None = None
+    ) -> None:
+        """Save the summary of the content hashed to ``digest``."""
+        if not self.enabled:
+            return
+        try:
+            conn = self._conn()
+            try:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {_TABLE} "
+                    "(sha256, kind, model, prompt, text, source_path, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        digest,
+                        self.kind,
+                        self.model,
+                        self.prompt,
+                        text,
+                        source_path,
+                        datetime.now(timezone.utc).isoformat(),
+                    ),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            logger.warning(
+                "Summary cache: could not store %s: %s", source_path or digest, exc
+            )
+            return
+        self.stored += 1
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "invalidated": self.invalidated,
+        }
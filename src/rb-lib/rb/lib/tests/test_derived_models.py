@@ -0,0 +1,23 @@
+"""Tests for the derived-model location."""
+
+import os
+
+from rb.lib.derived_models import derived_model_dir, derived_model_path
+
+
+def test_derived_paths_follow_the_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_DERIVED_MODEL_DIR", str(tmp_path / "models"))
+    src = tmp_path / "pkg" / "model.onnx"
+    src.parent.mkdir()
+    src.write_bytes(b"v1")
+
+    first = derived_model_path("plugin", src, "text")
+    assert first.parent == derived_model_dir("plugin") == tmp_path / "models" / "plugin"
+    assert first.name.startswith("model.") and first.name.endswith(".text.onnx")
+    assert derived_model_path("plugin", src, "text") == first
+    assert derived_model_path("plugin", src, "image") != first
+
+    src.write_bytes(b"v2, updated")
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert derived_model_path("plugin", src, "text") != first
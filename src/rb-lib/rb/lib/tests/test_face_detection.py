@@ -0,0 +1,165 @@
+"""Tests for the shared face detector (sessions, batching, per-file box cache)."""
+
+import os
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+from rb.lib import face_detection
+from rb.lib.face_detection import FaceDetector, decode_faces, get_session
+
+
+class _FakeDetector:
+    """RFB-640-shaped outputs: one face whose position follows image brightness."""
+
+    def __init__(self, batch_dim="batch"):
+        self._inputs = [SimpleNamespace(name="input", shape=[batch_dim, 3, 480, 640])]
+        self.batches: list[int] = []
+
+    def get_inputs(self):
+        return self._inputs
+
+    def run(self, _names, feed):
+        x = feed["input"]
+        self.batches.append(len(x))
+        m = np.tanh(x.mean(axis=(1, 2, 3)))
+        scores = np.stack([0.1 - 0.05 * m, 0.9 + 0.05 * m], axis=1)[:, None, :]
+        left = 0.3 + 0.2 * m
+        boxes = np.stack([left, left, left + 0.2, left + 0.3], axis=1)[:, None, :]
+        return [scores.astype(np.float32), boxes.astype(np.float32)]
+
+
+@pytest.fixture(autouse=True)
+def _dbs(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_FACE_CACHE_DB", str(tmp_path / "faces.db"))
+
+
+def _images(tmp_path, n=5):
+    paths = []
+    for i in range(n):
+        pixels = np.full((300 + 10 * i, 400, 3), 20 * i, dtype=np.uint8)
+        path = tmp_path / f"img_{i}.jpg"
+        Image.fromarray(pixels).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_decode_faces_nms_and_scaling():
+    scores = np.array([[0.9, 0.1], [0.1, 0.9], [0.2, 0.8], [0.05, 0.95]], np.float32)
+    boxes = np.array(
+        [
+            [0.0, 0.0, 0.1, 0.1],
+            [0.1, 0.1, 0.5, 0.5],
+            [0.11, 0.11, 0.5, 0.5],  # overlaps the one above -> suppressed
+            [0.6, 0.6, 0.9, 0.8],
+        ],
+        np.float32,
+    )
+    faces = decode_faces(200, 100, scores, boxes, threshold=0.7)
+    assert faces.boxes.dtype == np.int32
+    assert faces.boxes.tolist() == [[120, 60, 180, 80], [20, 10, 100, 50]]
+    assert faces.largest() == 1
+    empty = decode_faces(200, 100, scores[:1], boxes[:1])
+    assert len(empty) == 0 and empty.largest() is None
+
+
+def test_detect_paths_batches_and_caches(tmp_path):
+    paths = _images(tmp_path)
+    session = _FakeDetector()
+    detector = FaceDetector(session, "fake", batch_size=2)
+    first = detector.detect_paths(paths)
+    assert set(first) == set(paths)
+    assert session.batches == [2, 2, 1]
+
+    # Another detector instance (another plugin) over the same files: no inference.
+    other = FaceDetector(_FakeDetector(), "fake", batch_size=2)
+    again = other.detect_paths(paths)
+    assert other.session.batches == []
+    for p in paths:
+        assert np.array_equal(again[p].boxes, first[p].boxes)
+        assert (again[p].width, again[p].height) == (400, first[p].height)
+
+
+def test_cache_is_per_detector_and_threshold(tmp_path):
+    paths = _images(tmp_path, 2)
+    FaceDetector(_FakeDetector(), "fake").detect_paths(paths)
+    assert FaceDetector(_FakeDetector(), "other").lookup(paths) == {}
+    assert FaceDetector(_FakeDetector(), "fake", threshold=0.5).lookup(paths) == {}
+
+
+def test_modified_file_is_redetected(tmp_path):
+    paths = _images(tmp_path, 1)
+    detector = FaceDetector(_FakeDetector(), "fake")
+    detector.detect_paths(paths)
+    Image.fromarray(np.zeros((50, 60, 3), np.uint8)).save(paths[0])
+    st = os.stat(paths[0])
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    faces = detector.detect_paths(paths)[paths[0]]
+    assert (faces.width, faces.height) == (60, 50)
+    assert len(detector.session.batches) == 2
+
+
+def test_lookup_uses_inode_index(tmp_path):
+    conn = face_detection._connect(tmp_path / "faces.db")
+    try:
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT boxes FROM face_boxes "
+                "WHERE detector = ? AND threshold = ? AND st_ino IN (?, ?)",
+                ("fake", 0.7, 1, 2),
+            )
+        )
+    finally:
+        conn.close()
+    assert "USING INDEX" in plan and "SCAN face_boxes" not in plan
+
+
+def test_unusable_cache_falls_back_to_detection(tmp_path, monkeypatch):
+    paths = _images(tmp_path, 2)
+    # A directory cannot be opened as a database.
+    monkeypatch.setenv("RESCUEBOX_FACE_CACHE_DB", str(tmp_path))
+    detector = FaceDetector(_FakeDetector(), "fake")
+    assert set(detector.detect_paths(paths)) == set(paths)
+    assert detector.session.batches == [2]
+
+
+def test_fixed_batch_session_runs_one_image_at_a_time(tmp_path):
+    paths = _images(tmp_path, 3)
+    detector = FaceDetector(_FakeDetector(batch_dim=1), "fake", use_cache=False)
+    detector.detect_paths(paths)
+    assert detector.session.batches == [1, 1, 1]
+
+
+def test_unreadable_files_are_skipped(tmp_path):
+    paths = _images(tmp_path, 1)
+    bad = tmp_path / "broken.jpg"
+    bad.write_bytes(b"not an image")
+    found = FaceDetector(_FakeDetector(), "fake").detect_paths([*paths, str(bad)])
+    assert set(found) == set(paths)
+
+
+def test_session_shared_across_model_copies(tmp_path, monkeypatch):
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["x"], ["y"])],
+        "identity",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    a = tmp_path / "a" / "detector.onnx"
+    a.parent.mkdir()
+    onnx.save(model, str(a))
+    b = tmp_path / "b.onnx"
+    shutil.copy(a, b)
+
+    monkeypatch.setattr(face_detection, "_SESSIONS", {})
+    assert get_session(a) is get_session(b)
+    assert get_session(a, cpu_only=True) is not get_session(a)
@@ -0,0 +1,76 @@
+"""Tests for the stat-keyed SHA-256 fingerprint cache."""
+
+import hashlib
+import os
+
+import pytest
+from rb.lib import file_fingerprint
+from rb.lib.file_fingerprint import cached_sha256, cached_sha256_many
+
+
+def _write(path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_cold_hash_matches_hashlib(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    paths = [_write(tmp_path / f"{i}.bin", os.urandom(1000 + i)) for i in range(20)]
+    got = cached_sha256_many(paths, max_workers=4)
+    for p in paths:
+        with open(p, "rb") as f:
+            assert got[p] == hashlib.sha256(f.read()).hexdigest()
+
+
+def test_unchanged_file_is_not_reread(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    p = _write(tmp_path / "a.jpg", b"image bytes")
+    first = cached_sha256(p)
+
+    def _fail(path):
+        raise AssertionError(f"re-read {path}")
+
+    monkeypatch.setattr(file_fingerprint, "sha256_file", _fail)
+    assert cached_sha256_many([p]) == {p: first}
+
+
+def test_modified_file_is_rehashed(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    p = _write(tmp_path / "a.jpg", b"before")
+    st = os.stat(p)
+    cached_sha256(p)
+    (tmp_path / "a.jpg").write_bytes(b"after!")
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cached_sha256(p) == hashlib.sha256(b"after!").hexdigest()
+
+
+def test_unreadable_paths_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    good = _write(tmp_path / "ok.png", b"ok")
+    missing = str(tmp_path / "missing.png")
+    assert list(cached_sha256_many([good, missing])) == [good]
+    with pytest.raises(OSError):
+        cached_sha256(missing)
+
+
+def test_lookup_uses_inode_index(tmp_path):
+    conn = file_fingerprint._connect(tmp_path / "fp.db")
+    try:
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT sha256 FROM file_sha256 "
+                "WHERE st_ino IN (?, ?)",
+                (1, 2),
+            )
+        )
+    finally:
+        conn.close()
+    assert "USING INDEX" in plan and "SCAN file_sha256" not in plan
+
+
+def test_unusable_cache_falls_back_to_hashing(tmp_path, monkeypatch):
+    # A directory cannot be opened as a database.
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path))
+    p = _write(tmp_path / "a.jpg", b"image bytes")
+    assert cached_sha256_many([p]) == {p: hashlib.sha256(b"image bytes").hexdigest()}
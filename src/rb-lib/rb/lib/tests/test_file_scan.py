@@ -0,0 +1,82 @@
+"""Tests for the shared os.scandir directory scanner."""
+
+import os
+
+from rb.lib import file_scan
+from rb.lib.file_scan import iter_files, scan_files, sniff_image_type
+
+_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 16
+
+
+def _tree(root):
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "top.JPG").write_bytes(_JPEG)
+    (root / "notes.txt").write_text("x")
+    (root / "a" / "mid.png").write_bytes(_PNG)
+    (root / "a" / "b" / "deep.jpeg").write_bytes(_JPEG)
+    (root / "a" / "b" / "renamed.dat").write_bytes(_PNG)
+    (root / "a" / "b" / "fake.png").write_text("not an image")
+
+
+def test_recursive_extension_filter(tmp_path):
+    _tree(tmp_path)
+    got = scan_files(tmp_path, extensions=["jpg", ".jpeg", ".PNG"], max_workers=3)
+    assert got == sorted(
+        [
+            str(tmp_path / "top.JPG"),
+            str(tmp_path / "a" / "mid.png"),
+            str(tmp_path / "a" / "b" / "deep.jpeg"),
+            str(tmp_path / "a" / "b" / "fake.png"),
+        ]
+    )
+
+
+def test_non_recursive(tmp_path):
+    _tree(tmp_path)
+    assert scan_files(tmp_path, recursive=False) == sorted(
+        [str(tmp_path / "notes.txt"), str(tmp_path / "top.JPG")]
+    )
+
+
+def test_magic_filter_finds_renamed_and_drops_fakes(tmp_path):
+    _tree(tmp_path)
+    got = scan_files(tmp_path, check_magic=True)
+    assert str(tmp_path / "a" / "b" / "renamed.dat") in got
+    assert str(tmp_path / "a" / "b" / "fake.png") not in got
+    assert str(tmp_path / "notes.txt") not in got
+    assert sniff_image_type(str(tmp_path / "a" / "mid.png")) == "png"
+
+
+def test_iter_files_streams(tmp_path):
+    _tree(tmp_path)
+    it = iter_files(tmp_path, extensions=[".jpg"])
+    assert next(it) == str(tmp_path / "top.JPG")
+    it.close()
+
+
+def test_snapshot_skips_unchanged_directories(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_SCAN_SNAPSHOT_DB", str(tmp_path / "snap.db"))
+    root = tmp_path / "evidence"
+    root.mkdir()
+    _tree(root)
+    old = 1_000_000_000_000_000_000
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(old, old))
+    first = scan_files(root, snapshot=True)
+
+    listed = []
+    real_scandir = os.scandir
+
+    def _spy(path):
+        listed.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(file_scan.os, "scandir", _spy)
+    assert scan_files(root, snapshot=True) == first
+    assert listed == []
+
+    (root / "a" / "new.png").write_bytes(_PNG)
+    again = scan_files(root, snapshot=True)
+    assert str(root / "a" / "new.png") in again
+    assert listed == [str(root / "a")]
@@ -0,0 +1,129 @@
+"""Tests for the shared tiered image decode cache."""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+from rb.lib import image_cache
+from rb.lib.image_cache import DecodeCache, size_tier
+
+
+def _write_jpeg(path, size=(1600, 1200), seed=0) -> str:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path, quality=90)
+    return str(path)
+
+
+@pytest.fixture
+def count_opens(monkeypatch):
+    opened: list[str] = []
+    real_open = Image.open
+
+    def _open(fp, *args, **kwargs):
+        opened.append(str(fp))
+        return real_open(fp, *args, **kwargs)
+
+    monkeypatch.setattr(image_cache.Image, "open", _open)
+    return opened
+
+
+def test_size_tiers():
+    assert size_tier(None) == 0
+    assert size_tier(100) == 224
+    assert size_tier(224) == 224
+    assert size_tier(352) == 384
+    assert size_tier(600) == 640
+    assert size_tier(1024) == 0
+
+
+def test_tier_has_requested_shorter_side(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg")
+    cache = DecodeCache(max_bytes=64 << 20)
+    rgb = cache.get_rgb(path, min_side=384)
+    assert rgb.dtype == np.uint8 and rgb.shape == (384, 512, 3)
+    assert not rgb.flags.writeable
+    full = cache.get_rgb(path)
+    assert full.shape == (1200, 1600, 3)
+
+
+def test_small_image_is_not_upscaled(tmp_path):
+    path = _write_jpeg(tmp_path / "small.jpg", size=(100, 80))
+    assert DecodeCache().get_rgb(path, min_side=224).shape == (80, 100, 3)
+
+
+def test_repeat_and_smaller_requests_do_not_reread(tmp_path, count_opens):
+    path = _write_jpeg(tmp_path / "a.jpg")
+    cache = DecodeCache(max_bytes=64 << 20)
+    first = cache.get_rgb(path, min_side=640)
+    assert cache.get_rgb(path, min_side=600) is first
+    small = cache.get_rgb(path, min_side=224)
+    assert small.shape == (224, 299, 3)
+    assert count_opens == [path]
+    assert (cache.stats.hits, cache.stats.derived, cache.stats.misses) == (1, 1, 1)
+
+
+def test_draft_decode_close_to_full_decode(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg", size=(3000, 2000))
+    cached = DecodeCache().get_image(path, min_side=384)
+    with Image.open(path) as im:
+        reference = im.convert("RGB").resize(cached.size, Image.Resampling.BICUBIC)
+    diff = np.abs(np.asarray(cached, np.int16) - np.asarray(reference, np.int16))
+    # Random noise is the worst case for DCT-domain downscaling; still close.
+    assert diff.mean() < 40
+
+
+def test_rewritten_file_is_redecoded(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg", seed=1)
+    cache = DecodeCache(max_bytes=64 << 20)
+    before = cache.get_rgb(path, min_side=224)
+    _write_jpeg(tmp_path / "a.jpg", seed=2)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    after = cache.get_rgb(path, min_side=224)
+    assert not np.array_equal(before, after)
+
+
+def test_lru_eviction_respects_budget(tmp_path):
+    paths = [_write_jpeg(tmp_path / f"{i}.jpg", seed=i) for i in range(4)]
+    one = 224 * 299 * 3
+    cache = DecodeCache(max_bytes=2 * one)
+    for p in paths:
+        cache.get_rgb(p, min_side=224)
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+    assert cache.stats.evictions == 2
+
+
+def test_zero_budget_disables_caching(tmp_path, monkeypatch, count_opens):
+    monkeypatch.setenv("RESCUEBOX_DECODE_CACHE_MB", "0")
+    path = _write_jpeg(tmp_path / "a.jpg")
+    cache = DecodeCache()
+    cache.get_rgb(path, min_side=224)
+    cache.get_rgb(path, min_side=224)
+    assert len(cache) == 0 and len(count_opens) == 2
+
+
+def test_returned_image_is_safe_to_modify(tmp_path):
+    path = _write_jpeg(tmp_path / "a.jpg")
+    cache = DecodeCache(max_bytes=64 << 20)
+    image = cache.get_image(path, min_side=224)
+    image.paste((0, 0, 0), (0, 0, 50, 50))
+    assert cache.get_rgb(path, min_side=224)[:50, :50].any()
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_upright_matches_exif_transpose(tmp_path, orientation):
+    rng = np.random.default_rng(orientation)
+    pixels = rng.integers(0, 256, (60, 90, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    exif = image.getexif()
+    exif[0x0112] = orientation
+    path = str(tmp_path / "rotated.png")
+    image.save(path, exif=exif)
+
+    cache = DecodeCache(max_bytes=64 << 20)
+    with Image.open(path) as im:
+        expected = np.asarray(ImageOps.exif_transpose(im).convert("RGB"))
+    assert np.array_equal(cache.get_rgb(path, upright=True), expected)
+    assert np.array_equal(cache.get_rgb(path), pixels)
@@ -0,0 +1,143 @@
+"""Tests for the Ollama request scheduler against a local fake Ollama server."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ollama
+import pytest
+from rb.lib.llm_scheduler import OllamaScheduler, is_retryable
+
+
+class _FakeOllama(ThreadingHTTPServer):
+    """``/api/generate`` that echoes the prompt, tracks overlap and can fail on cue."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.requests: list[dict] = []
+        self.fail_next: list[int] = []  # HTTP statuses to return first
+        self.delay = 0.05
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server: _FakeOllama = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(body)
+            status = server.fail_next.pop(0) if server.fail_next else 200
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        if status != 200:
+            payload = {"error": "server busy"}
+        else:
+            payload = {
+                "model": body["model"],
+                "created_at": "2026-01-01T00:00:00Z",
+                "response": f"echo:{body['prompt']}:{len(body.get('images') or [])}",
+                "done": True,
+            }
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def fake_ollama():
+    server = _FakeOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _run_concurrently(scheduler, prompts, **kwargs):
+    results = {}
+
+    def _one(prompt):
+        results[prompt] = scheduler.generate("m", prompt, **kwargs)
+
+    threads = [threading.Thread(target=_one, args=(p,)) for p in prompts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrency_window_bounds_inflight_requests(fake_ollama):
+    scheduler = OllamaScheduler(2, host=fake_ollama.host, retries=0)
+    results = _run_concurrently(scheduler, [f"p{i}" for i in range(6)], tag="job")
+    assert {p: r["response"] for p, r in results.items()} == {
+        f"p{i}": f"echo:p{i}:0" for i in range(6)
+    }
+    assert fake_ollama.peak == 2
+    summary = scheduler.summary("job")
+    assert summary["requests"] == 6 and summary["failed"] == 0
+    assert summary["p50_secs"] >= 0.05 and summary["mean_queue_secs"] > 0
+    assert scheduler.summary("other") == {"requests": 0}
+
+
+def test_images_are_sent(fake_ollama, tmp_path):
+    image = tmp_path / "a.png"
+    image.write_bytes(b"\x89PNG fake")
+    scheduler = OllamaScheduler(1, host=fake_ollama.host)
+    response = scheduler.generate("m", "describe", images=[str(image)] * 2)
+    assert response["response"] == "echo:describe:2"
+    assert scheduler.metrics()[0].images == 2
+
+
+def test_transient_errors_are_retried(fake_ollama):
+    fake_ollama.fail_next = [503, 429]
+    scheduler = OllamaScheduler(1, host=fake_ollama.host, retries=3, backoff_secs=0)
+    assert scheduler.generate("m", "x")["response"] == "echo:x:0"
+    assert len(fake_ollama.requests) == 3
+    [metric] = scheduler.metrics()
+    assert metric.attempts == 3 and metric.ok
+
+
+def test_gives_up_after_retries_and_on_client_errors(fake_ollama):
+    fake_ollama.fail_next = [503, 503]
+    scheduler = OllamaScheduler(1, host=fake_ollama.host, retries=1, backoff_secs=0)
+    with pytest.raises(ollama.ResponseError):
+        scheduler.generate("m", "x")
+    fake_ollama.fail_next = [400]
+    with pytest.raises(ollama.ResponseError):
+        scheduler.generate("m", "y")
+    assert len(fake_ollama.requests) == 3
+    assert scheduler.summary()["failed"] == 2
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_connection_refused_is_retried():
+    scheduler = OllamaScheduler(1, host="http://127.0.0.1:9", retries=2, backoff_secs=0)
+    with pytest.raises(ConnectionError):
+        scheduler.generate("m", "x")
+    assert scheduler.metrics()[0].attempts == 3
+
+
+def test_model_options_are_sent(fake_ollama):
+    scheduler = OllamaScheduler(1, host=fake_ollama.host)
+    scheduler.generate("m", "x", options={"num_ctx": 8192})
+    scheduler.generate("m", "y")
+    assert fake_ollama.requests[0]["options"] == {"num_ctx": 8192}
+    assert not fake_ollama.requests[1].get("options")
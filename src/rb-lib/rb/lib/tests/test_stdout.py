@@ -0,0 +1,59 @@
+"""Line-by-line stdout capture used by the API streaming path."""
+
+import threading
+from contextvars import ContextVar
+
+import pytest
+from rb.api.models import TextResponse
+from rb.lib.stdout import capture_stdout_as_generator, emit_result, is_streaming
+
+_VAR: ContextVar[str | None] = ContextVar("test_stdout_var", default=None)
+
+
+def test_lines_are_yielded_while_the_function_runs():
+    consumed = threading.Event()
+
+    def _job():
+        print("first")
+        # Only returns if "first" reached the consumer before the function ended.
+        assert consumed.wait(timeout=5)
+        print("second", end="")
+
+    lines = []
+    for line in capture_stdout_as_generator(_job):
+        lines.append(line)
+        consumed.set()
+    assert lines == ["first", "second"]
+
+
+def test_exception_is_raised_after_printed_lines():
+    def _job():
+        print("partial")
+        raise ValueError("boom")
+
+    lines = []
+    with pytest.raises(ValueError, match="boom"):
+        for line in capture_stdout_as_generator(_job):
+            lines.append(line)
+    assert lines == ["partial"]
+
+
+def test_context_is_carried_to_the_worker():
+    token = _VAR.set("job-1")
+    try:
+        assert list(capture_stdout_as_generator(lambda: print(_VAR.get()))) == ["job-1"]
+    finally:
+        _VAR.reset(token)
+
+
+def test_results_are_emitted_only_when_streaming(capsys):
+    result = TextResponse(value="face 1")
+    emit_result(result)
+    assert capsys.readouterr().out == "" and not is_streaming()
+
+    def _job():
+        assert is_streaming()
+        emit_result(result)
+
+    assert list(capture_stdout_as_generator(_job)) == [result.model_dump_json()]
+    assert not is_streaming()
@@ -0,0 +1,97 @@
+"""Tests for the content-hash keyed summary cache."""
+
+import os
+
+import pytest
+from rb.lib.summary_cache import SummaryCache, prompt_version
+
+
+@pytest.fixture(autouse=True)
+def _dbs(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CACHE_DB", str(tmp_path / "summaries.db"))
+
+
+@pytest.fixture
+def docs(tmp_path):
+    paths = []
+    for name in ("a.txt", "b.txt", "copy_of_a.txt"):
+        path = tmp_path / name
+        path.write_text("alpha" if name != "b.txt" else "beta", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+V1 = prompt_version("Summarize: {text}")
+
+
+def test_repeat_lookup_hits_and_copies_share_summaries(docs):
+    first = SummaryCache("text_summary", "gemma3:1b", V1)
+    assert first.lookup(docs) == {}
+    first.store(docs[0], "summary of alpha")
+    first.store(docs[1], "summary of beta")
+    assert first.stats() == {
+        "enabled": True,
+        "hits": 0,
+        "misses": 3,
+        "stored": 2,
+        "invalidated": 0,
+    }
+
+    again = SummaryCache("text_summary", "gemma3:1b", V1)
+    assert again.lookup(docs) == {
+        docs[0]: "summary of alpha",
+        docs[1]: "summary of beta",
+        docs[2]: "summary of alpha",  # same content, other name
+    }
+    assert again.stats()["hits"] == 3
+    assert SummaryCache("text_summary", "gemma3:4b", V1).lookup(docs) == {}
+    assert SummaryCache("image_summary", "gemma3:1b", V1).lookup(docs) == {}
+
+
+def test_edited_file_misses(docs):
+    cache = SummaryCache("text_summary", "gemma3:1b", V1)
+    cache.lookup(docs[:1])
+    cache.store(docs[0], "summary of alpha")
+    with open(docs[0], "w", encoding="utf-8") as f:
+        f.write("alpha, revised")
+    st = os.stat(docs[0])
+    os.utime(docs[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert SummaryCache("text_summary", "gemma3:1b", V1).lookup(docs[:1]) == {}
+
+
+def test_prompt_change_invalidates_old_summaries(docs):
+    old = SummaryCache("text_summary", "gemma3:1b", V1)
+    old.lookup(docs)
+    old.store(docs[0], "old summary")
+    other_kind = SummaryCache("image_summary", "gemma3:1b", V1)
+    other_kind.lookup(docs)
+    other_kind.store(docs[1], "kept")
+
+    v2 = prompt_version("Summarize briefly: {text}")
+    assert v2 != V1
+    new = SummaryCache("text_summary", "gemma3:1b", v2)
+    assert new.lookup(docs) == {}
+    assert new.stats()["invalidated"] == 1
+    # Going back to the old prompt does not resurrect the dropped entry.
+    assert SummaryCache("text_summary", "gemma3:1b", V1).lookup(docs) == {}
+    assert SummaryCache("image_summary", "gemma3:1b", V1).lookup(docs) == {
+        docs[1]: "kept"
+    }
+
+
+def test_disabled_cache(docs, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CACHE", "0")
+    cache = SummaryCache("text_summary", "gemma3:1b", V1)
+    assert cache.lookup(docs) == {}
+    cache.store(docs[0], "ignored")
+    assert cache.stats()["enabled"] is False and cache.stats()["stored"] == 0
+
+
+def test_digest_entries_for_parts_of_files():
+    cache = SummaryCache("text_summary_chunk", "gemma3:1b", V1)
+    assert cache.lookup_digests(["a" * 64, "a" * 64, "b" * 64]) == {}
+    cache.store_digest("a" * 64, "part a", source_path="/docs/report.pdf")
+    again = SummaryCache("text_summary_chunk", "gemma3:1b", V1)
+    assert again.lookup_digests(["a" * 64, "b" * 64]) == {"a" * 64: "part a"}
+    assert again.stats()["hits"] == 1 and again.stats()["misses"] == 1
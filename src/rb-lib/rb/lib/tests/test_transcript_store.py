@@ -0,0 +1,151 @@
+"""Tests for the content-hash keyed transcript store."""
+
+import os
+
+import pytest
+from rb.lib import transcript_store
+from rb.lib.transcript_store import (
+    clear_checkpoints,
+    load_checkpoints,
+    load_segments,
+    lookup_transcripts,
+    record_transcript_file,
+    save_checkpoint,
+    search_transcripts,
+    store_transcript,
+    transcripts_for_files,
+)
+
+
+@pytest.fixture(autouse=True)
+def _dbs(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_TRANSCRIPT_DB", str(tmp_path / "transcripts.db"))
+
+
+OPTS = {"vad": True, "batched_min_secs": 120.0}
+
+
+def test_store_and_lookup_round_trip():
+    assert lookup_transcripts([], "medium") == {}
+    store_transcript("a" * 64, "medium", OPTS, "hello", audio_path="/x/a.wav")
+    store_transcript("b" * 64, "medium", OPTS, "world")
+    found = lookup_transcripts(["a" * 64, "b" * 64, "c" * 64], "medium", OPTS)
+    assert found == {"a" * 64: "hello", "b" * 64: "world"}
+    # Same audio, new transcript for the same key replaces the old one.
+    store_transcript("a" * 64, "medium", OPTS, "hello again")
+    assert lookup_transcripts(["a" * 64], "medium", OPTS) == {"a" * 64: "hello again"}
+
+
+def test_model_and_options_are_part_of_the_key():
+    store_transcript("a" * 64, "medium", OPTS, "hello")
+    assert lookup_transcripts(["a" * 64], "small", OPTS) == {}
+    assert lookup_transcripts(["a" * 64], "medium", {**OPTS, "vad": False}) == {}
+    # Key order does not matter.
+    reordered = dict(reversed(list(OPTS.items())))
+    assert lookup_transcripts(["a" * 64], "medium", reordered) == {"a" * 64: "hello"}
+
+
+def test_transcript_file_served_until_edited(tmp_path):
+    txt = tmp_path / "call.txt"
+    txt.write_text("hello", encoding="utf-8")
+    other = tmp_path / "notes.txt"
+    other.write_text("not a transcript", encoding="utf-8")
+    store_transcript("a" * 64, "medium", OPTS, "hello")
+    record_transcript_file(str(txt), "a" * 64, "medium", OPTS)
+    record_transcript_file(str(tmp_path / "missing.txt"), "a" * 64, "medium", OPTS)
+
+    paths = [str(txt), str(other), str(tmp_path / "gone.txt")]
+    assert transcripts_for_files(paths) == {str(txt): "hello"}
+
+    txt.write_text("hello, edited", encoding="utf-8")
+    st = os.stat(txt)
+    os.utime(txt, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert transcripts_for_files(paths) == {}
+
+
+def test_transcript_files_lookup_uses_inode_index(tmp_path):
+    conn = transcript_store._connect(tmp_path / "transcripts.db")
+    try:
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT sha256 FROM transcript_files "
+                "WHERE st_ino IN (?, ?)",
+                (1, 2),
+            )
+        )
+    finally:
+        conn.close()
+    assert "USING INDEX" in plan and "SCAN transcript_files" not in plan
+
+
+def test_transcripts_for_files_does_not_create_the_store(tmp_path):
+    txt = tmp_path / "notes.txt"
+    txt.write_text("not a transcript", encoding="utf-8")
+    assert transcripts_for_files([str(txt)]) == {}
+    assert not (tmp_path / "transcripts.db").exists()
+
+
+def test_checkpoints_per_recording():
+    rows = [{"start": 300.0, "end": 304.5, "text": " hi"}]
+    save_checkpoint("a" * 64, "medium", OPTS, 0, 4_800_000, [])
+    save_checkpoint("a" * 64, "medium", OPTS, 4_800_000, 9_600_000, rows)
+    save_checkpoint("b" * 64, "medium", OPTS, 0, 4_800_000, rows)
+    assert load_checkpoints("a" * 64, "medium", OPTS) == {
+        (0, 4_800_000): [],
+        (4_800_000, 9_600_000): rows,
+    }
+    assert load_checkpoints("a" * 64, "small", OPTS) == {}
+    clear_checkpoints("a" * 64, "medium", OPTS)
+    assert load_checkpoints("a" * 64, "medium", OPTS) == {}
+    assert load_checkpoints("b" * 64, "medium", OPTS) == {(0, 4_800_000): rows}
+
+
+CALL = [
+    {"start": 0.0, "end": 4.0, "text": " Meet me at the dock."},
+    {
+        "start": 4.0,
+        "end": 9.5,
+        "text": " Bring the red van, don't be late.",
+        "words": {
+            "start": [4.0, 4.4, 4.6, 5.0, 5.3, 6.1, 6.4, 6.6],
+            "end": [4.4, 4.6, 5.0, 5.3, 6.0, 6.4, 6.6, 7.0],
+            "word": [" Bring", " the", " red", " van,", " don't", " be", " late.", ""],
+        },
+    },
+]
+
+
+def test_segments_round_trip_and_phrase_search():
+    text = "".join(s["text"] for s in CALL)
+    store_transcript(
+        "a" * 64, "medium", OPTS, text, segments=CALL, audio_path="/c/a.mp3"
+    )
+    other = [{"start": 30.0, "end": 33.0, "text": " The red van left."}]
+    store_transcript(
+        "b" * 64, "small", OPTS, other[0]["text"], segments=other, audio_path="/c/b.mp3"
+    )
+    assert load_segments("a" * 64, "medium", OPTS) == CALL
+
+    hits = search_transcripts("RED VAN")
+    assert [(h["audio_path"], h["offset"]) for h in hits] == [
+        ("/c/a.mp3", 4.6),  # word timing
+        ("/c/b.mp3", 30.0),  # segment start
+    ]
+    assert [h["audio_path"] for h in search_transcripts("red van", model="small")] == [
+        "/c/b.mp3"
+    ]
+    assert search_transcripts("don't be")[0]["offset"] == 5.3
+    assert search_transcripts("van red") == []
+    assert search_transcripts("  ,, ") == []
+
+    # A new transcript for the same key replaces the indexed segments.
+    store_transcript(
+        "a" * 64,
+        "medium",
+        OPTS,
+        " Nothing.",
+        segments=[{"start": 0.0, "end": 1.0, "text": " Nothing."}],
+    )
+    assert [h["audio_path"] for h in search_transcripts("red van")] == ["/c/b.mp3"]
+    assert len(search_transcripts("nothing")) == 1
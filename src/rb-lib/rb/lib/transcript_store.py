@@ -0,0 +1,500 @@
+"""
+Transcript store shared by audio transcription and the text plugins.
+
+Transcripts are stored under ``(audio SHA-256, model, options)``, so re-running
+a case returns them without running Whisper again, wherever the audio file now
+lives. Audio digests come from ``file_fingerprint`` (stat-keyed, so unchanged
+files are not re-read).
+
+Each transcript written to disk as ``<stem>.txt`` is also recorded under that
+file's stat key. ``transcripts_for_files`` returns the stored text while the
+``.txt`` is unchanged, so text-embeddings can index transcripts without reading
+them again; an edited file falls back to a normal read.
+
+Timed segments (and word timings when enabled, stored as columnar JSON
+``{"start": [...], "end": [...], "word": [...]}``) are kept with each
+transcript and indexed with FTS5, so ``search_transcripts`` finds a phrase
+across every transcript and returns the file and time offset without scanning
+text.
+
+Long recordings are transcribed in pieces; each finished segment is saved
+as a checkpoint under the same key plus its sample range, so an interrupted
+job resumes with the segments it has not done yet.
+
+One SQLite file (WAL, busy_timeout) at ``{RESCUEBOX_TRANSCRIPT_DB}`` or
+``~/.rescuebox/data/transcripts.db`` (``%LOCALAPPDATA%\\RescueBox\\data`` on Windows).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import platform
+import re
+import sqlite3
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from rb.lib.file_fingerprint import StatKey, stat_key
+
+logger = logging.getLogger(__name__)
+
+_BUSY_TIMEOUT_MS = 15_000
+_TABLE = "transcripts"
+_FILES_TABLE = "transcript_files"
+_CHECKPOINT_TABLE = "transcript_checkpoints"
+_SEGMENTS_TABLE = "transcript_segments"
+_FTS_TABLE = "transcript_segments_fts"
+# SQLite's default host-parameter limit is 999 on older builds.
+_LOOKUP_CHUNK = 500
+
+
+def transcript_db_path() -> Path:
+    """SQLite file holding the transcript tables."""
+    env = os.getenv("RESCUEBOX_TRANSCRIPT_DB")
+    if env:
+        path = Path(env).expanduser()
+    elif platform.system() == "Windows":
+        base = Path(os.getenv("LOCALAPPDATA", str(Path.home() / "AppData" / "Local")))
+        path = base / "RescueBox" / "data" / "transcripts.db"
+    else:
+        path = Path.home() / ".rescuebox" / "data" / "transcripts.db"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def options_key(options: dict[str, Any] | None) -> str:
+    """Canonical string for the transcription options that change the output."""
+    return json.dumps(options or {}, sort_keys=True, separators=(",", ":"))
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=_BUSY_TIMEOUT_MS / 1000.0)
+    conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_TABLE} ("
+        "sha256 TEXT NOT NULL, model TEXT NOT NULL, options TEXT NOT NULL, "
+        "text TEXT NOT NULL, audio_path TEXT, updated_at TEXT, "
+        "PRIMARY KEY (sha256, model, options))"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_FILES_TABLE} ("
+        "st_dev INTEGER NOT NULL, st_ino INTEGER NOT NULL, "
+        "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "sha256 TEXT NOT NULL, model TEXT NOT NULL, options TEXT NOT NULL, "
+        "path TEXT, updated_at TEXT, "
+        "PRIMARY KEY (st_dev, st_ino, size, mtime_ns))"
+    )
+    # Lookups filter on inode alone; without this index each chunk scans the table.
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {_FILES_TABLE}_ino ON {_FILES_TABLE} (st_ino)"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_CHECKPOINT_TABLE} ("
+        "sha256 TEXT NOT NULL, model TEXT NOT NULL, options TEXT NOT NULL, "
+        "start_sample INTEGER NOT NULL, end_sample INTEGER NOT NULL, "
+        "segments TEXT NOT NULL, updated_at TEXT, "
+        "PRIMARY KEY (sha256, model, options, start_sample, end_sample))"
+    )
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_SEGMENTS_TABLE} ("
+        "id INTEGER PRIMARY KEY, "
+        "sha256 TEXT NOT NULL, model TEXT NOT NULL, options TEXT NOT NULL, "
+        "seg INTEGER NOT NULL, start_secs REAL NOT NULL, end_secs REAL NOT NULL, "
+        "text TEXT NOT NULL, words TEXT)"
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {_SEGMENTS_TABLE}_key "
+        f"ON {_SEGMENTS_TABLE} (sha256, model, options)"
+    )
+    try:
+        # External-content index: the text lives once, in the segments table.
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5("
+            f"text, content='{_SEGMENTS_TABLE}', content_rowid='id')"
+        )
+    except sqlite3.OperationalError as exc:
+        logger.debug("SQLite without FTS5 (%s); phrase search scans segments", exc)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (_FTS_TABLE,),
+        ).fetchone()
+        is not None
+    )
+
+
+def _replace_segments(
+    conn: sqlite3.Connection,
+    digest: str,
+    model: str,
+    opts: str,
+    segments: list[dict[str, Any]],
+) -> None:
+    fts = _has_fts(conn)
+    key = (digest, model, opts)
+    if fts:
+        # External-content FTS rows are removed by replaying the old text.
+        conn.execute(
+            f"INSERT INTO {_FTS_TABLE} ({_FTS_TABLE}, rowid, text) "
+            f"SELECT 'delete', id, text FROM {_SEGMENTS_TABLE} "
+            "WHERE sha256 = ? AND model = ? AND options = ?",
+            key,
+        )
+    conn.execute(
+        f"DELETE FROM {_SEGMENTS_TABLE} WHERE sha256 = ? AND model = ? AND options = ?",
+        key,
+    )
+    for i, seg in enumerate(segments):
+        words = seg.get("words")
+        cur = conn.execute(
+            f"INSERT INTO {_SEGMENTS_TABLE} "
+            "(sha256, model, options, seg, start_secs, end_secs, text, words) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                i,
+                seg["start"],
+                seg["end"],
+                seg["text"],
+                json.dumps(words, separators=(",", ":")) if words else None,
+            ),
+        )
+        if fts:
+            conn.execute(
+                f"INSERT INTO {_FTS_TABLE} (rowid, text) VALUES (?, ?)",
+                (cur.lastrowid, seg["text"]),
+            )
+
+
+def lookup_transcripts(
+    digests: Iterable[str],
+    model: str,
+    options: dict[str, Any] | None = None,
+    *,
+    db_path: Path | None = None,
+) -> dict[str, str]:
+    """``{sha256: text}`` for the digests already transcribed with ``model`` / ``options``."""
+    wanted = sorted(set(digests))
+    if not wanted:
+        return {}
+    opts = options_key(options)
+    found: dict[str, str] = {}
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        for i in range(0, len(wanted), _LOOKUP_CHUNK):
+            chunk = wanted[i : i + _LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT sha256, text FROM {_TABLE} "
+                f"WHERE model = ? AND options = ? AND sha256 IN ({marks})",
+                [model, opts, *chunk],
+            ).fetchall()
+            found.update(rows)
+    finally:
+        conn.close()
+    return found
+
+
+def store_transcript(
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None,
+    text: str,
+    *,
+    segments: list[dict[str, Any]] | None = None,
+    audio_path: str | None = None,
+    db_path: Path | None = None,
+) -> None:
+    """
+    Save one transcript (replaces an earlier one for the same key).
+
+    ``segments`` are ``{"start", "end", "text"}`` dicts in seconds, with an
+    optional columnar ``"words"``; they replace the key's indexed segments.
+    """
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        if segments is not None:
+            _replace_segments(conn, digest, model, options_key(options), segments)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {_TABLE} "
+            "(sha256, model, options, text, audio_path, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                digest,
+                model,
+                options_key(options),
+                text,
+                audio_path,
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def record_transcript_file(
+    txt_path: str,
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None = None,
+    *,
+    db_path: Path | None = None,
+) -> None:
+    """Remember that ``txt_path`` (as it is now) holds the stored transcript."""
+    try:
+        key = stat_key(os.stat(txt_path))
+    except OSError as exc:
+        logger.debug("Not recording transcript file %s: %s", txt_path, exc)
+        return
+    if key is None:
+        return
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {_FILES_TABLE} "
+            "(st_dev, st_ino, size, mtime_ns, sha256, model, options, path, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                digest,
+                model,
+                options_key(options),
+                str(txt_path),
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def transcripts_for_files(
+    paths: Iterable[str], *, db_path: Path | None = None
+) -> dict[str, str]:
+    """
+    ``{path: text}`` for transcript files that are unchanged since they were written.
+
+    Other paths (not transcripts, edited, unreadable) are left out. Nothing is
+    returned, and no database is created, until a transcript has been stored.
+    """
+    keyed: dict[str, StatKey] = {}
+    for p in paths:
+        try:
+            key = stat_key(os.stat(p))
+        except OSError:
+            continue
+        if key is not None:
+            keyed[p] = key
+    if not keyed:
+        return {}
+    db_path = db_path or transcript_db_path()
+    if not db_path.is_file():
+        return {}
+    wanted = set(keyed.values())
+    texts: dict[StatKey, str] = {}
+    conn = _connect(db_path)
+    try:
+        inodes = sorted({k[1] for k in wanted})
+        for i in range(0, len(inodes), _LOOKUP_CHUNK):
+            chunk = inodes[i : i + _LOOKUP_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT f.st_dev, f.st_ino, f.size, f.mtime_ns, t.text "
+                f"FROM {_FILES_TABLE} f JOIN {_TABLE} t "
+                "ON t.sha256 = f.sha256 AND t.model = f.model "
+                "AND t.options = f.options "
+                f"WHERE f.st_ino IN ({marks})",
+                chunk,
+            ).fetchall()
+            for dev, ino, size, mtime_ns, text in rows:
+                key = (dev, ino, size, mtime_ns)
+                if key in wanted:
+                    texts[key] = text
+    finally:
+        conn.close()
+    return {p: texts[k] for p, k in keyed.items() if k in texts}
+
+
+def load_checkpoints(
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None = None,
+    *,
+    db_path: Path | None = None,
+) -> dict[tuple[int, int], list[dict[str, Any]]]:
+    """``{(start, end): segments}`` for the finished parts of one recording."""
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        rows = conn.execute(
+            f"SELECT start_sample, end_sample, segments FROM {_CHECKPOINT_TABLE} "
+            "WHERE sha256 = ? AND model = ? AND options = ?",
+            (digest, model, options_key(options)),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {(start, end): json.loads(segments) for start, end, segments in rows}
+
+
+def save_checkpoint(
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None,
+    start: int,
+    end: int,
+    segments: list[dict[str, Any]],
+    *,
+    db_path: Path | None = None,
+) -> None:
+    """Save the transcribed segments for samples ``start:end`` of one recording."""
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {_CHECKPOINT_TABLE} "
+            "(sha256, model, options, start_sample, end_sample, segments, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                digest,
+                model,
+                options_key(options),
+                start,
+                end,
+                json.dumps(segments),
+                datetime.now(timezone.utc).isoformat(),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def clear_checkpoints(
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None = None,
+    *,
+    db_path: Path | None = None,
+) -> None:
+    """Drop a recording's checkpoints once its full transcript is stored."""
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        conn.execute(
+            f"DELETE FROM {_CHECKPOINT_TABLE} "
+            "WHERE sha256 = ? AND model = ? AND options = ?",
+            (digest, model, options_key(options)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_segments(
+    digest: str,
+    model: str,
+    options: dict[str, Any] | None = None,
+    *,
+    db_path: Path | None = None,
+) -> list[dict[str, Any]]:
+    """Timed segments of one stored transcript, in order."""
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        rows = conn.execute(
+            f"SELECT start_secs, end_secs, text, words FROM {_SEGMENTS_TABLE} "
+            "WHERE sha256 = ? AND model = ? AND options = ? ORDER BY seg",
+            (digest, model, options_key(options)),
+        ).fetchall()
+    finally:
+        conn.close()
+    segments = []
+    for start, end, text, words in rows:
+        seg: dict[str, Any] = {"start": start, "end": end, "text": text}
+        if words:
+            seg["words"] = json.loads(words)
+        segments.append(seg)
+    return segments
+
+
+def _tokens(text: str) -> list[str]:
+    # Close to FTS5's unicode61 tokenizer: case-folded runs of word characters.
+    return re.findall(r"\w+", text.casefold())
+
+
+def _phrase_offset(phrase: list[str], start: float, words: str | None) -> float:
+    """Start of the first word of ``phrase`` in the segment, else the segment start."""
+    if not words or not phrase:
+        return start
+    cols = json.loads(words)
+    tokens: list[str] = []
+    owner: list[int] = []  # word index of each token ("don't" -> don, t)
+    for i, word in enumerate(cols["word"]):
+        for token in _tokens(word):
+            tokens.append(token)
+            owner.append(i)
+    for j in range(len(tokens) - len(phrase) + 1):
+        if tokens[j : j + len(phrase)] == phrase:
+            return cols["start"][owner[j]]
+    return start
+
+
+def search_transcripts(
+    phrase: str,
+    *,
+    model: str | None = None,
+    limit: int = 50,
+    db_path: Path | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Segments containing ``phrase``, across all stored transcripts.
+
+    Each hit is ``{"audio_path", "sha256", "model", "offset", "start", "end",
+    "text"}``; ``offset`` is the time of the phrase's first word when word
+    timings were stored, otherwise the segment start. Ordered by file and time.
+    """
+    words = _tokens(phrase)
+    if not words:
+        return []
+    conn = _connect(db_path or transcript_db_path())
+    try:
+        select = (
+            "SELECT t.audio_path, s.sha256, s.model, s.start_secs, s.end_secs, "
+            f"s.text, s.words FROM {_SEGMENTS_TABLE} s JOIN {_TABLE} t "
+            "ON t.sha256 = s.sha256 AND t.model = s.model AND t.options = s.options "
+        )
+        params: list[Any] = []
+        if _has_fts(conn):
+            select += (
+                f"JOIN {_FTS_TABLE} f ON f.rowid = s.id WHERE {_FTS_TABLE} MATCH ? "
+            )
+            params.append('"' + " ".join(words) + '"')
+        else:
+            select += "WHERE s.text LIKE ? "
+            params.append("%" + phrase.strip() + "%")
+        if model is not None:
+            select += "AND s.model = ? "
+            params.append(model)
+        select += "ORDER BY t.audio_path, s.start_secs LIMIT ?"
+        params.append(limit)
+        rows = conn.execute(select, params).fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            "audio_path": audio_path,
+            "sha256": digest,
+            "model": row_model,
+            "offset": _phrase_offset(words, start, word_cols),
+            "start": start,
+            "end": end,
+            "text": text,
+        }
+        for audio_path, digest, row_model, start, end, text, word_cols in rows
+    ]
@@ -0,0 +1,130 @@
+"""
+Compare the ONNX (fp32 / int8) text encoders against the PyTorch SentenceTransformer path.
+
+Chunks every text file under ``--corpus_dir`` exactly like ``/search`` does, encodes the
+chunks with each backend, and reports:
+
+* docs/sec (chunks encoded per second, model load excluded)
+* per-vector cosine between each ONNX backend and PyTorch (min / mean)
+* recall@k: overlap of each backend's top-k chunks with the PyTorch top-k, per query
+
+Exits non-zero when a backend falls below the documented tolerance in
+``text_embeddings.onnx_encoder`` (``FP32_MIN_COSINE`` / ``INT8_MIN_COSINE``).
+
+Example::
+
+    python benchmark_testing/benchmark_onnx_backend.py --corpus_dir ./docs \\
+        --queries "vehicle collision" "wire transfer" --k 10
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from rb.lib.pipeline_corpus import list_text_files_in_directory
+from text_embeddings.main import (
+    _CHUNK_OVERLAP,
+    _CHUNK_SIZE,
+    _CHUNKER,
+    _MAX_READ_BYTES_PER_FILE,
+    _MODEL_NAME,
+    _chunk_text,
+    _format_search_query,
+    _load_encoder,
+    _read_text_file_safe,
+)
+from text_embeddings.onnx_encoder import FP32_MIN_COSINE, INT8_MIN_COSINE
+
+_BATCH_SIZES = {"pytorch": 256, "onnx": 32, "onnx-int8": 32}
+_MIN_COSINE = {"onnx": FP32_MIN_COSINE, "onnx-int8": INT8_MIN_COSINE}
+
+
+def _load_chunks(corpus_dir: str, limit: int) -> list[str]:
+    chunks: list[str] = []
+    for path in list_text_files_in_directory(corpus_dir):
+        text = _read_text_file_safe(path, _MAX_READ_BYTES_PER_FILE)
+        chunks.extend(
+            _chunk_text(
+                text,
+                chunker=_CHUNKER,
+                chunk_size=_CHUNK_SIZE,
+                chunk_overlap=_CHUNK_OVERLAP,
+            )
+        )
+        if limit and len(chunks) >= limit:
+            return chunks[:limit]
+    return chunks
+
+
+def _encode(backend: str, texts: list[str]) -> tuple[np.ndarray, float]:
+    model = _load_encoder(backend, _MODEL_NAME)
+    model.encode(texts[:4], batch_size=4)  # warm-up (graph init, allocator)
+    start = time.perf_counter()
+    vecs = model.encode(
+        texts,
+        batch_size=_BATCH_SIZES[backend],
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    return np.asarray(vecs, dtype=np.float32), time.perf_counter() - start
+
+
+def _topk(doc_vecs: np.ndarray, query_vecs: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vecs @ doc_vecs.T
+    k = min(k, doc_vecs.shape[0])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return part
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus_dir", required=True, type=str)
+    parser.add_argument("--queries", nargs="+", required=True, type=str)
+    parser.add_argument("--k", default=10, type=int)
+    parser.add_argument("--limit", default=0, type=int, help="Max chunks (0 = all)")
+    parser.add_argument(
+        "--backends", nargs="+", default=["onnx", "onnx-int8"], type=str
+    )
+    args = parser.parse_args()
+
+    chunks = _load_chunks(args.corpus_dir, args.limit)
+    if not chunks:
+        print("No text chunks found", file=sys.stderr)
+        return 1
+    queries = [_format_search_query(_MODEL_NAME, q) for q in args.queries]
+
+    ref_docs, ref_secs = _encode("pytorch", chunks)
+    ref_queries, _ = _encode("pytorch", queries)
+    ref_topk = _topk(ref_docs, ref_queries, args.k)
+
+    report: dict[str, dict] = {
+        "pytorch": {"docs_per_sec": round(len(chunks) / ref_secs, 2)}
+    }
+    failed = False
+    for backend in args.backends:
+        docs, secs = _encode(backend, chunks)
+        qvecs, _ = _encode(backend, queries)
+        cos = np.sum(docs * ref_docs, axis=1)
+        topk = _topk(docs, qvecs, args.k)
+        recall = [
+            len(set(a.tolist()) & set(b.tolist())) / len(b)
+            for a, b in zip(topk, ref_topk)
+        ]
+        report[backend] = {
+            "docs_per_sec": round(len(chunks) / secs, 2),
+            "speedup_vs_pytorch": round(ref_secs / secs, 2),
+            "cosine_min": round(float(cos.min()), 5),
+            "cosine_mean": round(float(cos.mean()), 5),
+            f"recall@{args.k}": round(float(np.mean(recall)), 4),
+        }
+        if cos.min() < _MIN_COSINE.get(backend, 0.0):
+            failed = True
+
+    print(json.dumps({"chunks": len(chunks), "results": report}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
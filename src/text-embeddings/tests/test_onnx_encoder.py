@@ -0,0 +1,86 @@
+"""Tests for the ONNX text encoder backend (fake session/tokenizer, no model files)."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from text_embeddings.onnx_encoder import OnnxTextEncoder
+
+
+class _FakeTokenizer:
+    def __call__(self, texts, padding, truncation, max_length, return_tensors):
+        width = max(len(t) for t in texts)
+        ids = np.zeros((len(texts), width), dtype=np.int32)
+        mask = np.zeros_like(ids)
+        for i, t in enumerate(texts):
+            ids[i, : len(t)] = [ord(c) for c in t]
+            mask[i, : len(t)] = 1
+        return {"input_ids": ids, "attention_mask": mask}
+
+
+class _FakeSession:
+    """Returns last_hidden_state whose CLS row is (len(text), 1, 0, ...)."""
+
+    def __init__(self, output_name="last_hidden_state"):
+        self.output_name = output_name
+        self.batch_shapes = []
+
+    def get_inputs(self):
+        return [
+            SimpleNamespace(name="input_ids"),
+            SimpleNamespace(name="attention_mask"),
+        ]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name=self.output_name)]
+
+    def get_providers(self):
+        return ["CPUExecutionProvider"]
+
+    def run(self, names, feed):
+        ids = feed["input_ids"]
+        assert ids.dtype == np.int64
+        self.batch_shapes.append(ids.shape)
+        lengths = feed["attention_mask"].sum(axis=1).astype(np.float32)
+        hidden = np.zeros((ids.shape[0], ids.shape[1], 4), dtype=np.float32)
+        hidden[:, 0, 0] = lengths
+        hidden[:, 0, 1] = 1.0
+        if self.output_name == "last_hidden_state":
+            return [hidden]
+        return [hidden[:, 0, :]]
+
+
+def test_encode_cls_pooling_and_normalisation():
+    enc = OnnxTextEncoder(_FakeSession(), _FakeTokenizer())
+    vecs = enc.encode(["abc", "a"], batch_size=8)
+    assert vecs.shape == (2, 4)
+    np.testing.assert_allclose(np.linalg.norm(vecs, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(vecs[0, :2], np.array([3.0, 1.0]) / np.sqrt(10))
+
+
+def test_encode_preserves_input_order_across_length_sorted_batches():
+    session = _FakeSession()
+    enc = OnnxTextEncoder(session, _FakeTokenizer())
+    texts = ["a", "aaaa", "aa", "aaaaaaa", "aaa"]
+    vecs = enc.encode(texts, batch_size=2, normalize_embeddings=False)
+    assert vecs[:, 0].tolist() == [1.0, 4.0, 2.0, 7.0, 3.0]
+    # Longest-first: first batch is padded to 7, later batches are narrower.
+    assert [w for _, w in session.batch_shapes] == [7, 3, 1]
+
+
+def test_encode_single_string_returns_1d():
+    enc = OnnxTextEncoder(_FakeSession(), _FakeTokenizer())
+    vec = enc.encode("query: hi")
+    assert vec.ndim == 1
+
+
+@pytest.mark.parametrize("name", ["sentence_embedding", "dense_vecs"])
+def test_encode_uses_pooled_output_when_exported(name):
+    enc = OnnxTextEncoder(_FakeSession(output_name=name), _FakeTokenizer())
+    vecs = enc.encode(["ab"], normalize_embeddings=False)
+    assert vecs[0, :2].tolist() == [2.0, 1.0]
+
+
+def test_encode_empty_input():
+    enc = OnnxTextEncoder(_FakeSession(), _FakeTokenizer())
+    assert enc.encode([]).shape == (0, 1024)
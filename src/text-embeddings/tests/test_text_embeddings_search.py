@@ -1,14 +1,19 @@
 """Tests for text embeddings search functionality."""
 
+import sqlite3
 from pathlib import Path
 
 import pytest
 from rb.api.models import BatchFileInput, FileInput, TextInput
 from rb.lib.pipeline_corpus import resolve_text_file_corpus_paths
+from text_embeddings import main as text_embeddings_main
 from text_embeddings.main import (
     Inputs,
     Parameters,
     TextCorpusDirectory,
+    _cap_text_bytes,
+    _read_text_file_safe,
+    _stored_transcripts,
     search,
     task_schema,
 )
@@ -104,3 +109,26 @@ def test_search_parameters_structure():
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+def test_file_and_stored_text_share_the_byte_cap(tmp_path: Path):
+    text = "é" * 10  # 2 bytes each in UTF-8
+    path = tmp_path / "notes.txt"
+    path.write_text(text, encoding="utf-8")
+    assert _read_text_file_safe(str(path), 7) == "é" * 3
+    assert _cap_text_bytes(str(path), text, 7) == "é" * 3
+    assert _cap_text_bytes(str(path), text, 20) == text
+
+
+def test_transcript_store_failure_reads_files(tmp_path: Path, monkeypatch):
+    # A directory cannot be opened as a database.
+    monkeypatch.setenv("RESCUEBOX_TRANSCRIPT_DB", str(tmp_path))
+    path = tmp_path / "notes.txt"
+    path.write_text("hello", encoding="utf-8")
+    assert _stored_transcripts([str(path)]) == {}
+
+    def broken(_paths):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(text_embeddings_main, "transcripts_for_files", broken)
+    assert _stored_transcripts([str(path)]) == {}
@@ -1,6 +1,8 @@
 import json
 import logging
 import os
+import sqlite3
+from functools import cache
 from pathlib import Path
 from typing import Any, NotRequired, TypedDict, cast
 
@@ -25,6 +27,7 @@ from rb.api.models import (
 )
 from rb.lib.ml_service import MLService
 from rb.lib.pipeline_corpus import resolve_text_file_corpus_paths
+from rb.lib.transcript_store import transcripts_for_files
 from sqlalchemy import bindparam, update
 from sqlalchemy import text as sql_text
 from sqlmodel import Session, delete, select
@@ -42,6 +45,13 @@ _CHUNK_OVERLAP = 60
 _MAX_READ_BYTES_PER_FILE = 50 * 1024 * 1024  # 50 MiB per file (truncate with warning)
 # GPU batching: one encode() over all chunks; raise on high-end GPUs (e.g. Spark / Blackwell).
 _EMBED_BATCH_SIZE = 256
+# CPU ONNX Runtime batches are smaller: attention cost grows with padded batch length.
+_ONNX_EMBED_BATCH_SIZE = 32
+
+# Encoder backend: "pytorch" (SentenceTransformer, default), "onnx" (fp32 export) or
+# "onnx-int8" (dynamically quantized export). All produce 1024-dim bge-m3 vectors stored
+# under the same ``model_name``; see README for the ONNX tolerance vs. PyTorch.
+EMBED_BACKENDS = ("pytorch", "onnx", "onnx-int8")
 
 APP_NAME = "text_embeddings"
 logger = logging.getLogger(__name__)
@@ -152,22 +162,63 @@ def _truncate(text: str, max_len: int) -> str:
     return s[:max_len] + ("..." if len(s) > max_len else "")
 
 
+def _cap_text_bytes(path: str, text: str, max_bytes: int) -> str:
+    """Truncate ``text`` to at most ``max_bytes`` of UTF-8, dropping a split character."""
+    data = text.encode("utf-8")
+    if len(data) <= max_bytes:
+        return text
+    logger.warning(
+        "Truncating %s to %d bytes for embedding (size cap)",
+        path,
+        max_bytes,
+    )
+    return data[:max_bytes].decode("utf-8", errors="ignore")
+
+
 def _read_text_file_safe(path: str, max_bytes: int) -> str:
     """Read text with a hard byte cap so huge forensic files cannot OOM the host."""
     try:
+        # Every character is at least one byte, so this covers the cap.
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
             data = f.read(max_bytes + 1)
-        if len(data) > max_bytes:
-            logger.warning(
-                "Truncating %s to %d bytes for embedding (size cap)",
-                path,
-                max_bytes,
-            )
-            return data[:max_bytes]
-        return data
     except OSError as exc:
         logger.warning("Skip unreadable file %s: %s", path, exc)
         return ""
+    return _cap_text_bytes(path, data, max_bytes)
+
+
+def _stored_transcripts(paths: list[str]) -> dict[str, str]:
+    """Unchanged transcripts from the audio-transcription store; ``{}`` if it fails."""
+    try:
+        return transcripts_for_files(paths)
+    except (sqlite3.Error, OSError) as exc:
+        logger.warning("Transcript store unavailable (%s); reading files", exc)
+        return {}
+
+
+def _embed_backend() -> str:
+    backend = (
+        os.environ.get("RESCUEBOX_TEXT_EMBED_BACKEND", "pytorch").strip().lower()
+        or "pytorch"
+    )
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(
+            f"RESCUEBOX_TEXT_EMBED_BACKEND must be one of {EMBED_BACKENDS}, got {backend!r}"
+        )
+    return backend
+
+
+@cache
+def _load_encoder(backend: str, model_name: str) -> Any:
+    """Load the encoder once per process; both backends expose ``encode``/``device``."""
+    if backend == "pytorch":
+        from sentence_transformers import SentenceTransformer  # type: ignore
+
+        return SentenceTransformer(model_name)
+
+    from text_embeddings.onnx_encoder import load_onnx_text_encoder
+
+    return load_onnx_text_encoder(quantized=backend == "onnx-int8")
 
 
 def _format_search_query(model_name: str, query_text: str) -> str:
@@ -285,8 +336,6 @@ def search(inputs: Inputs, parameters: Parameters) -> ResponseBody:
     for the requested model, then runs cosine similarity search.
     """
 
-    from sentence_transformers import SentenceTransformer  # type: ignore
-
     input_dir = str(inputs["input_dir"].path)
     query_text = inputs["query"].text
 
@@ -306,10 +355,13 @@ def search(inputs: Inputs, parameters: Parameters) -> ResponseBody:
             )
         )
 
-    model = SentenceTransformer(model_name)
+    backend = _embed_backend()
+    model = _load_encoder(backend, model_name)
+    batch_size = _EMBED_BATCH_SIZE if backend == "pytorch" else _ONNX_EMBED_BATCH_SIZE
 
     logger.info(
-        "SentenceTransformer loaded on device=%s model_name=%s",
+        "Text encoder ready backend=%s device=%s model_name=%s",
+        backend,
         model.device,
         model_name,
     )
@@ -327,8 +379,13 @@ def search(inputs: Inputs, parameters: Parameters) -> ResponseBody:
 
         # 1) Collect chunk texts only for paths that need vectors, then 2) one batched encode.
         chunk_rows: list[tuple[str, int, str]] = []
+        # Unchanged transcripts from audio-transcription come from its store.
+        stored = _stored_transcripts(paths_to_embed)
         for path in paths_to_embed:
-            text = _read_text_file_safe(path, _MAX_READ_BYTES_PER_FILE)
+            if path in stored:
+                text = _cap_text_bytes(path, stored[path], _MAX_READ_BYTES_PER_FILE)
+            else:
+                text = _read_text_file_safe(path, _MAX_READ_BYTES_PER_FILE)
             if not text.strip():
                 continue
             chunks = _chunk_text(
@@ -349,11 +406,11 @@ def search(inputs: Inputs, parameters: Parameters) -> ResponseBody:
                 len(paths_to_embed),
                 len(existing_paths),
                 len(file_paths),
-                _EMBED_BATCH_SIZE,
+                batch_size,
             )
             vectors = model.encode(
                 texts,
-                batch_size=_EMBED_BATCH_SIZE,
+                batch_size=batch_size,
                 convert_to_numpy=True,
                 normalize_embeddings=True,
                 show_progress_bar=len(texts) > 64,
@@ -433,6 +490,7 @@ def search(inputs: Inputs, parameters: Parameters) -> ResponseBody:
     response_data = {
         "query": query_text,
         "model": model_name,
+        "backend": backend,
         "top_k": top_k,
         "min_similarity": min_similarity,
         "similarity_guidance": (
@@ -0,0 +1,182 @@
+"""
+ONNX Runtime encoder for ``BAAI/bge-m3`` (CPU-only field kits).
+
+Drop-in replacement for the subset of ``SentenceTransformer.encode`` used by
+``text_embeddings.main``: CLS pooling + L2 normalisation, 1024-dim output, so
+vectors land in the same ``text_embedding_chunks`` rows as the PyTorch path.
+
+Export once (fp32), then optionally quantize to int8 for faster CPU inference::
+
+    optimum-cli export onnx --model BAAI/bge-m3 --task feature-extraction \\
+        text_embeddings/onnx_models/bge-m3
+    python -c "from text_embeddings.onnx_encoder import quantize_int8; \\
+        quantize_int8('text_embeddings/onnx_models/bge-m3')"
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODELS_DIR = Path(__file__).resolve().parent / "onnx_models" / "bge-m3"
+FP32_MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+
+EMBED_DIM = 1024
+# bge-m3 sentence-transformers config: max_seq_length=8192, CLS pooling, Normalize.
+MAX_SEQ_LENGTH = 8192
+
+# Documented tolerance vs. the PyTorch SentenceTransformer path (per-vector cosine).
+# ``benchmark_testing/benchmark_onnx_backend.py`` fails when a backend falls below it.
+FP32_MIN_COSINE = 0.999
+INT8_MIN_COSINE = 0.98
+
+# Output names produced by common bge-m3 exports that are already pooled.
+_POOLED_OUTPUT_NAMES = ("sentence_embedding", "dense_vecs")
+
+
+def onnx_model_dir() -> Path:
+    """Directory holding the exported model and tokenizer files."""
+    env = os.environ.get("RESCUEBOX_TEXT_EMBED_ONNX_DIR")
+    if env:
+        return Path(env).expanduser().resolve()
+    return ONNX_MODELS_DIR
+
+
+class OnnxTextEncoder:
+    """Encode text with an exported bge-m3 ONNX graph."""
+
+    def __init__(
+        self,
+        session: Any,
+        tokenizer: Any,
+        *,
+        max_length: int = MAX_SEQ_LENGTH,
+        label: str = "onnx",
+    ) -> None:
+        self._session = session
+        self._tokenizer = tokenizer
+        self._max_length = max_length
+        self._input_names = {i.name for i in session.get_inputs()}
+        output_names = [o.name for o in session.get_outputs()]
+        self._output_name = next(
+            (n for n in _POOLED_OUTPUT_NAMES if n in output_names), output_names[0]
+        )
+        self._pooled = self._output_name in _POOLED_OUTPUT_NAMES
+        providers = getattr(session, "get_providers", lambda: [])()
+        self.device = f"{label}:{providers[0] if providers else 'cpu'}"
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        tokens = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="np",
+        )
+        feed = {
+            name: np.asarray(value, dtype=np.int64)
+            for name, value in tokens.items()
+            if name in self._input_names
+        }
+        if "token_type_ids" in self._input_names and "token_type_ids" not in feed:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        out = self._session.run([self._output_name], feed)[0]
+        if not self._pooled and out.ndim == 3:
+            out = out[:, 0, :]  # CLS pooling, as in the bge-m3 ST pooling config
+        return out.astype(np.float32, copy=False)
+
+    def encode(
+        self,
+        sentences: str | Sequence[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        """Same call shape as ``SentenceTransformer.encode`` (numpy output only)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+
+        # Longest-first batching keeps padding (and wasted attention FLOPs) low.
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out: np.ndarray | None = None
+        for start in range(0, len(order), batch_size):
+            idx = order[start : start + batch_size]
+            vecs = self._encode_batch([texts[i] for i in idx])
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[-1]), dtype=np.float32)
+            out[idx] = vecs
+            if show_progress_bar:
+                logger.info(
+                    "ONNX encode: %d/%d",
+                    min(start + batch_size, len(texts)),
+                    len(texts),
+                )
+        assert out is not None
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.clip(norms, 1e-12, None)
+        return out[0] if single else out
+
+
+def load_onnx_text_encoder(
+    model_dir: Path | None = None, *, quantized: bool = False
+) -> OnnxTextEncoder:
+    """Open the fp32 or int8 export under ``model_dir`` with its tokenizer."""
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+
+    model_dir = model_dir or onnx_model_dir()
+    model_path = model_dir / (INT8_MODEL_FILE if quantized else FP32_MODEL_FILE)
+    if not model_path.is_file():
+        raise FileNotFoundError(
+            f"ONNX text encoder not found at {model_path}. "
+            "See text-embeddings README (ONNX backend) for export steps."
+        )
+
+    available = ort.get_available_providers()
+    providers: list[str] = []
+    # Dynamic int8 kernels are CPU-only; fp32 can still use CUDA when present.
+    if not quantized and "CUDAExecutionProvider" in available:
+        providers.append("CUDAExecutionProvider")
+    providers.append("CPUExecutionProvider")
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(
+        str(model_path), sess_options=opts, providers=providers
+    )
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dir), local_files_only=True)
+    logger.info(
+        "Loaded ONNX text encoder %s (providers=%s)",
+        model_path.name,
+        session.get_providers(),
+    )
+    return OnnxTextEncoder(
+        session, tokenizer, label="onnx-int8" if quantized else "onnx"
+    )
+
+
+def quantize_int8(model_dir: str | Path | None = None) -> Path:
+    """Write ``model_int8.onnx`` next to ``model.onnx`` (dynamic, weight-only int8)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_dir = Path(model_dir) if model_dir else onnx_model_dir()
+    src = model_dir / FP32_MODEL_FILE
+    dst = model_dir / INT8_MODEL_FILE
+    quantize_dynamic(
+        str(src),
+        str(dst),
+        weight_type=QuantType.QInt8,
+        use_external_data_format=True,
+    )
+    return dst
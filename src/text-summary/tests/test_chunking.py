@@ -0,0 +1,37 @@
+from text_summary.chunking import CHARS_PER_TOKEN, chunk_pages, estimate_tokens
+
+
+def _pages(n, words=120):
+    return [" ".join(f"p{i}w{j}" for j in range(words)) + "\n\n" for i in range(n)]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * (CHARS_PER_TOKEN + 1)) == 2
+
+
+def test_chunks_fit_the_budget_and_keep_all_text():
+    pages = _pages(40)
+    chunks = list(chunk_pages(pages, max_tokens=800))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "".join(pages)
+    assert all(estimate_tokens(c) <= 800 for c in chunks)
+
+
+def test_oversized_page_is_split_at_boundaries():
+    page = "\n\n".join(" ".join(["word"] * 300) for _ in range(5))
+    page += " " + "x" * 5000
+    chunks = list(chunk_pages([page], max_tokens=500))
+    assert "".join(chunks) == page
+    assert all(len(c) <= 500 * CHARS_PER_TOKEN for c in chunks)
+    assert chunks[0].endswith("\n\n")
+
+
+def test_boundaries_realign_after_an_edit():
+    pages = _pages(60)
+    before = list(chunk_pages(pages, max_tokens=1500))
+    pages[5] = pages[5].replace("p5w3 ", "p5w3 an inserted sentence of several words ")
+    after = list(chunk_pages(pages, max_tokens=1500))
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 2
+    assert len(set(after) & set(before)) >= len(after) - 2
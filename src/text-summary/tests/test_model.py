@@ -50,7 +50,9 @@ def test_summarize(mock_generate):
     }
     result = summarize("gemma3:1b", "Some text")
     assert result == "Summary"
-    mock_generate.assert_called_once_with("gemma3:1b", PROMPT.format(text="Some text"))
+    mock_generate.assert_called_once_with(
+        "gemma3:1b", PROMPT.format(text="Some text"), options={"num_ctx": 8192}
+    )
 
     # Test case where response is not done
     mock_generate.return_value = {"done": False}
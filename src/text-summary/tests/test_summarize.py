@@ -2,7 +2,7 @@ from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
-from text_summary.summarize import extract_text, process_files
+from text_summary.summarize import extract_text, new_summary_cache, process_files
 
 
 @patch(
@@ -19,6 +19,10 @@ def test_extract_text():
 @patch(
     "text_summary.summarize.PARSERS", {".txt": MagicMock(return_value="Mocked text")}
 )
+@patch(
+    "text_summary.summarize.PAGE_READERS",
+    {".txt": MagicMock(return_value=iter(["Mocked text"]))},
+)
 @patch("text_summary.summarize.Path.mkdir")
 @patch("text_summary.summarize.Path.iterdir")
 @patch("text_summary.summarize.Path.write_text")
@@ -93,3 +97,78 @@ def test_process_files_no_supported_files(
         mock_warning.assert_called_once_with(
             "No files were processed. Check the input directory for supported file types."
         )
+
+
+def test_process_files_reuses_cached_summaries(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CACHE_DB", str(tmp_path / "summaries.db"))
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "a.txt").write_text("alpha", encoding="utf-8")
+    (src / "b.md").write_text("beta", encoding="utf-8")
+    calls: list[str] = []
+
+    def _summarize(model, text):
+        calls.append(text)
+        return f"summary of {text}"
+
+    with patch("text_summary.summarize.ensure_model_exists"), patch(
+        "text_summary.summarize.summarize", side_effect=_summarize
+    ):
+        process_files("gemma3:1b", str(src), str(tmp_path / "out"))
+        (src / "c.txt").write_text("gamma", encoding="utf-8")
+        cache = new_summary_cache("gemma3:1b")
+        out = process_files("gemma3:1b", str(src), str(tmp_path / "out2"), cache)
+
+    assert sorted(calls) == ["alpha", "beta", "gamma"]
+    assert len(out) == 3
+    assert (tmp_path / "out2" / "a.txt").read_text(encoding="utf-8") == (
+        "summary of alpha"
+    )
+    assert cache.stats()["hits"] == 2 and cache.stats()["stored"] == 1
+
+
+def test_long_document_is_summarized_map_reduce(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESCUEBOX_FINGERPRINT_DB", str(tmp_path / "fp.db"))
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CACHE_DB", str(tmp_path / "summaries.db"))
+    monkeypatch.setenv("RESCUEBOX_SUMMARY_CONTEXT_TOKENS", "2048")
+    src = tmp_path / "in"
+    src.mkdir()
+    paragraphs = [" ".join(f"s{i}w{j}" for j in range(150)) + "\n\n" for i in range(60)]
+    (src / "long.txt").write_text("".join(paragraphs), encoding="utf-8")
+    (src / "short.txt").write_text("short", encoding="utf-8")
+    chunks: list[str] = []
+    reduced: list[list[str]] = []
+
+    def _chunk(model, text):
+        chunks.append(text)
+        return f"part {text[:8]}"
+
+    def _combine(model, summaries):
+        reduced.append(summaries)
+        return " + ".join(summaries)
+
+    with patch("text_summary.summarize.ensure_model_exists"), patch(
+        "text_summary.summarize.summarize", return_value="whole"
+    ) as whole, patch(
+        "text_summary.summarize.summarize_chunk", side_effect=_chunk
+    ), patch(
+        "text_summary.summarize.combine_summaries", side_effect=_combine
+    ):
+        process_files("gemma3:1b", str(src), str(tmp_path / "out"))
+        assert len(chunks) > 2
+        assert sum(map(len, chunks)) == len("".join(paragraphs))
+        whole.assert_called_once_with("gemma3:1b", "short")
+        [parts] = reduced
+        assert parts[0] == "part s0w0 s0w"
+        assert (tmp_path / "out" / "long.txt").read_text(encoding="utf-8") == (
+            " + ".join(parts)
+        )
+
+        # Editing one paragraph only re-runs the chunk(s) around it.
+        chunks.clear()
+        paragraphs[3] = paragraphs[3].replace("s3w7 ", "s3w7 edited ")
+        (src / "long.txt").write_text("".join(paragraphs), encoding="utf-8")
+        process_files("gemma3:1b", str(src), str(tmp_path / "out2"))
+        assert 1 <= len(chunks) <= 2
+        assert any("edited" in c for c in chunks)
@@ -0,0 +1,84 @@
+"""
+Token-aware chunking for documents longer than the model context.
+
+The Gemma tokenizer is not shipped with the plugin, so sizes are estimated at
+``CHARS_PER_TOKEN`` characters per token, a conservative ratio for prose.
+
+Pages are packed, in order, into chunks of at most ``max_tokens``. Once a chunk
+is half full it also ends after an "anchor" page (chosen by a hash of the page
+text). After an edit, chunk boundaries line up again at the next anchor, so
+unchanged pages keep producing the same chunks and their cached summaries stay
+valid. Pages larger than a chunk are split at paragraph, line, then word
+boundaries.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections.abc import Iterable, Iterator
+
+CHARS_PER_TOKEN = 4
+# On average one page in this many is an anchor.
+_ANCHOR_EVERY = 4
+_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of ``text``."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _split(text: str, max_chars: int, separators: tuple[str, ...]) -> list[str]:
+    """Pieces of at most ``max_chars`` that join back to ``text``."""
+    if len(text) <= max_chars:
+        return [text]
+    if not separators:
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+    sep, finer = separators[0], separators[1:]
+    parts = text.split(sep)
+    parts = [p + sep for p in parts[:-1]] + [parts[-1]]
+    pieces: list[str] = []
+    current: list[str] = []
+    size = 0
+    for part in parts:
+        if size + len(part) <= max_chars:
+            current.append(part)
+            size += len(part)
+            continue
+        if current:
+            pieces.append("".join(current))
+            current, size = [], 0
+        if len(part) <= max_chars:
+            current, size = [part], len(part)
+        else:
+            pieces.extend(_split(part, max_chars, finer))
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def _is_anchor(piece: str) -> bool:
+    return zlib.crc32(piece.encode("utf-8")) % _ANCHOR_EVERY == 0
+
+
+def chunk_pages(pages: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """
+    Chunks of at most ``max_tokens`` (estimated) covering ``pages`` in order.
+
+    Joined, the chunks are ``"".join(pages)``.
+    """
+    max_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+    current: list[str] = []
+    size = 0
+    for page in pages:
+        for piece in _split(page, max_chars, _SEPARATORS):
+            if current and size + len(piece) > max_chars:
+                yield "".join(current)
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece)
+            if size >= max_chars // 2 and _is_anchor(piece):
+                yield "".join(current)
+                current, size = [], 0
+    if current:
+        yield "".join(current)
@@ -1,7 +1,6 @@
 import json
 import logging
 import os
-import threading
 from pathlib import Path
 from typing import TypedDict
 
@@ -22,14 +21,12 @@ from rb.api.models import (
 from rb.lib.ml_service import MLService
 
 from text_summary.model import SUPPORTED_MODELS
-from text_summary.summarize import process_files
+from text_summary.summarize import new_summary_cache, process_files
 from text_summary.text_parser import PARSERS
 
 APP_NAME = "text_summarization"
 logger = logging.getLogger(__name__)
 
-_SUMMARIZE_LOCK = threading.Lock()
-
 # Extensions handled by ``text_parser.PARSERS`` (top-level files under ``input_dir``).
 TEXT_SUMMARY_EXTENSIONS = frozenset(PARSERS.keys())
 
@@ -104,10 +101,17 @@ def summarize(
     output_dir = inputs["output_dir"].path
     model = parameters["model"]
 
-    with _SUMMARIZE_LOCK:
-        processed_files = process_files(model, input_dir, output_dir)
+    # Concurrent jobs share the Ollama scheduler's window (rb.lib.llm_scheduler).
+    cache = new_summary_cache(model)
+    processed_files = process_files(model, input_dir, output_dir, cache)
 
-    response = TextResponse(value=json.dumps(list(processed_files)))
+    stats = cache.stats()
+    response = TextResponse(
+        value=json.dumps(list(processed_files)),
+        subtitle=(
+            f"Summary cache: {stats['hits']} reused, {stats['misses']} generated"
+        ),
+    )
     return ResponseBody(root=response)
 
 
@@ -1,13 +1,44 @@
+import os
+
 import ollama
 import rb.lib.ollama  # noqa: F401
+from rb.lib.llm_scheduler import get_scheduler
 
-from text_summary.summary_prompt import PROMPT
+from text_summary.chunking import estimate_tokens
+from text_summary.summary_prompt import CHUNK_PROMPT, PROMPT, REDUCE_PROMPT
 
 SUPPORTED_MODELS = [
     "gemma3:1b",
     "gemma3:4b",
 ]
 
+_DEFAULT_CONTEXT_TOKENS = 8192
+# Room left in the context for the model's answer.
+RESPONSE_TOKENS = 1024
+
+
+def summary_context_tokens() -> int:
+    """
+    Context window requested from Ollama (``RESCUEBOX_SUMMARY_CONTEXT_TOKENS``).
+
+    Sent as ``num_ctx`` so prompts are not silently truncated to Ollama's
+    smaller default; longer documents are summarized in parts.
+    """
+    return max(
+        2048,
+        int(
+            os.getenv("RESCUEBOX_SUMMARY_CONTEXT_TOKENS", str(_DEFAULT_CONTEXT_TOKENS))
+        ),
+    )
+
+
+def prompt_budget(template: str) -> int:
+    """Tokens of document text that fit in ``template`` with room for the answer."""
+    return max(
+        256,
+        summary_context_tokens() - estimate_tokens(template) - RESPONSE_TOKENS,
+    )
+
 
 def extract_response_after_think(text: str) -> str:
     """
@@ -34,9 +65,33 @@ def ensure_model_exists(model: str) -> None:
         raise ValueError(e)
 
 
-def summarize(model: str, text: str) -> str:
-    prompt = PROMPT.format(text=text)
-    response = ollama.generate(model, prompt)
+def _generate(model: str, prompt: str):
+    # Shared concurrency window and retries (rb.lib.llm_scheduler).
+    response = get_scheduler().generate(
+        model, prompt, options={"num_ctx": summary_context_tokens()}
+    )
     if response and response["done"]:
         response = extract_response_after_think(response["response"])
     return response
+
+
+def _generate_text(model: str, prompt: str) -> str:
+    response = _generate(model, prompt)
+    if not isinstance(response, str):
+        raise ValueError(f"Model '{model}' returned an incomplete response")
+    return response
+
+
+def summarize(model: str, text: str) -> str:
+    return _generate(model, PROMPT.format(text=text))
+
+
+def summarize_chunk(model: str, text: str) -> str:
+    """Summary of one part of a document too long for a single prompt."""
+    return _generate_text(model, CHUNK_PROMPT.format(text=text))
+
+
+def combine_summaries(model: str, summaries: list[str]) -> str:
+    """One summary from part summaries given in document order."""
+    text = "\n\n".join(f"Part {i}:\n{s}" for i, s in enumerate(summaries, start=1))
+    return _generate_text(model, REDUCE_PROMPT.format(text=text))
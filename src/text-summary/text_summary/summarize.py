@@ -1,8 +1,29 @@
+import hashlib
 import logging
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 
-from text_summary.model import ensure_model_exists, summarize
-from text_summary.text_parser import PARSERS
+from rb.lib.llm_scheduler import get_scheduler
+from rb.lib.summary_cache import SummaryCache, prompt_version
+
+from text_summary.chunking import chunk_pages, estimate_tokens
+from text_summary.model import (
+    combine_summaries,
+    ensure_model_exists,
+    prompt_budget,
+    summarize,
+    summarize_chunk,
+    summary_context_tokens,
+)
+from text_summary.summary_prompt import CHUNK_PROMPT, PROMPT, REDUCE_PROMPT
+from text_summary.text_parser import PAGE_READERS, PARSERS
+
+CACHE_KIND = "text_summary"
+CHUNK_CACHE_KIND = "text_summary_chunk"
+# Added per part by ``combine_summaries`` ("Part N:" label and spacing).
+_PART_OVERHEAD_TOKENS = 4
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,7 +34,131 @@ def extract_text(file_path: Path) -> str:
     return parser(file_path)
 
 
-def process_files(model: str, input_dir: str, output_dir: str) -> None:
+def iter_pages(file_path: Path) -> Iterator[str]:
+    reader = PAGE_READERS.get(file_path.suffix.lower())
+    return reader(file_path)
+
+
+def new_summary_cache(model: str) -> SummaryCache:
+    """Cache of this plugin's summaries; entries from older prompts are dropped."""
+    return SummaryCache(
+        CACHE_KIND,
+        model,
+        prompt_version(
+            PROMPT, CHUNK_PROMPT, REDUCE_PROMPT, str(summary_context_tokens())
+        ),
+    )
+
+
+def new_chunk_cache(model: str) -> SummaryCache:
+    """Cache of part summaries of long documents, keyed by the part's text."""
+    return SummaryCache(CHUNK_CACHE_KIND, model, prompt_version(CHUNK_PROMPT))
+
+
+def _map_chunks(
+    model: str,
+    chunks: list[str],
+    pool: ThreadPoolExecutor,
+    chunk_cache: SummaryCache,
+    source: str,
+) -> list[str]:
+    """Summary of each chunk; cached ones are reused, the rest run on ``pool``."""
+    digests = [hashlib.sha256(c.encode("utf-8")).hexdigest() for c in chunks]
+    cached = chunk_cache.lookup_digests(digests)
+    futures = {
+        digest: pool.submit(summarize_chunk, model, chunk)
+        for digest, chunk in dict(zip(digests, chunks)).items()
+        if digest not in cached
+    }
+    logger.info(
+        f"{Path(source).name}: {len(chunks)} parts, {len(chunks) - len(futures)} "
+        f"cached, {len(futures)} to summarize"
+    )
+    # Keep every part that finished, even if another failed, so a retry only
+    # redoes the failed ones.
+    wait(futures.values())
+    for digest, future in futures.items():
+        if future.exception() is None:
+            chunk_cache.store_digest(digest, future.result(), source_path=source)
+    return [cached[d] if d in cached else futures[d].result() for d in digests]
+
+
+def _reduce(model: str, summaries: list[str], pool: ThreadPoolExecutor) -> str:
+    """Combine part summaries, in rounds while they do not fit one prompt."""
+    budget = prompt_budget(REDUCE_PROMPT)
+    while True:
+        sizes = [estimate_tokens(s) + _PART_OVERHEAD_TOKENS for s in summaries]
+        if len(summaries) <= 2 or sum(sizes) <= budget:
+            return combine_summaries(model, summaries)
+        # Consecutive groups that fit; at least two per group so rounds shrink.
+        groups: list[list[str]] = []
+        size = 0
+        for summary, tokens in zip(summaries, sizes):
+            if groups and (len(groups[-1]) < 2 or size + tokens <= budget):
+                groups[-1].append(summary)
+                size += tokens
+            else:
+                groups.append([summary])
+                size = tokens
+        summaries = list(pool.map(lambda g: combine_summaries(model, g), groups))
+
+
+def summarize_document(
+    model: str,
+    pages: Iterable[str],
+    pool: ThreadPoolExecutor,
+    chunk_cache: SummaryCache,
+    source: str = "",
+) -> str:
+    """
+    Summary of a document given as pages (or text blocks) in order.
+
+    A document that fits the context is summarized with one prompt. A longer
+    one is split into token-bounded chunks that are summarized in parallel
+    on ``pool`` (map) and then combined (reduce); chunk summaries are cached
+    by chunk text, so after an edit only the changed chunks run again.
+    """
+    pages = list(pages)
+    if sum(estimate_tokens(p) for p in pages) <= prompt_budget(PROMPT):
+        return summarize(model, "".join(pages))
+    chunks = list(chunk_pages(pages, prompt_budget(CHUNK_PROMPT)))
+    summaries = _map_chunks(model, chunks, pool, chunk_cache, source)
+    return _reduce(model, summaries, pool)
+
+
+def _summarize_file(
+    model: str,
+    file_path: Path,
+    output_path: Path,
+    cache: SummaryCache,
+    pool: ThreadPoolExecutor,
+    chunk_cache: SummaryCache,
+) -> str:
+    started = time.perf_counter()
+    summary = summarize_document(
+        model, iter_pages(file_path), pool, chunk_cache, str(file_path)
+    )
+    if isinstance(summary, str):
+        cache.store(str(file_path), summary)
+    output_file = output_path / (file_path.stem + ".txt")
+    output_file.write_text(summary, encoding="utf-8")
+    logger.info(
+        f"Processed: {file_path.name} -> {output_file.name} "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+    return str(output_file)
+
+
+def process_files(
+    model: str, input_dir: str, output_dir: str, cache: SummaryCache | None = None
+) -> set[str]:
+    """
+    Summarize each supported file into ``output_dir/<stem>.txt``.
+
+    Files whose content was already summarized with this model and prompt are
+    written from ``cache`` without calling the model. Files longer than the
+    model context are summarized map-reduce (``summarize_document``).
+    """
     ensure_model_exists(model)
     input_path = Path(input_dir)
     if not input_path.exists():
@@ -24,21 +169,49 @@ def process_files(model: str, input_dir: str, output_dir: str) -> None:
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
+    files = [f for f in input_path.iterdir() if f.suffix.lower() in PARSERS]
+    if cache is None:
+        cache = new_summary_cache(model)
+    cached = cache.lookup(str(f) for f in files)
     processed_files = set()
-    for file_path in input_path.iterdir():
-        if file_path.suffix.lower() not in PARSERS:
-            continue
-
-        try:
-            text = extract_text(file_path)
-            summary = summarize(model, text)
-
+    for file_path in files:
+        if str(file_path) in cached:
             output_file = output_path / (file_path.stem + ".txt")
-            output_file.write_text(summary, encoding="utf-8")
+            output_file.write_text(cached[str(file_path)], encoding="utf-8")
             processed_files.add(str(output_file))
-            logger.info(f"Processed: {file_path.name} -> {output_file.name}")
-        except Exception as e:
-            logger.error(f"Error processing {file_path.name}: {e}")
+    files = [f for f in files if str(f) not in cached]
+    if files:
+        # Files run on one pool and parts of long files on another (file tasks
+        # wait for their parts); the scheduler bounds what reaches Ollama.
+        scheduler = get_scheduler()
+        chunk_cache = new_chunk_cache(model)
+        with ThreadPoolExecutor(
+            max_workers=scheduler.max_concurrency,
+            thread_name_prefix="text-summary-part",
+        ) as part_pool, ThreadPoolExecutor(
+            max_workers=min(scheduler.max_concurrency, len(files)),
+            thread_name_prefix="text-summary",
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _summarize_file,
+                    model,
+                    f,
+                    output_path,
+                    cache,
+                    part_pool,
+                    chunk_cache,
+                ): f
+                for f in files
+            }
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    processed_files.add(future.result())
+                except Exception as e:
+                    logger.error(f"Error processing {file_path.name}: {e}")
+        if chunk_cache.hits or chunk_cache.misses:
+            logger.info(f"Part summaries: {chunk_cache.stats()}")
 
     if not processed_files:
         logger.warning(
@@ -6,3 +6,23 @@ Document:
 
 Summary:
 """
+
+# Map step for documents longer than the model context: one part at a time.
+CHUNK_PROMPT = """You are an expert writing assistant. The following text is one part of a longer document. Summarize this part in clear, concise language, keeping its main points, names, figures and dates.
+Just provide the summary without any additional commentary or explanation.
+
+Document part:
+{text}
+
+Summary:
+"""
+
+# Reduce step: combine the part summaries (in document order) into one.
+REDUCE_PROMPT = """You are an expert writing assistant. The following are summaries of consecutive parts of one document, in order. Combine them into a single clear, concise summary that captures the main points, structure, and tone of the whole document.
+Just provide the summary without any additional commentary or explanation.
+
+Part summaries:
+{text}
+
+Summary:
+"""
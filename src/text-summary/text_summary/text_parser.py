@@ -1,19 +1,41 @@
+from collections.abc import Iterator
 from pathlib import Path
 
 import PyPDF2
 
+# Text files are read in blocks of whole lines of about this many characters.
+_TEXT_BLOCK_CHARS = 64 * 1024
 
-def parse_raw_text(file_path: Path) -> str:
-    return file_path.read_text(encoding="utf-8")
 
+def iter_text_blocks(file_path: Path) -> Iterator[str]:
+    """Text file in blocks of whole lines; joined, the blocks are the file text."""
+    with open(file_path, encoding="utf-8") as file:
+        block: list[str] = []
+        size = 0
+        for line in file:
+            block.append(line)
+            size += len(line)
+            if size >= _TEXT_BLOCK_CHARS:
+                yield "".join(block)
+                block, size = [], 0
+        if block:
+            yield "".join(block)
 
-def parse_pdf(file_path: Path) -> str:
-    text = ""
+
+def iter_pdf_pages(file_path: Path) -> Iterator[str]:
+    """Text of each PDF page, one page at a time."""
     with open(file_path, "rb") as file:
         reader = PyPDF2.PdfReader(file)
         for page in reader.pages:
-            text += page.extract_text() or ""
-    return text
+            yield page.extract_text() or ""
+
+
+def parse_raw_text(file_path: Path) -> str:
+    return file_path.read_text(encoding="utf-8")
+
+
+def parse_pdf(file_path: Path) -> str:
+    return "".join(iter_pdf_pages(file_path))
 
 
 # File extension to parser function mapping
@@ -22,3 +44,10 @@ PARSERS = {
     ".pdf": parse_pdf,
     ".md": parse_raw_text,
 }
+
+# File extension to page reader (pages or blocks, in order) mapping
+PAGE_READERS = {
+    ".txt": iter_text_blocks,
+    ".pdf": iter_pdf_pages,
+    ".md": iter_text_blocks,
+}